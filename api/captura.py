@@ -0,0 +1,220 @@
+"""
+Captura de tráfego (opt-in) para reproduzir a carga real em staging.
+
+Com CAPTURA_TRAFEGO=<ficheiro> definido, cada pedido que corresponda a uma
+rota da API é registado numa linha JSON de um ficheiro rotativo:
+
+    {"t": 1760950000.123, "metodo": "POST", "rota": "/api/aulas/{aula_id}/confirm",
+     "path_params": {"aula_id": "812"}, "query": {}, "corpo": {"leva_carro": true},
+     "role": "mentor", "estado": 200, "duracao_ms": 41.7}
+
+Só se guardam metadados sanitizados: o template da rota (nunca o path cru),
+o role de quem chamou (nunca o id, email ou token) e valores que não
+identificam ninguém — números, booleanos, datas e identificadores curtos em
+minúsculas (ex: estados). Texto livre, UUIDs e chaves sensíveis ficam "*".
+
+O pedido só paga o enfileiramento: a resolução do role e a escrita em disco
+correm numa thread própria. A reprodução faz-se com `python -m perf.replay`.
+
+Variáveis:
+    CAPTURA_TRAFEGO            caminho do ficheiro (vazio = desligado); com vários
+                               workers usar {pid} no nome, ex: /var/log/rap/trafego-{pid}.jsonl
+    CAPTURA_TRAFEGO_MAX_MB     tamanho de cada ficheiro antes de rodar (omissão 50)
+    CAPTURA_TRAFEGO_FICHEIROS  nº de ficheiros rodados a manter (omissão 5)
+    CAPTURA_TRAFEGO_AMOSTRA    fração de pedidos a registar (omissão 1.0)
+"""
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import threading
+import time
+from typing import Any, Optional
+from urllib.parse import parse_qsl
+
+logger = logging.getLogger(__name__)
+
+REDIGIDO = "*"
+
+# Chaves cujo valor nunca é guardado, seja qual for o formato
+CHAVES_SENSIVEIS = {
+    "q", "search", "email", "nome", "name", "password", "token", "telefone", "telemovel",
+    "nif", "morada", "observacoes", "obs_termino", "sumario", "texto", "mensagem", "conteudo",
+    "descricao", "notas", "feedback", "prompt", "avatar_url", "access_token", "refresh_token",
+}
+
+# Maior corpo que é lido para sanitizar (uploads e afins ficam só com o tamanho)
+MAX_CORPO_BYTES = 16 * 1024
+
+_RE_DATA = re.compile(r"^\d{4}-\d{2}-\d{2}([T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?(Z|[+-]\d{2}:?\d{2})?)?$")
+_RE_NUMERO = re.compile(r"^-?\d+(\.\d+)?$")
+_RE_IDENTIFICADOR = re.compile(r"^[a-z][a-z0-9_]{0,29}$")
+
+
+def sanitizar(valor: Any, chave: Optional[str] = None) -> Any:
+    """Mantém números, booleanos, datas e identificadores curtos; o resto passa a "*"."""
+    if chave is not None and chave.lower() in CHAVES_SENSIVEIS:
+        return REDIGIDO
+    if valor is None or isinstance(valor, (bool, int, float)):
+        return valor
+    if isinstance(valor, dict):
+        return {k: sanitizar(v, k) for k, v in valor.items()}
+    if isinstance(valor, list):
+        return [sanitizar(v, chave) for v in valor]
+    if isinstance(valor, str) and (_RE_DATA.match(valor) or _RE_NUMERO.match(valor)
+                                    or _RE_IDENTIFICADOR.match(valor)):
+        return valor
+    return REDIGIDO
+
+
+def sanitizar_query(query_string: bytes) -> dict:
+    """Query string → dict sanitizado (chaves repetidas viram lista)."""
+    resultado: dict = {}
+    for chave, valor in parse_qsl(query_string.decode("latin-1"), keep_blank_values=True):
+        valor = sanitizar(valor, chave)
+        if chave in resultado:
+            anterior = resultado[chave]
+            resultado[chave] = (anterior if isinstance(anterior, list) else [anterior]) + [valor]
+        else:
+            resultado[chave] = valor
+    return resultado
+
+
+def sanitizar_corpo(corpo: bytes, content_type: str) -> Any:
+    """Corpo JSON sanitizado; None se vazio, não-JSON ou grande demais."""
+    if not corpo or len(corpo) > MAX_CORPO_BYTES or "json" not in content_type:
+        return None
+    try:
+        return sanitizar(json.loads(corpo))
+    except ValueError:
+        return None
+
+
+def _role_do_token(autorizacao: str) -> Optional[str]:
+    """Role de quem enviou o token (None se anónimo ou inválido). Usa a cache de permissões."""
+    from auth import JWT_SECRET
+    if not JWT_SECRET or not autorizacao.lower().startswith("bearer "):
+        return None
+    import jwt
+    try:
+        payload = jwt.decode(autorizacao[7:], JWT_SECRET, algorithms=["HS256"], audience="authenticated")
+    except jwt.InvalidTokenError:
+        return None
+    from services import permission_service
+    try:
+        perms = permission_service.get_user_permissions(payload["sub"])
+    except Exception:
+        return "desconhecido"
+    if perms.get("is_root"):
+        return "root"
+    return perms.get("role") or "desconhecido"
+
+
+class _Gravador:
+    """Thread que resolve o role e escreve as linhas no ficheiro rotativo."""
+
+    def __init__(self, caminho: str, max_bytes: int, ficheiros: int):
+        pasta = os.path.dirname(os.path.abspath(caminho))
+        os.makedirs(pasta, exist_ok=True)
+        self.handler = logging.handlers.RotatingFileHandler(
+            caminho, maxBytes=max_bytes, backupCount=ficheiros, encoding="utf-8")
+        self.handler.setFormatter(logging.Formatter("%(message)s"))
+        self.fila: "queue.Queue[Optional[dict]]" = queue.Queue(maxsize=10_000)
+        self.descartados = 0
+        self._thread = threading.Thread(target=self._correr, name="captura-trafego", daemon=True)
+        self._thread.start()
+
+    def registar(self, entrada: dict):
+        try:
+            self.fila.put_nowait(entrada)
+        except queue.Full:
+            # Nunca atrasar um pedido por causa da captura
+            self.descartados += 1
+
+    def _correr(self):
+        while True:
+            entrada = self.fila.get()
+            if entrada is None:
+                break
+            try:
+                entrada["role"] = _role_do_token(entrada.pop("_autorizacao", ""))
+                linha = json.dumps(entrada, ensure_ascii=False, separators=(",", ":"))
+                self.handler.emit(logging.makeLogRecord({"msg": linha}))
+            except Exception as e:
+                logger.warning(f"[CAPTURA] Erro a registar pedido: {e}")
+            finally:
+                self.fila.task_done()
+
+    def fechar(self):
+        self.fila.put(None)
+        self._thread.join(timeout=5)
+        self.handler.close()
+
+
+class CapturaTrafegoMiddleware:
+    """Middleware ASGI puro: não lê o corpo por conta própria, só copia o que a app já consome."""
+
+    def __init__(self, app, caminho: str, max_bytes: int = 50 * 1024 * 1024,
+                 ficheiros: int = 5, amostra: float = 1.0):
+        self.app = app
+        self.amostra = amostra
+        self.gravador = _Gravador(caminho, max_bytes, ficheiros)
+
+    async def __call__(self, scope, receive, send):
+        # Sub-pedidos do POST /api/batch não são gravados: o replay já reproduz o batch
+        if scope["type"] != "http" or scope.get("rap.batch") or (self.amostra < 1.0 and random.random() >= self.amostra):
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.time()
+        t0 = time.perf_counter()
+        corpo = bytearray()
+        estado = {"codigo": 500}
+
+        async def _receive():
+            mensagem = await receive()
+            if mensagem["type"] == "http.request" and len(corpo) <= MAX_CORPO_BYTES:
+                corpo.extend(mensagem.get("body", b""))
+            return mensagem
+
+        async def _send(mensagem):
+            if mensagem["type"] == "http.response.start":
+                estado["codigo"] = mensagem["status"]
+            await send(mensagem)
+
+        try:
+            await self.app(scope, _receive, _send)
+        finally:
+            rota = scope.get("route")
+            if rota is not None and getattr(rota, "path", None):
+                cabecalhos = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope.get("headers", [])}
+                self.gravador.registar({
+                    "t": round(inicio, 3),
+                    "metodo": scope["method"],
+                    "rota": rota.path,
+                    "path_params": {k: sanitizar(str(v), k) for k, v in scope.get("path_params", {}).items()},
+                    "query": sanitizar_query(scope.get("query_string", b"")),
+                    "corpo": sanitizar_corpo(bytes(corpo), cabecalhos.get("content-type", "")),
+                    "estado": estado["codigo"],
+                    "duracao_ms": round((time.perf_counter() - t0) * 1000.0, 2),
+                    "_autorizacao": cabecalhos.get("authorization", ""),
+                })
+
+
+def configurar_captura(app) -> bool:
+    """Liga a captura se CAPTURA_TRAFEGO estiver definido. Devolve True se ficou ativa."""
+    caminho = os.getenv("CAPTURA_TRAFEGO", "").strip()
+    if not caminho:
+        return False
+    app.add_middleware(
+        CapturaTrafegoMiddleware,
+        caminho=caminho.replace("{pid}", str(os.getpid())),
+        max_bytes=int(float(os.getenv("CAPTURA_TRAFEGO_MAX_MB", "50")) * 1024 * 1024),
+        ficheiros=int(os.getenv("CAPTURA_TRAFEGO_FICHEIROS", "5")),
+        amostra=float(os.getenv("CAPTURA_TRAFEGO_AMOSTRA", "1.0")),
+    )
+    logger.info(f"[CAPTURA] A registar tráfego em {caminho}")
+    return True
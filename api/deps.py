@@ -1,49 +1,72 @@
 """
 Dependências e helpers de permissão partilhados por todos os routers.
+
+Cada pedido HTTP corre dentro de `permissoes_partilhadas()` (PermissoesPorPedido,
+registado em main.py): as permissões de um utilizador são resolvidas uma vez e
+o mesmo PermissionContext serve os `_require_*`, os filtros de projeto e os
+serviços chamados durante esse pedido.
 """
-from fastapi import HTTPException
+from fastapi import Depends, HTTPException
+
+from auth import get_current_user_required
 from services import permission_service as _perm_svc
+from services.permission_service import PermissionContext
+
+
+class PermissoesPorPedido:
+    """Middleware ASGI: abre o memo de permissões por pedido HTTP."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with _perm_svc.permissoes_partilhadas():
+            await self.app(scope, receive, send)
+
+
+def _contexto(user: dict) -> PermissionContext:
+    return _perm_svc.get_permission_context(user.get("sub"))
+
+
+def get_permission_context(user=Depends(get_current_user_required)) -> PermissionContext:
+    """Dependência FastAPI: PermissionContext do utilizador autenticado."""
+    return _contexto(user)
 
 
 def _require_admin(user: dict):
     """Levanta 403 se o utilizador não for root. Gestão de sistema é exclusiva de IT."""
-    user_id = user.get("sub")
-    perms = _perm_svc.get_user_permissions(user_id)
-    if perms["is_root"]:
+    if _contexto(user).is_root:
         return
     raise HTTPException(status_code=403, detail="Acesso negado.")
 
 
 def _require_direcao(user: dict):
     """Levanta 403 se o utilizador não tiver acesso de direção (is_root ou is_direcao)."""
-    user_id = user.get("sub")
-    perms = _perm_svc.get_user_permissions(user_id)
-    if perms["is_root"] or perms["is_direcao"]:
+    if _contexto(user).is_direcao_or_above:
         return
     raise HTTPException(status_code=403, detail="Acesso negado.")
 
 
 def _require_coordenacao(user: dict):
     """Levanta 403 se o utilizador não tiver acesso de coordenação."""
-    user_id = user.get("sub")
-    perms = _perm_svc.get_user_permissions(user_id)
-    if perms["is_root"] or perms["is_direcao"] or perms["is_coordenacao"]:
+    if _contexto(user).is_coordenacao_or_above:
         return
     raise HTTPException(status_code=403, detail="Acesso negado.")
 
 
 def _require_root_or_role(user: dict, allowed_roles: set):
     """Levanta 403 se o utilizador não for root nem tiver um dos roles permitidos."""
-    user_id = user.get("sub")
-    perms = _perm_svc.get_user_permissions(user_id)
-    if perms["is_root"]:
+    ctx = _contexto(user)
+    if ctx.is_root:
         return
-    if perms["role"] not in allowed_roles:
+    if ctx.role not in allowed_roles:
         raise HTTPException(status_code=403, detail="Acesso negado.")
 
 
 def _require_action(user: dict, action_key: str):
     """Levanta 403 se o utilizador não tiver a action_key permitida na sua patente."""
-    user_id = user.get("sub")
-    if not _perm_svc.has_action(user_id, action_key):
+    if not _contexto(user).has_action(action_key):
         raise HTTPException(status_code=403, detail="Acesso negado.")
@@ -6,6 +6,10 @@ from api.deps import _require_admin, _require_direcao, _require_coordenacao, _re
 from services import permission_service as _perm_svc
 from services import settings_service as _settings_svc
 from services import audit_service as _audit_svc
+from services import index_advisor_service as _index_svc
+from database import cache_invalidacao as _cache_inv
+from utils import lru as _lru
+from utils import single_flight as _single_flight
 
 router = APIRouter()
 
@@ -60,6 +64,10 @@ class PatenteCreatePayload(BaseModel):
     color: Optional[str] = None
 
 
+class IndicesMigracaoPayload(BaseModel):
+    nomes: List[str] = []
+
+
 class PatenteUpdatePayload(BaseModel):
     label: str
     allowed_pages: List[str] = []
@@ -105,6 +113,37 @@ async def admin_audit_logs(limit: int = 200, user=Depends(get_current_user_requi
     return _audit_svc.listar(limit)
 
 
+@router.get("/api/admin/caches", tags=["Admin"])
+async def admin_caches(user=Depends(get_current_user_required)):
+    """Tamanho, taxa de acerto e despejos das caches em memória deste worker. Apenas root."""
+    _require_admin(user)
+    return {
+        "escuta_ativa": _cache_inv.ativo(),
+        "caches": _lru.metricas(),
+        "single_flight": _single_flight.estatisticas(),
+    }
+
+
+@router.get("/api/admin/indices/sugestoes", tags=["Admin"])
+async def admin_sugestoes_indices(limit: int = 50, user=Depends(get_current_user_required)):
+    """Propõe índices a partir das queries mais pesadas (pg_stat_statements + EXPLAIN). Apenas root."""
+    _require_admin(user)
+    return _index_svc.sugerir_indices(limit)
+
+
+@router.post("/api/admin/indices/migracao", tags=["Admin"])
+async def admin_gerar_migracao_indices(payload: IndicesMigracaoPayload, user=Depends(get_current_user_required)):
+    """
+    Devolve o SQL da migração com as propostas escolhidas (todas se vazio). Apenas root.
+    Não escreve ficheiros no servidor: o SQL é revisto e entra no repositório por commit.
+    """
+    _require_admin(user)
+    try:
+        return _index_svc.migracao_sugerida(payload.nomes or None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.get("/api/admin/roles", tags=["Admin"])
 async def admin_listar_roles(user=Depends(get_current_user_required)):
     """Lista todos os roles (sistema + custom). Qualquer utilizador autenticado pode ler."""
@@ -8,10 +8,13 @@ from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 from google import genai as _genai
 from google.genai import types as _genai_types
+from config import externos
+from database import cache_invalidacao, lideranca
 from auth import get_current_user_required, get_current_user_optional
 from api.deps import _require_admin, _require_direcao, _require_coordenacao, _require_root_or_role, _require_action
 from services import permission_service as _perm_svc
 from services import ai_agent_service, drive_sync_service
+from utils.single_flight import single_flight
 
 router = APIRouter()
 
@@ -42,13 +45,47 @@ def _invalidate_kb_cache():
     _kb_cache = None
 
 
+# O sync corre num só worker: os outros sabem do ficheiro novo por NOTIFY
+cache_invalidacao.registar(("knowledge_base",), lambda _chave: _invalidate_kb_cache())
+
+
+def _kb_atualizada():
+    _invalidate_kb_cache()
+    cache_invalidacao.notificar("knowledge_base")
+
+
+class _SyncNoutroProcesso(Exception):
+    pass
+
+
+@single_flight
+def _sincronizar_kb() -> dict:
+    """
+    Sync Drive → KNOWLEDGE_BASE. Um sync manual pedido enquanto outro (manual ou
+    agendado) corre neste processo junta-se a ele e recebe as mesmas stats;
+    noutro processo, o advisory lock impede uma segunda escrita.
+    """
+    with lideranca.exclusivo("knowledge_base") as obtido:
+        if not obtido:
+            raise _SyncNoutroProcesso()
+        stats = drive_sync_service.sync_knowledge_base()
+    _kb_atualizada()
+    return stats
+
+
+# Só corre no líder (database/lideranca.py); o lock do recurso é tomado em _sincronizar_kb
+@lideranca.job("drive_sync_daily")
 def _scheduled_sync():
+    # Erros sobem para lideranca.job, que os regista em scheduler_execucoes.erro
     try:
-        stats = drive_sync_service.sync_knowledge_base()
-        _invalidate_kb_cache()
-        _chatbot_logger.info(f"Sync agendado concluído: {stats}")
+        stats = _sincronizar_kb()
+    except _SyncNoutroProcesso:
+        _chatbot_logger.info("Sync agendado ignorado: já está a correr noutro processo")
+        return
     except Exception as exc:
         _chatbot_logger.error(f"Erro no sync agendado: {exc}")
+        raise
+    _chatbot_logger.info(f"Sync agendado concluído: {stats}")
 
 
 _scheduler.add_job(
@@ -56,6 +93,9 @@ _scheduler.add_job(
     trigger=CronTrigger(hour=18, minute=0),
     id="drive_sync_daily",
     replace_existing=True,
+    # Margem para um líder acabado de eleger ainda correr o horário que herdou
+    misfire_grace_time=300,
+    coalesce=True,
 )
 
 _CHATBOT_SYSTEM_PROMPT = """
@@ -178,7 +218,7 @@ async def chatbot(payload: ChatbotRequest, _user=Depends(get_current_user_requir
     contents.append(_genai_types.Content(role="user", parts=[_genai_types.Part(text=msgs[-1].content)]))
 
     try:
-        client = _genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+        client = _genai.Client(api_key=externos.gemini_api_key(), http_options=externos.gemini_http_options())
         response = client.models.generate_content(
             model="gemini-2.5-flash",
             contents=contents,
@@ -194,14 +234,14 @@ async def chatbot(payload: ChatbotRequest, _user=Depends(get_current_user_requir
 
 
 @router.post("/api/chatbot/sync", tags=["Chatbot"])
-async def chatbot_sync(user=Depends(get_current_user_required)):
+def chatbot_sync(user=Depends(get_current_user_required)):
     """Força uma sincronização imediata da pasta Drive → KNOWLEDGE_BASE. Apenas admins."""
     _require_coordenacao(user)
 
     try:
-        stats = drive_sync_service.sync_knowledge_base()
-        _invalidate_kb_cache()
-        return stats
+        return _sincronizar_kb()
+    except _SyncNoutroProcesso:
+        raise HTTPException(status_code=409, detail="Já está a decorrer uma sincronização.")
     except FileNotFoundError as exc:
         raise HTTPException(status_code=503, detail=str(exc))
     except Exception as exc:
@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from typing import Any, List, Optional
 from pydantic import BaseModel, Field
 from auth import get_current_user_required, get_current_user_optional
 from api.deps import _require_admin, _require_direcao, _require_coordenacao, _require_root_or_role, _require_action
 from services import permission_service as _perm_svc
+from services import snapshot_service
 
 router = APIRouter()
 
@@ -51,3 +52,24 @@ async def get_my_permissions(user=Depends(get_current_user_required)):
         "project_scoped": perms["project_scoped"],
         "allowed_project_ids": perms["allowed_project_ids"],
     }
+
+
+def _etag_corresponde(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidatos = {c.strip().removeprefix("W/") for c in if_none_match.split(",")}
+    return "*" in candidatos or etag in candidatos
+
+
+@router.get("/api/me/snapshot", tags=["Auth"])
+def get_my_snapshot(request: Request, user=Depends(get_current_user_required)):
+    """
+    "O meu dia" num só pedido: próximas sessões, sessões por confirmar e por
+    registar, notificações por ler e músicas atribuídas. Com If-None-Match
+    igual ao ETag atual responde 304 sem corpo.
+    """
+    etag, corpo = snapshot_service.obter_snapshot(user.get("sub"))
+    cabecalhos = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _etag_corresponde(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=cabecalhos)
+    return Response(content=corpo, media_type="application/json", headers=cabecalhos)
@@ -0,0 +1,104 @@
+import asyncio
+import json
+from typing import List, Optional
+from urllib.parse import urlsplit
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from pydantic import BaseModel, Field
+
+from auth import get_current_user_required, token_partilhado
+from services import permission_service as _perm_svc
+
+router = APIRouter()
+
+MAX_PEDIDOS = 20
+
+# Cabeçalhos do pedido principal que passam para os sub-pedidos
+_CABECALHOS_HERDADOS = {b"authorization", b"accept-language", b"user-agent", b"x-forwarded-for"}
+
+
+class SubPedido(BaseModel):
+    id: Optional[str] = None
+    url: str = Field(..., description="Caminho GET com query string, ex: /api/aulas?projeto_id=1")
+
+
+class BatchRequest(BaseModel):
+    pedidos: List[SubPedido] = Field(..., min_length=1, max_length=MAX_PEDIDOS)
+
+
+def _validar_url(url: str) -> None:
+    partes = urlsplit(url)
+    if partes.scheme or partes.netloc or not partes.path.startswith("/api/"):
+        raise HTTPException(status_code=400, detail=f"URL inválido no batch: {url}")
+    if partes.path.rstrip("/") == "/api/batch":
+        raise HTTPException(status_code=400, detail="Um batch não pode conter outro batch.")
+
+
+async def _executar(request: Request, url: str) -> tuple:
+    """Corre um GET dentro da própria app (ASGI) e devolve (status, content-type, corpo)."""
+    partes = urlsplit(url)
+    scope = {
+        "type": "http",
+        "asgi": request.scope.get("asgi", {"version": "3.0"}),
+        "http_version": request.scope.get("http_version", "1.1"),
+        "method": "GET",
+        "scheme": request.scope.get("scheme", "http"),
+        "server": request.scope.get("server"),
+        "client": request.scope.get("client"),
+        "root_path": request.scope.get("root_path", ""),
+        "path": partes.path,
+        "raw_path": partes.path.encode("latin-1"),
+        "query_string": partes.query.encode("latin-1"),
+        "headers": [(k, v) for k, v in request.scope["headers"] if k in _CABECALHOS_HERDADOS],
+        "rap.batch": True,
+    }
+    resposta = {"status": 500, "tipo": b"", "corpo": bytearray()}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(mensagem):
+        if mensagem["type"] == "http.response.start":
+            resposta["status"] = mensagem["status"]
+            resposta["tipo"] = dict(mensagem.get("headers", [])).get(b"content-type", b"")
+        elif mensagem["type"] == "http.response.body":
+            resposta["corpo"].extend(mensagem.get("body", b""))
+
+    try:
+        await request.app(scope, receive, send)
+    except Exception as e:
+        erro = json.dumps({"detail": f"Erro interno: {e}"}).encode()
+        return 500, b"application/json", erro
+    return resposta["status"], resposta["tipo"], bytes(resposta["corpo"])
+
+
+@router.post("/api/batch", tags=["Batch"])
+async def batch(payload: BatchRequest, request: Request, user=Depends(get_current_user_required)):
+    """
+    Junta vários GET num só pedido (ex: a página de Horários). Os sub-pedidos
+    correm em paralelo dentro da app, com o token validado uma vez e as
+    permissões resolvidas uma vez. Só há paralelismo se os handlers forem
+    `def` (correm na threadpool): um `async def` que chama o psycopg2 bloqueia
+    o event loop e serializa o batch. Cada resposta traz o seu próprio status:
+    um sub-pedido 403/404 não faz falhar o batch.
+
+    Corpo: {"pedidos": [{"id": "aulas", "url": "/api/aulas?projeto_id=1"}, ...]}
+    Resposta: {"respostas": [{"id": "aulas", "status": 200, "corpo": [...]}, ...]}
+    """
+    for pedido in payload.pedidos:
+        _validar_url(pedido.url)
+
+    token = request.headers.get("authorization", "").partition(" ")[2]
+    with token_partilhado(token, user), _perm_svc.permissoes_partilhadas():
+        # Permissões resolvidas antes de lançar os sub-pedidos: todos as reutilizam
+        _perm_svc.get_user_permissions(user.get("sub"))
+        resultados = await asyncio.gather(*(_executar(request, p.url) for p in payload.pedidos))
+
+    # Os corpos JSON entram tal como vieram, sem voltar a descodificar/codificar
+    partes = []
+    for pedido, (status, tipo, corpo) in zip(payload.pedidos, resultados):
+        if not tipo.startswith(b"application/json") or not corpo:
+            corpo = json.dumps(corpo.decode("utf-8", errors="replace") if corpo else None).encode()
+        cabeca = json.dumps({"id": pedido.id if pedido.id is not None else pedido.url, "status": status})
+        partes.append(cabeca[:-1].encode() + b', "corpo": ' + corpo + b"}")
+    return Response(content=b'{"respostas": [' + b", ".join(partes) + b"]}", media_type="application/json")
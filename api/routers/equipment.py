@@ -5,6 +5,7 @@ from auth import get_current_user_required, get_current_user_optional
 from api.deps import _require_admin, _require_direcao, _require_coordenacao, _require_root_or_role, _require_action
 from services import permission_service as _perm_svc
 from services import equipment_service, aula_service
+from utils.campos import ler_campos
 
 router = APIRouter()
 
@@ -90,10 +91,16 @@ async def verificar_conflitos_equipamento(payload: ConflitosVerificar, user=Depe
 async def get_equipamento_itens(
     categoria_id: Optional[int] = None,
     estado: Optional[str] = None,
+    fields: Optional[str] = None,
     user=Depends(get_current_user_required),
 ):
-    """Lista todos os itens individuais de equipamento (localizacao/responsavel derivados de sessoes)."""
-    return equipment_service.listar_itens(categoria_id, estado)
+    """Lista todos os itens individuais de equipamento (localizacao/responsavel derivados de sessoes).
+    fields: campos a devolver, separados por virgulas (id vem sempre)."""
+    try:
+        campos = ler_campos(fields, equipment_service.CAMPOS_ITEM)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return equipment_service.listar_itens(categoria_id, estado, campos=campos)
 
 
 @router.get("/api/equipamento/stats", tags=["Equipamento"])
@@ -21,7 +21,7 @@ class PushUnsubscribePayload(BaseModel):
 
 
 @router.get("/api/notifications", tags=["Notifications"])
-async def get_notifications(user=Depends(get_current_user_required)):
+def get_notifications(user=Depends(get_current_user_required)):
     """
     Lista notificações de um utilizador.
     O user_id é extraído do token JWT (sub).
@@ -5,6 +5,7 @@ from auth import get_current_user_required, get_current_user_optional
 from api.deps import _require_admin, _require_direcao, _require_coordenacao, _require_root_or_role, _require_action
 from services import permission_service as _perm_svc
 from services import musica_service
+from utils.campos import ler_campos
 
 router = APIRouter()
 
@@ -31,12 +32,22 @@ class MusicaDetalhesUpdate(BaseModel):
 
 
 @router.get("/api/musicas", tags=["Producao"])
-async def get_musicas(arquivadas: bool = False, projeto_id: Optional[int] = None, user=Depends(get_current_user_optional)):
-    """Lista todas as músicas (ativas ou arquivadas), com filtro opcional por projeto."""
+async def get_musicas(
+    arquivadas: bool = False,
+    projeto_id: Optional[int] = None,
+    fields: Optional[str] = None,
+    user=Depends(get_current_user_optional),
+):
+    """Lista todas as músicas (ativas ou arquivadas), com filtro opcional por projeto.
+    fields: campos a devolver, separados por vírgulas (id vem sempre)."""
+    try:
+        campos = ler_campos(fields, musica_service.CAMPOS_MUSICA)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     user_id = user.get("sub") if user else None
     role = (user.get("user_metadata") or {}).get("role") if user else None
-    project_filter = _perm_svc.get_project_filter(user_id) if user_id else None
-    return musica_service.listar_musicas(arquivadas, user_id, role, projeto_id, allowed_project_ids=project_filter)
+    project_filter = _perm_svc.get_permission_context(user_id).project_filter if user_id else None
+    return musica_service.listar_musicas(arquivadas, user_id, role, projeto_id, allowed_project_ids=project_filter, campos=campos)
 
 
 @router.post("/api/musicas", tags=["Producao"])
@@ -94,8 +105,7 @@ async def aceitar_tarefa_musica(musica_id: int, user=Depends(get_current_user_re
 @router.post("/api/musicas/{musica_id}/reset-timer", tags=["Producao"])
 async def reset_timer_musica(musica_id: int, user=Depends(get_current_user_required)):
     """Repõe o timer de uma música (apenas direção/it_support)."""
-    perms = _perm_svc.get_user_permissions(user.get("sub"))
-    if not perms["is_root"] and not perms["is_direcao"]:
+    if not _perm_svc.get_permission_context(user.get("sub")).is_direcao_or_above:
         raise HTTPException(status_code=403, detail="Apenas admins podem repor timers.")
     sucesso, mensagem = musica_service.reset_timer(musica_id)
     if not sucesso:
@@ -106,9 +116,8 @@ async def reset_timer_musica(musica_id: int, user=Depends(get_current_user_requi
 @router.patch("/api/musicas/{musica_id}/arquivar", tags=["Producao"])
 async def arquivar_musica(musica_id: int, user=Depends(get_current_user_required)):
     """Arquiva uma música — requer production.lab (produtor) ou coordenação."""
-    perms = _perm_svc.get_user_permissions(user.get("sub"))
-    has_lab = _perm_svc.has_action(user.get("sub"), "production.lab")
-    if not (has_lab or perms["is_coordenacao"] or perms["is_direcao"] or perms["is_root"]):
+    ctx = _perm_svc.get_permission_context(user.get("sub"))
+    if not (ctx.has_action("production.lab") or ctx.is_coordenacao_or_above):
         raise HTTPException(status_code=403, detail="Acesso negado.")
     sucesso, mensagem = musica_service.arquivar_musica(musica_id)
     if not sucesso:
@@ -165,8 +174,9 @@ async def verificar_deadlines_musicas(user=Depends(get_current_user_required)):
 
 
 @router.get("/api/producao/stats/instituicao", tags=["Producao"])
-async def get_stats_instituicao(projeto_id: Optional[int] = None, user=Depends(get_current_user_required)):
+def get_stats_instituicao(projeto_id: Optional[int] = None, user=Depends(get_current_user_required)):
     """Stats de progresso agrupados por estabelecimento > turma."""
+    # `def` (threadpool): pedidos iguais em simultâneo partilham a query (single-flight)
     return musica_service.listar_stats_instituicao(projeto_id)
 
 
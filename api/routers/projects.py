@@ -48,10 +48,9 @@ _ASSET_TIPOS = {"logo_esq": "logo_esq_path", "logo_dir": "logo_dir_path", "foote
 
 
 @router.get("/api/projetos", tags=["Projetos"])
-async def get_projetos(user=Depends(get_current_user_required)):
+def get_projetos(user=Depends(get_current_user_required)):
     """Lista todos os projetos (filtrado por project scoping se aplicável)."""
-    project_filter = _perm_svc.get_project_filter(user.get("sub"))
-    return projeto_service.listar_projetos(allowed_ids=project_filter)
+    return projeto_service.listar_projetos(allowed_ids=_perm_svc.get_permission_context(user.get("sub")).project_filter)
 
 
 @router.post("/api/projetos", tags=["Projetos"])
@@ -173,7 +172,7 @@ async def delete_projeto_asset(id: int, tipo: str, user=Depends(get_current_user
 # ─── Sub-Projetos ────────────────────────────────────────────────────────────
 
 @router.get("/api/sub-projetos", tags=["SubProjetos"])
-async def get_all_sub_projetos(_user=Depends(get_current_user_required)):
+def get_all_sub_projetos(_user=Depends(get_current_user_required)):
     """Lista todos os sub-projetos de todos os projetos."""
     return sub_projeto_service.listar_todos_sub_projetos()
 
@@ -2,15 +2,17 @@ import json
 import os
 import logging as _log
 from datetime import datetime as _dt
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from typing import Any, List, Optional
 from pydantic import BaseModel, Field
 from auth import get_current_user_required, get_current_user_optional
-from api.deps import _require_admin, _require_direcao, _require_coordenacao, _require_root_or_role, _require_action
+from api.deps import _require_admin, _require_direcao, _require_coordenacao, _require_root_or_role, _require_action, get_permission_context
 from services import permission_service as _perm_svc
 from services import aula_service, turma_service, aluno_service, notification_service, estudio_service, registo_service, profile_service
 from services import settings_service as _settings_svc
+from services import serie_service
 from models.sqlmodel_models import AulaCreate, AulaUpdate
+from utils.campos import ler_campos
 
 router = APIRouter()
 
@@ -36,6 +38,47 @@ class AulaRecorrenteCreate(BaseModel):
     participantes_ids: List[str] = []
 
 
+class AulaSerieCreate(BaseModel):
+    data_hora: str  # primeira ocorrência
+    # RRULE do RFC 5545 sem DTSTART, ex: "FREQ=WEEKLY;COUNT=30"; sem COUNT/UNTIL não tem fim
+    regra: str = "FREQ=WEEKLY"
+    excecoes: List[str] = []
+    duracao_minutos: int = 120
+    tipo_atividade: Optional[str] = None
+    responsavel_user_id: Optional[str] = None
+    observacoes: Optional[str] = None
+    tema: Optional[str] = None
+    projeto_id: Optional[int] = None
+    turma_id: Optional[int] = None
+    mentor_id: Optional[int] = None
+    local: Optional[str] = None
+    atividade_uuid: Optional[str] = None
+    is_autonomous: bool = True
+    tipo: str = "trabalho_autonomo"
+    sumario: Optional[str] = None
+    codigo_sessao: Optional[str] = None
+    participantes_ids: List[str] = []
+
+
+class AulaSerieUpdate(BaseModel):
+    regra: Optional[str] = None
+    inicio: Optional[str] = None
+    excecoes: Optional[List[str]] = None
+    duracao_minutos: Optional[int] = None
+    tipo_atividade: Optional[str] = None
+    responsavel_user_id: Optional[str] = None
+    observacoes: Optional[str] = None
+    tema: Optional[str] = None
+    projeto_id: Optional[int] = None
+    turma_id: Optional[int] = None
+    mentor_id: Optional[int] = None
+    local: Optional[str] = None
+    atividade_uuid: Optional[str] = None
+    sumario: Optional[str] = None
+    codigo_sessao: Optional[str] = None
+    participantes_ids: Optional[List[str]] = None
+
+
 class AulaEstadoOverride(BaseModel):
     estado: str
 
@@ -63,9 +106,8 @@ def _check_session_permission(user: dict, aula_info: dict):
     """Verifica se o user tem permissão para alterar o estado da sessão.
     Coordenadores podem alterar todas. Outros users só as atribuídas a eles."""
     user_id = user.get("sub")
-    perms = _perm_svc.get_user_permissions(user_id)
     # Root, direção e coordenação têm acesso total a sessões
-    if perms["is_root"] or perms["is_direcao"] or perms["is_coordenacao"]:
+    if _perm_svc.get_permission_context(user_id).is_coordenacao_or_above:
         return True
     # Sessão regular: apenas o mentor atribuído pode agir
     if not aula_info.get("is_autonomous"):
@@ -77,28 +119,83 @@ def _check_session_permission(user: dict, aula_info: dict):
 
 
 @router.get("/api/aulas", tags=["Aulas"])
-async def get_todas_aulas(user=Depends(get_current_user_required)):
+def get_todas_aulas(
+    response: Response,
+    desde: Optional[_dt] = Query(None, alias="from"),
+    ate: Optional[_dt] = Query(None, alias="to"),
+    limite: int = Query(2000, ge=1, le=2000, alias="limit"),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    ctx=Depends(get_permission_context),
+):
     """
-    Endpoint para listar todas as aulas existentes.
-    Chama o serviço correspondente e retorna os dados.
+    Endpoint para listar as aulas, da mais recente para a mais antiga.
+    - from/to: janela [from, to) em data_hora (ex.: a semana visível no Horários)
+    - limit: tamanho da página (máx. 2000)
+    - cursor: valor do header X-Next-Cursor da página anterior; o header só vem
+      quando a página está cheia e pode haver mais aulas na janela
+    - fields: campos a devolver, separados por vírgulas (ex.: a vista mensal pede
+      "tipo,estado,turma_nome" e carrega o resto com GET /api/aulas/{id});
+      id e data_hora vêm sempre
+    Sem parâmetros devolve as 2000 aulas mais recentes, como antes.
     """
+    depois_de = None
     try:
-        user_id = user.get("sub")
-        project_filter = _perm_svc.get_project_filter(user_id)
-        hide_direcao = False
-        if _settings_svc.ocultar_sessoes_direcao():
-            perms = _perm_svc.get_user_permissions(user_id)
-            if not perms["is_root"] and not perms["is_direcao"]:
-                hide_direcao = True
+        campos = ler_campos(fields, aula_service.CAMPOS_LISTA, aula_service.CAMPOS_LISTA_SEMPRE)
+        if cursor:
+            depois_de = aula_service.ler_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        hide_direcao = _settings_svc.ocultar_sessoes_direcao() and not ctx.is_direcao_or_above
         aulas = aula_service.listar_todas_aulas(
-            allowed_project_ids=project_filter,
+            limite=limite,
+            allowed_project_ids=ctx.project_filter,
             hide_direcao_sessions=hide_direcao,
+            desde=desde,
+            ate=ate,
+            depois_de=depois_de,
+            campos=campos,
         )
+        if len(aulas) == limite:
+            ultima = aulas[-1]
+            response.headers["X-Next-Cursor"] = aula_service.codificar_cursor(ultima["data_hora"], ultima["id"])
         return aulas
     except Exception as e:
         return {"error": str(e)}
 
 
+@router.get("/api/aulas/changes", tags=["Aulas"])
+async def get_alteracoes_aulas(since: Optional[str] = None, ctx=Depends(get_permission_context)):
+    """
+    Sincronização incremental da lista de aulas.
+    Devolve as aulas criadas/alteradas e os ids removidos desde o token `since`,
+    com um novo token para o pedido seguinte. Sem `since` (ou com recarregar=true
+    na resposta) o cliente carrega GET /api/aulas e guarda o token devolvido.
+    Conta como alteração qualquer campo da lista, incluindo nomes (turma,
+    estabelecimento, mentor, atividade, disciplina) e participantes. Se mudar o
+    que o utilizador pode ver (acesso a projetos, sessões da direção ocultas), a
+    resposta traz recarregar=true.
+    """
+    desde = visao = None
+    if since:
+        try:
+            desde = aula_service.ler_token(since)
+            visao = aula_service.visao_do_token(since)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    try:
+        hide_direcao = _settings_svc.ocultar_sessoes_direcao() and not ctx.is_direcao_or_above
+        return aula_service.listar_alteracoes_aulas(
+            desde,
+            allowed_project_ids=ctx.project_filter,
+            hide_direcao_sessions=hide_direcao,
+            visao_anterior=visao,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/api/aulas/proximo-numero", tags=["Aulas"])
 async def get_proximo_numero_sessao(
     atividade_uuid: Optional[str] = None,
@@ -130,9 +227,7 @@ async def get_aula_by_id(aula_id: int, user=Depends(get_current_user_required)):
         aula = aula_service.obter_aula_por_id(aula_id)
         if aula:
             if _settings_svc.ocultar_sessoes_direcao():
-                user_id = user.get("sub")
-                perms = _perm_svc.get_user_permissions(user_id)
-                if not perms["is_root"] and not perms["is_direcao"]:
+                if not _perm_svc.get_permission_context(user.get("sub")).is_direcao_or_above:
                     direcao_ids = _settings_svc.obter_direcao_user_ids()
                     mentor_uid = aula.get("mentor_user_id") if isinstance(aula, dict) else getattr(aula, "mentor_user_id", None)
                     resp_uid = str((aula.get("responsavel_user_id") if isinstance(aula, dict) else getattr(aula, "responsavel_user_id", None)) or "")
@@ -149,29 +244,32 @@ async def create_aula(aula: AulaCreate, user=Depends(get_current_user_required))
     """
     Cria uma nova aula via API (regular ou trabalho autónomo).
     """
-    nova_aula = aula_service.criar_aula(
-        turma_id=aula.turma_id,
-        data_hora=aula.data_hora,
-        tipo=aula.tipo,
-        duracao_minutos=aula.duracao_minutos,
-        mentor_id=aula.mentor_id,
-        local=aula.local,
-        tema=aula.tema,
-        objetivos=aula.objetivos,
-        projeto_id=aula.projeto_id,
-        observacoes=aula.observacoes,
-        atividade_uuid=aula.atividade_uuid,
-        is_autonomous=aula.is_autonomous,
-        is_realized=aula.is_realized,
-        tipo_atividade=aula.tipo_atividade,
-        responsavel_user_id=aula.responsavel_user_id,
-        musica_id=aula.musica_id,
-        sumario=aula.sumario,
-        codigo_sessao=aula.codigo_sessao,
-        tarefa_id=getattr(aula, 'tarefa_id', None),
-        participantes_ids=aula.participantes_ids or [],
-        criador_user_id=user.get('sub') if user else None,
-    )
+    try:
+        nova_aula = aula_service.criar_aula(
+            turma_id=aula.turma_id,
+            data_hora=aula.data_hora,
+            tipo=aula.tipo,
+            duracao_minutos=aula.duracao_minutos,
+            mentor_id=aula.mentor_id,
+            local=aula.local,
+            tema=aula.tema,
+            objetivos=aula.objetivos,
+            projeto_id=aula.projeto_id,
+            observacoes=aula.observacoes,
+            atividade_uuid=aula.atividade_uuid,
+            is_autonomous=aula.is_autonomous,
+            is_realized=aula.is_realized,
+            tipo_atividade=aula.tipo_atividade,
+            responsavel_user_id=aula.responsavel_user_id,
+            musica_id=aula.musica_id,
+            sumario=aula.sumario,
+            codigo_sessao=aula.codigo_sessao,
+            tarefa_id=getattr(aula, 'tarefa_id', None),
+            participantes_ids=aula.participantes_ids or [],
+            criador_user_id=user.get('sub') if user else None,
+        )
+    except aula_service.ConflitoHorario as e:
+        raise HTTPException(status_code=409, detail=str(e))
     if nova_aula is None:
         raise HTTPException(
             status_code=500,
@@ -204,10 +302,139 @@ async def create_aulas_recorrentes(payload: AulaRecorrenteCreate, user=Depends(g
             sumario=payload.sumario,
             codigo_sessao=payload.codigo_sessao,
             participantes_ids=payload.participantes_ids or [],
+            criador_user_id=user.get("sub"),
         )
         return {"criadas": len(resultados), "sessoes": resultados}
+    except aula_service.ConflitoHorario as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/api/aulas/series", tags=["Aulas"])
+async def create_aula_serie(payload: AulaSerieCreate, user=Depends(get_current_user_required)):
+    """
+    Cria uma série de sessões a partir de uma regra de recorrência, sem criar
+    aulas: as ocorrências vêm de GET /api/aulas/series/ocorrencias.
+    """
+    try:
+        serie = serie_service.criar_serie(payload.model_dump(), criador_user_id=user.get("sub"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return serie
+
+
+@router.get("/api/aulas/series/ocorrencias", tags=["Aulas"])
+async def get_ocorrencias_series(
+    desde: _dt = Query(..., alias="from"),
+    ate: _dt = Query(..., alias="to"),
+    ctx=Depends(get_permission_context),
+):
+    """
+    Ocorrências das séries na janela [from, to) (máx. 93 dias), no formato de
+    GET /api/aulas com id null, serie_id e ocorrencia. O calendário junta-as às
+    aulas da mesma janela; as já materializadas vêm em GET /api/aulas.
+    """
+    if ate <= desde or ate - desde > serie_service.JANELA_MAXIMA:
+        raise HTTPException(status_code=400, detail="Janela inválida (from < to, no máximo 93 dias)")
+    try:
+        hide_direcao = _settings_svc.ocultar_sessoes_direcao() and not ctx.is_direcao_or_above
+        return serie_service.listar_ocorrencias(
+            desde, ate, allowed_project_ids=ctx.project_filter, hide_direcao_sessions=hide_direcao,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Quem, além da coordenação, altera ou apaga uma série / materializa uma ocorrência
+_EDITAM_SERIE = ("criador_user_id", "responsavel_user_id")
+_MATERIALIZAM_SERIE = _EDITAM_SERIE + ("mentor_user_id", "participantes_ids")
+
+
+def _serie_autorizada(serie_id: int, ctx, autorizados=None) -> dict:
+    """
+    A série, se o utilizador a vê em GET /api/aulas/series/ocorrencias (projetos,
+    sessões da direção); 404 se não. Com `autorizados`, 403 se não for da
+    coordenação nem um dos utilizadores nesses campos da série.
+    """
+    serie = serie_service.obter_serie(serie_id)
+    direcao = frozenset()
+    if _settings_svc.ocultar_sessoes_direcao() and not ctx.is_direcao_or_above:
+        direcao = _settings_svc.obter_direcao_user_ids()
+    if not serie or not serie_service.visivel(serie, ctx.project_filter, direcao):
+        raise HTTPException(status_code=404, detail="Série não encontrada")
+    if autorizados is not None and not ctx.is_coordenacao_or_above:
+        envolvidos = set()
+        for campo in autorizados:
+            valor = serie[campo]
+            envolvidos.update(valor if isinstance(valor, list) else [valor])
+        if ctx.user_id not in envolvidos:
+            raise HTTPException(status_code=403, detail="Acesso negado.")
+    return serie
+
+
+@router.get("/api/aulas/series/{serie_id}", tags=["Aulas"])
+async def get_aula_serie(serie_id: int, ctx=Depends(get_permission_context)):
+    """Devolve a série (regra, exceções e campos comuns às ocorrências)."""
+    return _serie_autorizada(serie_id, ctx)
+
+
+@router.put("/api/aulas/series/{serie_id}", tags=["Aulas"])
+async def update_aula_serie(serie_id: int, payload: AulaSerieUpdate, ctx=Depends(get_permission_context)):
+    """
+    Altera a série: vale para todas as ocorrências ainda não materializadas
+    (as materializadas são aulas normais e editam-se em /api/aulas/{id}).
+    Coordenação, criador ou responsável da série.
+    """
+    _serie_autorizada(serie_id, ctx, _EDITAM_SERIE)
+    dados = {k: v for k, v in payload.model_dump().items() if v is not None}
+    try:
+        sucesso = serie_service.atualizar_serie(serie_id, dados)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not sucesso:
+        raise HTTPException(status_code=404, detail="Série não encontrada ou erro ao atualizar")
+    return {"message": "Série atualizada com sucesso"}
+
+
+@router.delete("/api/aulas/series/{serie_id}", tags=["Aulas"])
+async def delete_aula_serie(serie_id: int, ctx=Depends(get_permission_context)):
+    """Apaga a série. As ocorrências já materializadas ficam como aulas soltas."""
+    _serie_autorizada(serie_id, ctx, _EDITAM_SERIE)
+    if not serie_service.apagar_serie(serie_id):
+        raise HTTPException(status_code=404, detail="Série não encontrada")
+    return {"message": "Série apagada com sucesso"}
+
+
+@router.delete("/api/aulas/series/{serie_id}/ocorrencias/{ocorrencia}", tags=["Aulas"])
+async def delete_ocorrencia_serie(serie_id: int, ocorrencia: _dt, ctx=Depends(get_permission_context)):
+    """Exclui uma ocorrência da série (EXDATE)."""
+    _serie_autorizada(serie_id, ctx, _EDITAM_SERIE)
+    if not serie_service.excluir_ocorrencia(serie_id, ocorrencia):
+        raise HTTPException(status_code=404, detail="Ocorrência não encontrada")
+    return {"message": "Ocorrência excluída"}
+
+
+@router.post("/api/aulas/series/{serie_id}/ocorrencias/{ocorrencia}/materializar", tags=["Aulas"])
+async def materializar_ocorrencia_serie(serie_id: int, ocorrencia: _dt, ctx=Depends(get_permission_context)):
+    """
+    Cria (ou devolve, se já existir) a aula de uma ocorrência. O cliente chama-o
+    antes de confirmar, terminar ou registar a ocorrência, e segue com o id
+    devolvido nos endpoints de /api/aulas/{id}. Coordenação ou quem está na
+    série (criador, responsável, mentor, participantes).
+    """
+    _serie_autorizada(serie_id, ctx, _MATERIALIZAM_SERIE)
+    try:
+        aula_id = serie_service.materializar_ocorrencia(serie_id, ocorrencia)
+    except aula_service.ConflitoHorario as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if aula_id is None:
+        raise HTTPException(status_code=404, detail="Ocorrência não encontrada")
+    return aula_service.obter_aula_por_id(aula_id)
 
 
 @router.put("/api/aulas/{aula_id}", tags=["Aulas"])
@@ -223,6 +450,8 @@ async def update_aula(aula_id: int, aula: AulaUpdate, user=Depends(get_current_u
         if sucesso:
             return {"message": "Aula atualizada com sucesso"}
         raise HTTPException(status_code=404, detail="Aula não encontrada ou erro ao atualizar")
+    except aula_service.ConflitoHorario as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -368,7 +597,7 @@ async def create_turma(turma: TurmaCreate, user=Depends(get_current_user_require
 
 
 @router.get("/api/turmas", tags=["Core"])
-async def get_turmas(estabelecimento_id: Optional[int] = None, user=Depends(get_current_user_required)):
+def get_turmas(estabelecimento_id: Optional[int] = None, user=Depends(get_current_user_required)):
     """Lista todas as turmas com estabelecimentos. Opcionalmente filtra por estabelecimento_id."""
     return turma_service.listar_turmas_com_estabelecimento(estabelecimento_id)
 
@@ -415,7 +644,7 @@ async def get_turma_disciplinas(turma_id: int, user=Depends(get_current_user_req
 
 
 @router.get("/api/mentores", tags=["Core"])
-async def get_mentores(user=Depends(get_current_user_required)):
+def get_mentores(user=Depends(get_current_user_required)):
     """Lista todos os mentores para dropdown."""
     return turma_service.listar_mentores()
 
@@ -17,8 +17,9 @@ async def get_stats_feedback(projeto_id: Optional[int] = None, user=Depends(get_
 
 
 @router.get("/api/stats/equipa-horas", tags=["Estatisticas"])
-async def get_stats_equipa_horas(projeto_id: Optional[int] = None, user=Depends(get_current_user_required)):
+def get_stats_equipa_horas(projeto_id: Optional[int] = None, user=Depends(get_current_user_required)):
     """Horas por colaborador (aulas vs trabalho autónomo)."""
+    # `def` (threadpool): pedidos iguais em simultâneo partilham a query (single-flight)
     return aula_service.listar_horas_equipa(projeto_id)
 
 
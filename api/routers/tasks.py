@@ -33,8 +33,8 @@ class TarefaEstado(BaseModel):
 async def get_tarefas(user=Depends(get_current_user_required)):
     """Lista tarefas do user autenticado (+ gerais). Coordenadores vêem todas."""
     user_id = user.get("sub")
-    perms = _perm_svc.get_user_permissions(user_id)
-    if perms["is_root"] or perms["is_coordenacao"]:
+    ctx = _perm_svc.get_permission_context(user_id)
+    if ctx.is_root or ctx.is_coordenacao:
         return tarefas_service.listar_todas_tarefas()
     return tarefas_service.listar_tarefas_para_user(user_id)
 
@@ -32,7 +32,7 @@ class MentorLocationUpdate(BaseModel):
 
 
 @router.get("/api/equipa", tags=["Core"])
-async def get_equipa(user=Depends(get_current_user_required)):
+def get_equipa(user=Depends(get_current_user_required)):
     """Lista todos os membros da equipa (perfis públicos)."""
     return profile_service.listar_perfis()
 
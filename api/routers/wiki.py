@@ -139,8 +139,9 @@ async def get_curriculo(user=Depends(get_current_user_required)):
 
 
 @router.get("/api/wiki/projeto/{projeto_id}", tags=["Wiki"])
-async def get_wiki_hierarquia(projeto_id: int, user=Depends(get_current_user_required)):
+def get_wiki_hierarquia(projeto_id: int, user=Depends(get_current_user_required)):
     """Hierarquia completa: Projeto > Estabelecimentos > Turmas > Disciplinas > Atividades."""
+    # `def` (threadpool): pedidos iguais em simultâneo partilham a query (single-flight)
     result = wiki_service.listar_hierarquia_projeto(projeto_id)
     return result
 
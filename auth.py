@@ -3,7 +3,9 @@ Validação opcional do JWT do Supabase para identificar o user nas rotas.
 Se SUPABASE_JWT_SECRET não estiver definido, as rotas protegidas não exigem auth.
 """
 import os
-from typing import Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Tuple
 
 import jwt
 from dotenv import load_dotenv
@@ -15,6 +17,22 @@ load_dotenv()
 JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
 HTTP_BEARER = HTTPBearer(auto_error=False)
 
+# (token, payload) já validado neste pedido — ver token_partilhado()
+_TOKEN_VALIDADO: ContextVar[Optional[Tuple[str, dict]]] = ContextVar("token_validado", default=None)
+
+
+@contextmanager
+def token_partilhado(token: str, payload: dict):
+    """
+    Dentro do bloco, o mesmo token não volta a ser descodificado: os sub-pedidos
+    do POST /api/batch reutilizam o payload validado pelo pedido principal.
+    """
+    marca = _TOKEN_VALIDADO.set((token, payload))
+    try:
+        yield
+    finally:
+        _TOKEN_VALIDADO.reset(marca)
+
 
 def get_current_user_optional(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTP_BEARER),
@@ -27,6 +45,9 @@ def get_current_user_optional(
         return None
     if not credentials or not credentials.credentials:
         return None
+    validado = _TOKEN_VALIDADO.get()
+    if validado is not None and validado[0] == credentials.credentials:
+        return validado[1]
     try:
         payload = jwt.decode(
             credentials.credentials,
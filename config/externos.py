@@ -0,0 +1,81 @@
+"""
+==============================================================================
+RAP NOVA ESCOLA - Endereços dos serviços externos
+==============================================================================
+Ficheiro: config/externos.py
+
+Um único interruptor decide para onde vão as chamadas externas da app
+(OSRM, Nominatim, Supabase Storage, Gemini, Google Drive, Web Push, Slack):
+
+    EXTERNAL_BACKEND=real   (omissão) endereços reais
+    EXTERNAL_BACKEND=fake   tudo aponta para o servidor de stand-ins local
+                            (perf/fakes.py) em FAKE_EXTERNOS_URL, um prefixo
+                            por serviço: /osrm, /nominatim, /supabase, ...
+
+Em modo real, cada endereço pode ser sobreposto com <SERVICO>_URL
+(ex: OSRM_URL para um OSRM próprio).
+
+Como usar noutros ficheiros:
+    from config import externos
+    url = f"{externos.base_url('osrm')}/route/v1/driving/{coords}"
+==============================================================================
+"""
+
+import os
+from typing import Optional
+from urllib.parse import quote
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SERVICOS = ("osrm", "nominatim", "supabase", "gemini", "drive", "push", "slack")
+
+# Endereços reais; vazio = usar o que o SDK/subscrição já define
+_REAIS = {
+    "osrm": "https://router.project-osrm.org",
+    "nominatim": "https://nominatim.openstreetmap.org",
+    "gemini": "",
+    "drive": "",
+    "push": "",
+}
+# Serviços cujo endereço real já vem de uma variável própria
+_VARIAVEL_REAL = {"supabase": "SUPABASE_URL", "slack": "SLACK_WEBHOOK_URL"}
+
+
+def usa_fakes() -> bool:
+    """True se EXTERNAL_BACKEND=fake (lido a cada chamada, para os testes poderem mudar o env)."""
+    return os.getenv("EXTERNAL_BACKEND", "real").strip().lower() == "fake"
+
+
+def fake_url() -> str:
+    return os.getenv("FAKE_EXTERNOS_URL", "http://127.0.0.1:8790").rstrip("/")
+
+
+def base_url(servico: str) -> str:
+    """Endereço base do serviço (sem barra final). String vazia = omissão do SDK."""
+    if servico not in SERVICOS:
+        raise ValueError(f"Serviço externo desconhecido: {servico}")
+    if usa_fakes():
+        return f"{fake_url()}/{servico}"
+    if servico in _VARIAVEL_REAL:
+        return os.getenv(_VARIAVEL_REAL[servico], "")
+    return os.getenv(f"{servico.upper()}_URL", _REAIS[servico]).rstrip("/")
+
+
+def endpoint_push(endpoint: str) -> str:
+    """Endpoint de uma subscrição Web Push; em modo fake é reencaminhado para o stand-in."""
+    if usa_fakes():
+        return f"{base_url('push')}/{quote(endpoint, safe='')}"
+    return endpoint
+
+
+def gemini_http_options() -> Optional[dict]:
+    """http_options para genai.Client (None = endpoint da Google)."""
+    url = base_url("gemini")
+    return {"base_url": url + "/"} if url else None
+
+
+def gemini_api_key() -> Optional[str]:
+    """Chave do Gemini; os stand-ins aceitam qualquer valor."""
+    return os.getenv("GEMINI_API_KEY") or ("fake" if usa_fakes() else None)
@@ -0,0 +1,176 @@
+"""
+Invalidação das caches em memória entre workers (LISTEN/NOTIFY).
+
+Com vários workers uvicorn cada processo tem a sua cópia das caches
+(permissões, system_settings, knowledge base). Os triggers da migração 053
+enviam um NOTIFY no canal 'rap_cache' sempre que as tabelas de origem mudam;
+cada worker corre uma thread que faz LISTEN nesse canal e chama os callbacks
+registados pelos serviços.
+
+Payload: '<tabela>' ou '<tabela>:<chave>'. O callback recebe a chave (ou None
+para "invalidar tudo dessa tabela").
+
+Variáveis:
+    CACHE_INVALIDACAO=off   desliga a escuta (caches ficam só com o TTL local)
+    DB_SESSAO_DSN           ligação de sessão para o LISTEN (ver
+                            database.connection.ligacao_dedicada): o pooler do
+                            Supabase em modo transação não entrega notificações.
+
+Como usar noutros ficheiros:
+    from database import cache_invalidacao
+    cache_invalidacao.registar(("system_settings",), lambda chave: _invalidate_cache())
+"""
+import logging
+import os
+import select
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CANAL = "rap_cache"
+
+# Sem mensagens durante este tempo, a ligação é testada com um SELECT 1
+INTERVALO_VERIFICACAO_S = 30.0
+ESPERA_MAX_RELIGAR_S = 30.0
+
+Callback = Callable[[Optional[str]], None]
+
+_callbacks: Dict[str, List[Callback]] = {}
+_lock = threading.Lock()
+_thread: Optional[threading.Thread] = None
+_parar = threading.Event()
+_ligado = threading.Event()
+
+
+def registar(tabelas: Iterable[str], callback: Callback) -> None:
+    """Chama `callback(chave)` quando chegar uma notificação de uma das tabelas."""
+    with _lock:
+        for tabela in tabelas:
+            _callbacks.setdefault(tabela, []).append(callback)
+
+
+def despachar(payload: str) -> None:
+    """Entrega um payload '<tabela>[:<chave>]' aos callbacks registados."""
+    tabela, _, chave = payload.partition(":")
+    with _lock:
+        callbacks = list(_callbacks.get(tabela, ()))
+    for callback in callbacks:
+        try:
+            callback(chave or None)
+        except Exception as e:
+            logger.warning(f"[CACHE] Erro a invalidar '{payload}': {e}")
+
+
+def invalidar_tudo() -> None:
+    """Invalida todas as caches registadas (ex: depois de um período sem escuta)."""
+    with _lock:
+        tabelas = list(_callbacks)
+    for tabela in tabelas:
+        despachar(tabela)
+
+
+def ativo() -> bool:
+    """True se este processo está a receber notificações (as caches podem confiar nelas)."""
+    return _ligado.is_set()
+
+
+def notificar(tabela: str, chave: Optional[str] = None) -> bool:
+    """
+    Envia uma notificação a todos os workers (incluindo este) para caches que
+    não vêm de uma tabela com trigger — ex: o ficheiro da knowledge base.
+    """
+    from database.connection import get_db_connection
+    payload = f"{tabela}:{chave}" if chave else tabela
+    try:
+        conn = get_db_connection()
+    except Exception as e:
+        logger.warning(f"[CACHE] Sem ligação para notificar '{payload}': {e}")
+        return False
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT pg_notify(%s, %s)", (CANAL, payload))
+        conn.commit()
+        cur.close()
+        return True
+    except Exception as e:
+        conn.rollback()
+        logger.warning(f"[CACHE] Erro ao notificar '{payload}': {e}")
+        return False
+    finally:
+        conn.close()
+
+
+def _ligar():
+    """Ligação dedicada já a escutar o canal."""
+    from database.connection import ligacao_dedicada
+    conn = ligacao_dedicada()
+    cur = conn.cursor()
+    cur.execute(f"LISTEN {CANAL}")
+    cur.close()
+    return conn
+
+
+def _escutar(conn) -> None:
+    silencio = 0.0
+    while not _parar.is_set():
+        # Timeout curto para o parar() não ter de esperar pelo próximo NOTIFY
+        prontos, _, _ = select.select([conn], [], [], 1.0)
+        silencio = 0.0 if prontos else silencio + 1.0
+        if silencio >= INTERVALO_VERIFICACAO_S:
+            # Silêncio longo: confirmar que a ligação não morreu sem aviso
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
+            silencio = 0.0
+        conn.poll()
+        while conn.notifies:
+            despachar(conn.notifies.pop(0).payload)
+
+
+def _ciclo() -> None:
+    espera = 1.0
+    while not _parar.is_set():
+        conn = None
+        try:
+            conn = _ligar()
+            _ligado.set()
+            # O que mudou enquanto não estávamos a escutar perdeu-se: começar do zero
+            invalidar_tudo()
+            logger.info(f"[CACHE] A escutar '{CANAL}' (pid {os.getpid()})")
+            espera = 1.0
+            _escutar(conn)
+        except Exception as e:
+            if not _parar.is_set():
+                logger.warning(f"[CACHE] Escuta interrompida ({e}); nova tentativa em {espera:.0f}s")
+        finally:
+            _ligado.clear()
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+        _parar.wait(espera)
+        espera = min(espera * 2, ESPERA_MAX_RELIGAR_S)
+
+
+def iniciar() -> bool:
+    """Arranca a thread de escuta deste processo (idempotente). False se desligada por env."""
+    global _thread
+    if os.getenv("CACHE_INVALIDACAO", "on").strip().lower() in ("off", "0", "false"):
+        logger.info("[CACHE] Invalidação entre workers desligada (CACHE_INVALIDACAO=off)")
+        return False
+    if _thread is not None and _thread.is_alive():
+        return True
+    _parar.clear()
+    _thread = threading.Thread(target=_ciclo, name="cache-invalidacao", daemon=True)
+    _thread.start()
+    return True
+
+
+def parar(timeout_s: float = 5.0) -> None:
+    global _thread
+    _parar.set()
+    if _thread is not None:
+        _thread.join(timeout=timeout_s)
+        _thread = None
@@ -24,7 +24,7 @@ def _get_pool():
             user=os.getenv('DB_USER', 'postgres'),
             password=os.getenv('DB_PASSWORD', 'postgres'),
             port=os.getenv('DB_PORT', '5432'),
-            sslmode='require'
+            sslmode=os.getenv('DB_SSLMODE', 'require')
         )
         logger.info("Pool de conexões inicializado (min=2, max=20)")
     return _connection_pool
@@ -108,6 +108,30 @@ def get_db_connection() -> PooledConnection:
         raise e
 
 
+def ligacao_dedicada():
+    """
+    Ligação própria (fora do pool), em autocommit, para quem precisa de estado de
+    sessão durante muito tempo: LISTEN e advisory locks de sessão. Tem de ser uma
+    ligação de sessão — o pooler do Supabase em modo transação (porta 6543) não
+    serve; DB_SESSAO_DSN permite apontar para outro endereço.
+    """
+    dsn = os.getenv('DB_SESSAO_DSN')
+    if dsn:
+        conn = psycopg2.connect(dsn, keepalives=1, keepalives_idle=30)
+    else:
+        conn = psycopg2.connect(
+            host=os.getenv('DB_HOST', 'localhost'),
+            database=os.getenv('DB_NAME', 'rap_nova_escola'),
+            user=os.getenv('DB_USER', 'postgres'),
+            password=os.getenv('DB_PASSWORD', 'postgres'),
+            port=os.getenv('DB_PORT', '5432'),
+            sslmode=os.getenv('DB_SSLMODE', 'require'),
+            keepalives=1, keepalives_idle=30,
+        )
+    conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+    return conn
+
+
 def testar_ligacao_bd():
     """Testa se a ligação à base de dados está a funcionar."""
     conn = None
@@ -0,0 +1,387 @@
+"""
+Fila de tarefas em segundo plano sobre o Postgres (tabela fila_tarefas, migração 055).
+
+Os pedidos HTTP enfileiram o trabalho lento ou externo (push, Slack,
+auto-atribuição da pool) e respondem logo; um worker reclama as tarefas com
+`SELECT ... FOR UPDATE SKIP LOCKED`, por isso vários workers (threads ou
+processos) consomem a mesma fila sem tarefas repetidas.
+
+  - prioridade: menor número corre primeiro (PRIORIDADE_NORMAL = 100)
+  - uma tarefa que lança exceção volta à fila com backoff exponencial, até
+    max_tentativas; depois fica 'falhada' (com o erro) para análise
+  - tarefas presas em 'em_curso' (worker morreu a meio) voltam à fila ao fim
+    de TEMPO_MAX_EXECUCAO_S
+  - `chave` evita duplicados: só há uma tarefa pendente por chave
+
+Variáveis:
+    FILA=off                  sem fila: as tarefas correm logo numa thread (comportamento antigo)
+    FILA_WORKER_EMBUTIDO=off  a API não consome a fila (usar com `python -m worker`)
+
+Como usar noutros ficheiros:
+    from database import fila
+
+    @fila.tarefa("push.enviar_user")
+    def _tarefa_push(user_id, titulo, mensagem): ...
+
+    fila.enfileirar("push.enviar_user", {"user_id": uid, "titulo": t, "mensagem": m})
+"""
+import importlib
+import json
+import logging
+import os
+import random
+import select
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+from database.lideranca import identificador_processo
+
+logger = logging.getLogger(__name__)
+
+CANAL = "rap_fila"
+
+PRIORIDADE_URGENTE = 0
+PRIORIDADE_NORMAL = 100
+PRIORIDADE_BAIXA = 200
+
+MAX_TENTATIVAS = 5
+BACKOFF_BASE_S = 5.0
+BACKOFF_MAX_S = 3600.0
+TEMPO_MAX_EXECUCAO_S = 600
+DIAS_RETENCAO_CONCLUIDAS = 7
+
+INTERVALO_POLL_S = 5.0
+INTERVALO_MANUTENCAO_S = 60.0
+
+# Módulos que registam tarefas com @fila.tarefa (importados pelo worker)
+MODULOS_TAREFAS = (
+    "services.push_service",
+    "notifications.slack_service",
+    "services.musica_service",
+)
+
+
+@dataclass(frozen=True)
+class Tarefa:
+    tipo: str
+    funcao: Callable[..., None]
+    max_tentativas: int
+    prioridade: int
+
+
+_tarefas: Dict[str, Tarefa] = {}
+_thread: Optional[threading.Thread] = None
+_parar = threading.Event()
+
+
+def tarefa(tipo: str, max_tentativas: int = MAX_TENTATIVAS, prioridade: int = PRIORIDADE_NORMAL):
+    """Regista a função como executora das tarefas `tipo`. Recebe o payload como kwargs."""
+    def decorador(funcao):
+        _tarefas[tipo] = Tarefa(tipo, funcao, max_tentativas, prioridade)
+        return funcao
+    return decorador
+
+
+def ativa() -> bool:
+    return os.getenv("FILA", "on").strip().lower() not in ("off", "0", "false")
+
+
+def carregar_tarefas() -> None:
+    for modulo in MODULOS_TAREFAS:
+        importlib.import_module(modulo)
+
+
+def atraso_backoff(tentativas: int, aleatorio: Callable[[], float] = random.random) -> float:
+    """Segundos até à próxima tentativa: exponencial com ±20% de jitter."""
+    base = min(BACKOFF_BASE_S * 2 ** max(tentativas - 1, 0), BACKOFF_MAX_S)
+    return base * (0.8 + 0.4 * aleatorio())
+
+
+# ─── Enfileirar ──────────────────────────────────────────────────────────────
+
+def _executar_em_thread(tipo: str, payload: dict) -> None:
+    registo = _tarefas.get(tipo)
+    if registo is None:
+        logger.error(f"[FILA] Tipo de tarefa desconhecido: {tipo}")
+        return
+
+    def _correr():
+        try:
+            registo.funcao(**payload)
+        except Exception as e:
+            logger.warning(f"[FILA] Tarefa {tipo} falhou (sem fila, não será repetida): {e}")
+
+    threading.Thread(target=_correr, name=f"tarefa-{tipo}", daemon=True).start()
+
+
+def enfileirar(
+    tipo: str,
+    payload: Optional[dict] = None,
+    prioridade: Optional[int] = None,
+    atraso_s: float = 0,
+    chave: Optional[str] = None,
+) -> Optional[int]:
+    """
+    Põe uma tarefa na fila e devolve o id (None se já havia uma pendente com a
+    mesma `chave`, ou se correu fora da fila). Se a fila não estiver disponível,
+    a tarefa corre numa thread, como antes da fila existir.
+    """
+    payload = payload or {}
+    registo = _tarefas.get(tipo)
+    if prioridade is None:
+        prioridade = registo.prioridade if registo else PRIORIDADE_NORMAL
+    max_tentativas = registo.max_tentativas if registo else MAX_TENTATIVAS
+
+    if not ativa():
+        _executar_em_thread(tipo, payload)
+        return None
+
+    from database.connection import get_db_connection
+    try:
+        conn = get_db_connection()
+    except Exception as e:
+        logger.warning(f"[FILA] Sem ligação para enfileirar {tipo} ({e}); a correr já")
+        _executar_em_thread(tipo, payload)
+        return None
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO fila_tarefas (tipo, payload, prioridade, max_tentativas, executar_apos, chave)
+            VALUES (%s, %s, %s, %s, NOW() + make_interval(secs => %s), %s)
+            ON CONFLICT (chave) WHERE chave IS NOT NULL AND estado = 'pendente' DO NOTHING
+            RETURNING id
+        """, (tipo, json.dumps(payload), prioridade, max_tentativas, atraso_s, chave))
+        linha = cur.fetchone()
+        conn.commit()
+        cur.close()
+        return linha[0] if linha else None
+    except Exception as e:
+        conn.rollback()
+        logger.warning(f"[FILA] Não foi possível enfileirar {tipo} ({e}); a correr já")
+        _executar_em_thread(tipo, payload)
+        return None
+    finally:
+        conn.close()
+
+
+# ─── Consumir ────────────────────────────────────────────────────────────────
+
+def _reclamar(cur, limite: int) -> list:
+    cur.execute("""
+        WITH proximas AS (
+            SELECT id FROM fila_tarefas
+             WHERE estado = 'pendente' AND executar_apos <= NOW()
+             ORDER BY prioridade, executar_apos, id
+             LIMIT %s
+             FOR UPDATE SKIP LOCKED
+        )
+        UPDATE fila_tarefas t
+           SET estado = 'em_curso', tentativas = t.tentativas + 1,
+               executor = %s, iniciada_em = NOW()
+          FROM proximas
+         WHERE t.id = proximas.id
+        RETURNING t.id, t.tipo, t.payload, t.tentativas, t.max_tentativas
+    """, (limite, identificador_processo()))
+    return cur.fetchall()
+
+
+def _concluir(cur, tarefa_id: int) -> None:
+    cur.execute("""
+        UPDATE fila_tarefas SET estado = 'concluida', concluida_em = NOW(), erro = NULL
+         WHERE id = %s
+    """, (tarefa_id,))
+
+
+def _falhar(cur, tarefa_id: int, tentativas: int, max_tentativas: int, erro: str) -> None:
+    if tentativas >= max_tentativas:
+        cur.execute("""
+            UPDATE fila_tarefas SET estado = 'falhada', concluida_em = NOW(), erro = %s
+             WHERE id = %s
+        """, (erro, tarefa_id))
+        return
+    # Se entretanto entrou outra pendente com a mesma chave, esta perde a
+    # chave (o índice único só admite uma pendente por chave)
+    cur.execute("""
+        UPDATE fila_tarefas t
+           SET estado = 'pendente', erro = %s,
+               executar_apos = NOW() + make_interval(secs => %s),
+               chave = CASE WHEN EXISTS (
+                           SELECT 1 FROM fila_tarefas o
+                            WHERE o.chave = t.chave AND o.estado = 'pendente'
+                       ) THEN NULL ELSE t.chave END
+         WHERE id = %s
+    """, (erro, atraso_backoff(tentativas), tarefa_id))
+
+
+def _registar_resultado(tarefa_id: int, tentativas: int, max_tentativas: int, erro: Optional[str]) -> None:
+    from database.connection import get_db_connection
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        if erro is None:
+            _concluir(cur, tarefa_id)
+        else:
+            _falhar(cur, tarefa_id, tentativas, max_tentativas, erro)
+        conn.commit()
+        cur.close()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def processar(limite: int = 1) -> int:
+    """Reclama e executa até `limite` tarefas prontas. Devolve quantas executou."""
+    from database.connection import get_db_connection
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        reclamadas = _reclamar(cur, limite)
+        # Commit já e devolver a ligação ao pool: o estado 'em_curso' protege a
+        # tarefa, o lock da linha não precisa de durar a execução
+        conn.commit()
+        cur.close()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    for tarefa_id, tipo, payload, tentativas, max_tentativas in reclamadas:
+        registo = _tarefas.get(tipo)
+        t0 = time.perf_counter()
+        erro = None
+        try:
+            if registo is None:
+                raise LookupError(f"tipo de tarefa desconhecido: {tipo}")
+            registo.funcao(**(payload or {}))
+        except Exception as e:
+            erro = f"{type(e).__name__}: {e}"[:500]
+            logger.warning(f"[FILA] Tarefa #{tarefa_id} {tipo} falhou (tentativa {tentativas}/{max_tentativas}): {erro}")
+        else:
+            logger.info(f"[FILA] Tarefa #{tarefa_id} {tipo} concluída em {(time.perf_counter() - t0) * 1000:.0f}ms")
+        _registar_resultado(tarefa_id, tentativas, max_tentativas, erro)
+    return len(reclamadas)
+
+
+def manutencao() -> None:
+    """Devolve à fila tarefas presas e apaga as concluídas antigas."""
+    from database.connection import get_db_connection
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            UPDATE fila_tarefas t
+               SET estado = CASE WHEN t.tentativas >= t.max_tentativas THEN 'falhada' ELSE 'pendente' END,
+                   erro = 'execução interrompida (worker sem resposta)',
+                   chave = CASE WHEN EXISTS (
+                               SELECT 1 FROM fila_tarefas o
+                                WHERE o.chave = t.chave AND o.estado = 'pendente'
+                           ) THEN NULL ELSE t.chave END
+             WHERE t.estado = 'em_curso' AND t.iniciada_em < NOW() - make_interval(secs => %s)
+        """, (TEMPO_MAX_EXECUCAO_S,))
+        if cur.rowcount:
+            logger.warning(f"[FILA] {cur.rowcount} tarefa(s) presa(s) devolvida(s) à fila")
+        cur.execute("""
+            DELETE FROM fila_tarefas
+             WHERE estado = 'concluida' AND concluida_em < NOW() - make_interval(days => %s)
+        """, (DIAS_RETENCAO_CONCLUIDAS,))
+        conn.commit()
+        cur.close()
+    except Exception as e:
+        conn.rollback()
+        logger.warning(f"[FILA] Erro na manutenção da fila: {e}")
+    finally:
+        conn.close()
+
+
+def _ligar_escuta():
+    from database.connection import ligacao_dedicada
+    conn = ligacao_dedicada()
+    cur = conn.cursor()
+    cur.execute(f"LISTEN {CANAL}")
+    cur.close()
+    return conn
+
+
+def _esperar_trabalho(escuta, parar: threading.Event, intervalo_s: float):
+    """Espera por um NOTIFY de tarefa nova (ou pelo intervalo). Devolve a ligação de escuta."""
+    if escuta is None:
+        parar.wait(intervalo_s)
+        return None
+    try:
+        prontos, _, _ = select.select([escuta], [], [], intervalo_s)
+        if prontos:
+            escuta.poll()
+            escuta.notifies.clear()
+        return escuta
+    except Exception as e:
+        logger.warning(f"[FILA] Escuta de '{CANAL}' perdida ({e}); a continuar só com polling")
+        try:
+            escuta.close()
+        except Exception:
+            pass
+        return None
+
+
+def correr(parar: threading.Event, intervalo_s: float = INTERVALO_POLL_S) -> None:
+    """Ciclo do worker: processa enquanto houver trabalho, depois espera."""
+    carregar_tarefas()
+    try:
+        escuta = _ligar_escuta()
+    except Exception as e:
+        logger.warning(f"[FILA] Sem LISTEN '{CANAL}' ({e}); só polling a cada {intervalo_s:.0f}s")
+        escuta = None
+    ultima_manutencao = 0.0
+    espera_erro = 1.0
+    try:
+        while not parar.is_set():
+            if time.monotonic() - ultima_manutencao >= INTERVALO_MANUTENCAO_S:
+                manutencao()
+                ultima_manutencao = time.monotonic()
+            try:
+                executadas = processar()
+                espera_erro = 1.0
+            except Exception as e:
+                logger.warning(f"[FILA] Erro a consumir a fila ({e}); nova tentativa em {espera_erro:.0f}s")
+                parar.wait(espera_erro)
+                espera_erro = min(espera_erro * 2, 30.0)
+                continue
+            if not executadas:
+                escuta = _esperar_trabalho(escuta, parar, intervalo_s)
+    finally:
+        if escuta is not None:
+            try:
+                escuta.close()
+            except Exception:
+                pass
+
+
+# ─── Worker embutido na API ──────────────────────────────────────────────────
+
+def iniciar() -> bool:
+    """Arranca um worker numa thread deste processo (idempotente). False se desligado por env."""
+    global _thread
+    if not ativa():
+        logger.info("[FILA] Fila desligada (FILA=off): tarefas correm em threads no próprio pedido")
+        return False
+    if os.getenv("FILA_WORKER_EMBUTIDO", "on").strip().lower() in ("off", "0", "false"):
+        logger.info("[FILA] Worker embutido desligado: a fila é consumida por `python -m worker`")
+        return False
+    if _thread is not None and _thread.is_alive():
+        return True
+    _parar.clear()
+    _thread = threading.Thread(target=correr, args=(_parar,), name="fila-worker", daemon=True)
+    _thread.start()
+    return True
+
+
+def parar(timeout_s: float = 5.0) -> None:
+    global _thread
+    _parar.set()
+    if _thread is not None:
+        _thread.join(timeout=timeout_s)
+        _thread = None
@@ -0,0 +1,305 @@
+"""
+Eleição de líder para os jobs agendados (advisory lock do Postgres).
+
+Cada worker (e cada contentor) arranca o seu BackgroundScheduler em pausa e
+tenta, a cada INTERVALO_S, obter `pg_try_advisory_lock` numa ligação dedicada.
+Quem o conseguir é o líder: retoma o scheduler e os jobs correm só aí. O lock é
+de sessão — se o processo do líder morrer, a ligação fecha, o Postgres liberta
+o lock e outro worker assume na tentativa seguinte.
+
+Duas proteções extra:
+  - cada execução de um job (e qualquer execução manual equivalente, ex: o
+    POST /api/chatbot/sync) segura um advisory lock próprio, por isso nunca há
+    duas escritas concorrentes do mesmo recurso, mesmo com um líder de saída;
+  - a última execução de cada job fica em scheduler_execucoes: um líder novo
+    corre logo os jobs cujo horário passou durante a troca de líder.
+
+Variáveis:
+    LIDERANCA=off   desliga a eleição (todos os processos correm os jobs, como antes)
+    DB_SESSAO_DSN   ligação de sessão para o lock (ver database.connection.ligacao_dedicada)
+
+Como usar noutros ficheiros:
+    from database import lideranca
+
+    @lideranca.job("drive_sync_daily", recurso="knowledge_base")
+    def _scheduled_sync(): ...
+
+    with lideranca.exclusivo("knowledge_base") as obtido:
+        if not obtido: ...  # já está a correr noutro sítio
+"""
+import functools
+import logging
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Callable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CHAVE_SCHEDULER = "rap:scheduler"
+INTERVALO_S = 5.0
+ESPERA_MAX_RELIGAR_S = 30.0
+
+# Um job atrasado há mais do que isto já não é recuperado (ex: base parada um dia)
+MAX_ATRASO_RECUPERAVEL = timedelta(hours=12)
+
+
+def identificador_processo() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class Lider:
+    """Eleição por advisory lock de sessão numa chave. Os callbacks correm na thread da eleição."""
+
+    def __init__(self, chave: str, intervalo_s: float = INTERVALO_S, ligar: Optional[Callable] = None):
+        self.chave = chave
+        self.intervalo_s = intervalo_s
+        self._ligar = ligar
+        self._ao_ganhar: List[Callable[[], None]] = []
+        self._ao_perder: List[Callable[[], None]] = []
+        self._lider = threading.Event()
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def registar(self, ao_ganhar: Callable[[], None], ao_perder: Callable[[], None]) -> None:
+        self._ao_ganhar.append(ao_ganhar)
+        self._ao_perder.append(ao_perder)
+
+    def e_lider(self) -> bool:
+        return self._lider.is_set()
+
+    def _notificar(self, callbacks: List[Callable[[], None]]) -> None:
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"[LIDER] Erro num callback de '{self.chave}': {e}")
+
+    def _mudar(self, lider: bool) -> None:
+        if lider == self._lider.is_set():
+            return
+        if lider:
+            self._lider.set()
+            logger.info(f"[LIDER] {identificador_processo()} é agora líder de '{self.chave}'")
+            self._notificar(self._ao_ganhar)
+        else:
+            self._lider.clear()
+            logger.warning(f"[LIDER] {identificador_processo()} deixou de ser líder de '{self.chave}'")
+            self._notificar(self._ao_perder)
+
+    def _ciclo(self) -> None:
+        if self._ligar is not None:
+            ligar = self._ligar
+        else:
+            from database.connection import ligacao_dedicada as ligar
+        espera = 1.0
+        while not self._parar.is_set():
+            conn = None
+            try:
+                conn = ligar()
+                cur = conn.cursor()
+                espera = 1.0
+                while not self._parar.is_set():
+                    if self.e_lider():
+                        # Heartbeat: se a ligação caiu, o lock já não é nosso
+                        cur.execute("SELECT 1")
+                    else:
+                        cur.execute("SELECT pg_try_advisory_lock(hashtext(%s))", (self.chave,))
+                        if cur.fetchone()[0]:
+                            self._mudar(True)
+                    self._parar.wait(self.intervalo_s)
+            except Exception as e:
+                if not self._parar.is_set():
+                    logger.warning(f"[LIDER] Ligação de '{self.chave}' perdida ({e}); nova tentativa em {espera:.0f}s")
+            finally:
+                self._mudar(False)
+                if conn is not None:
+                    try:
+                        conn.close()  # liberta o lock de sessão
+                    except Exception:
+                        pass
+            self._parar.wait(espera)
+            espera = min(espera * 2, ESPERA_MAX_RELIGAR_S)
+
+    def iniciar(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._ciclo, name=f"lider-{self.chave}", daemon=True)
+        self._thread.start()
+
+    def parar(self, timeout_s: float = 5.0) -> None:
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout_s)
+            self._thread = None
+
+
+_lider = Lider(CHAVE_SCHEDULER)
+
+
+def e_lider() -> bool:
+    return _lider.e_lider()
+
+
+def ativa() -> bool:
+    return os.getenv("LIDERANCA", "on").strip().lower() not in ("off", "0", "false")
+
+
+# ─── Exclusão por job / recurso ──────────────────────────────────────────────
+
+@contextmanager
+def exclusivo(recurso: str, ligar: Optional[Callable] = None) -> Iterator[bool]:
+    """
+    Advisory lock de sessão sobre `recurso` durante o bloco. Devolve False (sem
+    esperar) se outro processo o tiver. Sem base de dados, corre sem lock.
+
+    Numa ligação dedicada, como a eleição: pelo pooler em modo transação o lock
+    e o unlock podiam cair em backends diferentes e o lock ficava preso. Fechar
+    a ligação liberta-o mesmo que o unlock falhe.
+    """
+    if ligar is None:
+        from database.connection import ligacao_dedicada as ligar
+    try:
+        conn = ligar()
+    except Exception as e:
+        logger.warning(f"[LIDER] Sem ligação para o lock de '{recurso}' ({e}); a correr sem lock")
+        yield True
+        return
+    chave = f"rap:job:{recurso}"
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT pg_try_advisory_lock(hashtext(%s))", (chave,))
+        obtido = cur.fetchone()[0]
+        try:
+            yield obtido
+        finally:
+            if obtido:
+                try:
+                    cur.execute("SELECT pg_advisory_unlock(hashtext(%s))", (chave,))
+                except Exception as e:
+                    logger.warning(f"[LIDER] Unlock de '{recurso}' falhou ({e}); fechar a ligação liberta-o")
+    finally:
+        conn.close()
+
+
+def _registar_execucao(job_id: str, inicio: datetime, duracao_ms: int, erro: Optional[str]) -> None:
+    from database.connection import get_db_connection
+    try:
+        conn = get_db_connection()
+    except Exception as e:
+        logger.warning(f"[LIDER] Não foi possível registar a execução de {job_id}: {e}")
+        return
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO scheduler_execucoes (job_id, ultima_execucao, duracao_ms, executor, erro)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (job_id) DO UPDATE
+               SET ultima_execucao = EXCLUDED.ultima_execucao, duracao_ms = EXCLUDED.duracao_ms,
+                   executor = EXCLUDED.executor, erro = EXCLUDED.erro
+        """, (job_id, inicio, duracao_ms, identificador_processo(), erro))
+        conn.commit()
+        cur.close()
+    except Exception as e:
+        conn.rollback()
+        logger.warning(f"[LIDER] Não foi possível registar a execução de {job_id}: {e}")
+    finally:
+        conn.close()
+
+
+def job(job_id: str, recurso: Optional[str] = None):
+    """
+    Decorador para funções agendadas: só correm no líder, com o lock do `recurso`
+    (por omissão o próprio job_id), e a execução fica registada.
+    """
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            if ativa() and not e_lider():
+                logger.info(f"[LIDER] {job_id} ignorado: este processo não é líder")
+                return None
+            with exclusivo(recurso or job_id) as obtido:
+                if not obtido:
+                    logger.info(f"[LIDER] {job_id} ignorado: já está a correr noutro processo")
+                    return None
+                inicio = datetime.now().astimezone()
+                t0 = time.perf_counter()
+                erro = None
+                try:
+                    return funcao(*args, **kwargs)
+                except Exception as e:
+                    erro = str(e)[:500]
+                    raise
+                finally:
+                    _registar_execucao(job_id, inicio, int((time.perf_counter() - t0) * 1000), erro)
+        return envolvida
+    return decorador
+
+
+# ─── Ligação ao APScheduler ──────────────────────────────────────────────────
+
+def execucao_em_falta(trigger, ultima: Optional[datetime], agora: datetime) -> Optional[datetime]:
+    """
+    Horário que devia ter corrido depois de `ultima` e já passou (e ainda é
+    recuperável), ou None. Sem registo de execução não há nada a recuperar.
+    """
+    if ultima is None:
+        return None
+    proxima = trigger.get_next_fire_time(None, ultima + timedelta(seconds=1))
+    if proxima is None or proxima > agora or agora - proxima > MAX_ATRASO_RECUPERAVEL:
+        return None
+    return proxima
+
+
+def _ultimas_execucoes() -> dict:
+    from database.connection import get_db_connection
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT job_id, ultima_execucao FROM scheduler_execucoes")
+        return dict(cur.fetchall())
+    except Exception as e:
+        conn.rollback()
+        logger.warning(f"[LIDER] Não foi possível ler scheduler_execucoes: {e}")
+        return {}
+    finally:
+        conn.close()
+
+
+def ligar_scheduler(scheduler) -> None:
+    """
+    Arranca o scheduler em pausa e entrega-o à eleição: retoma no líder, pausa
+    ao perder a liderança. Com LIDERANCA=off arranca normalmente.
+    """
+    if not ativa():
+        logger.info("[LIDER] Eleição desligada (LIDERANCA=off): jobs correm em todos os processos")
+        if not scheduler.running:
+            scheduler.start()
+        return
+    if not scheduler.running:
+        scheduler.start(paused=True)
+
+    def _ao_ganhar():
+        agora = datetime.now(scheduler.timezone)
+        ultimas = _ultimas_execucoes()
+        for agendado in scheduler.get_jobs():
+            # O next_run_time deste processo ficou parado durante a pausa e pode
+            # apontar para uma execução que o líder anterior já fez: recalcular
+            em_falta = execucao_em_falta(agendado.trigger, ultimas.get(agendado.id), agora)
+            if em_falta is not None:
+                logger.info(f"[LIDER] {agendado.id} devia ter corrido às {em_falta:%H:%M}: a recuperar agora")
+                agendado.modify(next_run_time=agora)
+            else:
+                agendado.modify(next_run_time=agendado.trigger.get_next_fire_time(None, agora))
+        scheduler.resume()
+
+    _lider.registar(_ao_ganhar, scheduler.pause)
+    _lider.iniciar()
+
+
+def parar() -> None:
+    _lider.parar()
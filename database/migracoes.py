@@ -0,0 +1,65 @@
+"""
+Migrações opcionais: código que usa um objeto criado por uma migração (função,
+tabela, coluna) e mantém o caminho antigo para bases onde ela ainda não foi
+aplicada — o deploy da app pode chegar antes do SQL Editor.
+
+Na primeira vez que o Postgres responde que o objeto não existe, o processo
+regista um aviso e passa a usar o caminho antigo até reiniciar.
+
+Como usar noutros ficheiros:
+    from database.migracoes import MigracaoOpcional
+
+    _CALENDARIO = MigracaoOpcional("062", "calendar_entries", pg_errors.UndefinedTable, "a listar aulas com joins")
+    aulas = _CALENDARIO.executar(lambda: _ler_projecao(...), lambda: _ler_com_joins(...))
+
+    # Na mesma ligação: o erro aborta a transação, conn=... faz rollback antes do caminho antigo
+    _PERIODO.executar(lambda: cur.execute(sql, params), lambda: cur.execute(sql_antigo, params), conn=conn)
+
+executar_com_periodo é isso para as queries sobre aulas.periodo (migração 064).
+"""
+import logging
+from typing import Callable, Type, TypeVar
+
+from psycopg2 import errors as pg_errors
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class MigracaoOpcional:
+    """Um objeto de uma migração, com o caminho a usar enquanto ela não estiver aplicada."""
+
+    def __init__(self, numero: str, objeto: str, erro: Type[Exception], alternativa: str):
+        self.numero = numero
+        self.objeto = objeto
+        self.erro = erro
+        self.alternativa = alternativa
+        self.disponivel = True
+
+    def executar(self, com: Callable[[], T], sem: Callable[[], T], conn=None) -> T:
+        """`com()` enquanto o objeto existir; `sem()` depois do primeiro `erro`."""
+        if self.disponivel:
+            try:
+                return com()
+            except self.erro:
+                self.disponivel = False
+                if conn is not None:
+                    conn.rollback()
+                logger.warning(f"{self.objeto} não existe (migração {self.numero}); {self.alternativa}")
+        return sem()
+
+
+# aulas.periodo (migração 064) é [data_hora, data_hora + duracao_minutos) como
+# tsrange, com índice GiST. Sem a migração calcula-se o mesmo intervalo na query.
+_PERIODO = MigracaoOpcional("064", "aulas.periodo", pg_errors.UndefinedColumn, "a calcular o intervalo na query")
+_PERIODO_CALCULADO = "tsrange(a.data_hora, a.data_hora + GREATEST(a.duracao_minutos, 0) * INTERVAL '1 minute')"
+
+
+def executar_com_periodo(conn, cur, sql, params) -> None:
+    """Executa uma query sobre `aulas a` que filtra por a.periodo (ex: `a.periodo && tsrange(%s, %s)`)."""
+    _PERIODO.executar(
+        lambda: cur.execute(sql, params),
+        lambda: cur.execute(sql.replace("a.periodo", _PERIODO_CALCULADO), params),
+        conn=conn,
+    )
@@ -6,11 +6,14 @@ load_dotenv()
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from database.connection import close_pool
+from database import cache_invalidacao, fila, lideranca
+from api.captura import configurar_captura
+from api.deps import PermissoesPorPedido
 
 from api.routers import (
     auth, studio, sessions, notifications, projects, records,
     team, financial, equipment, production, stats, geo, wiki,
-    chat, ai, shortcuts, tasks, admin, curriculo
+    chat, ai, shortcuts, tasks, admin, curriculo, batch
 )
 
 app = FastAPI(
@@ -30,24 +33,47 @@ app.add_middleware(
     allow_origins=origins,
     allow_origin_regex=r"(https://app-rap-novaescola(-[a-z0-9]+)*\.vercel\.app|https://([a-z0-9-]+\.)?rapnovaescola\.pt|http://(localhost|127\.0\.0\.1|192\.168\.\d+\.\d+|10\.\d+\.\d+\.\d+):\d+)",
     allow_credentials=True, allow_methods=["*"], allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+# Opt-in: CAPTURA_TRAFEGO=<ficheiro> regista o tráfego para o perf.replay
+configurar_captura(app)
+
+# Permissões resolvidas uma vez por pedido (PermissionContext); o último a ser
+# registado é o mais exterior, por isso cobre também os sub-pedidos do /api/batch
+app.add_middleware(PermissoesPorPedido)
+
 for r in [auth.router, studio.router, records.router, sessions.router,
           notifications.router, projects.router, team.router, financial.router,
           equipment.router, production.router, stats.router, geo.router,
           wiki.router, chat.router, ai.router, shortcuts.router, tasks.router,
-          admin.router, curriculo.router]:
+          admin.router, curriculo.router, batch.router]:
     app.include_router(r)
 
 
+@app.on_event("startup")
+async def start_cache_invalidacao():
+    # Um LISTEN por worker: invalidações de permissões/settings feitas noutro worker chegam aqui
+    cache_invalidacao.iniciar()
+
+
 @app.on_event("startup")
 async def start_scheduler():
-    if not ai._scheduler.running:
-        ai._scheduler.start()
+    # Todos os processos arrancam o scheduler em pausa; só o líder o retoma
+    lideranca.ligar_scheduler(ai._scheduler)
+
+
+@app.on_event("startup")
+async def start_fila():
+    # Worker da fila embutido; com FILA_WORKER_EMBUTIDO=off a fila é consumida por `python -m worker`
+    fila.iniciar()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    fila.parar()
+    lideranca.parar()
+    cache_invalidacao.parar()
     close_pool()
     try:
         if ai._scheduler.running:
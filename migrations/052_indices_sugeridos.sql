@@ -0,0 +1,11 @@
+-- 052: Índices sugeridos pelo index advisor (python -m perf.indices), revistos à mão
+-- CREATE INDEX CONCURRENTLY não corre dentro de uma transação: no SQL Editor,
+-- executar cada instrução isoladamente.
+
+-- aulas: filtro por intervalo de data_hora (calendário, exportação, honorários, kms)
+-- Seq Scan custo 1104 → ~206 no dataset de perf (escala 3)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_aulas_data_hora ON aulas(data_hora);
+
+-- notificacoes: contador de não lidas (polling) — evita o BitmapAnd com idx_notificacoes_lida
+-- custo 164 → ~104 no dataset de perf (escala 3)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_notificacoes_user_id_lida_false ON notificacoes(user_id) WHERE lida = FALSE;
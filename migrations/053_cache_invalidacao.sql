@@ -0,0 +1,66 @@
+-- 053: Invalidação de caches entre workers via LISTEN/NOTIFY
+-- Cada alteração às tabelas que alimentam caches em memória (permissões,
+-- system_settings) envia um NOTIFY no canal 'rap_cache'. Todos os workers da
+-- API escutam esse canal (database/cache_invalidacao.py) e limpam a cache local.
+--
+-- Payload: '<tabela>' (invalida tudo o que vem dessa tabela) ou
+--          '<tabela>:<chave>' (só a entrada dessa chave, ex: o user_id).
+-- Notificações iguais dentro da mesma transação são agregadas pelo Postgres,
+-- por isso um UPDATE a muitas linhas gera poucas mensagens.
+
+CREATE OR REPLACE FUNCTION public.notificar_invalidacao_cache()
+RETURNS TRIGGER AS $$
+DECLARE
+  coluna TEXT := TG_ARGV[0];
+BEGIN
+  IF TG_LEVEL = 'STATEMENT' OR coluna IS NULL THEN
+    PERFORM pg_notify('rap_cache', TG_TABLE_NAME);
+    RETURN NULL;
+  END IF;
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    PERFORM pg_notify('rap_cache', TG_TABLE_NAME || ':' || (to_jsonb(OLD) ->> coluna));
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    PERFORM pg_notify('rap_cache', TG_TABLE_NAME || ':' || (to_jsonb(NEW) ->> coluna));
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- profiles: só as colunas que entram nas permissões (evita NOTIFY em cada edição de perfil)
+DROP TRIGGER IF EXISTS trg_cache_profiles ON public.profiles;
+CREATE TRIGGER trg_cache_profiles
+  AFTER UPDATE OF role, is_root, is_direcao, is_coordenacao, project_scoped, permission_level_id
+     OR DELETE ON public.profiles
+  FOR EACH ROW EXECUTE FUNCTION public.notificar_invalidacao_cache('id');
+
+DROP TRIGGER IF EXISTS trg_cache_user_page_permissions ON public.user_page_permissions;
+CREATE TRIGGER trg_cache_user_page_permissions
+  AFTER INSERT OR UPDATE OR DELETE ON public.user_page_permissions
+  FOR EACH ROW EXECUTE FUNCTION public.notificar_invalidacao_cache('user_id');
+
+DROP TRIGGER IF EXISTS trg_cache_user_project_access ON public.user_project_access;
+CREATE TRIGGER trg_cache_user_project_access
+  AFTER INSERT OR UPDATE OR DELETE ON public.user_project_access
+  FOR EACH ROW EXECUTE FUNCTION public.notificar_invalidacao_cache('user_id');
+
+-- Tabelas que afetam muitos utilizadores de uma vez: um NOTIFY por instrução
+DROP TRIGGER IF EXISTS trg_cache_permission_levels ON public.permission_levels;
+CREATE TRIGGER trg_cache_permission_levels
+  AFTER INSERT OR UPDATE OR DELETE ON public.permission_levels
+  FOR EACH STATEMENT EXECUTE FUNCTION public.notificar_invalidacao_cache();
+
+DROP TRIGGER IF EXISTS trg_cache_roles ON public.roles;
+CREATE TRIGGER trg_cache_roles
+  AFTER INSERT OR UPDATE OR DELETE ON public.roles
+  FOR EACH STATEMENT EXECUTE FUNCTION public.notificar_invalidacao_cache();
+
+DROP TRIGGER IF EXISTS trg_cache_role_page_permissions ON public.role_page_permissions;
+CREATE TRIGGER trg_cache_role_page_permissions
+  AFTER INSERT OR UPDATE OR DELETE ON public.role_page_permissions
+  FOR EACH STATEMENT EXECUTE FUNCTION public.notificar_invalidacao_cache();
+
+DROP TRIGGER IF EXISTS trg_cache_system_settings ON public.system_settings;
+CREATE TRIGGER trg_cache_system_settings
+  AFTER INSERT OR UPDATE OR DELETE ON public.system_settings
+  FOR EACH STATEMENT EXECUTE FUNCTION public.notificar_invalidacao_cache();
@@ -0,0 +1,12 @@
+-- 054: Registo da última execução de cada job agendado (database/lideranca.py)
+-- Os jobs do APScheduler só correm no worker líder (advisory lock). Quando o
+-- líder muda, o novo líder consulta esta tabela para correr de imediato um
+-- horário que tenha passado durante a troca.
+
+CREATE TABLE IF NOT EXISTS scheduler_execucoes (
+    job_id          TEXT PRIMARY KEY,
+    ultima_execucao TIMESTAMPTZ NOT NULL,
+    duracao_ms      INTEGER,
+    executor        TEXT,          -- hostname:pid do processo que correu o job
+    erro            TEXT           -- NULL se terminou sem erro
+);
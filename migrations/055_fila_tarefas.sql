@@ -0,0 +1,56 @@
+-- 055: Fila de tarefas em segundo plano (database/fila.py)
+-- Efeitos secundários que não precisam de acontecer dentro do pedido (push,
+-- Slack, auto-atribuição da pool) passam a ser enfileirados aqui e executados
+-- por um worker (`python -m worker`, ou a thread embutida na API).
+-- O audit log continua inline (audit_service.registar): é um INSERT local, com
+-- o mesmo custo de enfileirar.
+--
+-- Os workers reclamam tarefas com SELECT ... FOR UPDATE SKIP LOCKED, por isso
+-- vários processos podem consumir a mesma fila sem se atropelarem.
+-- Prioridade: menor número corre primeiro (0 = urgente, 100 = normal).
+
+CREATE TABLE IF NOT EXISTS fila_tarefas (
+    id             BIGSERIAL PRIMARY KEY,
+    tipo           TEXT        NOT NULL,
+    payload        JSONB       NOT NULL DEFAULT '{}'::jsonb,
+    prioridade     SMALLINT    NOT NULL DEFAULT 100,
+    estado         TEXT        NOT NULL DEFAULT 'pendente'
+                   CHECK (estado IN ('pendente', 'em_curso', 'concluida', 'falhada')),
+    tentativas     INTEGER     NOT NULL DEFAULT 0,
+    max_tentativas INTEGER     NOT NULL DEFAULT 5,
+    executar_apos  TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    chave          TEXT,                 -- deduplicação: uma só tarefa pendente por chave
+    executor       TEXT,                 -- hostname:pid do worker que a reclamou
+    iniciada_em    TIMESTAMPTZ,
+    concluida_em   TIMESTAMPTZ,
+    erro           TEXT,
+    criada_em      TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Índice do "próximo trabalho": só as pendentes, pela ordem em que são reclamadas
+CREATE INDEX IF NOT EXISTS idx_fila_tarefas_proxima
+    ON fila_tarefas (prioridade, executar_apos, id)
+    WHERE estado = 'pendente';
+
+-- Tarefas presas em 'em_curso' (worker morreu a meio) são devolvidas à fila
+CREATE INDEX IF NOT EXISTS idx_fila_tarefas_em_curso
+    ON fila_tarefas (iniciada_em)
+    WHERE estado = 'em_curso';
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_fila_tarefas_chave_pendente
+    ON fila_tarefas (chave)
+    WHERE chave IS NOT NULL AND estado = 'pendente';
+
+-- Acorda os workers assim que há trabalho novo (eles também fazem polling)
+CREATE OR REPLACE FUNCTION public.notificar_fila_tarefas()
+RETURNS TRIGGER AS $$
+BEGIN
+  PERFORM pg_notify('rap_fila', '');
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_fila_tarefas_nova ON public.fila_tarefas;
+CREATE TRIGGER trg_fila_tarefas_nova
+  AFTER INSERT ON public.fila_tarefas
+  FOR EACH STATEMENT EXECUTE FUNCTION public.notificar_fila_tarefas();
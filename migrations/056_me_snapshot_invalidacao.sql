@@ -0,0 +1,113 @@
+-- 056: Invalidação do snapshot "o meu dia" (GET /api/me/snapshot)
+-- O snapshot de cada utilizador fica em cache nos workers
+-- (services/snapshot_service.py). Estes triggers avisam, pelo mesmo canal
+-- 'rap_cache' da migração 053, quando muda algo que entra no snapshot:
+--   'me_snapshot:<user_id>'  só o snapshot desse utilizador
+--   'me_snapshot'            todos (ex: mudou o nome de uma turma)
+
+-- Utilizadores afetados por uma aula: o mentor (via mentores.user_id) e o
+-- responsável de trabalho autónomo
+CREATE OR REPLACE FUNCTION public.notificar_snapshot_aula(p_mentor_id INTEGER, p_responsavel TEXT)
+RETURNS VOID AS $$
+DECLARE
+  utilizador TEXT;
+BEGIN
+  IF p_mentor_id IS NOT NULL THEN
+    SELECT user_id::text INTO utilizador FROM public.mentores WHERE id = p_mentor_id;
+    IF utilizador IS NOT NULL THEN
+      PERFORM pg_notify('rap_cache', 'me_snapshot:' || utilizador);
+    END IF;
+  END IF;
+  IF p_responsavel IS NOT NULL THEN
+    PERFORM pg_notify('rap_cache', 'me_snapshot:' || p_responsavel);
+  END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- TG_ARGV[0]: coluna com o user_id (notificacoes, musicas); aulas e registos
+-- resolvem o utilizador a partir da aula
+CREATE OR REPLACE FUNCTION public.notificar_snapshot_utilizador()
+RETURNS TRIGGER AS $$
+DECLARE
+  coluna TEXT := TG_ARGV[0];
+  linha JSONB;
+BEGIN
+  IF TG_LEVEL = 'STATEMENT' THEN
+    PERFORM pg_notify('rap_cache', 'me_snapshot');
+    RETURN NULL;
+  END IF;
+
+  FOREACH linha IN ARRAY ARRAY[
+    CASE WHEN TG_OP IN ('UPDATE', 'DELETE') THEN to_jsonb(OLD) END,
+    CASE WHEN TG_OP IN ('INSERT', 'UPDATE') THEN to_jsonb(NEW) END
+  ] LOOP
+    CONTINUE WHEN linha IS NULL;
+    IF TG_TABLE_NAME = 'aulas' THEN
+      PERFORM public.notificar_snapshot_aula((linha ->> 'mentor_id')::int, linha ->> 'responsavel_user_id');
+    ELSIF TG_TABLE_NAME = 'registos' THEN
+      PERFORM public.notificar_snapshot_aula(a.mentor_id, a.responsavel_user_id)
+         FROM public.aulas a WHERE a.id = (linha ->> 'aula_id')::int;
+    ELSIF linha ->> coluna IS NOT NULL THEN
+      PERFORM pg_notify('rap_cache', 'me_snapshot:' || (linha ->> coluna));
+    END IF;
+  END LOOP;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- aulas: só as colunas que aparecem no snapshot (próximas sessões, pendentes e
+-- as sessões por registar de registo_service.listar_sessoes_registaveis)
+DROP TRIGGER IF EXISTS trg_snapshot_aulas ON public.aulas;
+CREATE TRIGGER trg_snapshot_aulas
+  AFTER INSERT OR DELETE
+     OR UPDATE OF mentor_id, responsavel_user_id, data_hora, duracao_minutos, estado,
+                  local, tema, tipo, turma_id, is_autonomous, is_realized,
+                  observacoes, objetivos, sumario, codigo_sessao, musica_id,
+                  atividade_uuid, tipo_atividade, projeto_id
+  ON public.aulas
+  FOR EACH ROW EXECUTE FUNCTION public.notificar_snapshot_utilizador();
+
+-- Um registo novo tira a sessão da lista "por registar"
+DROP TRIGGER IF EXISTS trg_snapshot_registos ON public.registos;
+CREATE TRIGGER trg_snapshot_registos
+  AFTER INSERT OR DELETE ON public.registos
+  FOR EACH ROW EXECUTE FUNCTION public.notificar_snapshot_utilizador();
+
+DROP TRIGGER IF EXISTS trg_snapshot_notificacoes ON public.notificacoes;
+CREATE TRIGGER trg_snapshot_notificacoes
+  AFTER INSERT OR DELETE OR UPDATE OF lida ON public.notificacoes
+  FOR EACH ROW EXECUTE FUNCTION public.notificar_snapshot_utilizador('user_id');
+
+DROP TRIGGER IF EXISTS trg_snapshot_musicas ON public.musicas;
+CREATE TRIGGER trg_snapshot_musicas
+  AFTER INSERT OR DELETE
+     OR UPDATE OF responsavel_id, estado, titulo, fase_deadline, arquivado
+  ON public.musicas
+  FOR EACH ROW EXECUTE FUNCTION public.notificar_snapshot_utilizador('responsavel_id');
+
+-- Nomes mostrados no snapshot e a ligação mentor -> utilizador: invalidar todos
+DROP TRIGGER IF EXISTS trg_snapshot_turmas ON public.turmas;
+CREATE TRIGGER trg_snapshot_turmas
+  AFTER UPDATE OR DELETE ON public.turmas
+  FOR EACH STATEMENT EXECUTE FUNCTION public.notificar_snapshot_utilizador();
+
+DROP TRIGGER IF EXISTS trg_snapshot_estabelecimentos ON public.estabelecimentos;
+CREATE TRIGGER trg_snapshot_estabelecimentos
+  AFTER UPDATE OR DELETE ON public.estabelecimentos
+  FOR EACH STATEMENT EXECUTE FUNCTION public.notificar_snapshot_utilizador();
+
+DROP TRIGGER IF EXISTS trg_snapshot_mentores ON public.mentores;
+CREATE TRIGGER trg_snapshot_mentores
+  AFTER UPDATE OR DELETE ON public.mentores
+  FOR EACH STATEMENT EXECUTE FUNCTION public.notificar_snapshot_utilizador();
+
+-- Nome da disciplina das sessões por registar (aulas.atividade_uuid → turma_atividades → turma_disciplinas)
+DROP TRIGGER IF EXISTS trg_snapshot_turma_atividades ON public.turma_atividades;
+CREATE TRIGGER trg_snapshot_turma_atividades
+  AFTER UPDATE OR DELETE ON public.turma_atividades
+  FOR EACH STATEMENT EXECUTE FUNCTION public.notificar_snapshot_utilizador();
+
+DROP TRIGGER IF EXISTS trg_snapshot_turma_disciplinas ON public.turma_disciplinas;
+CREATE TRIGGER trg_snapshot_turma_disciplinas
+  AFTER UPDATE OR DELETE ON public.turma_disciplinas
+  FOR EACH STATEMENT EXECUTE FUNCTION public.notificar_snapshot_utilizador();
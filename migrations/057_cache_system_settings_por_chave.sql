@@ -0,0 +1,11 @@
+-- 057: NOTIFY de system_settings com a key alterada
+-- Na migração 053 o trigger era por instrução ('system_settings'), o que obrigava
+-- a cache de permissões a esvaziar-se em qualquer alteração de settings. Por
+-- linha, o payload passa a ser 'system_settings:<key>' e cada worker só limpa
+-- as permissões quando muda uma flag module_* (services/permission_service.py).
+-- A cache das settings continua a ser relida por inteiro.
+
+DROP TRIGGER IF EXISTS trg_cache_system_settings ON public.system_settings;
+CREATE TRIGGER trg_cache_system_settings
+  AFTER INSERT OR UPDATE OR DELETE ON public.system_settings
+  FOR EACH ROW EXECUTE FUNCTION public.notificar_invalidacao_cache('key');
@@ -0,0 +1,49 @@
+-- 058: Permissões efetivas numa só ida à BD
+-- services/permission_service.get_user_permissions fazia até quatro queries
+-- por cache miss (perfil + patente, role_page_permissions,
+-- user_page_permissions, user_project_access), mais a leitura das flags
+-- module_* de system_settings. Esta função devolve tudo numa linha; cada
+-- subquery usa um índice (idx_rpp_role_id, idx_upp_user_id, idx_upa_user_id).
+-- Em plpgsql o plano fica em cache na ligação, o que conta porque as
+-- ligações do pool são reutilizadas e o planeamento custava mais do que a
+-- execução.
+-- A lógica (patente vs flags legadas, overrides, root) continua em Python;
+-- a função só junta os dados.
+
+CREATE OR REPLACE FUNCTION public.permissoes_efetivas(p_user_id UUID, p_flags TEXT[])
+RETURNS TABLE (
+  role TEXT, is_root BOOLEAN, is_direcao BOOLEAN, is_coordenacao BOOLEAN, project_scoped BOOLEAN,
+  permission_level_id INTEGER, level_order INTEGER, allowed_pages JSONB, allowed_actions JSONB,
+  pl_name TEXT, pl_label TEXT, pl_color TEXT,
+  role_pages TEXT[], granted_pages TEXT[], denied_pages TEXT[], project_ids INTEGER[], disabled_flags TEXT[]
+) AS $$
+BEGIN
+  RETURN QUERY
+    SELECT p.role::text, p.is_root, p.is_direcao, p.is_coordenacao, p.project_scoped,
+           p.permission_level_id,
+           pl.level_order, pl.allowed_pages, pl.allowed_actions,
+           pl.name::text, pl.label::text, pl.color::text,
+           CASE WHEN pl.allowed_pages IS NULL THEN (
+               SELECT array_agg(rpp.page_slug::text)
+               FROM public.role_page_permissions rpp
+               JOIN public.roles r ON r.id = rpp.role_id
+               WHERE r.name = p.role
+           ) END,
+           upp.granted_pages, upp.denied_pages,
+           CASE WHEN p.project_scoped THEN (
+               SELECT array_agg(upa.projeto_id ORDER BY upa.projeto_id)
+               FROM public.user_project_access upa WHERE upa.user_id = p.id
+           ) END,
+           (SELECT array_agg(s.key::text) FROM public.system_settings s
+            WHERE s.key = ANY(p_flags)
+              AND s.value IN ('false'::jsonb, 'null'::jsonb, '0'::jsonb, '""'::jsonb))
+    FROM public.profiles p
+    LEFT JOIN public.permission_levels pl ON pl.id = p.permission_level_id
+    LEFT JOIN LATERAL (
+        SELECT array_agg(x.page_slug::text) FILTER (WHERE x.granted) AS granted_pages,
+               array_agg(x.page_slug::text) FILTER (WHERE NOT x.granted) AS denied_pages
+        FROM public.user_page_permissions x WHERE x.user_id = p.id
+    ) upp ON TRUE
+    WHERE p.id = p_user_id;
+END;
+$$ LANGUAGE plpgsql STABLE;
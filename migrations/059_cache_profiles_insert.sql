@@ -0,0 +1,12 @@
+-- 059: NOTIFY também na criação de perfis
+-- services/settings_service.py guarda em memória o conjunto de users de
+-- direção/root (usado para ocultar as sessões da direção em GET /api/aulas).
+-- O trigger da migração 053 só avisava em UPDATE/DELETE; um perfil criado já
+-- com is_direcao/is_root (POST /api/admin/users) tem de invalidar também.
+
+DROP TRIGGER IF EXISTS trg_cache_profiles ON public.profiles;
+CREATE TRIGGER trg_cache_profiles
+  AFTER INSERT
+     OR UPDATE OF role, is_root, is_direcao, is_coordenacao, project_scoped, permission_level_id
+     OR DELETE ON public.profiles
+  FOR EACH ROW EXECUTE FUNCTION public.notificar_invalidacao_cache('id');
@@ -0,0 +1,14 @@
+-- 060: Índice composto para a paginação por cursor de GET /api/aulas
+-- CREATE/DROP INDEX CONCURRENTLY não correm dentro de uma transação: no SQL
+-- Editor, executar cada instrução isoladamente e pela ordem.
+
+-- aulas: janela from/to + keyset em (data_hora, id), ORDER BY data_hora DESC, id DESC.
+-- O Index Scan Backward devolve as linhas já pela ordem do ORDER BY e pára no
+-- LIMIT. Com o índice só em data_hora o desempate por id custava um Incremental
+-- Sort sobre o join (2000 aulas, dataset de 50k: ~27 ms → ~10 ms; semana: ~6 ms → ~3.5 ms).
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_aulas_data_hora_id ON aulas(data_hora, id);
+
+-- idx_aulas_data_hora (052) fica redundante: (data_hora, id) serve os mesmos
+-- filtros por intervalo, e enquanto existir o planner prefere-o por ser mais
+-- pequeno e volta a ordenar por id.
+DROP INDEX CONCURRENTLY IF EXISTS idx_aulas_data_hora;
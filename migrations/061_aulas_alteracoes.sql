@@ -0,0 +1,56 @@
+-- 061: Sincronização incremental de sessões (GET /api/aulas/changes)
+-- O cliente guarda a lista de aulas e pede só o que mudou desde o último token:
+--   - aulas.atualizado_em passa a ser mantido pela base em todos os INSERT/UPDATE
+--     (o código Python só o atualizava em parte dos caminhos; os UPDATE em SQL
+--     direto, ex: confirmacao_service, deixavam-no para trás);
+--   - aulas_apagadas guarda uma "tombstone" por aula apagada, venha o DELETE de
+--     apagar_aula, do apagar projeto ou de um cascade.
+-- Hora em UTC (naive), como o datetime.utcnow() que o código já usava.
+
+CREATE OR REPLACE FUNCTION public.aulas_marcar_atualizacao()
+RETURNS TRIGGER AS $$
+BEGIN
+  NEW.atualizado_em := clock_timestamp() AT TIME ZONE 'UTC';
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_aulas_atualizado_em ON public.aulas;
+CREATE TRIGGER trg_aulas_atualizado_em
+  BEFORE INSERT OR UPDATE ON public.aulas
+  FOR EACH ROW EXECUTE FUNCTION public.aulas_marcar_atualizacao();
+
+CREATE TABLE IF NOT EXISTS public.aulas_apagadas (
+  aula_id     INTEGER   PRIMARY KEY,
+  apagada_em  TIMESTAMP NOT NULL DEFAULT (NOW() AT TIME ZONE 'UTC')
+);
+
+COMMENT ON TABLE public.aulas_apagadas IS 'Tombstones de aulas apagadas, para GET /api/aulas/changes (guardadas 90 dias)';
+
+CREATE INDEX IF NOT EXISTS idx_aulas_apagadas_apagada_em ON public.aulas_apagadas(apagada_em);
+
+-- Tokens com mais de 90 dias pedem recarregamento completo
+-- (aula_service.RETENCAO_APAGADAS), por isso as tombstones mais antigas saem aqui.
+CREATE OR REPLACE FUNCTION public.aulas_registar_apagadas()
+RETURNS TRIGGER AS $$
+BEGIN
+  INSERT INTO public.aulas_apagadas (aula_id, apagada_em)
+  SELECT id, clock_timestamp() AT TIME ZONE 'UTC' FROM apagadas
+  ON CONFLICT (aula_id) DO UPDATE SET apagada_em = EXCLUDED.apagada_em;
+
+  DELETE FROM public.aulas_apagadas
+  WHERE apagada_em < (NOW() AT TIME ZONE 'UTC') - INTERVAL '90 days';
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Statement-level com transition table: um DELETE de um projeto inteiro é um só INSERT
+DROP TRIGGER IF EXISTS trg_aulas_apagadas ON public.aulas;
+CREATE TRIGGER trg_aulas_apagadas
+  AFTER DELETE ON public.aulas
+  REFERENCING OLD TABLE AS apagadas
+  FOR EACH STATEMENT EXECUTE FUNCTION public.aulas_registar_apagadas();
+
+-- CREATE INDEX CONCURRENTLY não corre dentro de uma transação: no SQL Editor,
+-- executar esta instrução isoladamente.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_aulas_atualizado_em ON aulas(atualizado_em);
@@ -0,0 +1,279 @@
+-- 062: Projeção desnormalizada das aulas para o calendário (Horários, GET /api/aulas)
+-- Cada linha de calendar_entries é uma aula já no formato de AulaListItem:
+-- nomes da turma, estabelecimento, mentor, atividade e disciplina, e os
+-- participantes das sessões 'outro'. A listagem passa a ser um Index Scan em
+-- (data_hora, id) sem joins nem a segunda query de _resolver_atividades_uuid_bulk.
+--
+-- A projeção é mantida por triggers em todas as tabelas de onde vêm colunas:
+--   aulas                 INSERT/UPDATE de qualquer coluna, incluindo atividade_uuid
+--                         (statement-level, uma query por instrução);
+--                         DELETE pelo ON DELETE CASCADE
+--   aula_participantes    INSERT/UPDATE/DELETE
+--   turmas                UPDATE OF nome, estabelecimento_id
+--   estabelecimentos      UPDATE OF nome, sigla
+--   mentores              UPDATE OF nome, user_id
+--   turma_atividades      INSERT/DELETE, UPDATE OF nome, turma_disciplina_id, uuid
+--   turma_disciplinas     INSERT/DELETE, UPDATE OF nome
+-- (projeto_nome e equipamento_nome não vêm de nenhuma tabela na listagem.)
+-- mentor_nome é mentores.nome; profiles.full_name chega lá pelo trigger
+-- trigger_sync_roles (fix_complete_trigger.py), que reescreve mentores.nome e
+-- dispara o trigger de mentores.
+--
+-- alterado_em é a hora (UTC) do último refrescamento da linha: muda também
+-- quando só mudou um nome ou os participantes, que não tocam em
+-- aulas.atualizado_em. É o que GET /api/aulas/changes lê.
+
+CREATE TABLE IF NOT EXISTS public.calendar_entries (
+  id                    INTEGER PRIMARY KEY REFERENCES public.aulas(id) ON DELETE CASCADE,
+  tipo                  VARCHAR(50),
+  data_hora             TIMESTAMP NOT NULL,
+  duracao_minutos       INTEGER,
+  estado                VARCHAR(50),
+  tema                  VARCHAR(255),
+  local                 VARCHAR(255),
+  objetivos             TEXT,
+  observacoes           TEXT,
+  criado_em             TIMESTAMP,
+  atualizado_em         TIMESTAMP,
+  turma_id              INTEGER,
+  turma_nome            TEXT,
+  mentor_id             INTEGER,
+  mentor_nome           TEXT,
+  mentor_user_id        TEXT,
+  estabelecimento_nome  TEXT,
+  estabelecimento_sigla TEXT,
+  projeto_id            INTEGER,
+  atividade_uuid        TEXT,
+  atividade_nome        TEXT,
+  disciplina_nome       TEXT,
+  is_autonomous         BOOLEAN NOT NULL DEFAULT FALSE,
+  is_realized           BOOLEAN NOT NULL DEFAULT FALSE,
+  tipo_atividade        TEXT,
+  responsavel_user_id   TEXT,
+  musica_id             INTEGER,
+  avaliacao             SMALLINT,
+  obs_termino           TEXT,
+  tarefa_id             INTEGER,
+  participantes_ids     TEXT[] NOT NULL DEFAULT '{}',
+  alterado_em           TIMESTAMP NOT NULL DEFAULT (NOW() AT TIME ZONE 'UTC')
+);
+-- Bases com a primeira versão desta migração (sem alterado_em)
+ALTER TABLE public.calendar_entries
+  ADD COLUMN IF NOT EXISTS alterado_em TIMESTAMP NOT NULL DEFAULT (NOW() AT TIME ZONE 'UTC');
+
+COMMENT ON TABLE public.calendar_entries IS 'Projeção de aulas para o calendário, mantida por triggers (migração 062)';
+
+CREATE INDEX IF NOT EXISTS idx_calendar_entries_data_hora_id ON public.calendar_entries(data_hora, id);
+CREATE INDEX IF NOT EXISTS idx_calendar_entries_alterado_em ON public.calendar_entries(alterado_em);
+
+-- Recalcula as linhas das aulas indicadas a partir das tabelas de origem.
+-- Upsert: a linha nunca desaparece a meio (uma leitura concorrente vê a versão
+-- antiga ou a nova), e só as linhas que mudaram de facto ganham alterado_em novo.
+CREATE OR REPLACE FUNCTION public.calendar_entries_refrescar(p_ids INTEGER[])
+RETURNS VOID AS $$
+BEGIN
+  IF p_ids IS NULL OR cardinality(p_ids) = 0 THEN
+    RETURN;
+  END IF;
+  INSERT INTO public.calendar_entries (
+    id, tipo, data_hora, duracao_minutos, estado, tema, local, objetivos,
+    observacoes, criado_em, atualizado_em, turma_id, turma_nome, mentor_id,
+    mentor_nome, mentor_user_id, estabelecimento_nome, estabelecimento_sigla,
+    projeto_id, atividade_uuid, atividade_nome, disciplina_nome,
+    is_autonomous, is_realized, tipo_atividade, responsavel_user_id,
+    musica_id, avaliacao, obs_termino, tarefa_id, participantes_ids,
+    alterado_em
+  )
+  SELECT a.id, a.tipo, a.data_hora, a.duracao_minutos, a.estado, a.tema, a.local,
+         a.objetivos, a.observacoes, a.criado_em, a.atualizado_em,
+         t.id, t.nome, m.id, m.nome, m.user_id::text, e.nome, e.sigla,
+         a.projeto_id, a.atividade_uuid::text, ta.nome, td.nome,
+         a.is_autonomous, a.is_realized, a.tipo_atividade, a.responsavel_user_id,
+         a.musica_id, a.avaliacao, a.obs_termino, a.tarefa_id,
+         COALESCE(p.ids, '{}'), clock_timestamp() AT TIME ZONE 'UTC'
+  FROM public.aulas a
+  LEFT JOIN public.turmas t ON t.id = a.turma_id
+  LEFT JOIN public.estabelecimentos e ON e.id = t.estabelecimento_id
+  LEFT JOIN public.mentores m ON m.id = a.mentor_id
+  LEFT JOIN public.turma_atividades ta ON ta.uuid = a.atividade_uuid
+  LEFT JOIN public.turma_disciplinas td ON td.id = ta.turma_disciplina_id
+  LEFT JOIN LATERAL (
+    -- como a listagem: só as sessões 'outro' mostram participantes
+    SELECT array_agg(ap.user_id ORDER BY ap.id) AS ids
+    FROM public.aula_participantes ap
+    WHERE ap.aula_id = a.id AND a.tipo = 'outro'
+  ) p ON TRUE
+  WHERE a.id = ANY(p_ids)
+  ON CONFLICT (id) DO UPDATE SET
+    tipo = EXCLUDED.tipo, data_hora = EXCLUDED.data_hora,
+    duracao_minutos = EXCLUDED.duracao_minutos, estado = EXCLUDED.estado,
+    tema = EXCLUDED.tema, local = EXCLUDED.local,
+    objetivos = EXCLUDED.objetivos, observacoes = EXCLUDED.observacoes,
+    criado_em = EXCLUDED.criado_em, atualizado_em = EXCLUDED.atualizado_em,
+    turma_id = EXCLUDED.turma_id, turma_nome = EXCLUDED.turma_nome,
+    mentor_id = EXCLUDED.mentor_id, mentor_nome = EXCLUDED.mentor_nome,
+    mentor_user_id = EXCLUDED.mentor_user_id,
+    estabelecimento_nome = EXCLUDED.estabelecimento_nome,
+    estabelecimento_sigla = EXCLUDED.estabelecimento_sigla,
+    projeto_id = EXCLUDED.projeto_id,
+    atividade_uuid = EXCLUDED.atividade_uuid,
+    atividade_nome = EXCLUDED.atividade_nome,
+    disciplina_nome = EXCLUDED.disciplina_nome,
+    is_autonomous = EXCLUDED.is_autonomous,
+    is_realized = EXCLUDED.is_realized,
+    tipo_atividade = EXCLUDED.tipo_atividade,
+    responsavel_user_id = EXCLUDED.responsavel_user_id,
+    musica_id = EXCLUDED.musica_id, avaliacao = EXCLUDED.avaliacao,
+    obs_termino = EXCLUDED.obs_termino, tarefa_id = EXCLUDED.tarefa_id,
+    participantes_ids = EXCLUDED.participantes_ids,
+    alterado_em = EXCLUDED.alterado_em
+  WHERE (
+    calendar_entries.tipo, calendar_entries.data_hora,
+    calendar_entries.duracao_minutos, calendar_entries.estado,
+    calendar_entries.tema, calendar_entries.local,
+    calendar_entries.objetivos, calendar_entries.observacoes,
+    calendar_entries.criado_em, calendar_entries.atualizado_em,
+    calendar_entries.turma_id, calendar_entries.turma_nome,
+    calendar_entries.mentor_id, calendar_entries.mentor_nome,
+    calendar_entries.mentor_user_id, calendar_entries.estabelecimento_nome,
+    calendar_entries.estabelecimento_sigla, calendar_entries.projeto_id,
+    calendar_entries.atividade_uuid, calendar_entries.atividade_nome,
+    calendar_entries.disciplina_nome, calendar_entries.is_autonomous,
+    calendar_entries.is_realized, calendar_entries.tipo_atividade,
+    calendar_entries.responsavel_user_id, calendar_entries.musica_id,
+    calendar_entries.avaliacao, calendar_entries.obs_termino,
+    calendar_entries.tarefa_id, calendar_entries.participantes_ids
+  ) IS DISTINCT FROM (
+    EXCLUDED.tipo, EXCLUDED.data_hora, EXCLUDED.duracao_minutos,
+    EXCLUDED.estado, EXCLUDED.tema, EXCLUDED.local, EXCLUDED.objetivos,
+    EXCLUDED.observacoes, EXCLUDED.criado_em, EXCLUDED.atualizado_em,
+    EXCLUDED.turma_id, EXCLUDED.turma_nome, EXCLUDED.mentor_id,
+    EXCLUDED.mentor_nome, EXCLUDED.mentor_user_id,
+    EXCLUDED.estabelecimento_nome, EXCLUDED.estabelecimento_sigla,
+    EXCLUDED.projeto_id, EXCLUDED.atividade_uuid, EXCLUDED.atividade_nome,
+    EXCLUDED.disciplina_nome, EXCLUDED.is_autonomous, EXCLUDED.is_realized,
+    EXCLUDED.tipo_atividade, EXCLUDED.responsavel_user_id,
+    EXCLUDED.musica_id, EXCLUDED.avaliacao, EXCLUDED.obs_termino,
+    EXCLUDED.tarefa_id, EXCLUDED.participantes_ids
+  );
+END;
+$$ LANGUAGE plpgsql;
+
+-- aulas: transition table com as linhas escritas (INSERT e UPDATE em triggers
+-- separados, porque uma transition table só pode ter um evento)
+CREATE OR REPLACE FUNCTION public.calendar_entries_aulas()
+RETURNS TRIGGER AS $$
+BEGIN
+  PERFORM public.calendar_entries_refrescar(ARRAY(SELECT id FROM novas));
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_calendar_aulas_insert ON public.aulas;
+CREATE TRIGGER trg_calendar_aulas_insert
+  AFTER INSERT ON public.aulas
+  REFERENCING NEW TABLE AS novas
+  FOR EACH STATEMENT EXECUTE FUNCTION public.calendar_entries_aulas();
+
+DROP TRIGGER IF EXISTS trg_calendar_aulas_update ON public.aulas;
+CREATE TRIGGER trg_calendar_aulas_update
+  AFTER UPDATE ON public.aulas
+  REFERENCING NEW TABLE AS novas
+  FOR EACH STATEMENT EXECUTE FUNCTION public.calendar_entries_aulas();
+
+-- Tabelas relacionadas: recalcula as aulas que apontam para a linha alterada
+CREATE OR REPLACE FUNCTION public.calendar_entries_relacionadas()
+RETURNS TRIGGER AS $$
+DECLARE
+  linha RECORD;
+BEGIN
+  IF TG_OP = 'DELETE' THEN
+    linha := OLD;
+  ELSE
+    linha := NEW;
+  END IF;
+  IF TG_TABLE_NAME = 'aula_participantes' THEN
+    PERFORM public.calendar_entries_refrescar(ARRAY[linha.aula_id]);
+    IF TG_OP = 'UPDATE' AND OLD.aula_id <> NEW.aula_id THEN
+      PERFORM public.calendar_entries_refrescar(ARRAY[OLD.aula_id]);
+    END IF;
+  ELSIF TG_TABLE_NAME = 'turmas' THEN
+    PERFORM public.calendar_entries_refrescar(ARRAY(
+      SELECT id FROM public.aulas WHERE turma_id = linha.id));
+  ELSIF TG_TABLE_NAME = 'estabelecimentos' THEN
+    PERFORM public.calendar_entries_refrescar(ARRAY(
+      SELECT a.id FROM public.aulas a JOIN public.turmas t ON t.id = a.turma_id
+      WHERE t.estabelecimento_id = linha.id));
+  ELSIF TG_TABLE_NAME = 'mentores' THEN
+    PERFORM public.calendar_entries_refrescar(ARRAY(
+      SELECT id FROM public.aulas WHERE mentor_id = linha.id));
+  ELSIF TG_TABLE_NAME = 'turma_atividades' THEN
+    PERFORM public.calendar_entries_refrescar(ARRAY(
+      SELECT id FROM public.aulas WHERE atividade_uuid = linha.uuid));
+    IF TG_OP = 'UPDATE' AND OLD.uuid IS DISTINCT FROM NEW.uuid THEN
+      PERFORM public.calendar_entries_refrescar(ARRAY(
+        SELECT id FROM public.aulas WHERE atividade_uuid = OLD.uuid));
+    END IF;
+  ELSIF TG_TABLE_NAME = 'turma_disciplinas' THEN
+    PERFORM public.calendar_entries_refrescar(ARRAY(
+      SELECT a.id FROM public.aulas a JOIN public.turma_atividades ta ON ta.uuid = a.atividade_uuid
+      WHERE ta.turma_disciplina_id = linha.id));
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_calendar_aula_participantes ON public.aula_participantes;
+CREATE TRIGGER trg_calendar_aula_participantes
+  AFTER INSERT OR UPDATE OR DELETE ON public.aula_participantes
+  FOR EACH ROW EXECUTE FUNCTION public.calendar_entries_relacionadas();
+
+DROP TRIGGER IF EXISTS trg_calendar_turmas ON public.turmas;
+CREATE TRIGGER trg_calendar_turmas
+  AFTER UPDATE OF nome, estabelecimento_id ON public.turmas
+  FOR EACH ROW WHEN (OLD.nome IS DISTINCT FROM NEW.nome OR OLD.estabelecimento_id IS DISTINCT FROM NEW.estabelecimento_id)
+  EXECUTE FUNCTION public.calendar_entries_relacionadas();
+
+DROP TRIGGER IF EXISTS trg_calendar_estabelecimentos ON public.estabelecimentos;
+CREATE TRIGGER trg_calendar_estabelecimentos
+  AFTER UPDATE OF nome, sigla ON public.estabelecimentos
+  FOR EACH ROW WHEN (OLD.nome IS DISTINCT FROM NEW.nome OR OLD.sigla IS DISTINCT FROM NEW.sigla)
+  EXECUTE FUNCTION public.calendar_entries_relacionadas();
+
+DROP TRIGGER IF EXISTS trg_calendar_mentores ON public.mentores;
+CREATE TRIGGER trg_calendar_mentores
+  AFTER UPDATE OF nome, user_id ON public.mentores
+  FOR EACH ROW WHEN (OLD.nome IS DISTINCT FROM NEW.nome OR OLD.user_id IS DISTINCT FROM NEW.user_id)
+  EXECUTE FUNCTION public.calendar_entries_relacionadas();
+
+DROP TRIGGER IF EXISTS trg_calendar_turma_atividades ON public.turma_atividades;
+CREATE TRIGGER trg_calendar_turma_atividades
+  AFTER UPDATE OF nome, turma_disciplina_id, uuid ON public.turma_atividades
+  FOR EACH ROW WHEN (OLD.nome IS DISTINCT FROM NEW.nome
+                     OR OLD.turma_disciplina_id IS DISTINCT FROM NEW.turma_disciplina_id
+                     OR OLD.uuid IS DISTINCT FROM NEW.uuid)
+  EXECUTE FUNCTION public.calendar_entries_relacionadas();
+
+-- Linhas novas ou apagadas: com a FK da 019 (aulas.atividade_uuid ON DELETE
+-- SET NULL, turma_disciplina_id ON DELETE CASCADE) o DELETE já chega pelo
+-- trigger de aulas; estes não dependem dela. Triggers à parte porque WHEN não
+-- pode usar OLD num INSERT.
+DROP TRIGGER IF EXISTS trg_calendar_turma_atividades_linhas ON public.turma_atividades;
+CREATE TRIGGER trg_calendar_turma_atividades_linhas
+  AFTER INSERT OR DELETE ON public.turma_atividades
+  FOR EACH ROW EXECUTE FUNCTION public.calendar_entries_relacionadas();
+
+DROP TRIGGER IF EXISTS trg_calendar_turma_disciplinas ON public.turma_disciplinas;
+CREATE TRIGGER trg_calendar_turma_disciplinas
+  AFTER UPDATE OF nome ON public.turma_disciplinas
+  FOR EACH ROW WHEN (OLD.nome IS DISTINCT FROM NEW.nome)
+  EXECUTE FUNCTION public.calendar_entries_relacionadas();
+
+DROP TRIGGER IF EXISTS trg_calendar_turma_disciplinas_linhas ON public.turma_disciplinas;
+CREATE TRIGGER trg_calendar_turma_disciplinas_linhas
+  AFTER INSERT OR DELETE ON public.turma_disciplinas
+  FOR EACH ROW EXECUTE FUNCTION public.calendar_entries_relacionadas();
+
+-- Carga inicial
+SELECT public.calendar_entries_refrescar(ARRAY(SELECT id FROM public.aulas));
+ANALYZE public.calendar_entries;
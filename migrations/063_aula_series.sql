@@ -0,0 +1,73 @@
+-- 063: Séries de sessões com regra de recorrência (POST /api/aulas/series)
+-- Uma série guarda a regra (RRULE do RFC 5545, ex: 'FREQ=WEEKLY;COUNT=30') e
+-- as datas excluídas (EXDATE) em vez de N linhas em aulas. As ocorrências são
+-- calculadas para a janela pedida (serie_service.listar_ocorrencias) e só
+-- passam a linha de aulas quando ganham estado — confirmação, término,
+-- registo — através de serie_service.materializar_ocorrencia.
+-- Datas na hora de Lisboa (naive), como aulas.data_hora.
+
+CREATE TABLE IF NOT EXISTS public.aula_series (
+  id                   SERIAL PRIMARY KEY,
+  regra                TEXT NOT NULL,
+  inicio               TIMESTAMP NOT NULL,                -- DTSTART: primeira ocorrência
+  fim                  TIMESTAMP,                         -- última ocorrência; NULL = sem fim
+  excecoes             TIMESTAMP[] NOT NULL DEFAULT '{}', -- EXDATE
+  projeto_id           INTEGER REFERENCES public.projetos(id) ON DELETE CASCADE,
+  turma_id             INTEGER REFERENCES public.turmas(id) ON DELETE CASCADE,
+  mentor_id            INTEGER REFERENCES public.mentores(id) ON DELETE SET NULL,
+  tipo                 VARCHAR(50),
+  estado               VARCHAR(50) NOT NULL,              -- estado inicial das ocorrências
+  duracao_minutos      INTEGER NOT NULL DEFAULT 90,
+  local                VARCHAR(255),
+  tema                 VARCHAR(255),
+  observacoes          TEXT,
+  sumario              TEXT,
+  codigo_sessao        TEXT,
+  atividade_uuid       UUID,
+  is_autonomous        BOOLEAN NOT NULL DEFAULT FALSE,
+  tipo_atividade       TEXT,
+  responsavel_user_id  TEXT,
+  participantes_ids    TEXT[] NOT NULL DEFAULT '{}',
+  criador_user_id      TEXT,
+  criado_em            TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  atualizado_em        TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+COMMENT ON TABLE public.aula_series IS 'Séries de sessões recorrentes, expandidas por janela (migração 063)';
+
+-- Séries que tocam uma janela [desde, ate): inicio < ate AND (fim IS NULL OR fim >= desde)
+CREATE INDEX IF NOT EXISTS idx_aula_series_inicio_fim ON public.aula_series(inicio, fim);
+
+-- Séries de um mentor (conflitos de horário em cada escrita de aulas)
+CREATE INDEX IF NOT EXISTS idx_aula_series_mentor ON public.aula_series(mentor_id) WHERE mentor_id IS NOT NULL;
+
+-- Ocorrências materializadas: a aula lembra-se da série e da data original
+-- (RECURRENCE-ID), mesmo que depois seja mudada de hora.
+ALTER TABLE public.aulas ADD COLUMN IF NOT EXISTS serie_id INTEGER REFERENCES public.aula_series(id) ON DELETE SET NULL;
+ALTER TABLE public.aulas ADD COLUMN IF NOT EXISTS serie_ocorrencia TIMESTAMP;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_aulas_serie_ocorrencia
+  ON public.aulas(serie_id, serie_ocorrencia) WHERE serie_id IS NOT NULL;
+
+-- Apagar a aula de uma ocorrência materializada (apagar_aula, ou DELETE direto)
+-- acrescenta a EXDATE: sem ela a ocorrência voltava a aparecer na série.
+-- Statement-level com transition table, como aulas_registar_apagadas (061).
+CREATE OR REPLACE FUNCTION public.aula_series_excluir_apagadas()
+RETURNS TRIGGER AS $$
+BEGIN
+  UPDATE public.aula_series s
+  SET excecoes = s.excecoes || ARRAY(
+        SELECT ap.serie_ocorrencia FROM apagadas ap
+        WHERE ap.serie_id = s.id AND NOT (ap.serie_ocorrencia = ANY(s.excecoes))
+      ),
+      atualizado_em = CURRENT_TIMESTAMP
+  WHERE s.id IN (SELECT serie_id FROM apagadas WHERE serie_id IS NOT NULL);
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_aulas_series_apagadas ON public.aulas;
+CREATE TRIGGER trg_aulas_series_apagadas
+  AFTER DELETE ON public.aulas
+  REFERENCING OLD TABLE AS apagadas
+  FOR EACH STATEMENT EXECUTE FUNCTION public.aula_series_excluir_apagadas();
@@ -0,0 +1,28 @@
+-- 065 (OPCIONAL): impedir que um mentor fique com duas sessões sobrepostas
+-- Sem esta migração o conflito é detetado depois da escrita: criar_aula e
+-- atualizar_aula correm aula_service.conflitos_mentor (índice da 064) e avisam
+-- a coordenação por excecoes_service.notificar_conflito_horario. Com ela a
+-- própria base recusa o INSERT/UPDATE (ExclusionViolation → HTTP 409).
+--
+-- Requer a extensão btree_gist (disponível no Supabase; não existe em todas as
+-- instalações locais) e a migração 064. Sessões canceladas ou recusadas não
+-- ocupam horário (aula_service.ESTADOS_SEM_HORARIO).
+--
+-- A restrição falha se já houver sobreposições. Ver quais antes de aplicar:
+--   SELECT a.mentor_id, a.id, b.id, a.periodo, b.periodo
+--   FROM aulas a JOIN aulas b
+--     ON b.mentor_id = a.mentor_id AND b.id > a.id AND b.periodo && a.periodo
+--   WHERE a.estado NOT IN ('cancelada', 'recusada')
+--     AND b.estado NOT IN ('cancelada', 'recusada');
+--
+-- ADD CONSTRAINT ... EXCLUDE constrói o índice (mentor_id, periodo) com lock
+-- exclusivo sobre aulas. Uma sessão que colida em criar_aulas_recorrentes falha
+-- a série toda; tal como em materializar_ocorrencia, a API responde 409
+-- (ConflitoHorario).
+
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+ALTER TABLE public.aulas DROP CONSTRAINT IF EXISTS aulas_mentor_sem_sobreposicao;
+ALTER TABLE public.aulas ADD CONSTRAINT aulas_mentor_sem_sobreposicao
+  EXCLUDE USING gist (mentor_id WITH =, periodo WITH &&)
+  WHERE (mentor_id IS NOT NULL AND estado NOT IN ('cancelada', 'recusada'));
@@ -5,27 +5,40 @@ import os
 import json
 import urllib.request
 
+from config import externos
+from database import fila
+
 # URL do Webhook (Em produção, deve vir de variáveis de ambiente)
 # Exemplo: https://hooks.slack.com/services/T000...
-WEBHOOK_URL = os.getenv("SLACK_WEBHOOK_URL", "")
+WEBHOOK_URL = externos.base_url("slack")
 
 # Alias para compatibilidade com testes
 SLACK_WEBHOOK_URL = WEBHOOK_URL
 
 def enviar_payload(payload, webhook_url=None):
     """
-    Envia um payload JSON para o Slack.
-    Retorna True se sucesso, False caso contrário.
+    Enfileira o envio de um payload JSON para o Slack (database/fila.py); o
+    pedido HTTP não espera pelo webhook e as falhas são repetidas pelo worker.
+    Retorna True se aceite, False se o Slack não estiver configurado.
     """
     url_to_use = webhook_url if webhook_url else WEBHOOK_URL
     
     if not url_to_use:
         # Silencioso se não estiver configurado para não atrapalhar testes locais
         return False
-        
+
+    # O URL por omissão não fica guardado na fila: o worker lê-o do ambiente
+    fila.enfileirar("slack.enviar", {"payload": payload, "webhook_url": webhook_url})
+    return True
+
+def enviar_payload_agora(payload, webhook_url):
+    """
+    Envia um payload JSON para o Slack (síncrono).
+    Retorna True se sucesso, False caso contrário.
+    """
     try:
         req = urllib.request.Request(
-            url_to_use,
+            webhook_url,
             data=json.dumps(payload).encode('utf-8'),
             headers={'Content-Type': 'application/json'}
         )
@@ -46,6 +59,14 @@ def enviar_payload(payload, webhook_url=None):
         print(f"⚠️  Falha ao notificar Slack: {e}")
         return False
 
+@fila.tarefa("slack.enviar")
+def _tarefa_enviar(payload, webhook_url=None):
+    url_to_use = webhook_url if webhook_url else WEBHOOK_URL
+    if not url_to_use:
+        return
+    if not enviar_payload_agora(payload, url_to_use):
+        raise RuntimeError("webhook do Slack não respondeu 200")
+
 def testar_slack_notification():
     """
     Envia uma mensagem de teste simples para verificar se o Slack está funcionando.
@@ -53,7 +74,10 @@ def testar_slack_notification():
     payload = {
         "text": "🧪 Teste de notificação - Sistema RAP NOVA ESCOLA funcionando!"
     }
-    return enviar_payload(payload)
+    # Síncrono: o objetivo é saber já se o webhook responde
+    if not WEBHOOK_URL:
+        return False
+    return enviar_payload_agora(payload, WEBHOOK_URL)
 
 def notificar_aula_atribuida(aula_id, mentor_nome, turma_nome, data_hora, tipo_aula, estabelecimento_nome, tema=None):
     """
@@ -0,0 +1,10 @@
+"""
+perf — ferramentas de performance (carga, dados sintéticos, benchmarks).
+
+Nada neste pacote é importado pela app em produção. Todas as ferramentas
+trabalham contra uma base Postgres LOCAL indicada em PERF_DATABASE_URL
+(ex: postgresql://postgres@localhost:5432/rap_perf) — nunca contra o Supabase.
+"""
+import os
+
+PERF_DATABASE_URL = os.getenv("PERF_DATABASE_URL")
@@ -0,0 +1,264 @@
+"""
+fakes.py
+Stand-ins locais para todas as dependências externas da app: OSRM, Nominatim,
+Supabase Storage, Gemini, Google Drive, Web Push e Slack.
+
+Cada serviço vive no seu prefixo (/osrm, /nominatim, /supabase, ...) e tem três
+botões — latência, taxa de erro e tamanho do payload — para medir como a app
+degrada quando uma dependência fica lenta ou instável. A app usa-os com
+EXTERNAL_BACKEND=fake e FAKE_EXTERNOS_URL (ver config/externos.py).
+
+Os botões começam com valores típicos de produção, podem ser definidos por
+env (FAKE_OSRM_LATENCIA_MS, FAKE_OSRM_TAXA_ERRO, FAKE_OSRM_PAYLOAD_KB, ...) e
+alterados em tempo real:
+
+    curl -X PUT localhost:8790/_config/osrm -d '{"latencia_ms": 2000}'
+
+Uso:
+    python -m perf.fakes --porta 8790
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import math
+import os
+import random
+import struct
+import subprocess
+import sys
+import time
+import zlib
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, fields
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from fastapi import FastAPI, HTTPException, Request, Response
+
+from config.externos import SERVICOS
+
+
+@dataclass
+class Perfil:
+    """Comportamento de um stand-in."""
+    latencia_ms: float = 50.0
+    jitter: float = 0.2        # variação relativa da latência (±)
+    taxa_erro: float = 0.0     # fração de pedidos que devolvem 503
+    payload_kb: float = 1.0    # tamanho aproximado do corpo da resposta
+
+
+# Valores por omissão próximos do observado em produção
+PERFIS_PADRAO: Dict[str, Perfil] = {
+    "osrm": Perfil(latencia_ms=120),
+    "nominatim": Perfil(latencia_ms=350, payload_kb=2),
+    "supabase": Perfil(latencia_ms=80, payload_kb=60),
+    "gemini": Perfil(latencia_ms=1800, jitter=0.4, payload_kb=2),
+    "drive": Perfil(latencia_ms=250, payload_kb=20),
+    "push": Perfil(latencia_ms=150, payload_kb=0),
+    "slack": Perfil(latencia_ms=200, payload_kb=0),
+}
+
+
+def perfis_do_ambiente(base: Dict[str, Perfil] = PERFIS_PADRAO) -> Dict[str, Perfil]:
+    """Aplica FAKE_<SERVICO>_<BOTAO> do ambiente sobre os perfis por omissão."""
+    perfis = {}
+    for servico in SERVICOS:
+        valores = asdict(base.get(servico, Perfil()))
+        for f in fields(Perfil):
+            env = os.getenv(f"FAKE_{servico.upper()}_{f.name.upper()}")
+            if env is not None:
+                valores[f.name] = float(env)
+        perfis[servico] = Perfil(**valores)
+    return perfis
+
+
+def texto_com_tamanho(kb: float, semente: str = "") -> str:
+    """Texto legível com ~kb KiB (para respostas de texto de tamanho controlado)."""
+    frase = f"{semente} Lorem ipsum rap nova escola sessão música turma. ".lstrip()
+    n = max(1, int(kb * 1024 / len(frase.encode("utf-8"))))
+    return (frase * n)[: max(1, int(kb * 1024))]
+
+
+def png_com_tamanho(kb: float) -> bytes:
+    """PNG RGB válido com ruído, de ~kb KiB (o ruído não comprime)."""
+    lado = max(1, int(math.sqrt(max(kb, 0.1) * 1024 / 3)))
+    rng = random.Random(lado)
+    linhas = b"".join(b"\x00" + rng.randbytes(lado * 3) for _ in range(lado))
+
+    def _chunk(tipo: bytes, dados: bytes) -> bytes:
+        return struct.pack(">I", len(dados)) + tipo + dados + struct.pack(">I", zlib.crc32(tipo + dados) & 0xFFFFFFFF)
+
+    return (b"\x89PNG\r\n\x1a\n"
+            + _chunk(b"IHDR", struct.pack(">IIBBBBB", lado, lado, 8, 2, 0, 0, 0))
+            + _chunk(b"IDAT", zlib.compress(linhas, 1))
+            + _chunk(b"IEND", b""))
+
+
+def _haversine_km(a: Tuple[float, float], b: Tuple[float, float]) -> float:
+    lat1, lng1, lat2, lng2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * 6371.0 * math.asin(math.sqrt(h))
+
+
+def criar_app(perfis: Optional[Dict[str, Perfil]] = None, seed: int = 1) -> FastAPI:
+    """App FastAPI com os stand-ins. `perfis` permite fixar os botões (ex: testes)."""
+    app = FastAPI(title="Stand-ins externos (perf)")
+    app.state.perfis = perfis or perfis_do_ambiente()
+    app.state.contagem = {s: 0 for s in SERVICOS}
+    rng = random.Random(seed)
+
+    async def _simular(servico: str) -> Perfil:
+        perfil: Perfil = app.state.perfis[servico]
+        app.state.contagem[servico] += 1
+        atraso = perfil.latencia_ms * (1 + rng.uniform(-perfil.jitter, perfil.jitter))
+        if atraso > 0:
+            await asyncio.sleep(atraso / 1000.0)
+        if perfil.taxa_erro and rng.random() < perfil.taxa_erro:
+            raise HTTPException(status_code=503, detail=f"{servico}: erro simulado")
+        return perfil
+
+    # ── Controlo ────────────────────────────────────────────────────────────
+    @app.get("/")
+    async def raiz():
+        return {"servicos": list(SERVICOS)}
+
+    @app.get("/_config")
+    async def obter_config():
+        return {"perfis": {s: asdict(p) for s, p in app.state.perfis.items()}, "pedidos": app.state.contagem}
+
+    @app.put("/_config/{servico}")
+    async def alterar_config(servico: str, request: Request):
+        if servico not in app.state.perfis:
+            raise HTTPException(status_code=404, detail="Serviço desconhecido")
+        valores = asdict(app.state.perfis[servico])
+        valores.update({k: float(v) for k, v in (await request.json()).items() if k in valores})
+        app.state.perfis[servico] = Perfil(**valores)
+        return asdict(app.state.perfis[servico])
+
+    # ── OSRM ────────────────────────────────────────────────────────────────
+    @app.get("/osrm/route/v1/driving/{coords}")
+    async def osrm_rota(coords: str):
+        perfil = await _simular("osrm")
+        pontos = [tuple(float(v) for v in par.split(",")[::-1]) for par in coords.split(";") if "," in par]
+        km = sum(_haversine_km(a, b) for a, b in zip(pontos, pontos[1:])) * 1.3
+        return {
+            "code": "Ok",
+            "routes": [{"distance": round(km * 1000, 1), "duration": round(km * 60, 1),
+                        "legs": [], "weight_name": "routability"}],
+            "waypoints": [{"location": [p[1], p[0]], "name": texto_com_tamanho(perfil.payload_kb / max(len(pontos), 1))}
+                          for p in pontos],
+        }
+
+    # ── Nominatim ───────────────────────────────────────────────────────────
+    @app.get("/nominatim/search")
+    async def nominatim_pesquisa(q: str = "", limit: int = 5):
+        perfil = await _simular("nominatim")
+        n = max(1, min(limit, 10))
+        return [{
+            "place_id": i + 1, "lat": f"{38.72 + i * 0.01:.6f}", "lon": f"{-9.14 + i * 0.01:.6f}",
+            "display_name": f"{q}, {texto_com_tamanho(perfil.payload_kb / n, 'Lisboa')}",
+            "type": "residential", "importance": 0.5,
+        } for i in range(n)]
+
+    # ── Supabase Storage ────────────────────────────────────────────────────
+    @app.get("/supabase/storage/v1/object/public/{bucket}/{caminho:path}")
+    @app.get("/supabase/storage/v1/object/sign/{bucket}/{caminho:path}")
+    async def storage_obter(bucket: str, caminho: str):
+        perfil = await _simular("supabase")
+        if caminho.lower().endswith((".png", ".jpg", ".jpeg")):
+            return Response(png_com_tamanho(perfil.payload_kb), media_type="image/png")
+        return Response(texto_com_tamanho(perfil.payload_kb).encode(), media_type="application/octet-stream")
+
+    @app.post("/supabase/storage/v1/object/sign/{bucket}/{caminho:path}")
+    async def storage_assinar(bucket: str, caminho: str):
+        await _simular("supabase")
+        return {"signedURL": f"/object/sign/{bucket}/{caminho}?token=fake"}
+
+    @app.post("/supabase/storage/v1/object/{bucket}/{caminho:path}")
+    @app.put("/supabase/storage/v1/object/{bucket}/{caminho:path}")
+    async def storage_carregar(bucket: str, caminho: str):
+        await _simular("supabase")
+        return {"Key": f"{bucket}/{caminho}"}
+
+    # ── Gemini ──────────────────────────────────────────────────────────────
+    @app.post("/gemini/{versao}/models/{modelo_acao}")
+    async def gemini_gerar(versao: str, modelo_acao: str):
+        perfil = await _simular("gemini")
+        texto = texto_com_tamanho(perfil.payload_kb, "Resposta simulada.")
+        return {
+            "candidates": [{"content": {"role": "model", "parts": [{"text": texto}]}, "finishReason": "STOP"}],
+            "usageMetadata": {"promptTokenCount": 100, "candidatesTokenCount": len(texto) // 4},
+            "modelVersion": modelo_acao.split(":")[0],
+        }
+
+    # ── Google Drive ────────────────────────────────────────────────────────
+    @app.get("/drive/files")
+    async def drive_listar(q: str = ""):
+        await _simular("drive")
+        return {"files": [{"id": f"doc-{i}", "name": f"Documento {i}.txt", "mimeType": "text/plain"}
+                          for i in range(5)]}
+
+    @app.get("/drive/files/{file_id}")
+    @app.get("/drive/files/{file_id}/export")
+    async def drive_descarregar(file_id: str):
+        perfil = await _simular("drive")
+        return Response(texto_com_tamanho(perfil.payload_kb, file_id).encode(), media_type="text/plain")
+
+    # ── Web Push ────────────────────────────────────────────────────────────
+    @app.post("/push/{endpoint:path}")
+    async def push_enviar(endpoint: str):
+        await _simular("push")
+        return Response(status_code=201)
+
+    # ── Slack ───────────────────────────────────────────────────────────────
+    @app.post("/slack")
+    @app.post("/slack/{resto:path}")
+    async def slack_webhook(resto: str = ""):
+        await _simular("slack")
+        return Response("ok", media_type="text/plain")
+
+    return app
+
+
+@contextmanager
+def iniciar_fakes(porta: int = 8790, timeout_s: float = 15.0) -> Iterator[str]:
+    """Arranca os stand-ins num subprocesso (uvicorn) e devolve o URL base quando estiverem prontos."""
+    import httpx
+
+    cmd = [sys.executable, "-m", "perf.fakes", "--porta", str(porta)]
+    proc = subprocess.Popen(cmd, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    base_url = f"http://127.0.0.1:{porta}"
+    try:
+        limite = time.monotonic() + timeout_s
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f"Stand-ins terminaram durante o arranque (código {proc.returncode})")
+            try:
+                if httpx.get(base_url + "/", timeout=1.0).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > limite:
+                raise RuntimeError("Stand-ins não ficaram prontos a tempo")
+            time.sleep(0.2)
+        yield base_url
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Stand-ins locais das dependências externas.")
+    parser.add_argument("--porta", type=int, default=8790)
+    args = parser.parse_args(argv)
+    uvicorn.run(criar_app(), host="127.0.0.1", port=args.porta, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
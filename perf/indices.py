@@ -0,0 +1,85 @@
+"""
+indices.py
+Corre o index advisor contra a base de perf, usando como fingerprints o SQL
+emitido pelas consultas críticas (perf.planos) em vez de pg_stat_statements.
+
+Uso:
+    python -m perf.indices                 # lista as propostas
+    python -m perf.indices --migracao      # escreve migrations/NNN_indices_sugeridos.sql
+    python -m perf.indices --migracao --indice idx_aulas_data_hora
+"""
+from __future__ import annotations
+
+import argparse
+import importlib
+import sys
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import psycopg2
+from tabulate import tabulate
+
+from perf import PERF_DATABASE_URL
+from perf.planos import CONSULTAS_CRITICAS, capturar_sql
+from services.index_advisor_service import (
+    MIGRATIONS_DIR, Proposta, analisar_consultas, conteudo_migracao, proximo_numero_migracao,
+)
+
+
+def recolher_sql(dsn: str) -> List[Tuple[str, int]]:
+    """SQL emitido pelas consultas críticas, como pares (sql, chamadas)."""
+    conn = psycopg2.connect(dsn)
+    consultas: List[Tuple[str, int]] = []
+    try:
+        cur = conn.cursor()
+        for critica in CONSULTAS_CRITICAS:
+            modulo = importlib.import_module(critica.modulo)
+            args, kwargs = critica.argumentos(cur)
+            with capturar_sql(dsn, modulo) as capturadas:
+                getattr(modulo, critica.funcao)(*args, **kwargs)
+            consultas.extend((sql, 1) for sql in capturadas)
+        cur.close()
+    finally:
+        conn.close()
+    return consultas
+
+
+def gerar_migracao(propostas: Sequence[Proposta], diretorio: Path = MIGRATIONS_DIR) -> Path:
+    """Escreve migrations/NNN_indices_sugeridos.sql com as propostas indicadas, para commit."""
+    if not propostas:
+        raise ValueError("Nenhuma proposta de índice para gerar.")
+    numero = proximo_numero_migracao(diretorio)
+    caminho = diretorio / f"{numero:03d}_indices_sugeridos.sql"
+    caminho.write_text(conteudo_migracao(propostas, numero), encoding="utf-8")
+    return caminho
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Index advisor sobre a base de perf.")
+    parser.add_argument("--dsn", default=PERF_DATABASE_URL, help="Base Postgres local (PERF_DATABASE_URL)")
+    parser.add_argument("--migracao", action="store_true", help="Gera a migração com as propostas")
+    parser.add_argument("--indice", action="append", default=[], help="Incluir só este índice na migração (repetível)")
+    args = parser.parse_args(argv)
+    if not args.dsn:
+        parser.error("Indica --dsn ou define PERF_DATABASE_URL")
+
+    consultas = recolher_sql(args.dsn)
+    conn = psycopg2.connect(args.dsn)
+    try:
+        propostas = analisar_consultas(conn.cursor(), consultas)
+    finally:
+        conn.close()
+
+    print(tabulate(
+        [[p.nome, p.custo_atual, p.custo_estimado, p.chamadas, round(p.beneficio)] for p in propostas],
+        headers=["índice", "custo atual", "custo estimado", "chamadas", "benefício"],
+    ))
+    if args.indice:
+        propostas = [p for p in propostas if p.nome in args.indice]
+    if args.migracao and propostas:
+        print("Migração gerada:", gerar_migracao(propostas))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""
+listagem_aulas.py
+Benchmark de GET /api/aulas (aula_service.listar_todas_aulas) para um mentor
+com project scoping e a setting ocultar_sessoes_direcao ligada — o caso em que
+os filtros de projeto e de direção se aplicam os dois.
+
+Para cada ronda chama a função de serviço real contra a base de perf e mede o
+tempo total (SQL + formatação). No fim corre EXPLAIN ANALYZE da query
+principal e reporta quantas linhas de aulas (ou de calendar_entries, a
+projeção da migração 062) foram lidas para as devolvidas.
+Com --semana mede a vista semanal do Horários (from/to numa semana a meio do
+histórico), cujo tempo não deve crescer com o número de aulas na base.
+Pensado para o dataset de 50k aulas:
+
+    python -m perf.seed --escala 5 --recriar
+    python -m perf.listagem_aulas
+    python -m perf.listagem_aulas --semana
+"""
+from __future__ import annotations
+
+import argparse
+import importlib
+import json
+import statistics
+import sys
+import time
+from contextlib import ExitStack
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from unittest import mock
+
+import psycopg2
+
+from perf import PERF_DATABASE_URL
+from perf.planos import capturar_sql, percorrer
+
+
+def mentor_com_scoping(cur) -> Dict[str, object]:
+    """Primeiro mentor (por email) com project scoping e projetos atribuídos."""
+    cur.execute("""
+        SELECT p.id::text, array_agg(upa.projeto_id ORDER BY upa.projeto_id)
+        FROM profiles p
+        JOIN mentores m ON m.user_id = p.id
+        JOIN user_project_access upa ON upa.user_id = p.id
+        WHERE p.project_scoped AND NOT p.is_root AND NOT p.is_direcao
+        GROUP BY p.id, p.email
+        ORDER BY p.email LIMIT 1
+    """)
+    linha = cur.fetchone()
+    if not linha:
+        raise RuntimeError("Nenhum mentor com project scoping na base de perf (correr perf.seed)")
+    return {"user_id": linha[0], "projetos": linha[1]}
+
+
+def semana_central(cur) -> Tuple[datetime, datetime]:
+    """[segunda, segunda seguinte) da semana da aula mediana por data_hora."""
+    cur.execute("""
+        SELECT date_trunc('week', percentile_disc(0.5) WITHIN GROUP (ORDER BY data_hora))
+        FROM aulas
+    """)
+    desde = cur.fetchone()[0]
+    return desde, desde + timedelta(days=7)
+
+
+def _direcao(cur) -> frozenset:
+    cur.execute("SELECT id::text FROM profiles WHERE is_direcao = TRUE OR is_root = TRUE")
+    return frozenset(r[0] for r in cur.fetchall())
+
+
+def medir(dsn: str, rondas: int = 10, limite: int = 2000, semana: bool = False) -> Dict[str, object]:
+    aula_service = importlib.import_module("services.aula_service")
+    settings_service = importlib.import_module("services.settings_service")
+    conn = psycopg2.connect(dsn)
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT count(*) FROM aulas")
+        total_aulas = cur.fetchone()[0]
+        mentor = mentor_com_scoping(cur)
+        direcao = _direcao(cur)
+        janela = dict(zip(("desde", "ate"), semana_central(cur))) if semana else {}
+
+        tempos: List[float] = []
+        with ExitStack() as stack:
+            stack.enter_context(mock.patch.object(settings_service, "obter_direcao_user_ids", lambda: direcao))
+            capturadas = stack.enter_context(capturar_sql(dsn, aula_service))
+            for _ in range(rondas + 1):
+                capturadas.clear()
+                t0 = time.perf_counter()
+                aulas = aula_service.listar_todas_aulas(
+                    limite=limite, allowed_project_ids=mentor["projetos"], hide_direcao_sessions=True, **janela,
+                )
+                tempos.append((time.perf_counter() - t0) * 1000)
+            sql = capturadas[0]
+        tempos = tempos[1:]  # a primeira ronda aquece caches e o pool
+
+        cur.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + sql)
+        plano = cur.fetchone()[0]
+        if isinstance(plano, str):
+            plano = json.loads(plano)
+        lidas = sum(
+            no.get("Actual Rows", 0) + no.get("Rows Removed by Filter", 0)
+            for no in percorrer(plano[0]["Plan"])
+            if no.get("Relation Name") in ("aulas", "calendar_entries")
+        )
+        cur.close()
+    finally:
+        conn.close()
+
+    return {
+        "aulas_na_base": total_aulas,
+        "projetos": mentor["projetos"],
+        "janela": f"{janela['desde']:%Y-%m-%d} → {janela['ate']:%Y-%m-%d}" if janela else "-",
+        "devolvidas": len(aulas),
+        "lidas_aulas": int(lidas),
+        "sql_ms": round(plano[0]["Execution Time"], 2),
+        "p50_ms": round(statistics.median(tempos), 2),
+        "p95_ms": round(sorted(tempos)[max(0, int(len(tempos) * 0.95) - 1)], 2),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de listar_todas_aulas com project scoping.")
+    parser.add_argument("--dsn", default=PERF_DATABASE_URL, help="Base Postgres local (PERF_DATABASE_URL)")
+    parser.add_argument("--rondas", type=int, default=10)
+    parser.add_argument("--limite", type=int, default=2000)
+    parser.add_argument("--semana", action="store_true", help="Só a semana a meio do histórico (from/to)")
+    args = parser.parse_args(argv)
+    if not args.dsn:
+        parser.error("Indica --dsn ou define PERF_DATABASE_URL")
+
+    resultado = medir(args.dsn, rondas=args.rondas, limite=args.limite, semana=args.semana)
+    for chave, valor in resultado.items():
+        print(f"{chave:<14} {valor}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
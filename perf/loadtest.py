@@ -0,0 +1,335 @@
+"""
+loadtest.py
+Harness de carga: arranca a API contra a base local de perf, reproduz uma
+mistura ponderada dos endpoints reais (Horários, polling de notificações,
+board de Produção, exportações) e falha se algum endpoint ultrapassar o
+seu orçamento de p95.
+
+Uso:
+    export PERF_DATABASE_URL=postgresql://postgres@localhost:5432/rap_perf
+    python -m perf.loadtest --preparar          # recria a base + schema + dados
+    python -m perf.loadtest --duracao 60 --concorrencia 16
+    python -m perf.loadtest --fakes --degradar osrm --latencias 0,500,2000
+"""
+from __future__ import annotations
+
+import argparse
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import httpx
+import jwt
+import psycopg2
+from tabulate import tabulate
+
+from perf import PERF_DATABASE_URL
+from perf.fakes import iniciar_fakes
+from perf.schema import ROOT_DIR
+
+# Segredo usado para assinar os tokens sintéticos — o servidor lançado pelo
+# harness recebe o mesmo valor em SUPABASE_JWT_SECRET.
+PERF_JWT_SECRET = "perf-jwt-secret"
+
+# Taxa máxima de respostas não-2xx tolerada por endpoint
+MAX_TAXA_ERRO = 0.01
+
+
+@dataclass
+class Endpoint:
+    """Um endpoint da mistura: peso relativo, orçamento de p95 e perfil de quem o chama."""
+    nome: str
+    path: str
+    peso: int
+    p95_ms: float
+    perfil: str
+    params: Dict[str, str] = field(default_factory=dict)
+
+
+# Mistura baseada no uso real: a maior parte do tráfego é o calendário e o
+# polling de notificações; exportações são raras mas pesadas.
+MIX_PADRAO: List[Endpoint] = [
+    Endpoint("horarios_mentor", "/api/aulas", 30, 1500, "mentor"),
+    Endpoint("horarios_coordenacao", "/api/aulas", 10, 1500, "coordenador"),
+    Endpoint("notificacoes", "/api/notifications", 30, 150, "mentor"),
+    Endpoint("producao", "/api/musicas", 12, 800, "produtor"),
+    Endpoint("registaveis", "/api/aulas/registaveis", 8, 300, "mentor"),
+    Endpoint("equipamento", "/api/equipamento/itens", 4, 800, "coordenador"),
+    Endpoint("export", "/api/aulas/export", 6, 3000, "coordenador",
+             {"data_inicio": "2026-01-01", "data_fim": "2026-03-31"}),
+]
+
+
+# Endpoints que dependem de serviços externos — só entram na mistura com os
+# stand-ins (--fakes), para a carga nunca sair da máquina.
+MIX_EXTERNOS: List[Endpoint] = [
+    Endpoint("distancia", "/api/distance", 5, 600, "mentor",
+             {"lat1": "38.72", "lng1": "-9.14", "lat2": "38.75", "lng2": "-9.20"}),
+    Endpoint("geocode", "/api/geocode/search", 3, 900, "coordenador", {"q": "Rua Augusta"}),
+]
+
+
+@dataclass
+class Resultado:
+    """Latências (ms) e contagem de erros recolhidas para um endpoint."""
+    latencias: List[float] = field(default_factory=list)
+    erros: int = 0
+
+    @property
+    def pedidos(self) -> int:
+        return len(self.latencias)
+
+
+def percentil(valores: List[float], p: float) -> float:
+    """Percentil por nearest-rank (p entre 0 e 100). 0.0 se não houver valores."""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    k = max(0, min(len(ordenados) - 1, math.ceil(p / 100.0 * len(ordenados)) - 1))
+    return ordenados[k]
+
+
+def gerar_token(user_id: str, email: str, segredo: str = PERF_JWT_SECRET, validade_s: int = 3600) -> str:
+    """JWT HS256 com a mesma forma dos tokens do Supabase (aud=authenticated)."""
+    agora = int(time.time())
+    payload = {
+        "sub": user_id, "email": email, "aud": "authenticated", "role": "authenticated",
+        "iat": agora, "exp": agora + validade_s,
+    }
+    return jwt.encode(payload, segredo, algorithm="HS256")
+
+
+def carregar_utilizadores(dsn: str) -> Dict[str, List[Tuple[str, str]]]:
+    """Devolve {role: [(user_id, email), ...]} a partir dos profiles da base de perf."""
+    conn = psycopg2.connect(dsn)
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT id::text, email, role FROM profiles ORDER BY email")
+        por_role: Dict[str, List[Tuple[str, str]]] = {}
+        for uid, email, role in cur.fetchall():
+            por_role.setdefault(role, []).append((uid, email))
+        cur.close()
+        return por_role
+    finally:
+        conn.close()
+
+
+def ambiente_servidor(dsn: str, fakes_url: Optional[str] = None) -> Dict[str, str]:
+    """
+    Variáveis de ambiente para a API apontar à base local (sem SSL, sem Supabase real).
+    Com `fakes_url`, todas as dependências externas vão para os stand-ins (perf.fakes).
+    """
+    params = psycopg2.extensions.parse_dsn(dsn)
+    env = dict(os.environ)
+    env.update({
+        "DB_HOST": params.get("host", "localhost"),
+        "DB_PORT": str(params.get("port", "5432")),
+        "DB_NAME": params.get("dbname", "rap_perf"),
+        "DB_USER": params.get("user", "postgres"),
+        "DB_PASSWORD": params.get("password", ""),
+        "DB_SSLMODE": params.get("sslmode", "disable"),
+        "SUPABASE_URL": env.get("SUPABASE_URL", "http://127.0.0.1:54321"),
+        "SUPABASE_SERVICE_KEY": env.get("SUPABASE_SERVICE_KEY", "perf-service-key"),
+        "SUPABASE_JWT_SECRET": PERF_JWT_SECRET,
+    })
+    env.pop("DATABASE_URL", None)
+    if fakes_url:
+        env.update({"EXTERNAL_BACKEND": "fake", "FAKE_EXTERNOS_URL": fakes_url})
+    return env
+
+
+@contextmanager
+def iniciar_servidor(
+    dsn: str, porta: int = 8765, workers: int = 1, timeout_s: float = 30.0, fakes_url: Optional[str] = None,
+) -> Iterator[str]:
+    """Arranca `uvicorn main:app` num subprocesso e devolve o URL base quando estiver pronto."""
+    cmd = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+           "--port", str(porta), "--workers", str(workers), "--log-level", "warning"]
+    proc = subprocess.Popen(cmd, cwd=str(ROOT_DIR), env=ambiente_servidor(dsn, fakes_url))
+    base_url = f"http://127.0.0.1:{porta}"
+    try:
+        limite = time.monotonic() + timeout_s
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f"Servidor terminou durante o arranque (código {proc.returncode})")
+            try:
+                if httpx.get(base_url + "/", timeout=1.0).status_code < 500:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > limite:
+                raise RuntimeError("Servidor não ficou pronto a tempo")
+            time.sleep(0.2)
+        yield base_url
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def executar_carga(
+    base_url: str,
+    utilizadores: Dict[str, List[Tuple[str, str]]],
+    mix: List[Endpoint] = MIX_PADRAO,
+    duracao_s: float = 30.0,
+    concorrencia: int = 8,
+    seed: int = 1,
+) -> Dict[str, Resultado]:
+    """
+    Corre `concorrencia` clientes em paralelo durante `duracao_s`, cada um a
+    escolher endpoints da mistura segundo o peso. Devolve resultados por endpoint.
+    """
+    tokens: Dict[str, List[str]] = {
+        role: [gerar_token(uid, email) for uid, email in lista]
+        for role, lista in utilizadores.items()
+    }
+    resultados = {ep.nome: Resultado() for ep in mix}
+    lock = threading.Lock()
+    fim = time.monotonic() + duracao_s
+    pesos = [ep.peso for ep in mix]
+
+    def _cliente(indice: int):
+        rng = random.Random(seed * 1000 + indice)
+        with httpx.Client(base_url=base_url, timeout=30.0) as client:
+            while time.monotonic() < fim:
+                ep = rng.choices(mix, weights=pesos, k=1)[0]
+                candidatos = tokens.get(ep.perfil) or tokens.get("mentor") or []
+                headers = {"Authorization": f"Bearer {rng.choice(candidatos)}"} if candidatos else {}
+                t0 = time.perf_counter()
+                try:
+                    resp = client.get(ep.path, params=ep.params, headers=headers)
+                    erro = resp.status_code >= 400
+                except httpx.HTTPError:
+                    erro = True
+                ms = (time.perf_counter() - t0) * 1000.0
+                with lock:
+                    resultados[ep.nome].latencias.append(ms)
+                    if erro:
+                        resultados[ep.nome].erros += 1
+
+    threads = [threading.Thread(target=_cliente, args=(i,), daemon=True) for i in range(concorrencia)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return resultados
+
+
+def avaliar(resultados: Dict[str, Resultado], mix: List[Endpoint] = MIX_PADRAO) -> List[str]:
+    """Lista de violações de orçamento (p95 acima do limite ou taxa de erro > MAX_TAXA_ERRO)."""
+    violacoes = []
+    for ep in mix:
+        r = resultados.get(ep.nome)
+        if not r or not r.pedidos:
+            continue
+        p95 = percentil(r.latencias, 95)
+        if p95 > ep.p95_ms:
+            violacoes.append(f"{ep.nome}: p95 {p95:.0f} ms > orçamento {ep.p95_ms:.0f} ms")
+        if r.erros / r.pedidos > MAX_TAXA_ERRO:
+            violacoes.append(f"{ep.nome}: {r.erros}/{r.pedidos} pedidos com erro")
+    return violacoes
+
+
+def relatorio(resultados: Dict[str, Resultado], mix: List[Endpoint] = MIX_PADRAO) -> str:
+    """Tabela com pedidos, erros, p50/p95/p99 e orçamento por endpoint."""
+    linhas = []
+    for ep in mix:
+        r = resultados.get(ep.nome, Resultado())
+        linhas.append([
+            ep.nome, r.pedidos, r.erros,
+            f"{percentil(r.latencias, 50):.0f}", f"{percentil(r.latencias, 95):.0f}",
+            f"{percentil(r.latencias, 99):.0f}", f"{ep.p95_ms:.0f}",
+        ])
+    return tabulate(linhas, headers=["endpoint", "pedidos", "erros", "p50 ms", "p95 ms", "p99 ms", "orçamento p95"])
+
+
+def degradar(
+    base_url: str,
+    fakes_url: str,
+    servico: str,
+    latencias_ms: List[float],
+    utilizadores: Dict[str, List[Tuple[str, str]]],
+    mix: List[Endpoint],
+    duracao_s: float,
+    concorrencia: int,
+) -> str:
+    """
+    Repete a carga com a latência do stand-in `servico` em cada valor de
+    `latencias_ms` e devolve uma tabela de p95 por endpoint e latência.
+    """
+    linhas: Dict[str, List[str]] = {ep.nome: [ep.nome] for ep in mix}
+    for latencia in latencias_ms:
+        httpx.put(f"{fakes_url}/_config/{servico}", json={"latencia_ms": latencia}, timeout=5.0).raise_for_status()
+        resultados = executar_carga(base_url, utilizadores, mix, duracao_s=duracao_s, concorrencia=concorrencia)
+        for ep in mix:
+            linhas[ep.nome].append(f"{percentil(resultados[ep.nome].latencias, 95):.0f}")
+    cabecalho = ["endpoint"] + [f"p95 ms @ {servico}={lat:.0f}ms" for lat in latencias_ms]
+    return tabulate(list(linhas.values()), headers=cabecalho)
+
+
+def preparar_base(dsn: str, escala: float = 3.0) -> Dict[str, int]:
+    """Recria a base de perf, aplica o schema e popula o dataset sintético (escala 3 ≈ 30k aulas)."""
+    from perf.schema import aplicar_schema, recriar_base
+    from perf.seed import popular
+
+    recriar_base(dsn)
+    aplicar_schema(dsn)
+    return popular(dsn, escala=escala)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Teste de carga com orçamentos de p95 por endpoint.")
+    parser.add_argument("--dsn", default=PERF_DATABASE_URL, help="Base Postgres local (PERF_DATABASE_URL)")
+    parser.add_argument("--preparar", action="store_true", help="Recria a base e gera o dataset antes da carga")
+    parser.add_argument("--escala", type=float, default=3.0, help="Fator de escala do dataset (com --preparar)")
+    parser.add_argument("--url", help="Usar um servidor já a correr em vez de arrancar um")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--duracao", type=float, default=30.0)
+    parser.add_argument("--concorrencia", type=int, default=8)
+    parser.add_argument("--fakes", action="store_true",
+                        help="Arranca os stand-ins externos (perf.fakes) e inclui os endpoints que os usam")
+    parser.add_argument("--porta-fakes", type=int, default=8790)
+    parser.add_argument("--degradar", metavar="SERVICO", help="Com --fakes: varia a latência deste serviço")
+    parser.add_argument("--latencias", default="0,500,2000", help="Latências (ms) para --degradar")
+    args = parser.parse_args(argv)
+
+    if not args.dsn:
+        parser.error("Indica --dsn ou define PERF_DATABASE_URL")
+    if args.preparar:
+        print("Dataset:", preparar_base(args.dsn, escala=args.escala))
+
+    if args.degradar and not args.fakes:
+        parser.error("--degradar precisa de --fakes")
+
+    utilizadores = carregar_utilizadores(args.dsn)
+    mix = MIX_PADRAO + (MIX_EXTERNOS if args.fakes else [])
+    with ExitStack() as stack:
+        fakes_url = stack.enter_context(iniciar_fakes(args.porta_fakes)) if args.fakes else None
+        base_url = args.url or stack.enter_context(
+            iniciar_servidor(args.dsn, porta=args.porta, workers=args.workers, fakes_url=fakes_url))
+        if args.degradar:
+            latencias = [float(v) for v in args.latencias.split(",")]
+            print(degradar(base_url, fakes_url, args.degradar, latencias, utilizadores, mix,
+                           args.duracao, args.concorrencia))
+            return 0
+        resultados = executar_carga(base_url, utilizadores, mix, duracao_s=args.duracao, concorrencia=args.concorrencia)
+
+    print(relatorio(resultados, mix))
+    violacoes = avaliar(resultados, mix)
+    for v in violacoes:
+        print("FALHA:", v)
+    return 1 if violacoes else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,334 @@
+"""
+planos.py
+Regressão de planos de execução para as queries críticas dos serviços.
+
+Cada consulta crítica é executada tal como a app a executa (a função de
+serviço real, redirecionada para a base de perf) e todo o SQL emitido é
+capturado. Para cada instrução corre-se `EXPLAIN (FORMAT JSON)` e verifica-se:
+  - nenhum Seq Scan em tabelas vigiadas (aulas, musicas, notificacoes) quando
+    a tabela tem mais de LIMIAR_LINHAS linhas;
+  - custo total estimado abaixo do orçamento da consulta.
+
+Assim, um filtro novo ou um índice apagado que transforme uma query de 5 ms
+numa de 5 s falha nos testes em vez de chegar a produção.
+
+Uso:
+    python -m perf.planos            # imprime os planos resumidos e as violações
+"""
+from __future__ import annotations
+
+import argparse
+import importlib
+import json
+import sys
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from unittest import mock
+
+import psycopg2
+import psycopg2.extensions
+from sqlalchemy import create_engine, event
+
+from perf import PERF_DATABASE_URL
+
+# Tabelas que nunca devem ser lidas por inteiro nas queries críticas
+TABELAS_VIGIADAS = ("aulas", "musicas", "notificacoes")
+
+# Abaixo deste tamanho um Seq Scan é aceitável (o planner escolhe-o com razão)
+LIMIAR_LINHAS = 5_000
+
+
+@dataclass
+class Consulta:
+    """SQL emitido por uma função de serviço, já com os parâmetros interpolados."""
+    sql: str
+    plano: Optional[Dict[str, Any]] = None
+
+
+@dataclass
+class ConsultaCritica:
+    """Uma função de serviço a vigiar, os argumentos com que é chamada e o orçamento de custo."""
+    nome: str
+    modulo: str
+    funcao: str
+    argumentos: Callable[[Any], Tuple[tuple, dict]]
+    custo_max: float
+    # Tabelas vigiadas que esta consulta pode legitimamente ler por inteiro
+    seq_scan_permitido: Sequence[str] = field(default_factory=tuple)
+    # Outros módulos de serviço onde a função vai buscar dados (ex: "services.serie_service")
+    outros_modulos: Sequence[str] = field(default_factory=tuple)
+
+
+class _CursorCaptura(psycopg2.extensions.cursor):
+    """Cursor que regista cada instrução (com parâmetros interpolados) antes de a executar."""
+
+    def execute(self, query, vars=None):
+        self.connection.capturadas.append(self.mogrify(query, vars).decode())
+        return super().execute(query, vars)
+
+
+class _ConexaoCaptura(psycopg2.extensions.connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.capturadas: List[str] = []
+        self.cursor_factory = _CursorCaptura
+
+
+class _ConexaoEmprestada:
+    """Imita a PooledConnection: close() faz rollback em vez de fechar a ligação partilhada."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def close(self):
+        self._conn.rollback()
+
+    def __getattr__(self, nome):
+        return getattr(self._conn, nome)
+
+
+def _url_sqlalchemy(dsn: str) -> str:
+    if dsn.startswith("postgresql://"):
+        return "postgresql+psycopg2://" + dsn[len("postgresql://"):]
+    return dsn
+
+
+@contextmanager
+def capturar_sql(dsn: str, modulo) -> Iterator[List[str]]:
+    """
+    Redireciona `get_db_connection` e `engine` do módulo de serviço para a base
+    de perf e devolve a lista (preenchida durante o bloco) do SQL executado.
+    """
+    conn = psycopg2.connect(dsn, connection_factory=_ConexaoCaptura)
+    engine = create_engine(_url_sqlalchemy(dsn))
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _registar(_conn, cursor, statement, parameters, _context, _executemany):
+        conn.capturadas.append(cursor.mogrify(statement, parameters).decode())
+
+    try:
+        with ExitStack() as stack:
+            if hasattr(modulo, "get_db_connection"):
+                stack.enter_context(mock.patch.object(modulo, "get_db_connection", lambda: _ConexaoEmprestada(conn)))
+            if hasattr(modulo, "engine"):
+                stack.enter_context(mock.patch.object(modulo, "engine", engine))
+            yield conn.capturadas
+    finally:
+        engine.dispose()
+        conn.close()
+
+
+def explicar(cur, sql: str) -> Dict[str, Any]:
+    """EXPLAIN (FORMAT JSON) de uma instrução. Devolve o nó de topo ('Plan')."""
+    cur.execute("EXPLAIN (FORMAT JSON) " + sql)
+    resultado = cur.fetchone()[0]
+    if isinstance(resultado, str):
+        resultado = json.loads(resultado)
+    return resultado[0]["Plan"]
+
+
+def percorrer(plano: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Todos os nós do plano (pré-ordem)."""
+    yield plano
+    for filho in plano.get("Plans", []):
+        yield from percorrer(filho)
+
+
+def tamanho_tabelas(cur, tabelas: Sequence[str] = TABELAS_VIGIADAS) -> Dict[str, float]:
+    """Número estimado de linhas (pg_class.reltuples) por tabela."""
+    cur.execute("SELECT relname, reltuples FROM pg_class WHERE relkind = 'r' AND relname = ANY(%s)",
+                (list(tabelas),))
+    return {nome: float(n) for nome, n in cur.fetchall()}
+
+
+def violacoes_plano(
+    plano: Dict[str, Any],
+    tamanhos: Dict[str, float],
+    custo_max: float,
+    seq_scan_permitido: Sequence[str] = (),
+    limiar_linhas: int = LIMIAR_LINHAS,
+) -> List[str]:
+    """Lista de problemas do plano (Seq Scan em tabela grande vigiada, custo acima do orçamento)."""
+    problemas = []
+    for no in percorrer(plano):
+        tabela = no.get("Relation Name")
+        if (no.get("Node Type") == "Seq Scan" and tabela in tamanhos
+                and tabela not in seq_scan_permitido and tamanhos[tabela] > limiar_linhas):
+            problemas.append(f"Seq Scan em {tabela} ({tamanhos[tabela]:.0f} linhas)")
+    custo = plano.get("Total Cost", 0.0)
+    if custo > custo_max:
+        problemas.append(f"custo estimado {custo:.0f} > orçamento {custo_max:.0f}")
+    return problemas
+
+
+# ─── Consultas críticas ───────────────────────────────────────────────────────
+
+def _utilizador(cur, role: str) -> str:
+    cur.execute("""
+        SELECT p.id::text FROM profiles p JOIN mentores m ON m.user_id = p.id
+        WHERE p.role = %s ORDER BY p.email LIMIT 1
+    """, (role,))
+    return cur.fetchone()[0]
+
+
+def _itens(cur) -> List[int]:
+    cur.execute("SELECT item_id FROM aula_equipamento GROUP BY item_id ORDER BY count(*) DESC LIMIT 3")
+    return [r[0] for r in cur.fetchall()]
+
+
+def _projetos_mentor_scoped(cur) -> List[int]:
+    from perf.listagem_aulas import mentor_com_scoping
+    return mentor_com_scoping(cur)["projetos"]
+
+
+def _semana_mentor_scoped(cur) -> Dict[str, object]:
+    from perf.listagem_aulas import mentor_com_scoping, semana_central
+    desde, ate = semana_central(cur)
+    return {"allowed_project_ids": mentor_com_scoping(cur)["projetos"], "desde": desde, "ate": ate}
+
+
+def _mentor_com_aulas(cur) -> int:
+    cur.execute("SELECT mentor_id FROM aulas WHERE mentor_id IS NOT NULL GROUP BY 1 ORDER BY count(*) DESC LIMIT 1")
+    return cur.fetchone()[0]
+
+
+def _projeto_com_aulas(cur) -> int:
+    cur.execute("SELECT projeto_id FROM aulas WHERE projeto_id IS NOT NULL GROUP BY 1 ORDER BY count(*) DESC LIMIT 1")
+    return cur.fetchone()[0]
+
+
+# Orçamentos calibrados no dataset por omissão do harness (perf.seed, escala 3 ≈ 30k
+# aulas) com ~3× de folga sobre o custo medido. Se a escala mudar, recalibrar.
+CONSULTAS_CRITICAS: List[ConsultaCritica] = [
+    ConsultaCritica(
+        "listar_aulas_export", "services.aula_service", "listar_aulas_export",
+        lambda cur: ((), {"data_inicio": "2026-01-01", "data_fim": "2026-03-31"}),
+        custo_max=4_500,
+    ),
+    ConsultaCritica(
+        "verificar_conflitos", "services.equipment_service", "verificar_conflitos",
+        lambda cur: ((_itens(cur), "2026-06-03T10:00:00", 90), {}),
+        custo_max=2_000,
+    ),
+    ConsultaCritica(
+        # Itens em uso agora: periodo @> LOCALTIMESTAMP no índice GiST (064), não um Seq Scan
+        "obter_stats_equipamento", "services.equipment_service", "obter_stats",
+        lambda cur: ((), {}),
+        custo_max=75,
+    ),
+    ConsultaCritica(
+        "conflitos_mentor", "services.aula_service", "conflitos_mentor",
+        lambda cur: ((_mentor_com_aulas(cur), "2026-06-03T10:00:00", 90), {}),
+        custo_max=100,
+        outros_modulos=("services.serie_service",),
+    ),
+    ConsultaCritica(
+        "listar_sessoes_registaveis", "services.registo_service", "listar_sessoes_registaveis",
+        lambda cur: ((_utilizador(cur, "mentor"),), {}),
+        custo_max=4_000,
+        # O OR entre o mentor (via join) e o responsável não é indexável tal como está escrito
+        seq_scan_permitido=("aulas",),
+    ),
+    ConsultaCritica(
+        "obter_sessoes_honorario", "services.honorario_service", "obter_sessoes_honorario",
+        lambda cur: ((_utilizador(cur, "mentor"), _projeto_com_aulas(cur), 3, 2026), {}),
+        custo_max=2_500,
+    ),
+    ConsultaCritica(
+        "listar_itens", "services.equipment_service", "listar_itens",
+        lambda cur: ((), {}),
+        # Um LATERAL (última sessão) por item: o custo é ~160 × nº de itens (~74k medido).
+        # Orçamento apertado — aqui a folga de 3× deixaria passar um LATERAL sem índice.
+        custo_max=90_000,
+    ),
+    ConsultaCritica(
+        "contar_nao_lidas", "services.notification_service", "contar_nao_lidas",
+        lambda cur: ((_utilizador(cur, "mentor"),), {}),
+        custo_max=100,
+    ),
+    ConsultaCritica(
+        "listar_todas_aulas_scoped", "services.aula_service", "listar_todas_aulas",
+        lambda cur: ((), {"allowed_project_ids": _projetos_mentor_scoped(cur)}),
+        custo_max=1_500,
+    ),
+    ConsultaCritica(
+        "listar_aulas_semana", "services.aula_service", "listar_todas_aulas",
+        lambda cur: ((), _semana_mentor_scoped(cur)),
+        custo_max=2_000,
+    ),
+    ConsultaCritica(
+        "listar_stats_instituicao", "services.musica_service", "listar_stats_instituicao",
+        lambda cur: ((), {}),
+        # Dois LATERAL (atividades, aulas) por turma_disciplina: ~351k medido
+        custo_max=420_000,
+    ),
+]
+
+
+def analisar(dsn: str, consulta: ConsultaCritica) -> List[Consulta]:
+    """Executa a função de serviço contra a base de perf e devolve o SQL emitido com os planos."""
+    modulo = importlib.import_module(consulta.modulo)
+    conn = psycopg2.connect(dsn)
+    try:
+        cur = conn.cursor()
+        args, kwargs = consulta.argumentos(cur)
+        with ExitStack() as stack:
+            capturadas = [stack.enter_context(capturar_sql(dsn, modulo))]
+            for outro in consulta.outros_modulos:
+                capturadas.append(stack.enter_context(capturar_sql(dsn, importlib.import_module(outro))))
+            getattr(modulo, consulta.funcao)(*args, **kwargs)
+        resultado = []
+        for sql in (sql for lista in capturadas for sql in lista):
+            if sql.lstrip().upper().startswith(("SELECT", "WITH")):
+                resultado.append(Consulta(sql, explicar(cur, sql)))
+        cur.close()
+        return resultado
+    finally:
+        conn.close()
+
+
+def verificar(dsn: str, consulta: ConsultaCritica) -> List[str]:
+    """Violações de plano de todas as instruções emitidas por uma consulta crítica."""
+    conn = psycopg2.connect(dsn)
+    try:
+        tamanhos = tamanho_tabelas(conn.cursor())
+    finally:
+        conn.close()
+    problemas = []
+    for i, c in enumerate(analisar(dsn, consulta)):
+        for p in violacoes_plano(c.plano, tamanhos, consulta.custo_max, consulta.seq_scan_permitido):
+            problemas.append(f"{consulta.nome}[{i}]: {p}")
+    return problemas
+
+
+def _resumo(plano: Dict[str, Any], nivel: int = 0) -> Iterator[str]:
+    alvo = plano.get("Relation Name") or plano.get("Index Name") or ""
+    yield f"{'  ' * nivel}{plano['Node Type']} {alvo} (custo {plano.get('Total Cost', 0):.0f}, linhas {plano.get('Plan Rows', 0)})"
+    for filho in plano.get("Plans", []):
+        yield from _resumo(filho, nivel + 1)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Verifica os planos das queries críticas.")
+    parser.add_argument("--dsn", default=PERF_DATABASE_URL, help="Base Postgres local (PERF_DATABASE_URL)")
+    parser.add_argument("consultas", nargs="*", help="Nomes das consultas (por omissão, todas)")
+    args = parser.parse_args(argv)
+    if not args.dsn:
+        parser.error("Indica --dsn ou define PERF_DATABASE_URL")
+
+    falhou = False
+    for consulta in CONSULTAS_CRITICAS:
+        if args.consultas and consulta.nome not in args.consultas:
+            continue
+        print(f"== {consulta.nome} (orçamento {consulta.custo_max:.0f})")
+        for c in analisar(args.dsn, consulta):
+            print("\n".join(_resumo(c.plano, 1)))
+        for problema in verificar(args.dsn, consulta):
+            falhou = True
+            print("FALHA:", problema)
+    return 1 if falhou else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+recorrentes.py
+Benchmark de POST /api/aulas/recorrentes (aula_service.criar_aulas_recorrentes)
+para uma série de aulas com mentor — o caso que notifica.
+
+Compara o caminho antigo, um criar_aula por semana (sessão SQLModel, commit e
+refresh, lookup do mentor, notificação e push por sessão), com o caminho em
+lote (um INSERT multi-linha numa só transação e uma notificação por mentor).
+O lookup do profile vai ao Supabase em produção; aqui é substituído por um
+stub com a latência do perfil "supabase" de perf.fakes. As aulas criadas são
+apagadas no fim de cada ronda.
+
+    python -m perf.recorrentes
+    python -m perf.recorrentes --semanas 12 52 --rondas 5
+"""
+from __future__ import annotations
+
+import argparse
+import importlib
+import statistics
+import sys
+import time
+from contextlib import ExitStack
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from unittest import mock
+
+import psycopg2
+
+from perf import PERF_DATABASE_URL
+from perf.fakes import PERFIS_PADRAO
+from perf.planos import capturar_sql
+
+INICIO = datetime(2031, 1, 6, 10, 0)  # longe dos dados do seed
+
+
+def _aula_com_mentor(cur) -> Dict[str, object]:
+    """Turma, mentor e projeto de uma aula presencial cujo mentor tem email."""
+    cur.execute("""
+        SELECT a.turma_id, a.mentor_id, a.projeto_id, m.user_id::text
+        FROM aulas a JOIN mentores m ON m.id = a.mentor_id
+        WHERE a.tipo = 'aula' AND a.turma_id IS NOT NULL AND m.email IS NOT NULL AND m.user_id IS NOT NULL
+        ORDER BY a.id LIMIT 1
+    """)
+    linha = cur.fetchone()
+    if not linha:
+        raise RuntimeError("Nenhuma aula com mentor na base de perf (correr perf.seed)")
+    return dict(zip(("turma_id", "mentor_id", "projeto_id", "profile_id"), linha))
+
+
+def _por_sessao(aula_service, semanas: int, dados: Dict[str, object]) -> List[dict]:
+    """O caminho antigo de criar_aulas_recorrentes: um criar_aula por semana."""
+    resultados = []
+    for i in range(semanas):
+        resultado = aula_service.criar_aula(
+            turma_id=dados["turma_id"], data_hora=INICIO + timedelta(weeks=i), tipo="aula",
+            duracao_minutos=120, mentor_id=dados["mentor_id"], projeto_id=dados["projeto_id"],
+            tema=str(1 + i),
+        )
+        if resultado:
+            resultados.append(resultado)
+    return resultados
+
+
+def _em_lote(aula_service, semanas: int, dados: Dict[str, object]) -> List[dict]:
+    return aula_service.criar_aulas_recorrentes(
+        data_hora=INICIO.isoformat(), duracao_minutos=120, tipo_atividade=None, responsavel_user_id=None,
+        observacoes=None, semanas=semanas, tema="1", projeto_id=dados["projeto_id"],
+        turma_id=dados["turma_id"], mentor_id=dados["mentor_id"], is_autonomous=False, tipo="aula",
+    )
+
+
+def _limpar(cur, ids: List[int], profile_id: str) -> None:
+    cur.execute("DELETE FROM aulas WHERE id = ANY(%s)", (ids,))
+    cur.execute("DELETE FROM aulas_apagadas WHERE aula_id = ANY(%s)", (ids,))
+    cur.execute("DELETE FROM notificacoes WHERE user_id::text = %s AND tipo = 'session_created'", (profile_id,))
+    cur.connection.commit()
+
+
+def medir(dsn: str, semanas: int, rondas: int = 3, latencia_supabase_ms: Optional[float] = None) -> Dict[str, object]:
+    aula_service = importlib.import_module("services.aula_service")
+    turma_service = importlib.import_module("services.turma_service")
+    notification_service = importlib.import_module("services.notification_service")
+    profile_service = importlib.import_module("services.profile_service")
+    if latencia_supabase_ms is None:
+        latencia_supabase_ms = PERFIS_PADRAO["supabase"].latencia_ms
+
+    conn = psycopg2.connect(dsn)
+    try:
+        cur = conn.cursor()
+        dados = _aula_com_mentor(cur)
+        contagem = {"supabase": 0, "push": 0}
+
+        def _profile(_email):
+            contagem["supabase"] += 1
+            time.sleep(latencia_supabase_ms / 1000)
+            return dados["profile_id"]
+
+        def _push(*_args, **_kwargs):
+            contagem["push"] += 1
+
+        resultado: Dict[str, object] = {"semanas": semanas, "latencia_supabase_ms": latencia_supabase_ms}
+        with ExitStack() as stack:
+            stack.enter_context(mock.patch.object(profile_service, "obter_profile_id_por_email", _profile))
+            stack.enter_context(mock.patch.object(notification_service, "_enviar_push_async", _push))
+            capturadas = [
+                stack.enter_context(capturar_sql(dsn, modulo))
+                for modulo in (aula_service, turma_service, notification_service)
+            ]
+            for nome, criar in (("por_sessao", _por_sessao), ("em_lote", _em_lote)):
+                tempos = []
+                for _ in range(rondas):
+                    for lista in capturadas:
+                        lista.clear()
+                    contagem.update(supabase=0, push=0)
+                    t0 = time.perf_counter()
+                    criadas = criar(aula_service, semanas, dados)
+                    tempos.append((time.perf_counter() - t0) * 1000)
+                    _limpar(cur, [a["id"] for a in criadas], dados["profile_id"])
+                    if len(criadas) != semanas:
+                        raise RuntimeError(f"{nome}: criadas {len(criadas)} de {semanas} sessões")
+                resultado[nome] = {
+                    "p50_ms": round(statistics.median(tempos), 1),
+                    "queries": sum(len(lista) for lista in capturadas),
+                    "supabase": contagem["supabase"],
+                    "pushes": contagem["push"],
+                }
+        cur.close()
+    finally:
+        conn.close()
+    return resultado
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de criar_aulas_recorrentes (por sessão vs em lote).")
+    parser.add_argument("--dsn", default=PERF_DATABASE_URL, help="Base Postgres local (PERF_DATABASE_URL)")
+    parser.add_argument("--semanas", type=int, nargs="+", default=[12, 52])
+    parser.add_argument("--rondas", type=int, default=3)
+    parser.add_argument("--latencia-supabase", type=float, default=None,
+                        help="ms por lookup de profile (omissão: perfil supabase de perf.fakes)")
+    args = parser.parse_args(argv)
+    if not args.dsn:
+        parser.error("Indica --dsn ou define PERF_DATABASE_URL")
+
+    print(f"{'semanas':>7}  {'caminho':<10} {'p50_ms':>9} {'queries':>8} {'supabase':>9} {'pushes':>7}")
+    for semanas in args.semanas:
+        resultado = medir(args.dsn, semanas, rondas=args.rondas, latencia_supabase_ms=args.latencia_supabase)
+        for caminho in ("por_sessao", "em_lote"):
+            r = resultado[caminho]
+            print(f"{semanas:>7}  {caminho:<10} {r['p50_ms']:>9} {r['queries']:>8} {r['supabase']:>9} {r['pushes']:>7}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+"""
+replay.py
+Reproduz tráfego capturado em produção (api/captura.py, CAPTURA_TRAFEGO) contra
+uma instância de staging, a 1×, 5× ou 10× a velocidade original.
+
+Os pedidos são reemitidos com os intervalos reais entre eles (divididos pela
+velocidade), cada um com um token sintético de um utilizador do mesmo role.
+Assim o pico de segunda de manhã — toda a gente a abrir os Horários e a
+confirmar sessões — pode ser reproduzido tal como aconteceu, e uma mudança de
+capacidade validada contra a mistura real em vez de uma mistura inventada.
+
+Valores redigidos na captura ("*") são substituídos na reprodução: na query
+o parâmetro é omitido, no corpo passa a "perf" e num path param (ex: um UUID
+de utilizador) passa a ser o id do utilizador sintético.
+
+Uso:
+    python -m perf.replay trafego.jsonl --url https://staging... --dsn postgresql://... \\
+        --segredo $STAGING_JWT_SECRET --velocidades 1,5,10
+    python -m perf.replay trafego.jsonl --desde 2026-03-09T08:00 --duracao 1800 --so-leitura
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import httpx
+from tabulate import tabulate
+
+from api.captura import REDIGIDO
+from perf import PERF_DATABASE_URL
+from perf.loadtest import PERF_JWT_SECRET, Resultado, carregar_utilizadores, gerar_token, percentil
+
+METODOS_LEITURA = ("GET", "HEAD", "OPTIONS")
+
+# Acima deste atraso médio de agendamento o próprio replay é o gargalo
+ATRASO_MAX_MS = 50.0
+
+
+@dataclass
+class Pedido:
+    """Uma linha da captura."""
+    t: float
+    metodo: str
+    rota: str
+    path_params: Dict[str, Any] = field(default_factory=dict)
+    query: Dict[str, Any] = field(default_factory=dict)
+    corpo: Any = None
+    role: Optional[str] = None
+    estado: Optional[int] = None
+    duracao_ms: Optional[float] = None
+
+    @property
+    def chave(self) -> str:
+        return f"{self.metodo} {self.rota}"
+
+
+def ficheiros_captura(caminho: str) -> List[str]:
+    """O ficheiro e os rodados (trafego.jsonl.1, .2, ...), do mais antigo para o mais recente."""
+    rodados = [p for p in glob.glob(glob.escape(caminho) + ".*") if p.rsplit(".", 1)[-1].isdigit()]
+    rodados.sort(key=lambda p: int(p.rsplit(".", 1)[-1]), reverse=True)
+    return rodados + ([caminho] if os.path.exists(caminho) else [])
+
+
+def ler_captura(caminhos: Iterable[str], desde: Optional[float] = None,
+                duracao_s: Optional[float] = None) -> List[Pedido]:
+    """Lê as linhas JSON (ignorando as corrompidas) e devolve os pedidos por ordem de chegada."""
+    pedidos = []
+    for caminho in caminhos:
+        for ficheiro in ficheiros_captura(caminho):
+            with open(ficheiro, encoding="utf-8") as f:
+                for linha in f:
+                    try:
+                        pedidos.append(Pedido(**json.loads(linha)))
+                    except (ValueError, TypeError):
+                        continue
+    pedidos.sort(key=lambda p: p.t)
+    if desde is not None:
+        pedidos = [p for p in pedidos if p.t >= desde]
+    if duracao_s is not None and pedidos:
+        fim = pedidos[0].t + duracao_s
+        pedidos = [p for p in pedidos if p.t < fim]
+    return pedidos
+
+
+def _sem_redigidos(valor: Any) -> Any:
+    if valor == REDIGIDO:
+        return "perf"
+    if isinstance(valor, dict):
+        return {k: _sem_redigidos(v) for k, v in valor.items()}
+    if isinstance(valor, list):
+        return [_sem_redigidos(v) for v in valor]
+    return valor
+
+
+def preparar_pedido(pedido: Pedido, user_id: Optional[str]) -> Tuple[str, Dict[str, Any], Any]:
+    """(path, params, corpo) prontos a enviar, com os valores redigidos substituídos."""
+    path = pedido.rota
+    for nome, valor in pedido.path_params.items():
+        if valor == REDIGIDO:
+            valor = user_id or "00000000-0000-0000-0000-000000000000"
+        path = path.replace("{" + nome + "}", str(valor))
+    params = {k: v for k, v in pedido.query.items() if v != REDIGIDO}
+    params = {k: [x for x in v if x != REDIGIDO] if isinstance(v, list) else v for k, v in params.items()}
+    return path, params, _sem_redigidos(pedido.corpo)
+
+
+def reproduzir(
+    base_url: str,
+    pedidos: Sequence[Pedido],
+    utilizadores: Dict[str, List[Tuple[str, str]]],
+    velocidade: float = 1.0,
+    segredo: str = PERF_JWT_SECRET,
+    max_workers: int = 64,
+    seed: int = 1,
+) -> Tuple[Dict[str, Resultado], float]:
+    """
+    Reemite os pedidos com os intervalos originais divididos por `velocidade`.
+    Devolve os resultados por rota e o atraso médio de agendamento (ms) — se
+    este crescer, o replay não está a conseguir acompanhar o ritmo pedido.
+    """
+    rng = random.Random(seed)
+    tokens: Dict[str, List[Tuple[str, str]]] = {
+        role: [(uid, gerar_token(uid, email, segredo)) for uid, email in lista]
+        for role, lista in utilizadores.items()
+    }
+    # Root não é um role em profiles: usa-se quem tiver mais permissões disponível
+    tokens.setdefault("root", tokens.get("direcao") or tokens.get("coordenador") or [])
+    resultados: Dict[str, Resultado] = {}
+    lock = threading.Lock()
+    atrasos: List[float] = []
+
+    def _enviar(client: httpx.Client, pedido: Pedido, agendado: float):
+        atraso = (time.monotonic() - agendado) * 1000.0
+        candidatos = tokens.get(pedido.role or "") or []
+        with lock:
+            escolhido = rng.choice(candidatos) if candidatos else None
+        user_id, token = escolhido if escolhido else (None, None)
+        path, params, corpo = preparar_pedido(pedido, user_id)
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        t0 = time.perf_counter()
+        try:
+            resp = client.request(pedido.metodo, path, params=params, headers=headers,
+                                  json=corpo if corpo is not None else None)
+            erro = resp.status_code >= 500 or (resp.status_code >= 400 and (pedido.estado or 0) < 400)
+        except httpx.HTTPError:
+            erro = True
+        ms = (time.perf_counter() - t0) * 1000.0
+        with lock:
+            r = resultados.setdefault(pedido.chave, Resultado())
+            r.latencias.append(ms)
+            r.erros += int(erro)
+            atrasos.append(atraso)
+
+    if not pedidos:
+        return {}, 0.0
+    limites = httpx.Limits(max_connections=max_workers, max_keepalive_connections=max_workers)
+    with httpx.Client(base_url=base_url, timeout=30.0, limits=limites) as client, \
+            ThreadPoolExecutor(max_workers=max_workers) as executor:
+        t_origem = pedidos[0].t
+        arranque = time.monotonic()
+        for pedido in pedidos:
+            agendado = arranque + (pedido.t - t_origem) / velocidade
+            espera = agendado - time.monotonic()
+            if espera > 0:
+                time.sleep(espera)
+            executor.submit(_enviar, client, pedido, agendado)
+    atraso_medio = sum(atrasos) / len(atrasos) if atrasos else 0.0
+    return resultados, atraso_medio
+
+
+def relatorio(por_velocidade: Dict[float, Dict[str, Resultado]], pedidos: Sequence[Pedido]) -> str:
+    """Tabela por rota: pedidos capturados, p95 em produção e p95/erros a cada velocidade."""
+    originais: Dict[str, List[float]] = {}
+    for p in pedidos:
+        originais.setdefault(p.chave, []).append(p.duracao_ms or 0.0)
+    chaves = sorted(originais, key=lambda k: -len(originais[k]))
+    cabecalho = ["rota", "pedidos", "p95 captura ms"]
+    for v in por_velocidade:
+        cabecalho += [f"p95 ms @{v:g}×", f"erros @{v:g}×"]
+    linhas = []
+    for chave in chaves:
+        linha = [chave, len(originais[chave]), f"{percentil(originais[chave], 95):.0f}"]
+        for resultados in por_velocidade.values():
+            r = resultados.get(chave, Resultado())
+            linha += [f"{percentil(r.latencias, 95):.0f}", r.erros]
+        linhas.append(linha)
+    return tabulate(linhas, headers=cabecalho)
+
+
+def _instante(valor: str) -> float:
+    return datetime.fromisoformat(valor).timestamp()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Reproduz tráfego capturado contra staging.")
+    parser.add_argument("capturas", nargs="+", help="Ficheiros CAPTURA_TRAFEGO (os rodados são incluídos)")
+    parser.add_argument("--url", required=True, help="URL base da instância de staging")
+    parser.add_argument("--dsn", default=PERF_DATABASE_URL,
+                        help="Base da instância (para escolher utilizadores por role)")
+    parser.add_argument("--segredo", default=os.getenv("REPLAY_JWT_SECRET", PERF_JWT_SECRET),
+                        help="SUPABASE_JWT_SECRET da instância, para assinar os tokens sintéticos")
+    parser.add_argument("--velocidades", default="1,5,10", help="Multiplicadores de velocidade")
+    parser.add_argument("--desde", type=_instante, help="Início da janela (ISO, hora local)")
+    parser.add_argument("--duracao", type=float, help="Duração da janela capturada a reproduzir (s)")
+    parser.add_argument("--so-leitura", action="store_true", help="Não reemitir POST/PUT/PATCH/DELETE")
+    parser.add_argument("--workers", type=int, default=64)
+    args = parser.parse_args(argv)
+    if not args.dsn:
+        parser.error("Indica --dsn ou define PERF_DATABASE_URL")
+
+    pedidos = ler_captura(args.capturas, desde=args.desde, duracao_s=args.duracao)
+    if args.so_leitura:
+        pedidos = [p for p in pedidos if p.metodo in METODOS_LEITURA]
+    if not pedidos:
+        print("Sem pedidos na janela indicada.")
+        return 1
+    janela = pedidos[-1].t - pedidos[0].t
+    print(f"{len(pedidos)} pedidos em {janela:.0f} s de captura")
+
+    utilizadores = carregar_utilizadores(args.dsn)
+    por_velocidade: Dict[float, Dict[str, Resultado]] = {}
+    falhou = False
+    for velocidade in [float(v) for v in args.velocidades.split(",")]:
+        print(f"== {velocidade:g}× ({janela / velocidade:.0f} s)")
+        resultados, atraso = reproduzir(args.url, pedidos, utilizadores, velocidade,
+                                        segredo=args.segredo, max_workers=args.workers)
+        por_velocidade[velocidade] = resultados
+        if atraso > ATRASO_MAX_MS:
+            falhou = True
+            print(f"AVISO: atraso médio de agendamento {atraso:.0f} ms — aumentar --workers")
+    print(relatorio(por_velocidade, pedidos))
+    return 1 if falhou else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
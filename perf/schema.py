@@ -0,0 +1,158 @@
+"""
+schema.py
+Constrói o schema da app numa base Postgres local: perf/sql/baseline.sql
+seguido de migrations/*.sql por ordem.
+
+Algumas migrações foram escritas para o SQL Editor do Supabase e têm passos de
+migração de dados que não correm numa base vazia. Cada migração é tentada numa
+única transação; se falhar, é reaplicada instrução a instrução (como no SQL
+Editor) e as instruções que falham são devolvidas para inspeção.
+"""
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+from typing import List, Tuple
+
+import psycopg2
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+MIGRATIONS_DIR = ROOT_DIR / "migrations"
+PERF_SQL_DIR = Path(__file__).resolve().parent / "sql"
+
+
+def dividir_instrucoes(sql: str) -> List[str]:
+    """
+    Divide um ficheiro SQL em instruções, respeitando strings, comentários e
+    blocos $tag$ ... $tag$ (funções plpgsql / DO).
+    """
+    instrucoes: List[str] = []
+    atual: List[str] = []
+    i, n = 0, len(sql)
+    dollar_tag = None
+    while i < n:
+        c = sql[i]
+        if dollar_tag:
+            if sql.startswith(dollar_tag, i):
+                atual.append(dollar_tag)
+                i += len(dollar_tag)
+                dollar_tag = None
+                continue
+            atual.append(c)
+            i += 1
+            continue
+        if c == "-" and sql.startswith("--", i):
+            fim = sql.find("\n", i)
+            fim = n if fim == -1 else fim
+            i = fim
+            continue
+        if c == "/" and sql.startswith("/*", i):
+            fim = sql.find("*/", i + 2)
+            i = n if fim == -1 else fim + 2
+            continue
+        if c == "'":
+            fim = i + 1
+            while fim < n:
+                if sql[fim] == "'" and sql.startswith("''", fim):
+                    fim += 2
+                    continue
+                if sql[fim] == "'":
+                    break
+                fim += 1
+            atual.append(sql[i:fim + 1])
+            i = fim + 1
+            continue
+        if c == "$":
+            fim = sql.find("$", i + 1)
+            tag = sql[i:fim + 1] if fim != -1 else ""
+            if tag and (tag == "$$" or tag[1:-1].replace("_", "").isalnum()):
+                dollar_tag = tag
+                atual.append(tag)
+                i = fim + 1
+                continue
+        if c == ";":
+            instrucao = "".join(atual).strip()
+            if instrucao:
+                instrucoes.append(instrucao)
+            atual = []
+            i += 1
+            continue
+        atual.append(c)
+        i += 1
+    resto = "".join(atual).strip()
+    if resto:
+        instrucoes.append(resto)
+    return instrucoes
+
+
+def listar_migracoes() -> List[Path]:
+    """Migrações por ordem (nome do ficheiro; os números repetidos ficam por ordem alfabética)."""
+    return sorted(MIGRATIONS_DIR.glob("*.sql"), key=lambda p: p.name)
+
+
+def _aplicar_ficheiro(conn, caminho: Path) -> List[Tuple[str, str]]:
+    """Aplica um ficheiro SQL. Devolve [(instrução, erro)] das instruções que falharam."""
+    sql = caminho.read_text(encoding="utf-8")
+    cur = conn.cursor()
+    try:
+        cur.execute(sql)
+        conn.commit()
+        return []
+    except psycopg2.Error:
+        conn.rollback()
+
+    falhas: List[Tuple[str, str]] = []
+    conn.autocommit = True
+    try:
+        for instrucao in dividir_instrucoes(sql):
+            try:
+                cur.execute(instrucao)
+            except psycopg2.Error as e:
+                falhas.append((instrucao, str(e).strip().splitlines()[0]))
+    finally:
+        conn.autocommit = False
+        cur.close()
+    return falhas
+
+
+def aplicar_schema(dsn: str) -> List[Tuple[str, str, str]]:
+    """
+    Cria o schema completo na base indicada (que deve estar vazia).
+
+    Returns:
+        Lista de (ficheiro, instrução, erro) das instruções que falharam.
+    """
+    conn = psycopg2.connect(dsn)
+    falhas: List[Tuple[str, str, str]] = []
+    try:
+        for instrucao, erro in _aplicar_ficheiro(conn, PERF_SQL_DIR / "baseline.sql"):
+            falhas.append(("baseline.sql", instrucao, erro))
+        for migracao in listar_migracoes():
+            pre = PERF_SQL_DIR / f"pre_{migracao.name}"
+            if pre.exists():
+                _aplicar_ficheiro(conn, pre)
+            for instrucao, erro in _aplicar_ficheiro(conn, migracao):
+                falhas.append((migracao.name, instrucao, erro))
+        for ficheiro, _, erro in falhas:
+            logger.warning("Instrução falhou em %s: %s", ficheiro, erro)
+        return falhas
+    finally:
+        conn.close()
+
+
+def recriar_base(dsn: str) -> None:
+    """Apaga e recria a base de dados do DSN (liga-se à base 'postgres' do mesmo servidor)."""
+    params = psycopg2.extensions.parse_dsn(dsn)
+    nome = params.pop("dbname")
+    params["dbname"] = "postgres"
+    conn = psycopg2.connect(**params)
+    conn.autocommit = True
+    try:
+        cur = conn.cursor()
+        cur.execute(f'DROP DATABASE IF EXISTS "{nome}" WITH (FORCE)')
+        cur.execute(f'CREATE DATABASE "{nome}"')
+        cur.close()
+    finally:
+        conn.close()
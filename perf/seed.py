@@ -0,0 +1,501 @@
+"""
+seed.py
+Gerador de dados sintéticos com a forma dos dados de produção, para uma base
+local criada com perf.schema.
+
+Cobre toda a cadeia projetos → sub_projetos → estabelecimentos → turmas →
+turma_disciplinas → turma_atividades → aulas (todos os estados, presenciais,
+autónomas, internas e 'outro'), mais músicas em todos os estados do kanban,
+equipamento com histórico em aula_equipamento/equipamento_historico,
+notificações, registos e push subscriptions.
+
+O tamanho é controlado por um fator de escala (1× ≈ produção atual; 10×, 100×).
+Os ids são gerados no cliente e as linhas são enviadas por COPY em streaming,
+sem as materializar em memória — 100× (~1M aulas) demora poucos minutos.
+
+O gerador é determinístico (seed fixa): duas execuções com o mesmo fator
+produzem exatamente os mesmos dados, para que os resultados sejam comparáveis.
+
+Uso:
+    python -m perf.seed --escala 10 --recriar
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import io
+import json
+import logging
+import math
+import random
+import sys
+import time
+import uuid
+from dataclasses import dataclass, fields
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import psycopg2
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+
+from perf import PERF_DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+# Estados possíveis por posição temporal da sessão (pesos aproximam produção)
+ESTADOS_AULA_PASSADA = [("terminada", 62), ("concluida", 8), ("cancelada", 8), ("recusada", 6),
+                        ("confirmada", 10), ("pendente", 4), ("em_curso", 2)]
+ESTADOS_AULA_FUTURA = [("confirmada", 45), ("pendente", 30), ("agendada", 12), ("rascunho", 8),
+                       ("recusada", 3), ("cancelada", 2)]
+TIPOS_AULA = [(None, 55), ("aula", 20), ("trabalho_autonomo", 17), ("trabalho_interno", 5), ("outro", 3)]
+ATIVIDADES_AUTONOMAS = ["Produção Musical", "Preparação Aulas", "Edição/Captura", "Reunião", "Manutenção"]
+ESTADOS_MUSICA = [
+    ("gravação", 22), ("edição", 12), ("mistura", 8), ("mistura_wip", 10), ("feedback", 6),
+    ("feedback_wip", 6), ("finalização", 4), ("finalização_wip", 5), ("concluído", 27),
+]
+ROLES = [("mentor", 60), ("produtor", 15), ("coordenador", 10), ("direcao", 2), ("videomaker", 3)]
+# level_order das patentes semeadas pela migração 046
+PATENTE_POR_ROLE = {"mentor": 1, "videomaker": 1, "produtor": 2, "coordenador": 3, "direcao": 4, "root": 5}
+TIPOS_NOTIFICACAO = ["session_created", "session_confirmed", "session_rejected", "info", "producao"]
+DISCIPLINAS = ["Rap e Escrita", "Produção Musical", "Beatmaking", "Vídeo"]
+
+# Data de referência fixa (determinismo): "hoje" no dataset
+AGORA = datetime(2026, 6, 1, 9, 0)
+
+
+@dataclass
+class Dimensoes:
+    """Tamanho do dataset a 1× (aproxima a produção atual)."""
+    projetos: int = 6
+    estabelecimentos: int = 300
+    turmas: int = 900
+    aulas: int = 10_000
+    musicas: int = 1_500
+    kit_itens: int = 150
+    notificacoes: int = 15_000
+    utilizadores: int = 90
+    semanas_historico: int = 104
+
+    def escalar(self, fator: float) -> "Dimensoes":
+        """Multiplica as contagens pelo fator. Projetos crescem com a raiz (são poucos e estáveis)."""
+        valores = {}
+        for f in fields(self):
+            atual = getattr(self, f.name)
+            if f.name == "semanas_historico":
+                valores[f.name] = atual
+            elif f.name == "projetos":
+                valores[f.name] = max(1, round(atual * math.sqrt(fator)))
+            else:
+                valores[f.name] = max(1, round(atual * fator))
+        return Dimensoes(**valores)
+
+
+# ─── COPY em streaming ────────────────────────────────────────────────────────
+
+def _campo_copy(valor) -> str:
+    """Formata um valor para o formato texto do COPY (NULL = \\N, escapes de tab/newline)."""
+    if valor is None:
+        return "\\N"
+    if isinstance(valor, bool):
+        return "t" if valor else "f"
+    if isinstance(valor, datetime):
+        return valor.isoformat(sep=" ")
+    s = str(valor)
+    if "\\" in s or "\t" in s or "\n" in s or "\r" in s:
+        s = s.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+    return s
+
+
+class _CopyStream(io.TextIOBase):
+    """Ficheiro só-de-leitura que serializa linhas de um iterador à medida que o COPY lê."""
+
+    def __init__(self, linhas: Iterable[Sequence]):
+        self._linhas = iter(linhas)
+        self._buffer = ""
+        self.contagem = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> str:
+        partes = [self._buffer]
+        tamanho = len(self._buffer)
+        while size < 0 or tamanho < size:
+            try:
+                linha = next(self._linhas)
+            except StopIteration:
+                break
+            texto = "\t".join(_campo_copy(v) for v in linha) + "\n"
+            partes.append(texto)
+            tamanho += len(texto)
+            self.contagem += 1
+        dados = "".join(partes)
+        if size < 0:
+            self._buffer = ""
+            return dados
+        self._buffer = dados[size:]
+        return dados[:size]
+
+    readline = read
+
+
+def copiar(cur, tabela: str, colunas: Sequence[str], linhas: Iterable[Sequence]) -> int:
+    """COPY FROM STDIN de um iterador de tuplos. Devolve o número de linhas."""
+    stream = _CopyStream(linhas)
+    cur.copy_expert(f"COPY {tabela} ({', '.join(colunas)}) FROM STDIN", stream, size=1 << 16)
+    return stream.contagem
+
+
+def _max_id(cur, tabela: str) -> int:
+    cur.execute(f"SELECT COALESCE(MAX(id), 0) FROM {tabela}")
+    return cur.fetchone()[0]
+
+
+def _acertar_sequencias(cur, tabelas: Iterable[str]) -> None:
+    for tabela in tabelas:
+        cur.execute(
+            f"SELECT setval(pg_get_serial_sequence('{tabela}', 'id'), GREATEST((SELECT MAX(id) FROM {tabela}), 1))"
+        )
+
+
+# ─── Gerador ─────────────────────────────────────────────────────────────────
+
+def _escolher(rng: random.Random, pesos: List[tuple]):
+    valores, w = zip(*pesos)
+    return rng.choices(valores, weights=w, k=1)[0]
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _chaves_push(rng: random.Random) -> Tuple[str, str]:
+    """p256dh/auth válidos (P-256), para o pywebpush conseguir cifrar contra os stand-ins."""
+    chave = ec.derive_private_key(rng.getrandbits(250) + 1, ec.SECP256R1())
+    publica = chave.public_key().public_bytes(serialization.Encoding.X962,
+                                              serialization.PublicFormat.UncompressedPoint)
+    b64 = lambda b: base64.urlsafe_b64encode(b).rstrip(b"=").decode()  # noqa: E731
+    return b64(publica), b64(rng.randbytes(16))
+
+
+class _Gerador:
+    """Estado partilhado entre tabelas (ids gerados, relações) durante uma execução."""
+
+    def __init__(self, cur, dim: Dimensoes, seed: int):
+        self.cur = cur
+        self.dim = dim
+        self.rng = random.Random(seed)
+        self.contagem: Dict[str, int] = {}
+
+    def _copiar(self, tabela: str, colunas: Sequence[str], linhas: Iterable[Sequence]) -> None:
+        t0 = time.perf_counter()
+        n = copiar(self.cur, tabela, colunas, linhas)
+        self.contagem[tabela] = self.contagem.get(tabela, 0) + n
+        logger.info("%s: %d linhas em %.1fs", tabela, n, time.perf_counter() - t0)
+
+    # ── Utilizadores ────────────────────────────────────────────────────────
+    def utilizadores(self) -> None:
+        rng, dim = self.rng, self.dim
+        self.cur.execute("SELECT level_order, id FROM permission_levels")
+        patentes = dict(self.cur.fetchall())
+        self.users: List[Tuple[str, str, str, str]] = []
+        for i in range(dim.utilizadores):
+            role = "root" if i == 0 else _escolher(rng, ROLES)
+            self.users.append((_uuid(rng), f"user{i:06d}@perf.local", f"Utilizador {i:06d}", role))
+        self.por_role: Dict[str, List[str]] = {}
+        for uid, _, _, role in self.users:
+            self.por_role.setdefault(role, []).append(uid)
+        # project_scoped é decidido aqui para user_project_access usar a mesma decisão
+        self.scoped = {uid for uid, _, _, role in self.users if role == "mentor" and rng.random() < 0.5}
+
+        self._copiar("auth.users", ("id", "email", "created_at"),
+                     ((uid, email, AGORA - timedelta(days=400)) for uid, email, _, _ in self.users))
+        self._copiar(
+            "profiles",
+            ("id", "email", "full_name", "role", "is_root", "is_direcao", "is_coordenacao",
+             "project_scoped", "permission_level_id"),
+            ((uid, email, nome, role, role == "root", role == "direcao",
+              role in ("coordenador", "direcao", "root"), uid in self.scoped,
+              patentes.get(PATENTE_POR_ROLE[role]))
+             for uid, email, nome, role in self.users),
+        )
+
+    # ── Estrutura: projetos → turma_atividades ──────────────────────────────
+    def estrutura(self) -> None:
+        rng, dim = self.rng, self.dim
+        # As migrações já semeiam alguns projetos/sub-projetos: os ids gerados começam depois deles
+        base = _max_id(self.cur, "projetos")
+        self.projeto_ids = list(range(base + 1, base + dim.projetos + 1))
+        self._copiar("projetos", ("id", "nome", "estado", "data_inicio", "data_fim"),
+                     ((p, f"Projeto {p}", "ativo", "2024-09-01", "2027-07-31") for p in self.projeto_ids))
+
+        self.subs_por_projeto: Dict[int, List[int]] = {}
+        sub_linhas = []
+        sid = _max_id(self.cur, "sub_projetos")
+        for p in self.projeto_ids:
+            for j in range(2):
+                sid += 1
+                self.subs_por_projeto.setdefault(p, []).append(sid)
+                sub_linhas.append((sid, p, f"Sub-projeto {p}.{j + 1}"))
+        self._copiar("sub_projetos", ("id", "projeto_id", "nome"), sub_linhas)
+
+        self.estab_ids = list(range(1, dim.estabelecimentos + 1))
+        self._copiar(
+            "estabelecimentos",
+            ("id", "nome", "sigla", "morada", "cidade", "latitude", "longitude", "nome_apresentacao"),
+            ((e, f"Escola {e:06d}", f"E{e:06d}", f"Rua {e}, Lisboa", "Lisboa",
+              38.6 + rng.random() * 0.6, -9.4 + rng.random() * 0.6, f"Agrupamento {e:06d}")
+             for e in self.estab_ids),
+        )
+        self.projeto_do_estab = {e: rng.choice(self.projeto_ids) for e in self.estab_ids}
+        self._copiar("projeto_estabelecimentos", ("projeto_id", "estabelecimento_id", "sub_projeto_id"),
+                     ((p, e, rng.choice(self.subs_por_projeto[p])) for e, p in self.projeto_do_estab.items()))
+
+        self.turmas: List[Tuple[int, int]] = [(t, rng.choice(self.estab_ids)) for t in range(1, dim.turmas + 1)]
+        self._copiar("turmas", ("id", "estabelecimento_id", "nome", "ano_escolar", "numero_alunos"),
+                     ((t, e, f"Turma {t:06d}", f"{rng.randint(5, 12)}º", rng.randint(8, 28)) for t, e in self.turmas))
+
+        disc_linhas, ativ_linhas = [], []
+        self.atividades_por_turma: Dict[int, List[str]] = {}
+        self.disciplinas_por_turma: Dict[int, List[int]] = {}
+        did = 0
+        for t, _ in self.turmas:
+            for nome in rng.sample(DISCIPLINAS, rng.randint(1, 3)):
+                did += 1
+                self.disciplinas_por_turma.setdefault(t, []).append(did)
+                disc_linhas.append((did, t, nome, rng.randint(2, 8)))
+                for k in range(rng.randint(1, 3)):
+                    au = _uuid(rng)
+                    autonoma = nome == "Produção Musical" and k > 0
+                    self.atividades_por_turma.setdefault(t, []).append(au)
+                    ativ_linhas.append((au, did, f"Atividade {k + 1}", f"A{k + 1}", rng.randint(8, 30),
+                                        rng.choice([1, 1.5, 2]), rng.randint(0, 4), autonoma,
+                                        "produtor" if autonoma else "mentor"))
+        self._copiar("turma_disciplinas", ("id", "turma_id", "nome", "musicas_previstas"), disc_linhas)
+        self._copiar("turma_atividades",
+                     ("uuid", "turma_disciplina_id", "nome", "codigo", "sessoes_previstas", "horas_por_sessao",
+                      "musicas_previstas", "is_autonomous", "role"),
+                     ativ_linhas)
+
+        mentor_users = self.por_role.get("mentor", []) + self.por_role.get("coordenador", [])
+        self.mentores: List[Tuple[int, str]] = [(i + 1, uid) for i, uid in enumerate(mentor_users)]
+        self._copiar("mentores", ("id", "nome", "email", "user_id", "latitude", "longitude"),
+                     ((mid, f"Mentor {mid:05d}", f"mentor{mid:05d}@perf.local", uid,
+                       38.6 + rng.random() * 0.6, -9.4 + rng.random() * 0.6) for mid, uid in self.mentores))
+        self._copiar("user_project_access", ("user_id", "projeto_id"),
+                     ((uid, p) for uid in sorted(self.scoped)
+                      for p in rng.sample(self.projeto_ids, min(2, len(self.projeto_ids)))))
+
+    # ── Aulas e dependentes ─────────────────────────────────────────────────
+    def _linhas_aulas(self) -> Iterator[tuple]:
+        rng, dim = self.rng, self.dim
+        inicio = AGORA - timedelta(weeks=dim.semanas_historico)
+        slots = int((AGORA + timedelta(weeks=8) - inicio).total_seconds() // 1800)
+        staff = [u for u, _, _, role in self.users if role != "root"]
+        for aid in range(1, dim.aulas + 1):
+            # Como em produção, os ids crescem com o tempo (sessões criadas com algumas
+            # semanas de antecedência): data_hora fica correlacionada com a ordem física.
+            slot = int(slots * (aid - 1) / dim.aulas) + rng.randint(-672, 672)
+            data_hora = inicio + timedelta(minutes=30 * min(max(slot, 0), slots - 1))
+            passada = data_hora < AGORA
+            estado = _escolher(rng, ESTADOS_AULA_PASSADA if passada else ESTADOS_AULA_FUTURA)
+            tipo = _escolher(rng, TIPOS_AULA)
+            mentor_id, mentor_uid = rng.choice(self.mentores)
+            criado = data_hora - timedelta(days=rng.randint(1, 60))
+            atualizado = criado + timedelta(days=rng.randint(0, 30))
+            if tipo in (None, "aula"):
+                turma_id, estab = rng.choice(self.turmas)
+                atividades = self.atividades_por_turma.get(turma_id)
+                self._aulas_presenciais.append((aid, estado, data_hora, mentor_id, mentor_uid))
+                yield (aid, self.projeto_do_estab[estab], turma_id, mentor_id, tipo, data_hora,
+                       rng.choice([60, 90, 90, 120]), estado, None, f"Sessão {rng.randint(1, 30)}",
+                       "Trabalhar escrita e flow" if rng.random() < 0.5 else None,
+                       "Observações da sessão\ncom várias linhas" if rng.random() < 0.2 else None,
+                       criado, atualizado, False, estado in ("terminada", "concluida"), None, None,
+                       rng.choice(atividades) if atividades else None,
+                       "Sumário da sessão" if estado == "terminada" else None,
+                       f"S{aid:07d}" if rng.random() < 0.3 else None,
+                       rng.random() < 0.3 if passada else None)
+            else:
+                responsavel = rng.choice(staff)
+                if tipo == "outro":
+                    self._participantes[aid] = rng.sample(staff, min(len(staff), rng.randint(2, 4)))
+                if passada and estado in ("confirmada", "pendente"):
+                    estado = "terminada"
+                yield (aid, rng.choice(self.projeto_ids), None, None, tipo, data_hora,
+                       rng.choice([60, 120, 180]), estado, "Estúdio" if rng.random() < 0.5 else None,
+                       None, None, "Notas do trabalho autónomo " * rng.randint(0, 3) or None,
+                       criado, atualizado, tipo == "trabalho_autonomo", passada and estado == "terminada",
+                       rng.choice(ATIVIDADES_AUTONOMAS), responsavel, None, None, None, None)
+
+    def aulas(self) -> None:
+        self._aulas_presenciais: List[Tuple[int, str, datetime, int, str]] = []
+        self._participantes: Dict[int, List[str]] = {}
+        self._copiar(
+            "aulas",
+            ("id", "projeto_id", "turma_id", "mentor_id", "tipo", "data_hora", "duracao_minutos", "estado",
+             "local", "tema", "objetivos", "observacoes", "criado_em", "atualizado_em", "is_autonomous",
+             "is_realized", "tipo_atividade", "responsavel_user_id", "atividade_uuid", "sumario",
+             "codigo_sessao", "leva_carro"),
+            self._linhas_aulas(),
+        )
+        self._copiar("aula_participantes", ("aula_id", "user_id"),
+                     ((aid, uid) for aid, uids in self._participantes.items() for uid in uids))
+
+        rng = self.rng
+        self._copiar(
+            "registos",
+            ("aula_id", "user_id", "numero_sessao", "objetivos_gerais", "sumario", "participantes",
+             "criado_em", "kms_percorridos", "leva_carro"),
+            ((aid, mentor_uid, str(rng.randint(1, 30)), "Objetivos gerais", "Sumário do registo",
+              json.dumps([{"nome_completo": f"Aluno {k}", "assinatura": None} for k in range(rng.randint(5, 15))]),
+              data_hora + timedelta(hours=rng.randint(2, 72)),
+              round(rng.uniform(5, 80), 2) if rng.random() < 0.3 else None, rng.random() < 0.3)
+             for aid, estado, data_hora, _, mentor_uid in self._aulas_presenciais
+             if estado == "terminada" and rng.random() < 0.75),
+        )
+
+    # ── Produção ────────────────────────────────────────────────────────────
+    def musicas(self) -> None:
+        rng, dim = self.rng, self.dim
+        produtores = self.por_role.get("produtor") or [u[0] for u in self.users]
+        criadores = [uid for _, uid in self.mentores] or produtores
+
+        def _linhas():
+            for mid in range(1, dim.musicas + 1):
+                turma_id, estab = rng.choice(self.turmas)
+                estado = _escolher(rng, ESTADOS_MUSICA)
+                criado = AGORA - timedelta(days=rng.randint(0, 7 * dim.semanas_historico))
+                concluida = estado == "concluído"
+                arquivada = concluida and rng.random() < 0.6
+                wip = estado.endswith("_wip")
+                disciplinas = self.disciplinas_por_turma.get(turma_id) or [None]
+                yield (mid, f"Música {mid:07d}", estado, turma_id, rng.choice(disciplinas),
+                       self.projeto_do_estab[estab], arquivada,
+                       criado + timedelta(days=rng.randint(30, 120)) if arquivada else None,
+                       rng.choice(produtores) if wip or concluida else None, rng.choice(criadores),
+                       rng.choice(produtores) if estado in ("feedback", "feedback_wip", "finalização",
+                                                            "finalização_wip", "concluído") else None,
+                       rng.choice(produtores) if concluida else None,
+                       "Feedback do coordenador" if rng.random() < 0.2 else None,
+                       (AGORA + timedelta(days=rng.randint(-5, 10))).date() if wip else None,
+                       criado, criado + timedelta(days=rng.randint(0, 60)))
+
+        self._copiar(
+            "musicas",
+            ("id", "titulo", "estado", "turma_id", "disciplina_id", "projeto_id", "arquivado", "arquivado_em",
+             "responsavel_id", "criador_id", "misturado_por_id", "finalizado_por_id", "feedback",
+             "fase_deadline", "criado_em", "updated_at"),
+            _linhas(),
+        )
+
+    # ── Equipamento ─────────────────────────────────────────────────────────
+    def equipamento(self) -> None:
+        rng, dim = self.rng, self.dim
+        self.cur.execute("SELECT id FROM kit_categorias ORDER BY id")
+        categorias = [r[0] for r in self.cur.fetchall()]
+        base = _max_id(self.cur, "kit_itens")
+        item_ids = list(range(base + 1, base + dim.kit_itens + 1))
+        self._copiar(
+            "kit_itens",
+            ("id", "categoria_id", "nome", "uuid", "identificador", "estado"),
+            ((iid, rng.choice(categorias), "Microfone" if iid % 3 else "Interface de áudio", _uuid(rng),
+              f"PERF-{iid:07d}", _escolher(rng, [("excelente", 70), ("bom", 20), ("danificado", 10)]))
+             for iid in item_ids),
+        )
+        nome_por_uid = {uid: nome for uid, _, nome, _ in self.users}
+        usos = [(aid, data_hora, mentor_uid) for aid, estado, data_hora, _, mentor_uid in self._aulas_presenciais
+                if estado not in ("cancelada", "recusada") and rng.random() < 0.15]
+        pares = []
+        for aid, data_hora, mentor_uid in usos:
+            for iid in rng.sample(item_ids, min(len(item_ids), rng.randint(1, 3))):
+                pares.append((aid, iid, data_hora, mentor_uid))
+        self._copiar("aula_equipamento", ("aula_id", "item_id"), ((aid, iid) for aid, iid, _, _ in pares))
+        self._copiar("equipamento_historico", ("item_id", "user_id", "user_nome", "data_utilizacao", "aula_id"),
+                     ((iid, uid, nome_por_uid.get(uid), data_hora, aid)
+                      for aid, iid, data_hora, uid in pares if data_hora < AGORA))
+
+    # ── Notificações e push ─────────────────────────────────────────────────
+    def notificacoes(self) -> None:
+        rng, dim = self.rng, self.dim
+        uids = [u[0] for u in self.users]
+        self._copiar(
+            "notificacoes",
+            ("user_id", "tipo", "titulo", "mensagem", "link", "lida", "criado_em", "metadados"),
+            ((rng.choice(uids), tipo, "Atualização", "Tens uma nova atualização numa sessão.", "/horarios",
+              rng.random() < 0.85, AGORA - timedelta(minutes=rng.randrange(60 * 24 * 7 * dim.semanas_historico)),
+              json.dumps({"aula_id": rng.randint(1, dim.aulas)}) if tipo.startswith("session") else None)
+             for tipo in (rng.choice(TIPOS_NOTIFICACAO) for _ in range(dim.notificacoes))),
+        )
+        self._copiar(
+            "push_subscriptions",
+            ("user_id", "endpoint", "p256dh", "auth"),
+            ((uid, f"https://push.perf.local/{uid}/{k}", *_chaves_push(rng))
+             for uid in uids if rng.random() < 0.6 for k in range(rng.randint(1, 2))),
+        )
+
+
+def popular(dsn: str, escala: float = 1.0, seed: int = 2026, dim: Optional[Dimensoes] = None) -> Dict[str, int]:
+    """
+    Gera o dataset na base indicada, que deve ter acabado de ser criada por
+    perf.schema.aplicar_schema.
+
+    Args:
+        escala: fator multiplicativo sobre Dimensoes() (1, 10, 100...). Ignorado se `dim` for dado.
+
+    Returns:
+        Contagem de linhas inseridas por tabela.
+    """
+    dim = dim or Dimensoes().escalar(escala)
+    conn = psycopg2.connect(dsn)
+    try:
+        cur = conn.cursor()
+        cur.execute("SET synchronous_commit = off")
+        g = _Gerador(cur, dim, seed)
+        passos: List[Callable[[], None]] = [g.utilizadores, g.estrutura, g.aulas, g.musicas,
+                                            g.equipamento, g.notificacoes]
+        for passo in passos:
+            passo()
+        _acertar_sequencias(cur, [
+            "projetos", "sub_projetos", "estabelecimentos", "turmas", "turma_disciplinas", "mentores",
+            "aulas", "aula_participantes", "registos", "musicas", "kit_itens", "aula_equipamento",
+            "equipamento_historico", "notificacoes", "push_subscriptions", "user_project_access",
+        ])
+        conn.commit()
+        conn.autocommit = True
+        cur.execute("VACUUM ANALYZE")
+        cur.close()
+        return g.contagem
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Gera o dataset sintético de perf.")
+    parser.add_argument("--dsn", default=PERF_DATABASE_URL, help="Base Postgres local (PERF_DATABASE_URL)")
+    parser.add_argument("--escala", type=float, default=1.0, help="1 ≈ produção atual; 10, 100...")
+    parser.add_argument("--seed", type=int, default=2026)
+    parser.add_argument("--recriar", action="store_true", help="Apaga e recria a base e o schema antes de gerar")
+    args = parser.parse_args(argv)
+    if not args.dsn:
+        parser.error("Indica --dsn ou define PERF_DATABASE_URL")
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.recriar:
+        from perf.schema import aplicar_schema, recriar_base
+        recriar_base(args.dsn)
+        aplicar_schema(args.dsn)
+    t0 = time.perf_counter()
+    contagem = popular(args.dsn, escala=args.escala, seed=args.seed)
+    for tabela, n in contagem.items():
+        print(f"{tabela:<24} {n:>10}")
+    print(f"Total: {sum(contagem.values())} linhas em {time.perf_counter() - t0:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,343 @@
+"""
+serializacao.py
+Micro-benchmarks do código que dá forma às linhas (linha da base → dict da API).
+
+Cada benchmark passa um conjunto de linhas GRAVADAS (perf/fixtures/serializacao.json)
+pela função de formatação real do serviço, sem base de dados:
+
+    listar_todas_aulas    _payload_aula_lista + validação AulaListItem
+    listar_musicas        _musica_de_linha (dicts aninhados, isoformat)
+    listar_aulas_export   _formatar_linha_export (strftime, timedelta)
+    listar_itens          _item_de_linha (derivação da localização)
+
+Para cada um reporta ops/s (uma op = formatar todas as linhas gravadas),
+µs por linha e a memória alocada por op (pico e retida, via tracemalloc).
+Com --guardar/--comparar fica um baseline em JSON, para que qualquer
+refactor da formatação venha acompanhado de números.
+
+Uso:
+    python -m perf.serializacao                         # corre e imprime a tabela
+    python -m perf.serializacao --guardar antes.json
+    python -m perf.serializacao --comparar antes.json   # diferença % face ao baseline
+    python -m perf.serializacao --gravar                # regrava as linhas a partir da base de perf
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import gc
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+import uuid
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from unittest import mock
+
+from tabulate import tabulate
+
+from perf import PERF_DATABASE_URL
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures" / "serializacao.json"
+
+# Cada ronda cronometrada dura pelo menos isto (as ops são repetidas até lá)
+TEMPO_MIN_RONDA_S = 0.02
+
+
+# ─── Gravação das linhas ──────────────────────────────────────────────────────
+
+def _codificar(valor: Any) -> Any:
+    """Valores da base → JSON, com etiqueta de tipo para os que o JSON não tem."""
+    if isinstance(valor, datetime):
+        return {"__datetime__": valor.isoformat()}
+    if isinstance(valor, date):
+        return {"__date__": valor.isoformat()}
+    if isinstance(valor, timedelta):
+        return {"__timedelta__": valor.total_seconds()}
+    if isinstance(valor, uuid.UUID):
+        return {"__uuid__": str(valor)}
+    if isinstance(valor, Decimal):
+        return {"__decimal__": str(valor)}
+    if isinstance(valor, (bytes, memoryview)):
+        return {"__bytes__": base64.b64encode(bytes(valor)).decode()}
+    if isinstance(valor, dict):
+        return {k: _codificar(v) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [_codificar(v) for v in valor]
+    return valor
+
+
+_DESCODIFICADORES: Dict[str, Callable[[Any], Any]] = {
+    "__datetime__": datetime.fromisoformat,
+    "__date__": date.fromisoformat,
+    "__timedelta__": lambda s: timedelta(seconds=s),
+    "__uuid__": uuid.UUID,
+    "__decimal__": Decimal,
+    "__bytes__": base64.b64decode,
+}
+
+
+def _descodificar(valor: Any) -> Any:
+    if isinstance(valor, dict):
+        if len(valor) == 1:
+            chave = next(iter(valor))
+            if chave in _DESCODIFICADORES:
+                return _DESCODIFICADORES[chave](valor[chave])
+        return {k: _descodificar(v) for k, v in valor.items()}
+    if isinstance(valor, list):
+        return [_descodificar(v) for v in valor]
+    return valor
+
+
+def _gravar_chamadas(modulo, nome_funcao: str, chamadas: List[tuple]):
+    """Patch que deixa a função correr normalmente mas guarda os argumentos de cada chamada."""
+    original = getattr(modulo, nome_funcao)
+
+    def _registar(*args):
+        chamadas.append(args)
+        return original(*args)
+
+    return mock.patch.object(modulo, nome_funcao, _registar)
+
+
+def gravar_linhas(dsn: str, limite: int = 100) -> Dict[str, Any]:
+    """
+    Corre as funções de serviço reais contra a base de perf e grava as linhas
+    que chegam às funções de formatação (no máximo `limite` por benchmark).
+    """
+    from perf.planos import capturar_sql
+    from services import aula_service, equipment_service, musica_service
+
+    linhas: Dict[str, Any] = {}
+
+    chamadas: List[tuple] = []
+    with capturar_sql(dsn, aula_service), _gravar_chamadas(aula_service, "_payload_aula_lista", chamadas):
+        aula_service.listar_todas_aulas(limite=limite)
+    linhas["listar_todas_aulas"] = [
+        {
+            "aula": aula.model_dump(warnings=False),
+            "turma": turma.model_dump(warnings=False) if turma else None,
+            "estabelecimento": estab.model_dump(warnings=False) if estab else None,
+            "mentor": mentor.model_dump(warnings=False) if mentor else None,
+            "atividade": list(uuid_map.get(str(aula.atividade_uuid), (None, None))) if aula.atividade_uuid else None,
+            "participantes": participantes.get(aula.id, []),
+        }
+        for aula, turma, estab, mentor, uuid_map, participantes in chamadas
+    ]
+
+    chamadas = []
+    with capturar_sql(dsn, musica_service), _gravar_chamadas(musica_service, "_musica_de_linha", chamadas):
+        musica_service.listar_musicas()
+    linhas["listar_musicas"] = [list(args[0]) for args in chamadas[:limite]]
+
+    chamadas = []
+    with capturar_sql(dsn, aula_service), _gravar_chamadas(aula_service, "_formatar_linha_export", chamadas):
+        aula_service.listar_aulas_export(data_inicio="2026-01-01", data_fim="2026-03-31")
+    amostra = [args[0] for args in chamadas[:limite]]
+    colunas = list(amostra[0]) if amostra else []
+    linhas["listar_aulas_export"] = {"colunas": colunas, "linhas": [[d[c] for c in colunas] for d in amostra]}
+
+    chamadas = []
+    with capturar_sql(dsn, equipment_service), _gravar_chamadas(equipment_service, "_item_de_linha", chamadas):
+        equipment_service.listar_itens()
+    linhas["listar_itens"] = [list(args[0]) for args in chamadas[:limite]]
+    return linhas
+
+
+def guardar_fixtures(linhas: Dict[str, Any], caminho: Path = FIXTURES):
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    caminho.write_text(json.dumps(_codificar(linhas), ensure_ascii=False, separators=(",", ":")) + "\n",
+                       encoding="utf-8")
+
+
+def carregar_fixtures(caminho: Path = FIXTURES) -> Dict[str, Any]:
+    return _descodificar(json.loads(caminho.read_text(encoding="utf-8")))
+
+
+# ─── Benchmarks ───────────────────────────────────────────────────────────────
+
+def _preparar_listar_todas_aulas(registos: List[dict]) -> Callable[[], List[dict]]:
+    from models.sqlmodel_models import Aula, AulaListItem, Estabelecimento, Mentor, Turma
+    from services.aula_service import _payload_aula_lista
+
+    linhas = []
+    uuid_map: Dict[str, tuple] = {}
+    participantes: Dict[int, List[str]] = {}
+    for r in registos:
+        aula = Aula(**r["aula"])
+        linhas.append((
+            aula,
+            Turma(**r["turma"]) if r["turma"] else None,
+            Estabelecimento(**r["estabelecimento"]) if r["estabelecimento"] else None,
+            Mentor(**r["mentor"]) if r["mentor"] else None,
+        ))
+        if r["atividade"]:
+            uuid_map[str(aula.atividade_uuid)] = tuple(r["atividade"])
+        if r["participantes"]:
+            participantes[aula.id] = r["participantes"]
+
+    def _op():
+        return [
+            AulaListItem.model_validate(
+                _payload_aula_lista(aula, turma, estab, mentor, uuid_map, participantes)
+            ).model_dump()
+            for aula, turma, estab, mentor in linhas
+        ]
+    return _op
+
+
+def _preparar_listar_musicas(linhas: List[list]) -> Callable[[], List[dict]]:
+    from services.musica_service import _musica_de_linha
+    tuplos = [tuple(r) for r in linhas]
+    return lambda: [_musica_de_linha(r) for r in tuplos]
+
+
+def _preparar_listar_aulas_export(dados: dict) -> Callable[[], List[dict]]:
+    from services.aula_service import _formatar_linha_export
+    colunas = dados["colunas"]
+    tuplos = [tuple(r) for r in dados["linhas"]]
+    # Como no serviço: dict(zip(cols, row)) faz parte do custo por linha
+    return lambda: [_formatar_linha_export(dict(zip(colunas, r))) for r in tuplos]
+
+
+def _preparar_listar_itens(linhas: List[list]) -> Callable[[], List[dict]]:
+    from services.equipment_service import _item_de_linha
+    tuplos = [tuple(r) for r in linhas]
+    return lambda: [_item_de_linha(r) for r in tuplos]
+
+
+BENCHMARKS: Dict[str, Callable[[Any], Callable[[], List[dict]]]] = {
+    "listar_todas_aulas": _preparar_listar_todas_aulas,
+    "listar_musicas": _preparar_listar_musicas,
+    "listar_aulas_export": _preparar_listar_aulas_export,
+    "listar_itens": _preparar_listar_itens,
+}
+
+
+def preparar(nome: str, fixtures: Optional[Dict[str, Any]] = None) -> Callable[[], List[dict]]:
+    """Função sem argumentos que formata todas as linhas gravadas do benchmark `nome`."""
+    fixtures = fixtures if fixtures is not None else carregar_fixtures()
+    return BENCHMARKS[nome](fixtures[nome])
+
+
+@dataclass
+class Medicao:
+    nome: str
+    linhas: int
+    ops_s: float
+    us_linha: float
+    desvio_pct: float
+    pico_kib: float
+    retido_kib: float
+
+
+def medir(nome: str, op: Callable[[], List[dict]], rondas: int = 7,
+          tempo_min_ronda_s: float = TEMPO_MIN_RONDA_S) -> Medicao:
+    """
+    Calibra o nº de repetições por ronda, cronometra `rondas` rondas com o GC
+    desligado (como o timeit) e usa a mediana. A memória mede-se numa op à parte,
+    com o tracemalloc ligado, para não distorcer os tempos.
+    """
+    n_linhas = len(op())  # aquecimento
+
+    repeticoes = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(repeticoes):
+            op()
+        if time.perf_counter() - t0 >= tempo_min_ronda_s or repeticoes >= 1 << 20:
+            break
+        repeticoes *= 2
+
+    tempos = []
+    gc_ativo = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(rondas):
+            t0 = time.perf_counter()
+            for _ in range(repeticoes):
+                op()
+            tempos.append((time.perf_counter() - t0) / repeticoes)
+    finally:
+        if gc_ativo:
+            gc.enable()
+
+    mediana = statistics.median(tempos)
+    desvio = statistics.pstdev(tempos) / mediana * 100 if mediana else 0.0
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        antes, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        resultado = op()
+        depois, pico = tracemalloc.get_traced_memory()
+        del resultado
+    finally:
+        tracemalloc.stop()
+
+    return Medicao(
+        nome=nome, linhas=n_linhas,
+        ops_s=1.0 / mediana if mediana else 0.0,
+        us_linha=mediana / max(n_linhas, 1) * 1e6,
+        desvio_pct=desvio,
+        pico_kib=(pico - antes) / 1024,
+        retido_kib=(depois - antes) / 1024,
+    )
+
+
+def relatorio(medicoes: List[Medicao], baseline: Optional[Dict[str, dict]] = None) -> str:
+    cabecalho = ["benchmark", "linhas", "ops/s", "µs/linha", "±%", "pico KiB/op", "retido KiB/op"]
+    if baseline:
+        cabecalho += ["Δ ops/s", "Δ pico"]
+    linhas = []
+    for m in medicoes:
+        linha = [m.nome, m.linhas, f"{m.ops_s:,.1f}", f"{m.us_linha:.2f}", f"{m.desvio_pct:.1f}",
+                 f"{m.pico_kib:,.1f}", f"{m.retido_kib:,.1f}"]
+        if baseline:
+            base = baseline.get(m.nome)
+            if base:
+                linha += [f"{(m.ops_s / base['ops_s'] - 1) * 100:+.1f}%",
+                          f"{(m.pico_kib / base['pico_kib'] - 1) * 100:+.1f}%" if base["pico_kib"] else "-"]
+            else:
+                linha += ["-", "-"]
+        linhas.append(linha)
+    return tabulate(linhas, headers=cabecalho)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks da formatação de linhas.")
+    parser.add_argument("benchmarks", nargs="*", help="Nomes (por omissão, todos)")
+    parser.add_argument("--rondas", type=int, default=7)
+    parser.add_argument("--guardar", type=Path, help="Guardar as medições como baseline (JSON)")
+    parser.add_argument("--comparar", type=Path, help="Comparar com um baseline guardado")
+    parser.add_argument("--gravar", action="store_true", help="Regravar as linhas a partir da base de perf")
+    parser.add_argument("--dsn", default=PERF_DATABASE_URL)
+    parser.add_argument("--limite", type=int, default=100, help="Linhas gravadas por benchmark (com --gravar)")
+    args = parser.parse_args(argv)
+
+    if args.gravar:
+        if not args.dsn:
+            parser.error("--gravar precisa de --dsn ou PERF_DATABASE_URL")
+        linhas = gravar_linhas(args.dsn, args.limite)
+        guardar_fixtures(linhas)
+        print(f"Gravado em {FIXTURES}: " + ", ".join(
+            f"{k}={len(v['linhas'] if isinstance(v, dict) else v)}" for k, v in linhas.items()))
+
+    fixtures = carregar_fixtures()
+    nomes = args.benchmarks or list(BENCHMARKS)
+    medicoes = [medir(nome, preparar(nome, fixtures), rondas=args.rondas) for nome in nomes]
+    baseline = json.loads(args.comparar.read_text()) if args.comparar else None
+    print(relatorio(medicoes, baseline))
+    if args.guardar:
+        args.guardar.write_text(json.dumps({m.nome: asdict(m) for m in medicoes}, indent=1) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
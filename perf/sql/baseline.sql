@@ -0,0 +1,221 @@
+-- ==============================================================================
+-- BASELINE PERF: schema de partida para uma base Postgres local (sem Supabase)
+-- ==============================================================================
+-- As tabelas base (profiles, musicas, notificacoes, estabelecimentos, ...) foram
+-- criadas no Supabase antes de existirem migrações. Este ficheiro reconstrói
+-- esse estado inicial, mais um "shim" mínimo dos schemas auth/storage, para que
+-- migrations/*.sql possam ser aplicadas por ordem numa base vazia.
+--
+-- Usado apenas pelas ferramentas em perf/ — NUNCA aplicar em produção.
+-- ==============================================================================
+
+-- ─── Shim Supabase ────────────────────────────────────────────────────────────
+CREATE SCHEMA IF NOT EXISTS auth;
+CREATE SCHEMA IF NOT EXISTS storage;
+
+CREATE TABLE IF NOT EXISTS auth.users (
+    id                  UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    email               VARCHAR(255),
+    raw_user_meta_data  JSONB DEFAULT '{}'::jsonb,
+    created_at          TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE OR REPLACE FUNCTION auth.uid() RETURNS UUID
+LANGUAGE sql STABLE AS $$
+  SELECT NULLIF(current_setting('request.jwt.claim.sub', true), '')::uuid;
+$$;
+
+CREATE TABLE IF NOT EXISTS storage.objects (
+    id         UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    bucket_id  TEXT,
+    name       TEXT,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+DO $$
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN
+    CREATE ROLE anon NOLOGIN;
+  END IF;
+  IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'authenticated') THEN
+    CREATE ROLE authenticated NOLOGIN;
+  END IF;
+  IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'service_role') THEN
+    CREATE ROLE service_role NOLOGIN;
+  END IF;
+  IF NOT EXISTS (SELECT 1 FROM pg_publication WHERE pubname = 'supabase_realtime') THEN
+    CREATE PUBLICATION supabase_realtime;
+  END IF;
+END $$;
+
+-- ─── Tabelas base (estado anterior à migração 001) ─────────────────────────────
+CREATE TABLE IF NOT EXISTS profiles (
+    id             UUID PRIMARY KEY REFERENCES auth.users(id) ON DELETE CASCADE,
+    email          VARCHAR(255),
+    full_name      VARCHAR(255),
+    role           VARCHAR(50) DEFAULT 'mentor',
+    avatar_url     TEXT,
+    producao_cols  JSONB,
+    created_at     TIMESTAMPTZ DEFAULT NOW(),
+    updated_at     TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS projetos (
+    id            SERIAL PRIMARY KEY,
+    nome          VARCHAR(255) NOT NULL,
+    descricao     TEXT,
+    data_inicio   DATE,
+    data_fim      DATE,
+    estado        VARCHAR(50) DEFAULT 'planejamento',
+    observacoes   TEXT,
+    requer_digitalizacao BOOLEAN NOT NULL DEFAULT FALSE,
+    criado_em     TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS estabelecimentos (
+    id              SERIAL PRIMARY KEY,
+    nome            VARCHAR(255) NOT NULL,
+    sigla           VARCHAR(20),
+    tipo            VARCHAR(50) DEFAULT 'escola',
+    morada          TEXT,
+    codigo_postal   VARCHAR(20),
+    cidade          VARCHAR(100),
+    telefone        VARCHAR(50),
+    email           VARCHAR(255),
+    pessoa_contacto VARCHAR(255),
+    observacoes     TEXT,
+    ativa           BOOLEAN DEFAULT TRUE,
+    criado_em       TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    atualizado_em   TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS turmas (
+    id                 SERIAL PRIMARY KEY,
+    estabelecimento_id INTEGER NOT NULL REFERENCES estabelecimentos(id),
+    nome               VARCHAR(255) NOT NULL,
+    ano_escolar        VARCHAR(20),
+    numero_alunos      INTEGER,
+    faixa_etaria       VARCHAR(50),
+    nivel_rap          VARCHAR(50) DEFAULT 'iniciante',
+    observacoes        TEXT,
+    ativa              BOOLEAN DEFAULT TRUE,
+    criado_em          TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    atualizado_em      TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS mentores (
+    id              SERIAL PRIMARY KEY,
+    nome            VARCHAR(255) NOT NULL,
+    email           VARCHAR(255) UNIQUE,
+    telefone        VARCHAR(50),
+    perfil          VARCHAR(50) DEFAULT 'generalista',
+    biografia       TEXT,
+    disponibilidade TEXT,
+    observacoes     TEXT,
+    morada          TEXT,
+    latitude        DOUBLE PRECISION,
+    longitude       DOUBLE PRECISION,
+    ativo           BOOLEAN DEFAULT TRUE,
+    criado_em       TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    atualizado_em   TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS aulas (
+    id              SERIAL PRIMARY KEY,
+    projeto_id      INTEGER REFERENCES projetos(id),
+    turma_id        INTEGER NOT NULL REFERENCES turmas(id),
+    mentor_id       INTEGER NOT NULL REFERENCES mentores(id),
+    tipo            VARCHAR(50) DEFAULT 'pratica_escrita',
+    data_hora       TIMESTAMP NOT NULL,
+    duracao_minutos INTEGER DEFAULT 90,
+    estado          VARCHAR(50) DEFAULT 'agendada',
+    local           VARCHAR(255),
+    tema            VARCHAR(255),
+    objetivos       TEXT,
+    observacoes     TEXT,
+    criado_em       TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    atualizado_em   TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS musicas (
+    id                SERIAL PRIMARY KEY,
+    titulo            VARCHAR(255) NOT NULL,
+    estado            VARCHAR(50) NOT NULL DEFAULT 'gravação',
+    turma_id          INTEGER REFERENCES turmas(id) ON DELETE SET NULL,
+    disciplina        VARCHAR(100),
+    arquivado         BOOLEAN DEFAULT FALSE,
+    responsavel_id    UUID REFERENCES profiles(id) ON DELETE SET NULL,
+    criador_id        UUID REFERENCES profiles(id) ON DELETE SET NULL,
+    misturado_por_id  UUID REFERENCES profiles(id) ON DELETE SET NULL,
+    revisto_por_id    UUID REFERENCES profiles(id) ON DELETE SET NULL,
+    finalizado_por_id UUID REFERENCES profiles(id) ON DELETE SET NULL,
+    feedback          TEXT,
+    link_demo         TEXT,
+    criado_em         TIMESTAMPTZ DEFAULT timezone('utc'::text, now()),
+    updated_at        TIMESTAMPTZ DEFAULT timezone('utc'::text, now())
+);
+
+CREATE TABLE IF NOT EXISTS notificacoes (
+    id        SERIAL PRIMARY KEY,
+    user_id   UUID NOT NULL REFERENCES profiles(id) ON DELETE CASCADE,
+    tipo      VARCHAR(50) NOT NULL,
+    titulo    VARCHAR(255) NOT NULL,
+    mensagem  TEXT NOT NULL,
+    link      VARCHAR(255),
+    lida      BOOLEAN DEFAULT FALSE,
+    criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    metadados JSONB
+);
+CREATE INDEX IF NOT EXISTS idx_notificacoes_user_id ON notificacoes(user_id);
+CREATE INDEX IF NOT EXISTS idx_notificacoes_lida ON notificacoes(lida);
+
+-- Modelo global de disciplinas/atividades (substituído na migração 019)
+CREATE TABLE IF NOT EXISTS disciplinas (
+    id        SERIAL PRIMARY KEY,
+    nome      VARCHAR(200) NOT NULL,
+    descricao TEXT
+);
+
+CREATE TABLE IF NOT EXISTS atividades (
+    id                  SERIAL PRIMARY KEY,
+    disciplina_id       INTEGER REFERENCES disciplinas(id) ON DELETE CASCADE,
+    nome                VARCHAR(200) NOT NULL,
+    codigo              VARCHAR(50),
+    sessoes_padrao      INTEGER,
+    horas_padrao        NUMERIC,
+    producoes_esperadas INTEGER,
+    perfil_mentor       VARCHAR(100)
+);
+
+CREATE TABLE IF NOT EXISTS tarefas (
+    id          SERIAL PRIMARY KEY,
+    titulo      VARCHAR(255) NOT NULL,
+    descricao   TEXT,
+    prioridade  VARCHAR(20) DEFAULT 'medio',
+    data_limite DATE,
+    criado_por  UUID,
+    created_at  TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS tarefa_atribuicoes (
+    id           SERIAL PRIMARY KEY,
+    tarefa_id    INTEGER NOT NULL REFERENCES tarefas(id) ON DELETE CASCADE,
+    user_id      UUID NOT NULL,
+    estado       VARCHAR(20) DEFAULT 'pendente',
+    concluida_em TIMESTAMPTZ,
+    UNIQUE (tarefa_id, user_id)
+);
+
+ALTER TABLE aulas ADD COLUMN IF NOT EXISTS tarefa_id INTEGER REFERENCES tarefas(id) ON DELETE SET NULL;
+
+CREATE TABLE IF NOT EXISTS logs (
+    id               SERIAL PRIMARY KEY,
+    tipo_acao        VARCHAR(50) NOT NULL,
+    entidade         VARCHAR(50) NOT NULL,
+    entidade_id      INTEGER,
+    descricao        TEXT NOT NULL,
+    usuario          VARCHAR(255),
+    dados_adicionais TEXT,
+    criado_em        TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,3 @@
+-- A migração 019 renomeia turma_disciplinas mas recria o índice com o mesmo
+-- nome; no Supabase o índice antigo já tinha sido removido à mão.
+ALTER INDEX IF EXISTS idx_turma_disciplinas_turma RENAME TO idx_turma_disciplinas_old_turma;
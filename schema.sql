@@ -146,7 +146,7 @@ CREATE INDEX IF NOT EXISTS idx_aulas_turma_id ON aulas(turma_id);
 CREATE INDEX IF NOT EXISTS idx_aulas_mentor_id ON aulas(mentor_id);
 CREATE INDEX IF NOT EXISTS idx_aulas_projeto_id ON aulas(projeto_id);
 CREATE INDEX IF NOT EXISTS idx_aulas_estado ON aulas(estado);
-CREATE INDEX IF NOT EXISTS idx_aulas_data_hora ON aulas(data_hora);
+CREATE INDEX IF NOT EXISTS idx_aulas_data_hora_id ON aulas(data_hora, id);
 
 CREATE INDEX IF NOT EXISTS idx_turmas_instituicao_id ON turmas(instituicao_id);
 
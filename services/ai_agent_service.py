@@ -19,6 +19,8 @@ from typing import Any, Dict, List, Optional
 from google import genai
 from google.genai import types
 from dotenv import load_dotenv
+
+from config import externos
 import logging
 
 load_dotenv()
@@ -34,7 +36,7 @@ _client: Optional[genai.Client] = None
 def _get_client() -> genai.Client:
     global _client
     if _client is None:
-        _client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+        _client = genai.Client(api_key=externos.gemini_api_key(), http_options=externos.gemini_http_options())
     return _client
 
 SYSTEM_PROMPT = f"""Tu és o Assistente de Agendamento da RAP Nova Escola.
@@ -278,7 +280,7 @@ def processar_mensagem(
     Processa uma mensagem do utilizador com o Gemini.
     Devolve {'resposta': str, 'historico': list}.
     """
-    if not os.getenv("GEMINI_API_KEY"):
+    if not externos.gemini_api_key():
         return {
             "resposta": "⚠️ A chave da API do Gemini não está configurada. Adiciona GEMINI_API_KEY ao ficheiro .env.",
             "historico": historico or [],
@@ -16,11 +16,13 @@ import requests
 from sqlmodel import Session, text
 from supabase import create_client
 
+from config import externos
+
 from database.database import engine
 
 logger = logging.getLogger(__name__)
 
-supabase_url = os.environ.get("SUPABASE_URL")
+supabase_url = externos.base_url("supabase")
 supabase_key = os.environ.get("SUPABASE_SERVICE_KEY") or os.environ.get("SUPABASE_ANON_KEY")
 supabase = create_client(supabase_url, supabase_key)
 
@@ -4,14 +4,22 @@ Serviço de aulas migrado para SQLModel.
 
 from __future__ import annotations
 
+import base64
+import hashlib
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple, Union
+from zoneinfo import ZoneInfo
 
-from sqlalchemy import or_
+from psycopg2 import errors as pg_errors
+from sqlalchemy import insert, or_, text, tuple_
 from sqlmodel import Session, select
 
+from config.settings import TIMEZONE
 from database.connection import get_db_connection
 from database.database import engine
+from database.migracoes import MigracaoOpcional, executar_com_periodo
+from utils.campos import projetar
+from utils.single_flight import single_flight
 from models.sqlmodel_models import (
     Aula,
     AulaListItem,
@@ -54,6 +62,9 @@ ESTADOS_VALIDOS = [
 # Estados que aguardam confirmação do mentor (tratados como equivalentes)
 ESTADOS_PENDENTES = {ESTADO_AGENDADA, ESTADO_PENDENTE}
 
+# Estados em que a sessão já não ocupa o horário do mentor (ver migração 065)
+ESTADOS_SEM_HORARIO = (ESTADO_CANCELADA, ESTADO_RECUSADA)
+
 
 
 
@@ -115,6 +126,138 @@ TIPOS_ATIVIDADE_AUTONOMA = [
 ]
 
 
+def _tipo_e_estado_inicial(tipo, is_autonomous, mentor_id) -> Tuple[Optional[str], str]:
+    """(tipo gravado, estado inicial) de uma sessão nova."""
+    if tipo == "trabalho_interno":
+        return "trabalho_interno", "confirmada"
+    tipo_final = "trabalho_autonomo" if is_autonomous else tipo
+    if tipo == "outro":
+        return tipo_final, "confirmada"
+    if is_autonomous:
+        return tipo_final, "autonomo"
+    return tipo_final, ESTADO_PENDENTE if mentor_id else ESTADO_RASCUNHO
+
+
+def _notificar_mentor(mentor_id, titulo, mensagem, metadados):
+    """Notificação (e push) session_created para o profile do mentor; falhas só vão para o log."""
+    try:
+        from services import notification_service, profile_service, turma_service
+
+        email_mentor = turma_service.obter_email_mentor(mentor_id)
+        if email_mentor:
+            profile_id = profile_service.obter_profile_id_por_email(email_mentor)
+            if profile_id:
+                notification_service.criar_notificacao(
+                    user_id=profile_id,
+                    tipo="session_created",
+                    titulo=titulo,
+                    mensagem=mensagem,
+                    link="/horarios",
+                    metadados=metadados,
+                )
+    except Exception as e:
+        logger.warning("Erro ao criar notificacao: %s", e)
+
+
+class ConflitoHorario(Exception):
+    """O mentor já tem outra sessão nesse horário (restrição da migração 065 ou uma série dele)."""
+
+
+def conflitos_mentor(
+    mentor_id, data_hora, duracao_minutos, excluir_aula_id=None, excluir_serie_id=None,
+) -> List[Dict[str, Any]]:
+    """Sessões ativas do mentor que se sobrepõem a [data_hora, data_hora + duracao_minutos).
+
+    Inclui as ocorrências por materializar das séries do mentor (migração 063),
+    com aula_id None e o serie_id. excluir_serie_id deixa de fora essa série,
+    materializada ou não.
+    """
+    if not mentor_id or not data_hora:
+        return []
+    inicio = _parse_data_hora(data_hora)
+    fim = inicio + timedelta(minutes=duracao_minutos or 0)
+    params: List[Any] = [mentor_id, inicio, fim, list(ESTADOS_SEM_HORARIO)]
+    exclusao = ""
+    if excluir_aula_id:
+        exclusao = "AND a.id <> %s"
+        params.append(excluir_aula_id)
+    if excluir_serie_id:
+        exclusao += " AND a.serie_id IS DISTINCT FROM %s"
+        params.append(excluir_serie_id)
+
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        executar_com_periodo(conn, cur, f"""
+            SELECT a.id, a.data_hora, a.duracao_minutos, a.estado,
+                   COALESCE(m.nome, p.full_name) AS mentor_nome
+            FROM aulas a
+            LEFT JOIN mentores m ON m.id = a.mentor_id
+            LEFT JOIN profiles p ON m.user_id::text = p.id::text
+            WHERE a.mentor_id = %s
+              AND a.periodo && tsrange(%s, %s)
+              AND a.estado <> ALL(%s)
+              {exclusao}
+            ORDER BY a.data_hora, a.id
+        """, params)
+        colunas = ("aula_id", "data_hora", "duracao_minutos", "estado", "mentor_nome")
+        conflitos = [dict(zip(colunas, linha)) for linha in cur.fetchall()]
+    finally:
+        conn.close()
+
+    from services import serie_service
+    conflitos += serie_service.ocorrencias_do_mentor(mentor_id, inicio, fim, excluir_serie_id)
+    conflitos.sort(key=lambda c: c["data_hora"])
+    return conflitos
+
+
+def _recusar_sobre_series(mentor_id, horarios: List[datetime], duracao_minutos, excluir_serie_id=None) -> None:
+    """
+    ConflitoHorario se alguma das sessões [horario, horario + duracao_minutos)
+    sobrepõe uma ocorrência por materializar de uma série do mentor. A restrição
+    da migração 065 só vê linhas de aulas, por isso esta verificação é da app.
+    """
+    if not mentor_id or not horarios or not duracao_minutos or duracao_minutos <= 0:
+        return
+    from services import serie_service
+
+    horarios = [hora_local(horario) for horario in horarios]
+    duracao = timedelta(minutes=duracao_minutos)
+    for ocorrencia in serie_service.ocorrencias_do_mentor(
+        mentor_id, min(horarios), max(horarios) + duracao, excluir_serie_id,
+    ):
+        fim = ocorrencia["data_hora"] + timedelta(minutes=ocorrencia["duracao_minutos"])
+        if any(horario < fim and ocorrencia["data_hora"] < horario + duracao for horario in horarios):
+            raise ConflitoHorario(
+                f"O mentor já tem uma sessão da série #{ocorrencia['serie_id']} "
+                f"a {ocorrencia['data_hora'].strftime('%d/%m/%Y %H:%M')}"
+            )
+
+
+def _notificar_conflitos_mentor(aula_id, mentor_id, data_hora, duracao_minutos) -> None:
+    """Avisa a coordenação (excecoes_service) se a sessão sobrepõe outra do mesmo mentor."""
+    try:
+        conflitos = conflitos_mentor(mentor_id, data_hora, duracao_minutos, excluir_aula_id=aula_id)
+        if not conflitos:
+            return
+        from services import excecoes_service
+        for conflito in conflitos:
+            excecoes_service.notificar_conflito_horario(
+                aula_id, conflito["aula_id"] or f"série {conflito['serie_id']}",
+                conflito["mentor_nome"] or f"#{mentor_id}", data_hora,
+            )
+        logger.warning("Aula #%s sobrepõe %s sessão(ões) do mentor #%s", aula_id, len(conflitos), mentor_id)
+    except Exception as e:
+        logger.warning("Erro ao verificar conflitos de horário do mentor: %s", e)
+
+
+def _e_conflito_horario(erro) -> bool:
+    """Erro (do psycopg2, ou IntegrityError do SQLAlchemy) da restrição aulas_mentor_sem_sobreposicao."""
+    return isinstance(erro, pg_errors.ExclusionViolation) or isinstance(
+        getattr(erro, "orig", None), pg_errors.ExclusionViolation
+    )
+
+
 def criar_aula(
     turma_id,
     data_hora,
@@ -149,22 +292,19 @@ def criar_aula(
         logger.error("Erro: data_hora e obrigatoria!")
         return None
 
-    if is_interno or is_outro:
-        estado_inicial = "confirmada"
-    elif is_autonomous:
-        estado_inicial = "autonomo"
-    else:
-        estado_inicial = ESTADO_PENDENTE if mentor_id else ESTADO_RASCUNHO
+    tipo_final, estado_inicial = _tipo_e_estado_inicial(tipo, is_autonomous, mentor_id)
 
     try:
         data_hora_dt = _parse_data_hora(data_hora)
+        if estado_inicial not in ESTADOS_SEM_HORARIO:
+            _recusar_sobre_series(mentor_id, [data_hora_dt], duracao_minutos)
 
         with Session(engine) as session:
             nova_aula = Aula(
                 turma_id=turma_id,
                 mentor_id=mentor_id,
                 projeto_id=projeto_id,
-                tipo="trabalho_interno" if is_interno else ("trabalho_autonomo" if is_autonomous else tipo),
+                tipo=tipo_final,
                 data_hora=data_hora_dt,
                 duracao_minutos=duracao_minutos,
                 estado=estado_inicial,
@@ -188,24 +328,16 @@ def criar_aula(
 
         logger.info("Aula #%s criada com sucesso!", nova_aula.id)
 
-        if mentor_id and not is_autonomous:
-            try:
-                from services import notification_service, profile_service, turma_service
+        if mentor_id:
+            _notificar_conflitos_mentor(nova_aula.id, mentor_id, data_hora_dt, duracao_minutos)
 
-                email_mentor = turma_service.obter_email_mentor(mentor_id)
-                if email_mentor:
-                    profile_id = profile_service.obter_profile_id_por_email(email_mentor)
-                    if profile_id:
-                        notification_service.criar_notificacao(
-                            user_id=profile_id,
-                            tipo="session_created",
-                            titulo="Nova Sessão Atribuída",
-                            mensagem=f"Foi-lhe atribuída uma nova sessão a {data_hora_dt}.",
-                            link="/horarios",
-                            metadados={"aula_id": nova_aula.id},
-                        )
-            except Exception as e:
-                logger.warning("Erro ao criar notificacao: %s", e)
+        if mentor_id and not is_autonomous:
+            _notificar_mentor(
+                mentor_id,
+                "Nova Sessão Atribuída",
+                f"Foi-lhe atribuída uma nova sessão a {data_hora_dt}.",
+                {"aula_id": nova_aula.id},
+            )
 
         if is_outro and participantes_ids:
             try:
@@ -241,7 +373,13 @@ def criar_aula(
 
         return _to_aula_read_dict(nova_aula)
 
+    except ConflitoHorario:
+        logger.warning("Aula não criada: mentor #%s tem uma série a %s", mentor_id, data_hora)
+        raise
     except Exception as e:
+        if _e_conflito_horario(e):
+            logger.warning("Aula não criada: mentor #%s já tem sessão a %s", mentor_id, data_hora)
+            raise ConflitoHorario("O mentor já tem outra sessão nesse horário") from e
         logger.error("Erro ao criar aula: %s", e)
         return None
 
@@ -264,47 +402,130 @@ def criar_aulas_recorrentes(
     sumario=None,
     codigo_sessao=None,
     participantes_ids=None,
+    criador_user_id=None,
 ):
-    """Cria N sessões com intervalo semanal."""
-    from datetime import timedelta
+    """Cria N sessões com intervalo semanal, numa só transação.
+
+    As sessões entram num INSERT multi-linha com RETURNING (insertmanyvalues do
+    SQLAlchemy) e os participantes num único INSERT … unnest; ou fica a série
+    toda ou nenhuma sessão. O mentor e cada participante recebem uma notificação
+    com a série inteira, em vez de uma (e um push) por sessão; as sobreposições
+    com outras sessões do mentor são avisadas por sessão, como em criar_aula.
+    Com a restrição da migração 065, uma sessão que colida com outra do mentor
+    levanta ConflitoHorario, tal como uma que caia sobre uma ocorrência por
+    materializar de uma série dele; os outros erros da base (ex: turma
+    inexistente) propagam-se.
+    """
+    if not is_autonomous and tipo not in ("trabalho_interno", "outro") and not turma_id:
+        logger.error("Erro: turma_id e obrigatorio para aulas regulares!")
+        return []
+    if not data_hora or semanas < 1:
+        return []
 
     data_hora_dt = _parse_data_hora(data_hora)
-    resultados = []
-    
+    tipo_final, estado_inicial = _tipo_e_estado_inicial(tipo, is_autonomous, mentor_id)
+
     # helper para iterar o N. de Sessão caso seja um número (ex: "1" vira "1", "2", "3")
     try:
         tema_is_num = tema and str(tema).isdigit()
     except Exception:
         tema_is_num = False
-        
-    for i in range(semanas):
-        data = data_hora_dt + timedelta(weeks=i)
-        
-        tema_sessao = tema
-        if tema_is_num:
-            tema_sessao = str(int(tema) + i)
-            
-        resultado = criar_aula(
+
+    linhas = [
+        dict(
             turma_id=turma_id,
-            data_hora=data,
-            tipo=tipo,
-            duracao_minutos=duracao_minutos,
             mentor_id=mentor_id,
-            local=local,
-            tema=tema_sessao,
             projeto_id=projeto_id,
+            tipo=tipo_final,
+            data_hora=data_hora_dt + timedelta(weeks=i),
+            duracao_minutos=duracao_minutos,
+            estado=estado_inicial,
+            local=local,
+            tema=str(int(tema) + i) if tema_is_num else tema,
             observacoes=observacoes,
             atividade_uuid=atividade_uuid,
             is_autonomous=is_autonomous,
+            is_realized=False,
             tipo_atividade=tipo_atividade,
             responsavel_user_id=responsavel_user_id,
             sumario=sumario,
             codigo_sessao=codigo_sessao,
-            participantes_ids=participantes_ids,
         )
-        if resultado:
-            resultados.append(resultado)
+        for i in range(semanas)
+    ]
+    participantes = list(dict.fromkeys(participantes_ids or [])) if tipo == "outro" else []
+    if estado_inicial not in ESTADOS_SEM_HORARIO:
+        _recusar_sobre_series(mentor_id, [linha["data_hora"] for linha in linhas], duracao_minutos)
+
+    try:
+        with Session(engine) as session:
+            aulas = session.scalars(
+                insert(Aula).returning(Aula, sort_by_parameter_order=True), linhas
+            ).all()
+            ids = [aula.id for aula in aulas]
+            if participantes:
+                session.execute(
+                    text("""
+                        INSERT INTO aula_participantes (aula_id, user_id)
+                        SELECT a.id, p.user_id
+                        FROM unnest(CAST(:aulas AS INTEGER[])) AS a(id)
+                        CROSS JOIN unnest(CAST(:participantes AS TEXT[])) AS p(user_id)
+                        ON CONFLICT DO NOTHING
+                    """),
+                    {"aulas": ids, "participantes": participantes},
+                )
+            resultados = [_to_aula_read_dict(aula) for aula in aulas]
+            session.commit()
+    except Exception as e:
+        if _e_conflito_horario(e):
+            logger.warning("Sessoes recorrentes não criadas: mentor #%s já tem sessão nesse horário", mentor_id)
+            raise ConflitoHorario("O mentor já tem outra sessão num dos horários da série") from e
+        raise
+
     logger.info("%s sessoes recorrentes criadas.", len(resultados))
+
+    if mentor_id:
+        for aula_id, linha in zip(ids, linhas):
+            _notificar_conflitos_mentor(aula_id, mentor_id, linha["data_hora"], duracao_minutos)
+
+    primeira, ultima = linhas[0]["data_hora"], linhas[-1]["data_hora"]
+    serie = len(ids) > 1
+    metadados = {"aula_id": ids[0], "aula_ids": ids}
+    if mentor_id and not is_autonomous:
+        if serie:
+            _notificar_mentor(
+                mentor_id,
+                "Novas Sessões Atribuídas",
+                f"Foram-lhe atribuídas {len(ids)} sessões semanais, "
+                f"de {primeira.strftime('%d/%m/%Y %H:%M')} a {ultima.strftime('%d/%m/%Y')}.",
+                metadados,
+            )
+        else:
+            _notificar_mentor(
+                mentor_id, "Nova Sessão Atribuída", f"Foi-lhe atribuída uma nova sessão a {primeira}.", metadados,
+            )
+
+    if participantes:
+        from services import notification_service
+
+        titulo = f"Nova sessão: {tema or 'Outro'}"
+        if serie:
+            mensagem = (
+                f'Foste adicionado a {len(ids)} sessões semanais de "{tema or "Outro"}", '
+                f'de {primeira.strftime("%d/%m %H:%M")} a {ultima.strftime("%d/%m")}.'
+            )
+        else:
+            mensagem = f'Foste adicionado a "{tema or "Outro"}" em {primeira.strftime("%d/%m %H:%M")}.'
+        for uid in participantes:
+            if uid != criador_user_id:
+                notification_service.criar_notificacao(
+                    user_id=uid,
+                    tipo="sessao_outro",
+                    titulo=titulo,
+                    mensagem=mensagem,
+                    link="/horarios",
+                    metadados=metadados,
+                )
     return resultados
 
 
@@ -731,117 +952,407 @@ def obter_aula_por_id(aula_id):
         return None
 
 
-def listar_todas_aulas(limite=2000, allowed_project_ids=None, hide_direcao_sessions=False):
-    try:
-        with Session(engine) as session:
-            # outerjoin em Turma/Estabelecimento para suportar sessões autónomas (sem turma_id)
-            statement = (
-                select(Aula, Turma, Estabelecimento, Mentor)
-                .outerjoin(Turma, Aula.turma_id == Turma.id)
-                .outerjoin(Estabelecimento, Turma.estabelecimento_id == Estabelecimento.id)
-                .outerjoin(Mentor, Aula.mentor_id == Mentor.id)
-                .order_by(Aula.data_hora.desc())
-                .limit(limite)
-            )
-            if allowed_project_ids is not None:
-                # Sessões presenciais são sempre devolvidas para coordenação de boleias.
-                # Presencial = tipo IS NULL (frontend não envia tipo para sessões regulares) ou tipo = 'aula'.
-                # Outros tipos (TA, outro, trabalho_interno) ficam restritos aos projetos do mentor.
-                statement = statement.where(
-                    or_(
-                        Aula.tipo.is_(None),
-                        Aula.tipo == 'aula',
-                        Aula.projeto_id.in_(allowed_project_ids),
-                    )
-                )
-            rows = session.exec(statement).all()
+def _payload_aula_lista(aula, turma, estabelecimento, mentor, uuid_map, participantes_map) -> Dict[str, Any]:
+    """Linha (Aula, Turma, Estabelecimento, Mentor) → payload de AulaListItem (ainda por validar)."""
+    uuid_str = str(aula.atividade_uuid) if aula.atividade_uuid else None
+    atv_nome, disc_nome = uuid_map.get(uuid_str, (None, None)) if uuid_str else (None, None)
+    return {
+        "id": aula.id,
+        "tipo": aula.tipo,
+        "data_hora": aula.data_hora,
+        "duracao_minutos": aula.duracao_minutos,
+        "estado": aula.estado,
+        "tema": aula.tema,
+        "local": aula.local,
+        "objetivos": aula.objetivos,
+        "observacoes": aula.observacoes,
+        "criado_em": aula.criado_em,
+        "atualizado_em": aula.atualizado_em,
+        "turma_nome": turma.nome if turma else None,
+        "turma_id": turma.id if turma else None,
+        "mentor_nome": mentor.nome if mentor else None,
+        "mentor_id": mentor.id if mentor else None,
+        "mentor_user_id": str(mentor.user_id) if mentor and mentor.user_id else None,
+        "estabelecimento_nome": estabelecimento.nome if estabelecimento else None,
+        "estabelecimento_sigla": estabelecimento.sigla if estabelecimento else None,
+        "projeto_id": aula.projeto_id,
+        "projeto_nome": None,
+        "atividade_uuid": uuid_str,
+        "atividade_nome": atv_nome,
+        "equipamento_nome": None,
+        "disciplina_nome": disc_nome,
+        "is_autonomous": aula.is_autonomous,
+        "is_realized": aula.is_realized,
+        "tipo_atividade": aula.tipo_atividade,
+        "responsavel_user_id": aula.responsavel_user_id,
+        "musica_id": aula.musica_id,
+        "avaliacao": aula.avaliacao,
+        "obs_termino": aula.obs_termino,
+        "tarefa_id": aula.tarefa_id,
+        "participantes_ids": participantes_map.get(aula.id, []),
+    }
+
+
+def _filtros_direcao(direcao_user_ids) -> list:
+    """Exclui sessões cujo mentor ou responsável seja da direção/root."""
+    ids = list(direcao_user_ids)
+    mentores_direcao = select(Mentor.id).where(Mentor.user_id.in_(ids))
+    return [
+        or_(Aula.mentor_id.is_(None), Aula.mentor_id.not_in(mentores_direcao)),
+        or_(Aula.responsavel_user_id.is_(None), Aula.responsavel_user_id.not_in(ids)),
+    ]
+
+
+def hora_local(data_hora: datetime) -> datetime:
+    """data_hora naive na hora de Lisboa, como está guardada em aulas.data_hora.
+
+    Datas com fuso (ex.: "2026-03-09T00:00:00Z" vindo do browser) são convertidas;
+    datas naive já estão na hora local e ficam como estão.
+    """
+    if data_hora.tzinfo is None:
+        return data_hora
+    return data_hora.astimezone(ZoneInfo(TIMEZONE)).replace(tzinfo=None)
 
-        # Batch fetch participants for 'outro' aulas
-        outro_aula_ids = [a.id for a, *_ in rows if a.tipo == 'outro']
-        participantes_map: Dict[int, List[str]] = {}
-        if outro_aula_ids:
-            try:
-                conn = get_db_connection()
-                cur = conn.cursor()
-                placeholders = ','.join(['%s'] * len(outro_aula_ids))
-                cur.execute(
-                    f"SELECT aula_id, user_id FROM aula_participantes WHERE aula_id IN ({placeholders})",
-                    outro_aula_ids,
-                )
-                for aula_id, user_id in cur.fetchall():
-                    participantes_map.setdefault(aula_id, []).append(user_id)
-            except Exception as e:
-                logger.warning("Erro ao buscar participantes: %s", e)
-            finally:
-                if 'cur' in locals() and cur:
-                    cur.close()
-                if 'conn' in locals() and conn:
-                    conn.close()
 
-        uuid_map = _resolver_atividades_uuid_bulk([a.atividade_uuid for a, *_ in rows])
+def _opaco(texto: str) -> str:
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip("=")
 
-        # Fetch direcao user ids once if filtering is needed
-        direcao_user_ids: set = set()
-        if hide_direcao_sessions:
-            try:
-                from services import settings_service as _settings_svc
-                direcao_user_ids = _settings_svc.obter_direcao_user_ids()
-            except Exception as e:
-                logger.warning("Erro ao buscar direcao_user_ids para filtro: %s", e)
 
-        aulas: List[Dict[str, Any]] = []
-        for aula, turma, estabelecimento, mentor in rows:
-            uuid_str = str(aula.atividade_uuid) if aula.atividade_uuid else None
-            atv_nome, disc_nome = uuid_map.get(uuid_str, (None, None)) if uuid_str else (None, None)
-            payload = {
-                "id": aula.id,
-                "tipo": aula.tipo,
-                "data_hora": aula.data_hora,
-                "duracao_minutos": aula.duracao_minutos,
-                "estado": aula.estado,
-                "tema": aula.tema,
-                "local": aula.local,
-                "objetivos": aula.objetivos,
-                "observacoes": aula.observacoes,
-                "criado_em": aula.criado_em,
-                "atualizado_em": aula.atualizado_em,
-                "turma_nome": turma.nome if turma else None,
-                "turma_id": turma.id if turma else None,
-                "mentor_nome": mentor.nome if mentor else None,
-                "mentor_id": mentor.id if mentor else None,
-                "mentor_user_id": str(mentor.user_id) if mentor and mentor.user_id else None,
-                "estabelecimento_nome": estabelecimento.nome if estabelecimento else None,
-                "estabelecimento_sigla": estabelecimento.sigla if estabelecimento else None,
-                "projeto_id": aula.projeto_id,
-                "projeto_nome": None,
-                "atividade_uuid": uuid_str,
-                "atividade_nome": atv_nome,
-                "equipamento_nome": None,
-                "disciplina_nome": disc_nome,
-                "is_autonomous": aula.is_autonomous,
-                "is_realized": aula.is_realized,
-                "tipo_atividade": aula.tipo_atividade,
-                "responsavel_user_id": aula.responsavel_user_id,
-                "musica_id": aula.musica_id,
-                "avaliacao": aula.avaliacao,
-                "obs_termino": aula.obs_termino,
-                "tarefa_id": aula.tarefa_id,
-                "participantes_ids": participantes_map.get(aula.id, []),
-            }
-            if hide_direcao_sessions and direcao_user_ids:
-                mentor_uid = payload.get("mentor_user_id")
-                resp_uid = str(payload.get("responsavel_user_id") or "")
-                if mentor_uid in direcao_user_ids or resp_uid in direcao_user_ids:
-                    continue
-            aulas.append(AulaListItem.model_validate(payload).model_dump())
+def _de_opaco(valor: str) -> str:
+    return base64.urlsafe_b64decode(valor + "=" * (-len(valor) % 4)).decode()
 
-        return aulas
 
+def codificar_cursor(data_hora: datetime, aula_id: int) -> str:
+    """Cursor opaco (base64url) da última aula de uma página: (data_hora, id)."""
+    return _opaco(f"{data_hora.isoformat()}|{aula_id}")
+
+
+def ler_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverso de codificar_cursor. Levanta ValueError se o cursor for inválido."""
+    try:
+        data_hora, aula_id = _de_opaco(cursor).split("|")
+        return datetime.fromisoformat(data_hora), int(aula_id)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise ValueError("Cursor inválido") from exc
+
+
+def codificar_token(momento: datetime, visao: str = "") -> str:
+    """Token opaco de GET /api/aulas/changes: hora (UTC) da base no pedido anterior
+    e a visão (visao_aulas) com que o cliente tinha a lista."""
+    return _opaco(f"t{momento.isoformat()}" + (f"|{visao}" if visao else ""))
+
+
+def _partes_token(token: str) -> Tuple[datetime, str]:
+    try:
+        texto = _de_opaco(token)
+        if not texto.startswith("t"):
+            raise ValueError(texto)
+        momento, _, visao = texto[1:].partition("|")
+        return datetime.fromisoformat(momento), visao
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise ValueError("Token inválido") from exc
+
+
+def ler_token(token: str) -> datetime:
+    """Inverso de codificar_token. Levanta ValueError se o token for inválido."""
+    return _partes_token(token)[0]
+
+
+def visao_do_token(token: str) -> str:
+    """Visão guardada no token ("" nos tokens anteriores à visão)."""
+    return _partes_token(token)[1]
+
+
+def visao_aulas(allowed_project_ids=None, direcao_user_ids: FrozenSet[str] = frozenset()) -> str:
+    """Resumo do que um utilizador vê na lista de aulas: projetos e mentores da direção
+    ocultos. Sem filtros é "" (o mesmo que os tokens antigos)."""
+    if allowed_project_ids is None and not direcao_user_ids:
+        return ""
+    chave = repr((
+        None if allowed_project_ids is None else sorted(allowed_project_ids),
+        sorted(direcao_user_ids),
+    ))
+    return hashlib.sha1(chave.encode()).hexdigest()[:12]
+
+
+def listar_todas_aulas(
+    limite=2000,
+    allowed_project_ids=None,
+    hide_direcao_sessions=False,
+    desde: Optional[datetime] = None,
+    ate: Optional[datetime] = None,
+    depois_de: Optional[Tuple[datetime, int]] = None,
+    campos: Optional[FrozenSet[str]] = None,
+):
+    """Aulas por data_hora DESC, id DESC.
+
+    desde/ate limitam a uma janela [desde, ate) (ex.: a semana do Horários) e
+    depois_de é o (data_hora, id) da última aula da página anterior (ler_cursor).
+    O índice idx_aulas_data_hora_id (060) serve a janela, o keyset e a ordenação,
+    por isso o custo de cada página não depende do histórico.
+    campos (utils.campos.ler_campos sobre CAMPOS_LISTA) limita o SELECT e o payload.
+    """
+    try:
+        return _listar_aulas(
+            limite=limite,
+            allowed_project_ids=allowed_project_ids,
+            hide_direcao_sessions=hide_direcao_sessions,
+            desde=desde,
+            ate=ate,
+            depois_de=depois_de,
+            campos=campos,
+        )
     except Exception as e:
         logger.error(f"Erro ao listar aulas: {e}")
         return []
 
 
+# Campos de cada aula na listagem (fields= de GET /api/aulas). id e data_hora
+# vêm sempre: identificam a aula e formam o cursor da página seguinte.
+CAMPOS_LISTA = tuple(AulaListItem.model_fields)
+CAMPOS_LISTA_SEMPRE = ("id", "data_hora")
+
+# calendar_entries (migração 062): uma linha por aula já no formato de AulaListItem.
+# Os campos que a listagem nunca preenche vêm a NULL.
+_CALENDARIO_SEM_COLUNA = ("sumario", "codigo_sessao", "projeto_nome", "equipamento_nome")
+# Obrigatórios em AulaListItem que fields= pode deixar de fora: só para a validação
+# das colunas pedidas passar, saem em projetar.
+_CALENDARIO_OBRIGATORIOS = {"duracao_minutos": 0, "estado": ""}
+_CALENDARIO = MigracaoOpcional("062", "calendar_entries", pg_errors.UndefinedTable, "a listar aulas com joins")
+
+
+def _listar_calendario(limite, allowed_project_ids, direcao_user_ids, desde, ate, depois_de, ids,
+                       campos=None) -> List[Dict[str, Any]]:
+    """Mesmos filtros e ordem de _listar_aulas, numa só query a calendar_entries.
+
+    Cada linha passa por AulaListItem, como nos joins, e só depois fica com os `campos` pedidos.
+    """
+    colunas = [c for c in CAMPOS_LISTA if campos is None or c in campos]
+    select = ", ".join(f"NULL AS {c}" if c in _CALENDARIO_SEM_COLUNA else c for c in colunas)
+    condicoes = []
+    params: Dict[str, Any] = {"limite": limite}
+    if desde is not None:
+        condicoes.append("data_hora >= %(desde)s")
+        params["desde"] = hora_local(desde)
+    if ate is not None:
+        condicoes.append("data_hora < %(ate)s")
+        params["ate"] = hora_local(ate)
+    if depois_de is not None:
+        condicoes.append("(data_hora, id) < (%(cursor_data_hora)s, %(cursor_id)s)")
+        params["cursor_data_hora"], params["cursor_id"] = depois_de
+    if ids is not None:
+        condicoes.append("id = ANY(%(ids)s)")
+        params["ids"] = list(ids)
+    if allowed_project_ids is not None:
+        # Presenciais sempre visíveis (ver o comentário do filtro em _listar_aulas)
+        condicoes.append("(tipo IS NULL OR tipo = 'aula' OR projeto_id = ANY(%(projetos)s))")
+        params["projetos"] = list(allowed_project_ids)
+    if direcao_user_ids:
+        condicoes.append("(mentor_user_id IS NULL OR mentor_user_id NOT IN %(direcao)s)")
+        condicoes.append("(responsavel_user_id IS NULL OR responsavel_user_id NOT IN %(direcao)s)")
+        params["direcao"] = tuple(sorted(direcao_user_ids))
+    where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(f"""
+            SELECT {select}
+            FROM calendar_entries
+            {where}
+            ORDER BY data_hora DESC, id DESC
+            LIMIT %(limite)s
+        """, params)
+        aulas = [
+            AulaListItem.model_validate({**_CALENDARIO_OBRIGATORIOS, **dict(zip(colunas, row))}).model_dump()
+            for row in cur.fetchall()
+        ]
+        cur.close()
+    finally:
+        conn.close()
+    return projetar(aulas, campos)
+
+
+def _listar_aulas(
+    limite=2000,
+    allowed_project_ids=None,
+    hide_direcao_sessions=False,
+    desde: Optional[datetime] = None,
+    ate: Optional[datetime] = None,
+    depois_de: Optional[Tuple[datetime, int]] = None,
+    ids: Optional[List[int]] = None,
+    campos: Optional[FrozenSet[str]] = None,
+) -> List[Dict[str, Any]]:
+    """Corpo de listar_todas_aulas, sem engolir erros. ids restringe a essas aulas.
+
+    Lê de calendar_entries; sem a migração 062 volta aos joins sobre aulas.
+    """
+    direcao_user_ids = _direcao_a_ocultar(hide_direcao_sessions)
+    return _CALENDARIO.executar(
+        lambda: _listar_calendario(limite, allowed_project_ids, direcao_user_ids, desde, ate, depois_de, ids, campos),
+        lambda: _listar_com_joins(limite, allowed_project_ids, direcao_user_ids, desde, ate, depois_de, ids, campos),
+    )
+
+
+def _direcao_a_ocultar(hide_direcao_sessions) -> FrozenSet[str]:
+    if not hide_direcao_sessions:
+        return frozenset()
+    from services import settings_service as _settings_svc
+    return _settings_svc.obter_direcao_user_ids()
+
+
+def _listar_com_joins(limite, allowed_project_ids, direcao_user_ids, desde, ate, depois_de, ids,
+                      campos=None) -> List[Dict[str, Any]]:
+    """_listar_aulas sem calendar_entries: joins sobre aulas (bases sem a migração 062)."""
+    filtros = _filtros_direcao(direcao_user_ids) if direcao_user_ids else []
+
+    with Session(engine) as session:
+        # outerjoin em Turma/Estabelecimento para suportar sessões autónomas (sem turma_id)
+        statement = (
+            select(Aula, Turma, Estabelecimento, Mentor)
+            .outerjoin(Turma, Aula.turma_id == Turma.id)
+            .outerjoin(Estabelecimento, Turma.estabelecimento_id == Estabelecimento.id)
+            .outerjoin(Mentor, Aula.mentor_id == Mentor.id)
+            .order_by(Aula.data_hora.desc(), Aula.id.desc())
+            .limit(limite)
+        )
+        if desde is not None:
+            statement = statement.where(Aula.data_hora >= hora_local(desde))
+        if ate is not None:
+            statement = statement.where(Aula.data_hora < hora_local(ate))
+        if depois_de is not None:
+            statement = statement.where(tuple_(Aula.data_hora, Aula.id) < tuple_(*depois_de))
+        if ids is not None:
+            statement = statement.where(Aula.id.in_(ids))
+        if allowed_project_ids is not None:
+            # Sessões presenciais são sempre devolvidas para coordenação de boleias.
+            # Presencial = tipo IS NULL (frontend não envia tipo para sessões regulares) ou tipo = 'aula'.
+            # Outros tipos (TA, outro, trabalho_interno) ficam restritos aos projetos do mentor.
+            # O OR fica como filtro do Index Scan Backward em idx_aulas_data_hora_id: como a
+            # maioria das aulas é presencial, lê-se pouco mais do que o limite (perf.listagem_aulas).
+            statement = statement.where(
+                or_(
+                    Aula.tipo.is_(None),
+                    Aula.tipo == 'aula',
+                    Aula.projeto_id.in_(allowed_project_ids),
+                )
+            )
+        if filtros:
+            statement = statement.where(*filtros)
+        rows = session.exec(statement).all()
+
+    # Batch fetch participants for 'outro' aulas
+    outro_aula_ids = [a.id for a, *_ in rows if a.tipo == 'outro']
+    participantes_map: Dict[int, List[str]] = {}
+    if outro_aula_ids:
+        try:
+            conn = get_db_connection()
+            cur = conn.cursor()
+            placeholders = ','.join(['%s'] * len(outro_aula_ids))
+            cur.execute(
+                f"SELECT aula_id, user_id FROM aula_participantes WHERE aula_id IN ({placeholders})",
+                outro_aula_ids,
+            )
+            for aula_id, user_id in cur.fetchall():
+                participantes_map.setdefault(aula_id, []).append(user_id)
+        except Exception as e:
+            logger.warning("Erro ao buscar participantes: %s", e)
+        finally:
+            if 'cur' in locals() and cur:
+                cur.close()
+            if 'conn' in locals() and conn:
+                conn.close()
+
+    uuid_map = _resolver_atividades_uuid_bulk([a.atividade_uuid for a, *_ in rows])
+
+    aulas: List[Dict[str, Any]] = []
+    for aula, turma, estabelecimento, mentor in rows:
+        payload = _payload_aula_lista(aula, turma, estabelecimento, mentor, uuid_map, participantes_map)
+        aulas.append(AulaListItem.model_validate(payload).model_dump())
+
+    return projetar(aulas, campos)
+
+
+# GET /api/aulas/changes (migrações 061 e 062)
+RETENCAO_APAGADAS = timedelta(days=90)  # tombstones mais antigas são apagadas pelo trigger
+# alterado_em/atualizado_em são a hora da escrita, não a do commit: uma transação
+# que demore a fazer commit pode ficar visível já depois do token. Relê-se esta
+# margem antes do token; o cliente aplica as alterações por id, por isso repetir é inofensivo.
+MARGEM_ALTERACOES = timedelta(seconds=60)
+LIMITE_ALTERACOES = 2000
+# calendar_entries.alterado_em muda também com os nomes (turma, estabelecimento,
+# mentor, atividade, disciplina) e os participantes; aulas.atualizado_em não.
+_ALTERADAS_SQL = "SELECT id FROM calendar_entries WHERE alterado_em > %s LIMIT %s"
+_ALTERADAS_SQL_AULAS = "SELECT id FROM aulas WHERE atualizado_em > %s LIMIT %s"
+
+
+def listar_alteracoes_aulas(
+    desde: Optional[datetime],
+    allowed_project_ids=None,
+    hide_direcao_sessions=False,
+    limite: int = LIMITE_ALTERACOES,
+    visao_anterior: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Aulas criadas, alteradas ou apagadas desde `desde` (ler_token).
+
+    Devolve {token, recarregar, alteradas, removidas}:
+      - alteradas: aulas no formato de listar_todas_aulas, com os mesmos filtros;
+      - removidas: ids apagados, ou alterados para fora do que o utilizador vê;
+      - recarregar: sem token, token mais antigo que RETENCAO_APAGADAS, mais de
+        `limite` alterações, ou visão diferente de `visao_anterior` (visao_do_token:
+        mudou o acesso a projetos ou o conjunto da direção, e aulas que não
+        mudaram entraram ou saíram da lista) — o cliente volta a pedir GET /api/aulas.
+
+    Sem a migração 062 só se vê aulas.atualizado_em: mudanças de nomes e de
+    participantes ficam de fora até a aula voltar a ser escrita.
+    """
+    direcao_user_ids = _direcao_a_ocultar(hide_direcao_sessions)
+    visao = visao_aulas(allowed_project_ids, direcao_user_ids)
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT clock_timestamp() AT TIME ZONE 'UTC'")
+        agora = cur.fetchone()[0]
+        resultado: Dict[str, Any] = {
+            "token": codificar_token(agora, visao), "recarregar": True, "alteradas": [], "removidas": [],
+        }
+        if desde is None or desde < agora - RETENCAO_APAGADAS:
+            return resultado
+        if visao_anterior is not None and visao_anterior != visao:
+            return resultado
+
+        limiar = desde - MARGEM_ALTERACOES
+
+        def _ids(sql):
+            cur.execute(sql, (limiar, limite + 1))
+            return [r[0] for r in cur.fetchall()]
+
+        alteradas_ids = _CALENDARIO.executar(
+            lambda: _ids(_ALTERADAS_SQL), lambda: _ids(_ALTERADAS_SQL_AULAS), conn=conn,
+        )
+        if len(alteradas_ids) > limite:
+            return resultado
+        cur.execute("SELECT aula_id FROM aulas_apagadas WHERE apagada_em > %s", (limiar,))
+        apagadas_ids = {r[0] for r in cur.fetchall()}
+        cur.close()
+    finally:
+        conn.close()
+
+    alteradas = []
+    if alteradas_ids:
+        alteradas = _CALENDARIO.executar(
+            lambda: _listar_calendario(len(alteradas_ids), allowed_project_ids, direcao_user_ids,
+                                       None, None, None, alteradas_ids),
+            lambda: _listar_com_joins(len(alteradas_ids), allowed_project_ids, direcao_user_ids,
+                                      None, None, None, alteradas_ids),
+        )
+    visiveis = {a["id"] for a in alteradas}
+    resultado["recarregar"] = False
+    resultado["alteradas"] = alteradas
+    resultado["removidas"] = sorted(apagadas_ids | (set(alteradas_ids) - visiveis))
+    return resultado
+
+
 def atualizar_aula(aula_id, dados):
     if not aula_id or not dados:
         return False
@@ -894,6 +1405,14 @@ def atualizar_aula(aula_id, dados):
 
             aula.atualizado_em = datetime.utcnow()
             mentor_id_para_notificar = aula.mentor_id
+            horario = None
+            if (
+                aula.mentor_id
+                and aula.estado not in ESTADOS_SEM_HORARIO
+                and dados.keys() & {"data_hora", "duracao_minutos", "mentor_id", "estado"}
+            ):
+                horario = (aula.mentor_id, aula.data_hora, aula.duracao_minutos)
+                _recusar_sobre_series(aula.mentor_id, [aula.data_hora], aula.duracao_minutos)
 
             # ORM: flush/commit gera UPDATE com os atributos sujos do objeto aula.
             session.add(aula)
@@ -901,6 +1420,9 @@ def atualizar_aula(aula_id, dados):
 
         logger.info(f"Aula #{aula_id} atualizada com sucesso!")
 
+        if horario:
+            _notificar_conflitos_mentor(aula_id, *horario)
+
         if should_notify_mentor_change and mentor_id_para_notificar:
             try:
                 from services import notification_service, profile_service, turma_service
@@ -925,7 +1447,13 @@ def atualizar_aula(aula_id, dados):
 
         return True
 
+    except ConflitoHorario:
+        logger.warning(f"Aula #{aula_id} não atualizada: sobrepõe uma série do mentor")
+        raise
     except Exception as e:
+        if _e_conflito_horario(e):
+            logger.warning(f"Aula #{aula_id} não atualizada: sobrepõe outra sessão do mentor")
+            raise ConflitoHorario("O mentor já tem outra sessão nesse horário") from e
         logger.error(f"Erro ao atualizar aula: {e}")
         return False
 
@@ -974,6 +1502,7 @@ def listar_sessoes_turma(turma_id, projeto_id=None):
         if 'conn' in locals() and conn: conn.close()
 
 
+@single_flight
 def listar_horas_equipa(projeto_id=None):
     """Agrega horas por colaborador, separando sessões-aula de trabalho autónomo."""
     try:
@@ -1186,6 +1715,32 @@ def listar_feedback_sessoes(projeto_id=None):
             conn.close()
 
 
+def _formatar_linha_export(d: Dict[str, Any]) -> Dict[str, Any]:
+    """Acrescenta colaborador, horas e datas formatadas a uma linha da exportação."""
+    # Determinar o responsável: mentor para presenciais, responsavel para autónomas
+    if d.get("is_autonomous"):
+        d["colaborador"] = d.get("responsavel_nome") or ""
+    else:
+        d["colaborador"] = d.get("mentor_nome") or ""
+    # Calcular hora início / fim
+    data_hora = d.get("data_hora")
+    duracao = d.get("duracao_minutos") or 0
+    if data_hora:
+        if not isinstance(data_hora, datetime):
+            data_hora = datetime.fromisoformat(str(data_hora))
+        d["hora_inicio"] = data_hora.strftime("%H:%M")
+        d["hora_fim"] = (data_hora + timedelta(minutes=duracao)).strftime("%H:%M")
+        d["data_fmt"] = data_hora.strftime("%d/%m/%Y")
+        d["data_hora_iso"] = data_hora.isoformat()
+    else:
+        d["hora_inicio"] = ""
+        d["hora_fim"] = ""
+        d["data_fmt"] = ""
+        d["data_hora_iso"] = ""
+    d["duracao_horas"] = round(duracao / 60, 2) if duracao else 0
+    return d
+
+
 def listar_aulas_export(
     projeto_ids: list = None,
     tipo_sessao: str = "todas",
@@ -1291,31 +1846,7 @@ def listar_aulas_export(
 
         rows = cur.fetchall()
         cols = [desc[0] for desc in cur.description]
-        result = []
-        for row in rows:
-            d = dict(zip(cols, row))
-            # Determinar o responsável: mentor para presenciais, responsavel para autónomas
-            if d.get("is_autonomous"):
-                d["colaborador"] = d.get("responsavel_nome") or ""
-            else:
-                d["colaborador"] = d.get("mentor_nome") or ""
-            # Calcular hora início / fim
-            data_hora = d.get("data_hora")
-            duracao = d.get("duracao_minutos") or 0
-            if data_hora:
-                if not isinstance(data_hora, datetime):
-                    data_hora = datetime.fromisoformat(str(data_hora))
-                d["hora_inicio"] = data_hora.strftime("%H:%M")
-                d["hora_fim"] = (data_hora + timedelta(minutes=duracao)).strftime("%H:%M")
-                d["data_fmt"] = data_hora.strftime("%d/%m/%Y")
-                d["data_hora_iso"] = data_hora.isoformat()
-            else:
-                d["hora_inicio"] = ""
-                d["hora_fim"] = ""
-                d["data_fmt"] = ""
-                d["data_hora_iso"] = ""
-            d["duracao_horas"] = round(duracao / 60, 2) if duracao else 0
-            result.append(d)
+        result = [_formatar_linha_export(dict(zip(cols, row))) for row in rows]
 
         cur.close()
         conn.close()
@@ -1335,6 +1866,8 @@ def apagar_aula(aula_id):
                 logger.error(f"Aula #{aula_id} não encontrada!")
                 return False
 
+            # Ocorrência materializada de uma série: o trigger da migração 063
+            # acrescenta a EXDATE, para não voltar a aparecer como ocorrência.
             session.delete(aula)
             session.commit()
 
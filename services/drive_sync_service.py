@@ -30,6 +30,8 @@ from googleapiclient.http import MediaIoBaseDownload
 import pypdf
 import docx
 
+from config import externos
+
 logger = logging.getLogger(__name__)
 
 FOLDER_ID = os.getenv("DRIVE_FOLDER_ID", "1m6AMj2zO5Ce5w8ippfsEvuMyWBPOeABu")
@@ -54,6 +56,16 @@ SUPPORTED_MIMES = {
 # ---------------------------------------------------------------------------
 
 def _get_drive_service():
+    if externos.usa_fakes():
+        # Stand-in local (perf/fakes.py): sem service account, mesmo cliente googleapiclient
+        from google.auth.credentials import AnonymousCredentials
+        return build(
+            "drive", "v3",
+            credentials=AnonymousCredentials(),
+            client_options={"api_endpoint": externos.base_url("drive")},
+            static_discovery=True,
+        )
+
     if not os.path.exists(SERVICE_ACCOUNT_FILE):
         raise FileNotFoundError(
             f"service_account.json não encontrado em {SERVICE_ACCOUNT_FILE}. "
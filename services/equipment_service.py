@@ -13,7 +13,9 @@ from datetime import datetime, timedelta
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from database.connection import get_db_connection
+from database.migracoes import executar_com_periodo
 from services import notification_service
+from utils.campos import projetar
 import logging
 
 logger = logging.getLogger(__name__)
@@ -125,11 +127,71 @@ ESTADOS_VALIDOS = [
 ]
 
 
-def listar_itens(categoria_id=None, estado=None):
+# Campos aceites em fields= de GET /api/equipamento/itens (chaves de _item_de_linha)
+CAMPOS_ITEM = (
+    "id", "nome", "identificador", "estado", "observacoes", "categoria_id",
+    "categoria_nome", "uuid", "localizacao_id", "localizacao_nome",
+    "localizacao_tipo", "ultimo_responsavel_id", "responsavel_nome", "ultima_utilizacao",
+)
+# Campos derivados da ultima sessao do item (LATERAL "ultima" de listar_itens)
+_CAMPOS_ULTIMA_SESSAO = frozenset(CAMPOS_ITEM[8:])
+# Campos em que a localizacao manual pode ganhar a da sessao
+_CAMPOS_LOCALIZACAO_MANUAL = frozenset({"localizacao_nome", "localizacao_tipo"})
+
+
+def _item_de_linha(r) -> dict:
+    """Linha do SELECT de listar_itens → dict do item com a localização derivada."""
+    sessao_estab_id = r[8]
+    sessao_estab_nome = r[9]
+    sessao_mentor_uid = r[10]
+    sessao_mentor_nome = r[11]
+    sessao_data = r[12]
+    manual_tipo = r[13]
+    manual_nome = r[15]
+    manual_atualizada = r[16]
+
+    # Logica de localizacao: manual (se mais recente) > estabelecimento > mentor
+    # Normalizar timezones para comparacao segura
+    _sessao_ts = sessao_data.replace(tzinfo=None) if sessao_data else None
+    _manual_ts = manual_atualizada.replace(tzinfo=None) if manual_atualizada else None
+    if manual_nome and (not _sessao_ts or (_manual_ts and _manual_ts >= _sessao_ts)):
+        loc_tipo = manual_tipo
+        loc_nome = manual_nome
+    elif sessao_estab_nome:
+        loc_tipo = 'estabelecimento'
+        loc_nome = sessao_estab_nome
+    elif sessao_mentor_nome:
+        loc_tipo = 'mentor'
+        loc_nome = sessao_mentor_nome
+    else:
+        loc_tipo = None
+        loc_nome = None
+
+    return {
+        "id": r[0],
+        "nome": r[1],
+        "identificador": r[2],
+        "estado": r[3],
+        "observacoes": r[4],
+        "categoria_id": r[5],
+        "categoria_nome": r[6],
+        "uuid": str(r[7]) if r[7] else None,
+        "localizacao_id": sessao_estab_id,
+        "localizacao_nome": loc_nome,
+        "localizacao_tipo": loc_tipo,
+        "ultimo_responsavel_id": str(sessao_mentor_uid) if sessao_mentor_uid else None,
+        "responsavel_nome": sessao_mentor_nome,
+        "ultima_utilizacao": sessao_data.isoformat() if sessao_data else None,
+    }
+
+
+def listar_itens(categoria_id=None, estado=None, campos=None):
     """
     Lista todos os itens individuais.
     Localizacao, ultimo responsavel e ultima utilizacao sao DERIVADOS
     da ultima sessao (passada) associada ao item via aula_equipamento.
+    campos (fields= do endpoint) limita o payload; sem nenhum campo derivado
+    da sessao o LATERAL sobre aula_equipamento/aulas nao corre.
     """
     try:
         conn = get_db_connection()
@@ -147,21 +209,15 @@ def listar_itens(categoria_id=None, estado=None):
 
         where = ("WHERE " + " AND ".join(filtros)) if filtros else ""
 
-        cur.execute(f"""
-            SELECT ki.id, ki.nome, ki.identificador, ki.estado, ki.observacoes,
-                   ki.categoria_id, kc.nome AS categoria_nome,
-                   ki.uuid,
-                   ultima.estabelecimento_id,
-                   ultima.estabelecimento_nome,
-                   ultima.mentor_user_id,
-                   ultima.mentor_nome,
-                   ultima.data_hora AS ultima_utilizacao,
-                   ki.localizacao_tipo,
-                   ki.localizacao_ref_id,
-                   ki.localizacao_nome,
-                   ki.localizacao_atualizada_em
-            FROM kit_itens ki
-            JOIN kit_categorias kc ON ki.categoria_id = kc.id
+        def _coluna(pedida, expr):
+            return expr if pedida else "NULL"
+
+        def _campo(campo, expr):
+            return _coluna(campos is None or campo in campos, expr)
+
+        com_sessao = campos is None or bool(campos & _CAMPOS_ULTIMA_SESSAO)
+        com_manual = campos is None or bool(campos & _CAMPOS_LOCALIZACAO_MANUAL)
+        lateral = """
             LEFT JOIN LATERAL (
                 SELECT e.id   AS estabelecimento_id,
                        e.nome AS estabelecimento_nome,
@@ -178,57 +234,32 @@ def listar_itens(categoria_id=None, estado=None):
                   AND a.data_hora <= NOW()
                 ORDER BY a.data_hora DESC
                 LIMIT 1
-            ) ultima ON true
+            ) ultima ON true""" if com_sessao else ""
+
+        cur.execute(f"""
+            SELECT ki.id, {_campo("nome", "ki.nome")}, {_campo("identificador", "ki.identificador")},
+                   {_campo("estado", "ki.estado")}, {_campo("observacoes", "ki.observacoes")},
+                   {_campo("categoria_id", "ki.categoria_id")}, {_campo("categoria_nome", "kc.nome")},
+                   {_campo("uuid", "ki.uuid")},
+                   {_coluna(com_sessao, "ultima.estabelecimento_id")},
+                   {_coluna(com_sessao, "ultima.estabelecimento_nome")},
+                   {_coluna(com_sessao, "ultima.mentor_user_id")},
+                   {_coluna(com_sessao, "ultima.mentor_nome")},
+                   {_coluna(com_sessao, "ultima.data_hora")},
+                   {_coluna(com_manual, "ki.localizacao_tipo")},
+                   {_coluna(com_manual, "ki.localizacao_ref_id")},
+                   {_coluna(com_manual, "ki.localizacao_nome")},
+                   {_coluna(com_manual, "ki.localizacao_atualizada_em")}
+            FROM kit_itens ki
+            JOIN kit_categorias kc ON ki.categoria_id = kc.id
+            {lateral}
             {where}
             ORDER BY kc.nome, ki.identificador
         """, params)
 
         rows = cur.fetchall()
-        result = []
-        for r in rows:
-            sessao_estab_id = r[8]
-            sessao_estab_nome = r[9]
-            sessao_mentor_uid = r[10]
-            sessao_mentor_nome = r[11]
-            sessao_data = r[12]
-            manual_tipo = r[13]
-            manual_nome = r[15]
-            manual_atualizada = r[16]
-
-            # Logica de localizacao: manual (se mais recente) > estabelecimento > mentor
-            # Normalizar timezones para comparacao segura
-            _sessao_ts = sessao_data.replace(tzinfo=None) if sessao_data else None
-            _manual_ts = manual_atualizada.replace(tzinfo=None) if manual_atualizada else None
-            if manual_nome and (not _sessao_ts or (_manual_ts and _manual_ts >= _sessao_ts)):
-                loc_tipo = manual_tipo
-                loc_nome = manual_nome
-            elif sessao_estab_nome:
-                loc_tipo = 'estabelecimento'
-                loc_nome = sessao_estab_nome
-            elif sessao_mentor_nome:
-                loc_tipo = 'mentor'
-                loc_nome = sessao_mentor_nome
-            else:
-                loc_tipo = None
-                loc_nome = None
-
-            result.append({
-                "id": r[0],
-                "nome": r[1],
-                "identificador": r[2],
-                "estado": r[3],
-                "observacoes": r[4],
-                "categoria_id": r[5],
-                "categoria_nome": r[6],
-                "uuid": str(r[7]) if r[7] else None,
-                "localizacao_id": sessao_estab_id,
-                "localizacao_nome": loc_nome,
-                "localizacao_tipo": loc_tipo,
-                "ultimo_responsavel_id": str(sessao_mentor_uid) if sessao_mentor_uid else None,
-                "responsavel_nome": sessao_mentor_nome,
-                "ultima_utilizacao": sessao_data.isoformat() if sessao_data else None,
-            })
-        return result
+        result = [_item_de_linha(r) for r in rows]
+        return projetar(result, campos)
 
     except Exception as e:
         logger.error("Erro ao listar itens: %s", e, exc_info=True)
@@ -610,15 +641,15 @@ def verificar_conflitos(item_ids, data_hora, duracao_minutos, excluir_aula_id=No
         fim_com_buffer = fim + timedelta(minutes=BUFFER_MINUTOS)
 
         placeholders = ','.join(['%s'] * len(item_ids))
-        params = list(item_ids) + [fim_com_buffer, inicio_com_buffer]
+        params = list(item_ids) + [inicio_com_buffer, fim_com_buffer]
 
         exclusao = ""
         if excluir_aula_id:
             exclusao = "AND a.id != %s"
             params.append(excluir_aula_id)
 
-        # Verificar sobreposicao temporal (com buffer de 1h)
-        cur.execute(f"""
+        # Verificar sobreposicao temporal (com buffer de 1h); a.periodo = [inicio, fim) da sessao
+        executar_com_periodo(conn, cur, f"""
             SELECT DISTINCT ki.id, ki.nome, ki.identificador, a.id AS aula_id,
                    a.data_hora, a.duracao_minutos,
                    e.nome AS estabelecimento_nome,
@@ -631,8 +662,7 @@ def verificar_conflitos(item_ids, data_hora, duracao_minutos, excluir_aula_id=No
             LEFT JOIN mentores m ON a.mentor_id = m.id
             LEFT JOIN profiles p ON m.user_id::text = p.id::text
             WHERE ae.item_id IN ({placeholders})
-              AND a.data_hora < %s
-              AND (a.data_hora + (a.duracao_minutos * INTERVAL '1 minute')) > %s
+              AND a.periodo && tsrange(%s, %s)
               {exclusao}
             ORDER BY ki.id
         """, params)
@@ -696,7 +726,7 @@ def listar_ocupacoes_item(item_id):
         conn = get_db_connection()
         cur = conn.cursor()
 
-        cur.execute("""
+        executar_com_periodo(conn, cur, """
             SELECT a.id, a.data_hora, a.duracao_minutos,
                    t.nome AS turma_nome, e.nome AS estabelecimento_nome,
                    p.full_name AS mentor_nome
@@ -707,7 +737,7 @@ def listar_ocupacoes_item(item_id):
             LEFT JOIN mentores m ON a.mentor_id = m.id
             LEFT JOIN profiles p ON m.user_id::text = p.id::text
             WHERE ae.item_id = %s
-              AND (a.data_hora + (a.duracao_minutos * INTERVAL '1 minute')) > NOW()
+              AND a.periodo && tsrange(LOCALTIMESTAMP, NULL)
             ORDER BY a.data_hora
         """, (item_id,))
 
@@ -890,13 +920,12 @@ def obter_stats():
         categorias = cur.fetchone()[0]
 
         # Contar itens atualmente em uso (sessao a decorrer agora)
-        cur.execute("""
+        executar_com_periodo(conn, cur, """
             SELECT COUNT(DISTINCT ae.item_id)
             FROM aula_equipamento ae
             JOIN aulas a ON ae.aula_id = a.id
-            WHERE a.data_hora <= NOW()
-              AND (a.data_hora + (a.duracao_minutos * INTERVAL '1 minute')) >= NOW()
-        """)
+            WHERE a.periodo @> LOCALTIMESTAMP
+        """, None)
         em_uso = cur.fetchone()[0]
 
         return {
@@ -0,0 +1,468 @@
+"""
+index_advisor_service.py
+Sugestão de índices a partir das queries observadas (pg_stat_statements) e
+dos respetivos planos (EXPLAIN).
+
+Para cada query frequente procura nós do plano que leem muito mais linhas do
+que devolvem — Seq Scan filtrado em tabelas grandes ou Index Scan com Filter
+residual — e propõe o índice (completo ou parcial) que os resolveria, com uma
+estimativa de benefício (custo do nó atual vs custo estimado com o índice,
+multiplicado pelo número de chamadas).
+
+As propostas nunca são aplicadas automaticamente: conteudo_migracao() gera o
+SQL (CREATE INDEX CONCURRENTLY) de uma migração para revisão humana. O ficheiro
+é escrito por um programador no seu checkout (python -m perf.indices --migracao)
+e entra no repositório por commit; a API só devolve o SQL.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import re
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from database.connection import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "migrations"
+
+# Tabelas abaixo deste tamanho não justificam índices novos
+MIN_LINHAS_TABELA = 10_000
+# Uma coluna com menos valores distintos do que isto não serve como chave de índice
+MIN_DISTINTOS_CHAVE = 50
+# Um valor de coluna pouco seletiva só dá índice parcial se cobrir no máximo esta fração
+MAX_FRACAO_PARCIAL = 0.3
+# O índice tem de reduzir o custo estimado do nó em pelo menos 30%
+MIN_REDUCAO = 0.7
+# Custo aproximado de ler uma linha pelo índice (random_page_cost por omissão)
+CUSTO_LINHA_INDICE = 4.0
+# ... e quando a coluna segue a ordem física da tabela (ex: data_hora de aulas)
+CUSTO_LINHA_CORRELACIONADA = 0.05
+
+
+@dataclass
+class Condicao:
+    """Uma comparação sargável extraída de um Filter / Index Cond."""
+    coluna: str
+    operador: str          # '=', '<', '<=', '>', '>=', 'ANY'
+    valor: Optional[str]   # literal (sem aspas) ou None se for parâmetro/expressão
+
+
+@dataclass
+class Proposta:
+    tabela: str
+    colunas: List[str]
+    predicado: Optional[str] = None
+    custo_atual: float = 0.0
+    custo_estimado: float = 0.0
+    chamadas: int = 0
+    consultas: List[str] = field(default_factory=list)
+
+    @property
+    def beneficio(self) -> float:
+        return max(0.0, self.custo_atual - self.custo_estimado) * max(self.chamadas, 1)
+
+    @property
+    def nome(self) -> str:
+        partes = [self.tabela] + self.colunas
+        if self.predicado:
+            partes.append(re.sub(r"[^a-z0-9]+", "_", self.predicado.lower()).strip("_"))
+        return ("idx_" + "_".join(partes))[:63]
+
+    @property
+    def sql(self) -> str:
+        where = f" WHERE {self.predicado}" if self.predicado else ""
+        return (f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {self.nome} "
+                f"ON {self.tabela}({', '.join(self.colunas)}){where};")
+
+    def to_dict(self) -> Dict[str, Any]:
+        d = asdict(self)
+        d.update(nome=self.nome, sql=self.sql, beneficio=round(self.beneficio, 1))
+        return d
+
+
+# ─── Parsing das condições do plano ──────────────────────────────────────────
+
+_COMPARACAO = re.compile(
+    r"^\(*(?:(?P<alias>\w+)\.)?(?P<col>[a-z_][a-z0-9_]*)\)?(?:::[a-z ]+?)?\s*"
+    r"(?P<op>=\s*ANY|>=|<=|=|<|>)\s*"
+    r"(?P<valor>'(?:[^']|'')*'|\$\d+|true|false|-?\d+(?:\.\d+)?)?",
+    re.IGNORECASE,
+)
+_BOOLEANO = re.compile(r"^(?P<neg>NOT )?(?:(?P<alias>\w+)\.)?(?P<col>[a-z_][a-z0-9_]*)$", re.IGNORECASE)
+
+
+def _sem_parenteses(expr: str) -> str:
+    """Remove parênteses exteriores que envolvem a expressão inteira."""
+    expr = expr.strip()
+    while expr.startswith("(") and expr.endswith(")"):
+        nivel = 0
+        for i, c in enumerate(expr):
+            nivel += (c == "(") - (c == ")")
+            if nivel == 0 and i < len(expr) - 1:
+                return expr
+        expr = expr[1:-1].strip()
+    return expr
+
+
+def _conjuncoes(expr: str) -> List[str]:
+    """Divide uma expressão nos seus termos AND de topo (as disjunções ficam inteiras)."""
+    expr = _sem_parenteses(expr)
+    termos, nivel, inicio, i = [], 0, 0, 0
+    dentro_string = False
+    while i < len(expr):
+        c = expr[i]
+        if c == "'":
+            dentro_string = not dentro_string
+        elif not dentro_string:
+            if c == "(":
+                nivel += 1
+            elif c == ")":
+                nivel -= 1
+            elif nivel == 0 and expr.startswith(" AND ", i):
+                termos.append(expr[inicio:i])
+                inicio = i + 5
+                i += 5
+                continue
+        i += 1
+    termos.append(expr[inicio:])
+    resultado: List[str] = []
+    for termo in termos:
+        termo = _sem_parenteses(termo)
+        if termo != expr and " AND " in termo and " OR " not in termo:
+            resultado.extend(_conjuncoes(termo))
+        else:
+            resultado.append(termo)
+    return resultado
+
+
+def extrair_condicoes(expressao: str, colunas: Dict[str, str], alias: Optional[str] = None) -> List[Condicao]:
+    """
+    Extrai as comparações sargáveis (coluna op literal) de uma expressão de plano.
+    Só considera termos AND de topo (um OR não é resolúvel com um índice simples)
+    e colunas reais da tabela (`colunas` = {nome: tipo}) do nó `alias`.
+    """
+    if not expressao:
+        return []
+    condicoes: List[Condicao] = []
+    for termo in _conjuncoes(expressao):
+        if " OR " in termo.upper():
+            continue
+        m = _COMPARACAO.match(termo)
+        if m:
+            col = m.group("col").lower()
+            if col not in colunas or (m.group("alias") and alias and m.group("alias") != alias):
+                continue
+            op = "ANY" if "ANY" in m.group("op").upper() else m.group("op")
+            valor = m.group("valor")
+            if valor and valor.startswith("'"):
+                valor = valor[1:-1].replace("''", "'")
+            elif valor and valor.startswith("$"):
+                valor = None
+            condicoes.append(Condicao(col, op, valor))
+            continue
+        m = _BOOLEANO.match(termo)
+        if m and colunas.get(m.group("col").lower()) == "boolean":
+            if m.group("alias") and alias and m.group("alias") != alias:
+                continue
+            condicoes.append(Condicao(m.group("col").lower(), "=", "false" if m.group("neg") else "true"))
+    return condicoes
+
+
+def _literal_sql(valor: str, tipo: str) -> str:
+    if tipo == "boolean":
+        return valor.upper()
+    if tipo in ("integer", "bigint", "smallint", "numeric", "real", "double precision"):
+        return valor
+    return "'" + valor.replace("'", "''") + "'"
+
+
+# ─── Estatísticas ────────────────────────────────────────────────────────────
+
+@dataclass
+class _InfoTabela:
+    linhas: float
+    colunas: Dict[str, str]
+    distintos: Dict[str, float]
+    frequentes: Dict[str, Dict[str, float]]
+    correlacao: Dict[str, float]
+    indices: List[Tuple[List[str], Optional[str]]]
+
+    def seletividade(self, cond: Condicao) -> Optional[float]:
+        """Fração estimada das linhas que cumprem uma igualdade (None se desconhecida)."""
+        if cond.operador not in ("=", "ANY"):
+            return None
+        freq = self.frequentes.get(cond.coluna, {})
+        if cond.valor is not None and cond.valor in freq:
+            return freq[cond.valor]
+        distintos = self.distintos.get(cond.coluna)
+        if not distintos:
+            return None
+        resto = 1.0 - sum(freq.values())
+        return max(resto, 0.0) / max(distintos - len(freq), 1.0)
+
+
+def _info_tabela(cur, tabela: str, cache: Dict[str, _InfoTabela]) -> Optional[_InfoTabela]:
+    if tabela in cache:
+        return cache[tabela]
+    cur.execute("SELECT reltuples FROM pg_class WHERE relname = %s AND relkind = 'r'", (tabela,))
+    row = cur.fetchone()
+    if not row:
+        return None
+    linhas = float(row[0])
+    cur.execute("""
+        SELECT column_name, data_type FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = %s
+    """, (tabela,))
+    colunas = dict(cur.fetchall())
+    cur.execute("""
+        SELECT attname, n_distinct, most_common_vals::text, most_common_freqs, correlation
+        FROM pg_stats WHERE schemaname = 'public' AND tablename = %s
+    """, (tabela,))
+    distintos, frequentes, correlacao = {}, {}, {}
+    for col, n_distinct, mcv, freqs, corr in cur.fetchall():
+        correlacao[col] = corr or 0.0
+        distintos[col] = n_distinct if n_distinct >= 0 else -n_distinct * linhas
+        if mcv and freqs:
+            valores = [v.strip('"') for v in _dividir_array(mcv)]
+            if colunas.get(col) == "boolean":
+                valores = [{"t": "true", "f": "false"}.get(v, v) for v in valores]
+            frequentes[col] = dict(zip(valores, freqs))
+    cur.execute("""
+        SELECT array_agg(a.attname ORDER BY k.ord), pg_get_expr(i.indpred, i.indrelid)
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indrelid
+        JOIN LATERAL unnest(i.indkey) WITH ORDINALITY AS k(attnum, ord) ON true
+        JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum = k.attnum
+        WHERE c.relname = %s
+        GROUP BY i.indexrelid, i.indpred, i.indrelid
+    """, (tabela,))
+    indices = [(list(cols), pred) for cols, pred in cur.fetchall()]
+    info = _InfoTabela(linhas, colunas, distintos, frequentes, correlacao, indices)
+    cache[tabela] = info
+    return info
+
+
+def _dividir_array(texto: str) -> List[str]:
+    """Divide o literal de um array Postgres ({a,"b c",d}) nos seus elementos."""
+    corpo = texto.strip()[1:-1]
+    return [m.group(0) for m in re.finditer(r'"(?:[^"\\]|\\.)*"|[^,]+', corpo)]
+
+
+# ─── Análise dos planos ──────────────────────────────────────────────────────
+
+def _percorrer(plano: Dict[str, Any]) -> Iterable[Dict[str, Any]]:
+    yield plano
+    for filho in plano.get("Plans", []):
+        yield from _percorrer(filho)
+
+
+def _custo_por_linha(info: _InfoTabela, coluna: str) -> float:
+    """Custo de ler uma linha pelo índice: aleatório, ou quase sequencial se a coluna
+    estiver correlacionada com a ordem física (interpolação como no planner)."""
+    c2 = info.correlacao.get(coluna, 0.0) ** 2
+    return CUSTO_LINHA_INDICE * (1.0 - c2) + CUSTO_LINHA_CORRELACIONADA * c2
+
+
+def _propor_para_no(no: Dict[str, Any], info: _InfoTabela) -> Optional[Proposta]:
+    tipo = no.get("Node Type")
+    tabela = no.get("Relation Name")
+    alias = no.get("Alias")
+    filhos = no.get("Plans", [])
+    if tipo == "Bitmap Heap Scan" and filhos and filhos[0].get("Node Type") == "BitmapAnd":
+        # Combinação de dois índices de uma coluna: todas as condições são candidatas
+        cond_indice: List[Condicao] = []
+        filtro = extrair_condicoes(no.get("Recheck Cond", ""), info.colunas, alias)
+        filtro += extrair_condicoes(no.get("Filter", ""), info.colunas, alias)
+    elif tipo in ("Seq Scan", "Index Scan", "Bitmap Heap Scan"):
+        cond_indice = extrair_condicoes(no.get("Index Cond") or no.get("Recheck Cond") or "", info.colunas, alias)
+        filtro = extrair_condicoes(no.get("Filter", ""), info.colunas, alias)
+    else:
+        return None
+    if not filtro:
+        return None
+
+    chave: List[str] = [c.coluna for c in cond_indice if c.operador in ("=", "ANY")]
+    secundarias: List[str] = []
+    intervalo: Optional[str] = None
+    predicado: Optional[str] = None
+    selet_filtro = 1.0
+    for c in filtro:
+        if c.operador not in ("=", "ANY"):
+            intervalo = intervalo or c.coluna
+            continue
+        s = info.seletividade(c)
+        if info.distintos.get(c.coluna, 0.0) >= MIN_DISTINTOS_CHAVE:
+            if c.coluna not in chave:
+                chave.append(c.coluna)
+        elif (c.operador == "=" and c.valor is not None and predicado is None
+              and s is not None and s <= MAX_FRACAO_PARCIAL):
+            # Valor raro de uma coluna pouco seletiva → índice parcial
+            predicado = f"{c.coluna} = {_literal_sql(c.valor, info.colunas.get(c.coluna, 'text'))}"
+        elif c.coluna not in secundarias:
+            secundarias.append(c.coluna)
+        if s is not None:
+            selet_filtro *= s
+    if not chave and not intervalo and predicado:
+        chave = [predicado.split(" ")[0]]
+    elif chave or intervalo:
+        chave += [c for c in secundarias if c not in chave]
+    if intervalo and intervalo not in chave:
+        chave.append(intervalo)
+    if not chave:
+        return None
+
+    # Já existe um índice com estas colunas à cabeça (e o mesmo predicado, se houver)?
+    for cols, pred in info.indices:
+        if cols[:len(chave)] == chave and (predicado is None) == (pred is None):
+            return None
+
+    custo_atual = float(no.get("Total Cost", 0.0))
+    linhas = float(no.get("Plan Rows", 0.0))
+    if tipo == "Seq Scan" or not cond_indice:
+        custo_estimado = _custo_por_linha(info, chave[-1] if intervalo else chave[0]) * linhas + 8.0
+    else:
+        if selet_filtro >= 1.0:
+            return None
+        custo_estimado = custo_atual * selet_filtro + 8.0
+    if custo_estimado > custo_atual * MIN_REDUCAO:
+        return None
+    return Proposta(tabela, chave, predicado, round(custo_atual, 1), round(custo_estimado, 1))
+
+
+def _explicar(cur, sql: str, parametrizada: bool) -> Optional[Dict[str, Any]]:
+    opcoes = "FORMAT JSON, GENERIC_PLAN" if parametrizada else "FORMAT JSON"
+    try:
+        cur.execute("SAVEPOINT advisor")
+        cur.execute(f"EXPLAIN ({opcoes}) {sql}")
+        resultado = cur.fetchone()[0]
+        cur.execute("RELEASE SAVEPOINT advisor")
+    except Exception as e:
+        cur.execute("ROLLBACK TO SAVEPOINT advisor")
+        logger.debug("EXPLAIN falhou (%s): %s", e, sql[:120])
+        return None
+    if isinstance(resultado, str):
+        resultado = json.loads(resultado)
+    return resultado[0]["Plan"]
+
+
+def analisar_consultas(cur, consultas: Sequence[Tuple[str, int]]) -> List[Proposta]:
+    """
+    Analisa (sql, chamadas) e devolve as propostas de índice ordenadas por benefício.
+    SQL com parâmetros $n só é analisado em Postgres 16+ (EXPLAIN GENERIC_PLAN).
+    """
+    cur.execute("SHOW server_version_num")
+    generic_plan = int(cur.fetchone()[0]) >= 160000
+    cache: Dict[str, _InfoTabela] = {}
+    propostas: Dict[str, Proposta] = {}
+    for sql, chamadas in consultas:
+        sql = sql.strip().rstrip(";")
+        if not sql.upper().startswith(("SELECT", "WITH")):
+            continue
+        parametrizada = bool(re.search(r"\$\d+", sql))
+        if parametrizada and not generic_plan:
+            continue
+        plano = _explicar(cur, sql, parametrizada)
+        if not plano:
+            continue
+        for no in _percorrer(plano):
+            tabela = no.get("Relation Name")
+            if not tabela:
+                continue
+            info = _info_tabela(cur, tabela, cache)
+            if not info or info.linhas < MIN_LINHAS_TABELA:
+                continue
+            p = _propor_para_no(no, info)
+            if not p:
+                continue
+            existente = propostas.get(p.nome)
+            if existente is None:
+                existente = propostas[p.nome] = p
+            else:
+                existente.custo_atual = max(existente.custo_atual, p.custo_atual)
+                existente.custo_estimado = max(existente.custo_estimado, p.custo_estimado)
+            existente.chamadas += max(chamadas, 1)
+            resumo = " ".join(sql.split())[:160]
+            if resumo not in existente.consultas:
+                existente.consultas.append(resumo)
+    return sorted(propostas.values(), key=lambda p: p.beneficio, reverse=True)
+
+
+def recolher_fingerprints(cur, limite: int = 50) -> List[Tuple[str, int]]:
+    """Queries mais pesadas segundo pg_stat_statements. Lista vazia se a extensão não existir."""
+    cur.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_stat_statements'")
+    if not cur.fetchone():
+        logger.warning("pg_stat_statements não está instalado — sem fingerprints para analisar")
+        return []
+    cur.execute("""
+        SELECT query, calls FROM pg_stat_statements
+        WHERE query ~* '^\\s*(select|with)\\s' AND query !~* 'pg_stat_statements|pg_catalog|information_schema'
+        ORDER BY total_exec_time DESC
+        LIMIT %s
+    """, (limite,))
+    return [(q, int(c)) for q, c in cur.fetchall()]
+
+
+def sugerir_indices(limite: int = 50) -> List[Dict[str, Any]]:
+    """Propostas de índice para as `limite` queries mais pesadas da base da app."""
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        propostas = analisar_consultas(cur, recolher_fingerprints(cur, limite))
+        cur.close()
+        return [p.to_dict() for p in propostas]
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+# ─── Migração ────────────────────────────────────────────────────────────────
+
+def proximo_numero_migracao(diretorio: Path = MIGRATIONS_DIR) -> int:
+    numeros = [int(m.group(1)) for p in diretorio.glob("*.sql") if (m := re.match(r"(\d+)_", p.name))]
+    return max(numeros, default=0) + 1
+
+
+def conteudo_migracao(propostas: Sequence[Proposta], numero: int) -> str:
+    linhas = [
+        f"-- {numero:03d}: Índices sugeridos pelo index advisor (rever antes de aplicar)",
+        "-- CREATE INDEX CONCURRENTLY não corre dentro de uma transação: no SQL Editor,",
+        "-- executar cada instrução isoladamente.",
+        "",
+    ]
+    for p in propostas:
+        linhas.append(f"-- {p.tabela}: custo {p.custo_atual:.0f} → ~{p.custo_estimado:.0f} "
+                      f"({p.chamadas} chamadas, benefício estimado {p.beneficio:.0f})")
+        for consulta in p.consultas[:3]:
+            linhas.append(f"--   {consulta[:110]}")
+        linhas.append(p.sql)
+        linhas.append("")
+    return "\n".join(linhas)
+
+
+def migracao_sugerida(nomes: Optional[List[str]] = None, limite: int = 50) -> Dict[str, str]:
+    """Recalcula as propostas e devolve o SQL da migração com as escolhidas (todas se `nomes` vazio).
+
+    Não escreve nada: o número em `ficheiro_sugerido` é o próximo livre nas
+    migrações deste deploy e deve ser confirmado ao fazer commit do ficheiro.
+    """
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        propostas = analisar_consultas(cur, recolher_fingerprints(cur, limite))
+        cur.close()
+    finally:
+        conn.rollback()
+        conn.close()
+    if nomes:
+        propostas = [p for p in propostas if p.nome in nomes]
+    if not propostas:
+        raise ValueError("Nenhuma proposta de índice para gerar.")
+    numero = proximo_numero_migracao()
+    return {
+        "ficheiro_sugerido": f"{numero:03d}_indices_sugeridos.sql",
+        "sql": conteudo_migracao(propostas, numero),
+    }
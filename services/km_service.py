@@ -7,6 +7,7 @@ from collections import defaultdict, OrderedDict
 
 import openpyxl
 
+from config import externos
 from database.connection import get_db_connection
 
 KM_TEMPLATES_DIR = os.path.join(
@@ -135,7 +136,7 @@ def _calcular_rota_diaria(
 
     all_points = [(mentor_lat, mentor_lng)] + unique_wps + [(mentor_lat, mentor_lng)]
     coords = ";".join(f"{lng},{lat}" for lat, lng in all_points)
-    url = f"https://router.project-osrm.org/route/v1/driving/{coords}?overview=false"
+    url = f"{externos.base_url('osrm')}/route/v1/driving/{coords}?overview=false"
 
     try:
         resp = requests.get(url, timeout=10)
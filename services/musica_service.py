@@ -4,7 +4,10 @@ from datetime import date, timedelta
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from database import fila
 from database.connection import get_db_connection
+from utils.campos import projetar
+from utils.single_flight import single_flight
 import logging
 
 logger = logging.getLogger(__name__)
@@ -51,7 +54,99 @@ def _notificar_users(user_ids: list, tipo: str, titulo: str, mensagem: str, link
     except Exception as e:
         logger.warning("Erro ao notificar users: %s", e)
 
-def listar_musicas(arquivadas=False, user_id=None, role=None, projeto_id=None, allowed_project_ids=None):
+
+# Colunas do SELECT de listar_musicas, pela ordem que _musica_de_linha lê:
+# (campo do payload, expressão, join de que a expressão precisa). Os campos não
+# pedidos em fields= vão a NULL e os joins que só eles usavam saem da query.
+_COLUNAS_MUSICA = (
+    ("id", "m.id", None),
+    ("titulo", "m.titulo", None),
+    ("estado", "m.estado", None),
+    ("disciplina", "COALESCE(NULLIF(m.disciplina, ''), disc.nome) as disciplina", "disc"),
+    ("arquivado", "m.arquivado", None),
+    ("criado_em", "m.criado_em", None),
+    ("turma", "t.id as turma_id", "t"),
+    ("turma", "t.nome as turma_nome", "t"),
+    ("turma", "e.nome as estabelecimento_nome", "e"),
+    ("responsavel", "m.responsavel_id", None),
+    ("responsavel", "p_resp.full_name as responsavel_nome", "p_resp"),
+    ("criador", "m.criador_id", None),
+    ("criador", "p_criador.full_name as criador_nome", "p_criador"),
+    ("feedback", "m.feedback", None),
+    ("link_demo", "m.link_demo", None),
+    ("misturado_por", "m.misturado_por_id", None),
+    ("misturado_por", "p_mist.full_name as misturado_por_nome", "p_mist"),
+    ("revisto_por", "m.revisto_por_id", None),
+    ("revisto_por", "p_rev.full_name as revisto_por_nome", "p_rev"),
+    ("finalizado_por", "m.finalizado_por_id", None),
+    ("finalizado_por", "p_fin.full_name as finalizado_por_nome", "p_fin"),
+    ("deadline", "m.deadline", None),
+    ("notas", "m.notas", None),
+    ("projeto_id", "m.projeto_id", None),
+    ("fase_deadline", "m.fase_deadline", None),
+    ("mistura_atribuida_em", "m.mistura_atribuida_em", None),
+    ("edicao_iniciada_em", "m.edicao_iniciada_em", None),
+)
+_JOINS_MUSICA = (
+    ("t", "LEFT JOIN turmas t ON m.turma_id = t.id"),
+    ("e", "LEFT JOIN estabelecimentos e ON t.estabelecimento_id = e.id"),
+    ("disc", "LEFT JOIN turma_disciplinas disc ON disc.id = m.disciplina_id"),
+    ("p_resp", "LEFT JOIN profiles p_resp ON m.responsavel_id = p_resp.id"),
+    ("p_criador", "LEFT JOIN profiles p_criador ON m.criador_id = p_criador.id"),
+    ("p_mist", "LEFT JOIN profiles p_mist ON m.misturado_por_id = p_mist.id"),
+    ("p_rev", "LEFT JOIN profiles p_rev ON m.revisto_por_id = p_rev.id"),
+    ("p_fin", "LEFT JOIN profiles p_fin ON m.finalizado_por_id = p_fin.id"),
+)
+# Campos aceites em fields= de GET /api/musicas
+CAMPOS_MUSICA = tuple(dict.fromkeys(campo for campo, _, _ in _COLUNAS_MUSICA))
+
+
+def _musica_de_linha(row) -> dict:
+    """Linha do SELECT de listar_musicas → dict com as pessoas e a turma aninhadas."""
+    return {
+        'id': row[0],
+        'titulo': row[1],
+        'estado': row[2],
+        'disciplina': row[3],
+        'arquivado': row[4],
+        'criado_em': row[5].isoformat() if row[5] else None,
+        'turma': {
+            'id': row[6],
+            'nome': row[7],
+            'estabelecimento': row[8]
+        } if row[6] else None,
+        'responsavel': {
+            'id': row[9],
+            'nome': row[10]
+        } if row[9] else None,
+        'criador': {
+            'id': row[11],
+            'nome': row[12]
+        } if row[11] else None,
+        'feedback': row[13],
+        'link_demo': row[14],
+        'misturado_por': {
+            'id': row[15],
+            'nome': row[16]
+        } if row[15] else None,
+        'revisto_por': {
+            'id': row[17],
+            'nome': row[18]
+        } if row[17] else None,
+        'finalizado_por': {
+            'id': row[19],
+            'nome': row[20]
+        } if row[19] else None,
+        'deadline': row[21].isoformat() if row[21] else None,
+        'notas': row[22],
+        'projeto_id': row[23],
+        'fase_deadline': row[24].isoformat() if row[24] else None,
+        'mistura_atribuida_em': row[25].isoformat() if row[25] else None,
+        'edicao_iniciada_em': row[26].isoformat() if row[26] else None,
+    }
+
+
+def listar_musicas(arquivadas=False, user_id=None, role=None, projeto_id=None, allowed_project_ids=None, campos=None):
     """
     Lista todas as músicas, com suporte a filtros.
 
@@ -61,6 +156,7 @@ def listar_musicas(arquivadas=False, user_id=None, role=None, projeto_id=None, a
         role (str): Role do utilizador atual (opcional).
         projeto_id (int): Filtrar por projeto específico (opcional).
         allowed_project_ids (list): Filtrar por lista de projetos permitidos (project scoping).
+        campos (frozenset): Campos a devolver (fields= do endpoint); None devolve todos.
     """
     try:
         conn = get_db_connection()
@@ -83,34 +179,21 @@ def listar_musicas(arquivadas=False, user_id=None, role=None, projeto_id=None, a
             conditions.append(f"m.projeto_id IN ({placeholders})")
             params.extend(allowed_project_ids)
 
+        colunas = [
+            expr if campos is None or campo in campos else "NULL"
+            for campo, expr, _ in _COLUNAS_MUSICA
+        ]
+        # t fica sempre: o filtro por projeto_id usa t.estabelecimento_id
+        aliases = {"t"} | {
+            alias for (campo, _, alias) in _COLUNAS_MUSICA
+            if alias and (campos is None or campo in campos)
+        }
+        joins = [sql for alias, sql in _JOINS_MUSICA if alias in aliases]
+
         query = f"""
-            SELECT
-                m.id, m.titulo, m.estado, COALESCE(NULLIF(m.disciplina, ''), disc.nome) as disciplina,
-                m.arquivado, m.criado_em,
-                t.id as turma_id, t.nome as turma_nome,
-                e.nome as estabelecimento_nome,
-                m.responsavel_id, p_resp.full_name as responsavel_nome,
-                m.criador_id, p_criador.full_name as criador_nome,
-                m.feedback,
-                m.link_demo,
-                m.misturado_por_id, p_mist.full_name as misturado_por_nome,
-                m.revisto_por_id, p_rev.full_name as revisto_por_nome,
-                m.finalizado_por_id, p_fin.full_name as finalizado_por_nome,
-                m.deadline,
-                m.notas,
-                m.projeto_id,
-                m.fase_deadline,
-                m.mistura_atribuida_em,
-                m.edicao_iniciada_em
+            SELECT {", ".join(colunas)}
             FROM musicas m
-            LEFT JOIN turmas t ON m.turma_id = t.id
-            LEFT JOIN estabelecimentos e ON t.estabelecimento_id = e.id
-            LEFT JOIN turma_disciplinas disc ON disc.id = m.disciplina_id
-            LEFT JOIN profiles p_resp ON m.responsavel_id = p_resp.id
-            LEFT JOIN profiles p_criador ON m.criador_id = p_criador.id
-            LEFT JOIN profiles p_mist ON m.misturado_por_id = p_mist.id
-            LEFT JOIN profiles p_rev ON m.revisto_por_id = p_rev.id
-            LEFT JOIN profiles p_fin ON m.finalizado_por_id = p_fin.id
+            {" ".join(joins)}
             WHERE {" AND ".join(conditions)}
             ORDER BY m.criado_em DESC
         """
@@ -118,51 +201,9 @@ def listar_musicas(arquivadas=False, user_id=None, role=None, projeto_id=None, a
         cur.execute(query, params)
         musicas = cur.fetchall()
         
-        resultado = []
-        for row in musicas:
-            resultado.append({
-                'id': row[0],
-                'titulo': row[1],
-                'estado': row[2],
-                'disciplina': row[3],
-                'arquivado': row[4],
-                'criado_em': row[5].isoformat() if row[5] else None,
-                'turma': {
-                    'id': row[6],
-                    'nome': row[7],
-                    'estabelecimento': row[8]
-                } if row[6] else None,
-                'responsavel': {
-                    'id': row[9],
-                    'nome': row[10]
-                } if row[9] else None,
-                'criador': {
-                    'id': row[11],
-                    'nome': row[12]
-                } if row[11] else None,
-                'feedback': row[13],
-                'link_demo': row[14],
-                'misturado_por': {
-                    'id': row[15],
-                    'nome': row[16]
-                } if row[15] else None,
-                'revisto_por': {
-                    'id': row[17],
-                    'nome': row[18]
-                } if row[17] else None,
-                'finalizado_por': {
-                    'id': row[19],
-                    'nome': row[20]
-                } if row[19] else None,
-                'deadline': row[21].isoformat() if row[21] else None,
-                'notas': row[22],
-                'projeto_id': row[23],
-                'fase_deadline': row[24].isoformat() if row[24] else None,
-                'mistura_atribuida_em': row[25].isoformat() if row[25] else None,
-                'edicao_iniciada_em': row[26].isoformat() if row[26] else None,
-            })
+        resultado = [_musica_de_linha(row) for row in musicas]
             
-        return resultado
+        return projetar(resultado, campos)
     except Exception as e:
         logger.error(f"Erro ao listar músicas: {e}")
         return []
@@ -307,7 +348,7 @@ def criar_musica(dados, criador_id, criador_role=None):
 
         # Se entrou direto em pool_mistura, tentar auto-atribuição imediata
         if estado_inicial == 'pool_mistura' and dados.get('projeto_id'):
-            auto_assign_from_pool(dados['projeto_id'])
+            _agendar_auto_assign(dados['projeto_id'])
 
         return {'id': new_id, 'message': 'Música criada com sucesso'}
     except Exception as e:
@@ -402,7 +443,7 @@ def avancar_fase(musica_id, user_id, dados=None):
 
         # Auto-atribuir da pool quando há slot livre
         if novo_estado in ('pool_mistura', 'pool_feedback') and projeto_id:
-            auto_assign_from_pool(projeto_id)
+            _agendar_auto_assign(projeto_id)
 
         return True, f"Fase avançada para {novo_estado}"
 
@@ -476,6 +517,17 @@ def _notificar_transicao(musica_id, titulo_musica, _estado_anterior, novo_estado
     except Exception as e:
         logger.warning("Erro em _notificar_transicao: %s", e)
 
+def _agendar_auto_assign(projeto_id: int) -> None:
+    """Enfileira a auto-atribuição (e as notificações aos produtores); uma só pendente por projeto."""
+    fila.enfileirar('musica.auto_assign', {'projeto_id': projeto_id},
+                    chave=f'musica.auto_assign:{projeto_id}')
+
+
+@fila.tarefa('musica.auto_assign')
+def _tarefa_auto_assign(projeto_id: int):
+    auto_assign_from_pool(projeto_id)
+
+
 def auto_assign_from_pool(projeto_id: int) -> int:
     """Auto-atribui músicas de pool_mistura a produtores com slot disponível (< 3 mistura_wip).
     Retorna o número de atribuições feitas."""
@@ -914,6 +966,7 @@ def verificar_e_notificar_deadlines():
         return 0
 
 
+@single_flight
 def listar_stats_instituicao(projeto_id=None):
     """Stats de progresso agrupados por estabelecimento > turma."""
     try:
@@ -10,6 +10,8 @@ from typing import Optional
 import requests
 from supabase import create_client
 
+from config import externos
+
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
 from reportlab.lib.pagesizes import A4
@@ -21,7 +23,7 @@ logger = logging.getLogger(__name__)
 
 ASSETS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "assets")
 
-_supabase_url = os.environ.get("SUPABASE_URL", "")
+_supabase_url = externos.base_url("supabase")
 _supabase_key = os.environ.get("SUPABASE_SERVICE_KEY") or os.environ.get("SUPABASE_ANON_KEY", "")
 _supabase = create_client(_supabase_url, _supabase_key) if _supabase_url else None
 
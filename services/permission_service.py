@@ -1,13 +1,21 @@
 import os
-import time
 import json
 import logging
-from typing import Optional
+import threading
+from psycopg2 import errors as pg_errors
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
 from supabase import create_client
+from config import externos
+from database import cache_invalidacao
+from database.migracoes import MigracaoOpcional
+from utils.lru import CacheLRU
 
 logger = logging.getLogger(__name__)
 
-supabase_url = os.environ.get("SUPABASE_URL")
+supabase_url = externos.base_url("supabase")
 supabase_key = os.environ.get("SUPABASE_SERVICE_KEY") or os.environ.get("SUPABASE_ANON_KEY")
 supabase = create_client(supabase_url, supabase_key)
 
@@ -47,30 +55,196 @@ ACTION_KEYS_CATALOGUE = [
     {"key": "work_type.videomaker",    "label": "Receber trabalhos de Videomaker",     "category": "Tipos de Trabalho"},
 ]
 
-# --- Simple TTL cache ---
-_CACHE: dict[str, tuple[float, dict]] = {}
+# --- Bounded LRU cache ---
+# Invalidated across workers via LISTEN/NOTIFY (database/cache_invalidacao.py,
+# triggers from migrations 053/057); the short TTL only matters while this
+# process is not listening. Least recently used users are evicted past the limit.
+_CACHE = CacheLRU("permissoes", max_entradas=int(os.getenv("PERMISSOES_CACHE_MAX", "2000")))
 _CACHE_TTL = 30  # seconds
+_CACHE_TTL_LISTENING = 900  # seconds
+
+# system_settings keys that change the resolved permissions (see _MODULE_FLAGS)
+_PREFIXO_FLAGS = "module_"
 
 _NOT_SET = object()  # sentinel for optional update params
 
+# Per-request memo (see permissoes_partilhadas): user_id -> permissions and
+# (user_id, PermissionContext) -> context.
+# Tasks and threadpool threads started inside the block see the same dict.
+_PEDIDO: ContextVar[Optional[dict]] = ContextVar("permissoes_pedido", default=None)
+
+
+@contextmanager
+def permissoes_partilhadas():
+    """
+    Within the block, each user's permissions are resolved at most once, even if
+    the TTL expires or several sub-requests (POST /api/batch) ask concurrently.
+    Nested blocks reuse the outer memo (every HTTP request already opens one,
+    see api.deps.PermissoesPorPedido).
+    """
+    if _PEDIDO.get() is not None:
+        yield
+        return
+    token = _PEDIDO.set({})
+    try:
+        yield
+    finally:
+        _PEDIDO.reset(token)
+
 
 def _cache_get(key: str) -> Optional[dict]:
-    entry = _CACHE.get(key)
-    if entry and (time.time() - entry[0]) < _CACHE_TTL:
-        return entry[1]
-    return None
+    memo = _PEDIDO.get()
+    if memo is not None and key in memo:
+        return memo[key]
+    ttl = _CACHE_TTL_LISTENING if cache_invalidacao.ativo() else _CACHE_TTL
+    value = _CACHE.get(key, ttl)
+    if value is not None and memo is not None:
+        memo[key] = value
+    return value
 
 
-def _cache_set(key: str, value: dict):
-    _CACHE[key] = (time.time(), value)
+# Generations: permissions read before an invalidation are not cached after it
+_lock = threading.Lock()
+_geracao_global = 0
+_geracoes: Dict[str, int] = {}
+
+
+def _geracao(user_id: str) -> Tuple[int, int]:
+    with _lock:
+        return _geracao_global, _geracoes.get(user_id, 0)
+
+
+def _cache_set(key: str, value: dict, geracao: Optional[Tuple[int, int]] = None):
+    """Cache `value`; with `geracao` (taken before the query), only if nothing was invalidated since."""
+    with _lock:
+        if geracao is None or geracao == (_geracao_global, _geracoes.get(key, 0)):
+            _CACHE.set(key, value)
+    memo = _PEDIDO.get()
+    if memo is not None:
+        memo[key] = value
 
 
 def _cache_invalidate(user_id: str):
-    _CACHE.pop(user_id, None)
+    with _lock:
+        _geracoes[user_id] = _geracoes.get(user_id, 0) + 1
+        _CACHE.pop(user_id, None)
+
+
+def _cache_clear():
+    global _geracao_global
+    with _lock:
+        _geracao_global += 1
+        _CACHE.clear()
+
+
+def _forget(user_id: Optional[str] = None):
+    """
+    After a local write: drop the user (or everyone) from the cache and from the
+    current request's memo, so the same request reads the new permissions.
+    """
+    if user_id:
+        _cache_invalidate(user_id)
+    else:
+        _cache_clear()
+    memo = _PEDIDO.get()
+    if memo is not None:
+        if user_id:
+            memo.pop(user_id, None)
+            memo.pop((user_id, PermissionContext), None)
+        else:
+            memo.clear()
+
+
+def _on_cache_notify(user_id: Optional[str]):
+    """NOTIFY from another worker: drop one user, or everything if no key."""
+    if user_id:
+        _cache_invalidate(user_id)
+    else:
+        _cache_clear()
+
+
+def _on_settings_notify(key: Optional[str]):
+    """Only module flags affect permissions; other settings keep the cache."""
+    if key is None or key.startswith(_PREFIXO_FLAGS):
+        _cache_clear()
+
+
+cache_invalidacao.registar(
+    ("profiles", "user_page_permissions", "user_project_access",
+     "permission_levels", "roles", "role_page_permissions"),
+    _on_cache_notify,
+)
+cache_invalidacao.registar(("system_settings",), _on_settings_notify)
 
 
 # --- Permission resolution ---
 
+# Pages hidden for everyone (except root) when the system_settings flag is off
+_MODULE_FLAGS = {
+    "chat":         "module_chat_enabled",
+    "financeiro":   "module_financeiro_enabled",
+    "estudio":      "module_estudio_enabled",
+    "wiki":         "module_wiki_enabled",
+    "formacao":     "module_formacao_enabled",
+    "equipamento":  "module_equipamento_enabled",
+    "estatisticas": "module_estatisticas_enabled",
+}
+
+# Everything get_user_permissions needs in one round trip (migration 058):
+# profile + patente, legacy role pages (only without patente), per-user
+# overrides, project access and disabled module flags.
+_PERMISSOES_SQL = "SELECT * FROM permissoes_efetivas(%(user_id)s, %(flags)s)"
+
+# Same row without the function (database not yet migrated): the function body
+# from migration 058 with the parameters as placeholders. Planned on every call.
+# test_permissoes_efetivas checks that the two stay identical.
+_PERMISSOES_SQL_INLINE = """
+    SELECT p.role::text, p.is_root, p.is_direcao, p.is_coordenacao, p.project_scoped,
+           p.permission_level_id,
+           pl.level_order, pl.allowed_pages, pl.allowed_actions,
+           pl.name::text, pl.label::text, pl.color::text,
+           CASE WHEN pl.allowed_pages IS NULL THEN (
+               SELECT array_agg(rpp.page_slug::text)
+               FROM public.role_page_permissions rpp
+               JOIN public.roles r ON r.id = rpp.role_id
+               WHERE r.name = p.role
+           ) END,
+           upp.granted_pages, upp.denied_pages,
+           CASE WHEN p.project_scoped THEN (
+               SELECT array_agg(upa.projeto_id ORDER BY upa.projeto_id)
+               FROM public.user_project_access upa WHERE upa.user_id = p.id
+           ) END,
+           (SELECT array_agg(s.key::text) FROM public.system_settings s
+            WHERE s.key = ANY(%(flags)s)
+              AND s.value IN ('false'::jsonb, 'null'::jsonb, '0'::jsonb, '""'::jsonb))
+    FROM public.profiles p
+    LEFT JOIN public.permission_levels pl ON pl.id = p.permission_level_id
+    LEFT JOIN LATERAL (
+        SELECT array_agg(x.page_slug::text) FILTER (WHERE x.granted) AS granted_pages,
+               array_agg(x.page_slug::text) FILTER (WHERE NOT x.granted) AS denied_pages
+        FROM public.user_page_permissions x WHERE x.user_id = p.id
+    ) upp ON TRUE
+    WHERE p.id = %(user_id)s
+"""
+_PERMISSOES_EFETIVAS = MigracaoOpcional(
+    "058", "permissoes_efetivas()", pg_errors.UndefinedFunction, "a usar a query inline",
+)
+
+
+def _fetch_permission_row(conn, user_id: str) -> Optional[tuple]:
+    params = {"user_id": user_id, "flags": list(_MODULE_FLAGS.values())}
+    cur = conn.cursor()
+    try:
+        _PERMISSOES_EFETIVAS.executar(
+            lambda: cur.execute(_PERMISSOES_SQL, params),
+            lambda: cur.execute(_PERMISSOES_SQL_INLINE, params),
+            conn=conn,
+        )
+        return cur.fetchone()
+    finally:
+        cur.close()
+
+
 def get_user_permissions(user_id: str) -> dict:
     """
     Resolves full permissions for a user.
@@ -93,34 +267,24 @@ def get_user_permissions(user_id: str) -> dict:
     if cached:
         return cached
 
+    geracao = _geracao(user_id)
     from database.connection import get_db_connection
     conn = get_db_connection()
     try:
-        cur = conn.cursor()
-
-        # Fetch profile joined with patente in one query
-        cur.execute("""
-            SELECT p.role, p.is_root, p.is_direcao, p.is_coordenacao, p.project_scoped,
-                   p.permission_level_id,
-                   pl.level_order, pl.allowed_pages, pl.allowed_actions,
-                   pl.name AS pl_name, pl.label AS pl_label, pl.color AS pl_color
-            FROM profiles p
-            LEFT JOIN permission_levels pl ON pl.id = p.permission_level_id
-            WHERE p.id = %s
-        """, (user_id,))
-        row = cur.fetchone()
+        row = _fetch_permission_row(conn, user_id)
         if not row:
             result = {
                 "is_root": False, "is_direcao": False, "is_coordenacao": False,
                 "role": "mentor", "allowed_pages": set(), "allowed_actions": {},
                 "permission_level": None, "project_scoped": False, "allowed_project_ids": [],
             }
-            _cache_set(user_id, result)
+            _cache_set(user_id, result, geracao)
             return result
 
         (role, db_is_root, db_is_direcao, db_is_coordenacao, project_scoped,
          perm_level_id, level_order, pl_allowed_pages, pl_allowed_actions,
-         pl_name, pl_label, pl_color) = row
+         pl_name, pl_label, pl_color, role_pages, pages_granted, pages_denied,
+         project_ids, disabled_flags) = row
 
         # Derive flags from level_order when patente is set; else fall back to DB flags
         if perm_level_id is not None and level_order is not None:
@@ -140,13 +304,7 @@ def get_user_permissions(user_id: str) -> dict:
             allowed_pages = set(pages_list) & ALL_PAGE_SLUGS
         else:
             # Legacy fallback: role page permissions
-            cur.execute("""
-                SELECT rpp.page_slug
-                FROM role_page_permissions rpp
-                JOIN roles r ON r.id = rpp.role_id
-                WHERE r.name = %s
-            """, (role,))
-            allowed_pages = {r[0] for r in cur.fetchall()}
+            allowed_pages = set(role_pages or ())
             if is_direcao:
                 allowed_pages = set(ALL_PAGE_SLUGS) - {"admin"}
             elif is_coordenacao:
@@ -154,15 +312,8 @@ def get_user_permissions(user_id: str) -> dict:
 
         # Per-user page overrides (always applied, even with patente)
         if not is_root:
-            cur.execute(
-                "SELECT page_slug, granted FROM user_page_permissions WHERE user_id = %s",
-                (user_id,)
-            )
-            for page_slug, granted in cur.fetchall():
-                if granted:
-                    allowed_pages.add(page_slug)
-                else:
-                    allowed_pages.discard(page_slug)
+            allowed_pages |= set(pages_granted or ())
+            allowed_pages -= set(pages_denied or ())
 
         # Allowed actions from patente
         if perm_level_id is not None and pl_allowed_actions is not None:
@@ -184,32 +335,14 @@ def get_user_permissions(user_id: str) -> dict:
         # Project access
         allowed_project_ids = []
         if project_scoped and not is_root:
-            cur.execute(
-                "SELECT projeto_id FROM user_project_access WHERE user_id = %s",
-                (user_id,)
-            )
-            allowed_project_ids = [r[0] for r in cur.fetchall()]
-
-        cur.close()
+            allowed_project_ids = list(project_ids or ())
 
         # Feature flags: remove globally disabled modules (root not affected)
         if not is_root:
-            try:
-                from services import settings_service as _settings_svc
-                _MODULE_FLAGS = {
-                    "chat":         "module_chat_enabled",
-                    "financeiro":   "module_financeiro_enabled",
-                    "estudio":      "module_estudio_enabled",
-                    "wiki":         "module_wiki_enabled",
-                    "formacao":     "module_formacao_enabled",
-                    "equipamento":  "module_equipamento_enabled",
-                    "estatisticas": "module_estatisticas_enabled",
-                }
-                for page, flag in _MODULE_FLAGS.items():
-                    if not _settings_svc.obter(flag, True):
-                        allowed_pages.discard(page)
-            except Exception as _e:
-                logger.warning("Erro ao aplicar feature flags: %s", _e)
+            disabled = set(disabled_flags or ())
+            for page, flag in _MODULE_FLAGS.items():
+                if flag in disabled:
+                    allowed_pages.discard(page)
 
         result = {
             "is_root": bool(is_root),
@@ -222,7 +355,7 @@ def get_user_permissions(user_id: str) -> dict:
             "project_scoped": bool(project_scoped),
             "allowed_project_ids": allowed_project_ids,
         }
-        _cache_set(user_id, result)
+        _cache_set(user_id, result, geracao)
         return result
     except Exception as e:
         logger.error(f"Erro ao obter permissões do utilizador {user_id}: {e}")
@@ -256,6 +389,69 @@ def can_access_page(user_id: str, page_slug: str) -> bool:
     return page_slug in perms["allowed_pages"]
 
 
+@dataclass(frozen=True)
+class PermissionContext:
+    """Resolved permissions of one user, built once per request (get_permission_context)."""
+    user_id: str
+    role: str
+    is_root: bool
+    is_direcao: bool
+    is_coordenacao: bool
+    allowed_pages: frozenset
+    allowed_actions: dict
+    permission_level: Optional[dict]
+    project_scoped: bool
+    allowed_project_ids: tuple
+
+    @property
+    def is_direcao_or_above(self) -> bool:
+        return self.is_root or self.is_direcao
+
+    @property
+    def is_coordenacao_or_above(self) -> bool:
+        return self.is_root or self.is_direcao or self.is_coordenacao
+
+    @property
+    def project_filter(self) -> Optional[list]:
+        """None if the user sees all projects, else the allowed projeto_ids."""
+        if self.is_root or not self.project_scoped:
+            return None
+        return list(self.allowed_project_ids)
+
+    def has_action(self, action_key: str) -> bool:
+        return self.is_root or bool(self.allowed_actions.get(action_key, False))
+
+    def can_access_page(self, page_slug: str) -> bool:
+        return page_slug in self.allowed_pages
+
+
+def get_permission_context(user_id: str) -> PermissionContext:
+    """
+    PermissionContext for user_id. Inside a request (permissoes_partilhadas) the
+    same object is returned to every caller; outside one it is built per call.
+    """
+    memo = _PEDIDO.get()
+    key = (user_id, PermissionContext)
+    if memo is not None and key in memo:
+        return memo[key]
+    perms = get_user_permissions(user_id)
+    ctx = PermissionContext(
+        user_id=user_id,
+        role=perms["role"],
+        is_root=perms["is_root"],
+        is_direcao=perms["is_direcao"],
+        is_coordenacao=perms["is_coordenacao"],
+        allowed_pages=frozenset(perms["allowed_pages"]),
+        allowed_actions=perms["allowed_actions"],
+        permission_level=perms["permission_level"],
+        project_scoped=perms["project_scoped"],
+        allowed_project_ids=tuple(perms["allowed_project_ids"]),
+    )
+    if memo is not None:
+        memo[key] = ctx
+    return ctx
+
+
 # --- Role management ---
 
 def listar_roles() -> list:
@@ -339,7 +535,7 @@ def atualizar_role_pages(role_id: int, pages: list[str], default_permission_leve
             cur.execute("UPDATE roles SET color = %s WHERE id = %s", (color, role_id))
         conn.commit()
         cur.close()
-        _CACHE.clear()
+        _forget()
         return True
     except Exception as e:
         conn.rollback()
@@ -419,7 +615,7 @@ def atualizar_patente(patente_id: int, label: str, allowed_pages: list,
         cur.execute(f"UPDATE permission_levels SET {', '.join(updates)} WHERE id = %s", params)
         conn.commit()
         cur.close()
-        _CACHE.clear()
+        _forget()
         return True
     except Exception as e:
         conn.rollback()
@@ -443,7 +639,7 @@ def apagar_patente(patente_id: int) -> bool:
         cur.execute("DELETE FROM permission_levels WHERE id = %s", (patente_id,))
         conn.commit()
         cur.close()
-        _CACHE.clear()
+        _forget()
         return True
     except Exception as e:
         conn.rollback()
@@ -608,7 +804,7 @@ def atualizar_permissoes_utilizador(
 
         supabase.auth.admin.update_user_by_id(user_id, {"user_metadata": {"role": role_name}})
 
-        _cache_invalidate(user_id)
+        _forget(user_id)
         return True
     except Exception as e:
         conn.rollback()
@@ -1,11 +1,12 @@
 from supabase import create_client
+from config import externos
 import os
 import logging
 
 logger = logging.getLogger(__name__)
 
 # Initialize Supabase client
-supabase_url = os.environ.get("SUPABASE_URL")
+supabase_url = externos.base_url("supabase")
 supabase_key = os.environ.get("SUPABASE_SERVICE_KEY") or os.environ.get("SUPABASE_ANON_KEY")
 supabase = create_client(supabase_url, supabase_key)
 
@@ -12,7 +12,8 @@ import os
 import base64
 import json
 import logging
-import threading
+from config import externos
+from database import fila
 from database.connection import get_db_connection
 
 logger = logging.getLogger(__name__)
@@ -114,13 +115,17 @@ def obter_subscricoes_user(user_id: str) -> list:
 
 
 def _enviar_push(sub: dict, payload: dict, private_key_pem: str):
-    """Envia um push para uma subscrição específica (síncrono)."""
+    """
+    Envia um push para uma subscrição específica (síncrono).
+    Devolve True se enviado, False se falhou (vale a pena repetir) e None se a
+    subscrição expirou (já removida).
+    """
     try:
         from pywebpush import webpush, WebPushException
 
         webpush(
             subscription_info={
-                "endpoint": sub["endpoint"],
+                "endpoint": externos.endpoint_push(sub["endpoint"]),
                 "keys": {"p256dh": sub["p256dh"], "auth": sub["auth"]},
             },
             data=json.dumps(payload),
@@ -134,8 +139,8 @@ def _enviar_push(sub: dict, payload: dict, private_key_pem: str):
         if "410" in err_str or "404" in err_str:
             logger.info("Subscrição expirada, a remover: %s", sub["endpoint"][:60])
             _remover_subscricao_por_endpoint(sub["endpoint"])
-        else:
-            logger.warning("Falha ao enviar push para %s: %s", sub["endpoint"][:60], err_str)
+            return None
+        logger.warning("Falha ao enviar push para %s: %s", sub["endpoint"][:60], err_str)
         return False
 
 
@@ -160,22 +165,29 @@ def _remover_subscricao_por_endpoint(endpoint: str):
 def enviar_push_para_user(user_id: str, titulo: str, mensagem: str, link: str = "/", notif_id=None):
     """
     Envia push notification para todas as subscrições de um utilizador.
-    Executado em background thread para não bloquear a resposta da API.
+    Só enfileira (database/fila.py): o envio corre no worker, sem bloquear a resposta da API.
     """
-    private_key_pem = _get_vapid_private_key_pem()
-    if not private_key_pem:
+    if not _get_vapid_private_key_pem():
         logger.warning("VAPID_PRIVATE_KEY não configurada — push não enviado")
         return
 
-    def _task():
-        subs = obter_subscricoes_user(user_id)
-        if not subs:
-            return
-        payload = {"title": titulo, "body": mensagem, "url": link or "/"}
-        if notif_id is not None:
-            payload["notif_id"] = notif_id
-        for sub in subs:
-            _enviar_push(sub, payload, private_key_pem)
-
-    thread = threading.Thread(target=_task, daemon=True)
-    thread.start()
+    payload = {"title": titulo, "body": mensagem, "url": link or "/"}
+    if notif_id is not None:
+        payload["notif_id"] = notif_id
+    fila.enfileirar("push.enviar_user", {"user_id": str(user_id), "payload": payload})
+
+
+@fila.tarefa("push.enviar_user")
+def _tarefa_enviar_user(user_id: str, payload: dict):
+    """Uma tarefa por subscrição: uma falha só repete o envio para esse dispositivo."""
+    for sub in obter_subscricoes_user(user_id):
+        fila.enfileirar("push.enviar", {"sub": sub, "payload": payload})
+
+
+@fila.tarefa("push.enviar", max_tentativas=4)
+def _tarefa_enviar(sub: dict, payload: dict):
+    private_key_pem = _get_vapid_private_key_pem()
+    if not private_key_pem:
+        return
+    if _enviar_push(sub, payload, private_key_pem) is False:
+        raise RuntimeError(f"push não entregue a {sub['endpoint'][:60]}")
@@ -0,0 +1,572 @@
+"""
+==============================================================================
+RAP NOVA ESCOLA - Serviço de Séries de Sessões
+==============================================================================
+Ficheiro: services/serie_service.py
+
+Sessões recorrentes guardadas como série (migração 063): uma linha em
+aula_series com a regra de recorrência (RRULE do RFC 5545, ex:
+"FREQ=WEEKLY;COUNT=30") e as datas excluídas, em vez de uma linha de aulas
+por semana (aula_service.criar_aulas_recorrentes).
+
+- listar_ocorrencias expande as séries só para a janela pedida (ex.: a
+  semana visível no Horários), sem escrever nada;
+- editar a série é um UPDATE, tenha ela 4 ou 40 ocorrências;
+- uma ocorrência passa a linha de aulas (materializar_ocorrencia) quando
+  ganha estado próprio — confirmação, término, registo — e a partir daí
+  usa os endpoints normais de /api/aulas/{id}. As alterações à série já não
+  mexem nas ocorrências materializadas; apagar uma delas exclui a ocorrência
+  (trigger da migração 063).
+
+Conflitos de horário do mentor: aula_service.conflitos_mentor expande as
+séries do mentor (ocorrencias_do_mentor), por isso criar_aula, atualizar_aula
+e criar_aulas_recorrentes recusam (ConflitoHorario) uma sessão por cima de uma
+ocorrência por materializar, e criar_serie/atualizar_serie avisam a
+coordenação das sobreposições com aulas e com outras séries. A restrição da
+migração 065 só vê linhas de aulas: a verificação das séries é feita pela app,
+antes de escrever, e não protege de dois pedidos simultâneos.
+
+Fora disso, ocorrências por materializar não são linhas de aulas e ficam de
+fora de tudo o que lê aulas:
+- reservas e conflitos de equipamento (equipment_service);
+- o snapshot de GET /api/me (sessões por registar) e as confirmações
+  pendentes do mentor;
+- horas e estatísticas (obter_stats, relatórios de horas).
+Cada uma passa a contar quando a ocorrência é materializada.
+
+Datas na hora de Lisboa (naive), como aulas.data_hora.
+==============================================================================
+"""
+
+import logging
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import Any, Dict, FrozenSet, Iterator, List, Optional, Tuple
+
+from dateutil.rrule import rrulestr
+from psycopg2 import errors as pg_errors
+
+from database.connection import get_db_connection
+from services import aula_service
+from utils.lru import CacheLRU
+
+logger = logging.getLogger(__name__)
+
+FREQUENCIAS = ("DAILY", "WEEKLY", "MONTHLY")
+# Séries com fim (COUNT/UNTIL): até 10 anos de sessões semanais
+LIMITE_OCORRENCIAS = 520
+# Janela máxima de GET /api/aulas/series/ocorrencias
+JANELA_MAXIMA = timedelta(days=93)
+
+# Conflitos com outras sessões do mentor: ocorrências até aqui (séries sem fim)
+HORIZONTE_CONFLITOS = timedelta(days=365)
+
+# Ocorrências por (regra, inicio). O dateutil gera sempre a partir do DTSTART,
+# por isso uma janela a meio de uma série longa recalculava tudo o que vinha
+# antes; (regra, inicio) não muda, o TTL só serve para libertar memória.
+_REGRAS = CacheLRU("series_regras", max_entradas=2000)
+_TTL_REGRAS_S = 24 * 3600
+
+# Colunas de aula_series que passam para cada ocorrência
+_CAMPOS_SERIE = (
+    "projeto_id", "turma_id", "mentor_id", "tipo", "estado", "duracao_minutos", "local", "tema",
+    "observacoes", "sumario", "codigo_sessao", "atividade_uuid", "is_autonomous", "tipo_atividade",
+    "responsavel_user_id", "participantes_ids",
+)
+# Campos que atualizar_serie aceita (tipo e is_autonomous definem a série)
+CAMPOS_EDITAVEIS = frozenset(_CAMPOS_SERIE) - {"tipo", "is_autonomous", "estado"} | {"regra", "inicio", "excecoes"}
+
+# Campos que mudam o horário das ocorrências (ou de quem) em atualizar_serie
+_CAMPOS_HORARIO = frozenset({"mentor_id", "regra", "inicio", "excecoes", "duracao_minutos"})
+
+_COLUNAS = (
+    ("id", "s.id"), ("regra", "s.regra"), ("inicio", "s.inicio"), ("fim", "s.fim"), ("excecoes", "s.excecoes"),
+    *((campo, f"s.{campo}") for campo in _CAMPOS_SERIE),
+    ("criador_user_id", "s.criador_user_id"), ("criado_em", "s.criado_em"), ("atualizado_em", "s.atualizado_em"),
+    ("turma_nome", "t.nome"), ("mentor_nome", "m.nome"), ("mentor_user_id", "m.user_id::text"),
+    ("estabelecimento_nome", "e.nome"), ("estabelecimento_sigla", "e.sigla"),
+    ("atividade_nome", "ta.nome"), ("disciplina_nome", "td.nome"),
+)
+_SELECT_SERIES = f"""
+    SELECT {", ".join(expr for _, expr in _COLUNAS)}
+    FROM aula_series s
+    LEFT JOIN turmas t ON t.id = s.turma_id
+    LEFT JOIN estabelecimentos e ON e.id = t.estabelecimento_id
+    LEFT JOIN mentores m ON m.id = s.mentor_id
+    LEFT JOIN turma_atividades ta ON ta.uuid = s.atividade_uuid
+    LEFT JOIN turma_disciplinas td ON td.id = ta.turma_disciplina_id
+"""
+
+
+def normalizar_regra(regra: str, inicio: datetime) -> Tuple[str, Optional[datetime]]:
+    """(regra normalizada, última ocorrência ou None se não tiver fim). ValueError se inválida."""
+    regra = (regra or "").strip().upper()
+    if regra.startswith("RRULE:"):
+        regra = regra[len("RRULE:"):]
+    if not regra or "DTSTART" in regra:
+        raise ValueError("Regra de recorrência inválida (o início vem de data_hora)")
+    try:
+        partes = dict(parte.split("=", 1) for parte in regra.split(";") if parte)
+        ocorrencias = rrulestr(regra, dtstart=inicio)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Regra de recorrência inválida: {e}") from e
+    if partes.get("FREQ") not in FREQUENCIAS:
+        raise ValueError(f"FREQ tem de ser {', '.join(FREQUENCIAS)}")
+    if "COUNT" not in partes and "UNTIL" not in partes:
+        return regra, None
+
+    datas = list(islice(ocorrencias, LIMITE_OCORRENCIAS + 1))
+    if not datas:
+        raise ValueError("A regra não tem nenhuma ocorrência")
+    if len(datas) > LIMITE_OCORRENCIAS:
+        raise ValueError(f"A série não pode ter mais de {LIMITE_OCORRENCIAS} ocorrências")
+    return regra, datas[-1]
+
+
+def _datas(regra: str, inicio: datetime):
+    """Todas as datas da regra: tuplo ordenado se tiver fim, senão o rrule (com cache interna)."""
+    chave = (regra, inicio)
+    datas = _REGRAS.get(chave, ttl_s=_TTL_REGRAS_S)
+    if datas is None:
+        datas = rrulestr(regra, dtstart=inicio, cache=True)
+        if "COUNT=" in regra or "UNTIL=" in regra:
+            datas = tuple(datas)  # no máximo LIMITE_OCORRENCIAS (normalizar_regra)
+        _REGRAS.set(chave, datas)
+    return datas
+
+
+def _ocorrencias(serie: Dict[str, Any], desde: datetime, ate: datetime) -> Iterator[Tuple[int, datetime]]:
+    """(índice na série, data) das ocorrências em [desde, ate), sem as excluídas.
+
+    O índice conta também as excluídas, para a numeração do tema não mudar
+    quando se apaga uma ocorrência.
+    """
+    excluidas = set(serie["excecoes"] or ())
+    datas = _datas(serie["regra"], serie["inicio"])
+    if isinstance(datas, tuple):
+        janela = range(bisect_left(datas, desde), bisect_left(datas, ate))
+        yield from ((i, datas[i]) for i in janela if datas[i] not in excluidas)
+        return
+    for indice, data in enumerate(datas):
+        if data >= ate:
+            break
+        if data >= desde and data not in excluidas:
+            yield indice, data
+
+
+def _indice(serie: Dict[str, Any], ocorrencia: datetime) -> Optional[int]:
+    """Índice da ocorrência na série, ou None se a regra não a gera (ou foi excluída)."""
+    for indice, _ in _ocorrencias(serie, ocorrencia, ocorrencia + timedelta(seconds=1)):
+        return indice
+    return None
+
+
+def _tema(tema: Optional[str], indice: int) -> Optional[str]:
+    """Como em criar_aulas_recorrentes: um tema numérico ("1") conta as sessões."""
+    if tema and str(tema).isdigit():
+        return str(int(tema) + indice)
+    return tema
+
+
+def _como_aula(serie: Dict[str, Any], indice: int, data: datetime) -> Dict[str, Any]:
+    """Ocorrência no formato de GET /api/aulas (AulaListItem), com id None."""
+    item: Dict[str, Any] = dict.fromkeys(aula_service.CAMPOS_LISTA)
+    item.update({campo: valor for campo, valor in serie.items() if campo in item})
+    item.update(
+        id=None,
+        data_hora=data,
+        tema=_tema(serie["tema"], indice),
+        is_realized=False,
+        participantes_ids=list(serie["participantes_ids"]) if serie["tipo"] == "outro" else [],
+        serie_id=serie["id"],
+        ocorrencia=data,
+    )
+    return item
+
+
+def visivel(serie: Dict[str, Any], allowed_project_ids=None, direcao_user_ids: FrozenSet[str] = frozenset()) -> bool:
+    """O filtro de listar_ocorrencias aplicado a uma série de obter_serie."""
+    if (
+        allowed_project_ids is not None
+        and serie["tipo"] not in (None, "aula")
+        and serie["projeto_id"] not in allowed_project_ids
+    ):
+        return False
+    return not (
+        serie["mentor_user_id"] in direcao_user_ids or serie["responsavel_user_id"] in direcao_user_ids
+    )
+
+
+def ocorrencias_do_mentor(
+    mentor_id: int, desde: datetime, ate: datetime, excluir_serie_id: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Ocorrências por materializar das séries do mentor que se sobrepõem a
+    [desde, ate), no formato de aula_service.conflitos_mentor (aula_id None,
+    com serie_id). As materializadas ficam de fora: já são linhas de aulas.
+    """
+    desde, ate = aula_service.hora_local(desde), aula_service.hora_local(ate)
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        try:
+            cur.execute(_SELECT_SERIES + """
+                WHERE s.mentor_id = %(mentor_id)s
+                  AND s.estado <> ALL(%(sem_horario)s)
+                  AND s.duracao_minutos > 0
+                  AND s.inicio < %(ate)s
+                  AND (s.fim IS NULL OR s.fim + s.duracao_minutos * INTERVAL '1 minute' > %(desde)s)
+                  AND s.id IS DISTINCT FROM %(excluir)s
+            """, {
+                "mentor_id": mentor_id, "sem_horario": list(aula_service.ESTADOS_SEM_HORARIO),
+                "desde": desde, "ate": ate, "excluir": excluir_serie_id,
+            })
+        except pg_errors.UndefinedTable:
+            conn.rollback()
+            return []
+        series = [dict(zip((campo for campo, _ in _COLUNAS), linha)) for linha in cur.fetchall()]
+        materializadas = set()
+        if series:
+            cur.execute(
+                "SELECT serie_id, serie_ocorrencia FROM aulas WHERE serie_id = ANY(%s)", ([s["id"] for s in series],),
+            )
+            materializadas = set(cur.fetchall())
+        cur.close()
+    finally:
+        conn.close()
+
+    ocorrencias = []
+    for serie in series:
+        duracao = timedelta(minutes=serie["duracao_minutos"])
+        for _, data in _ocorrencias(serie, desde - duracao, ate):
+            if data + duracao > desde and (serie["id"], data) not in materializadas:
+                ocorrencias.append({
+                    "aula_id": None, "serie_id": serie["id"], "data_hora": data,
+                    "duracao_minutos": serie["duracao_minutos"], "estado": serie["estado"],
+                    "mentor_nome": serie["mentor_nome"],
+                })
+    ocorrencias.sort(key=lambda o: (o["data_hora"], o["serie_id"]))
+    return ocorrencias
+
+
+def _notificar_conflitos_mentor(serie: Dict[str, Any]) -> None:
+    """
+    Avisa a coordenação das ocorrências futuras que sobrepõem outras sessões do
+    mentor (aulas ou ocorrências de outras séries), como criar_aula faz para
+    uma aula. Uma só chamada a conflitos_mentor para a série toda.
+    """
+    mentor_id = serie["mentor_id"]
+    if not mentor_id:
+        return
+    try:
+        desde = max(serie["inicio"], aula_service.hora_local(datetime.now(timezone.utc)))
+        ate = serie["fim"] + timedelta(seconds=1) if serie["fim"] else desde + HORIZONTE_CONFLITOS
+        datas = [data for _, data in _ocorrencias(serie, desde, ate)]
+        if not datas:
+            return
+        duracao = timedelta(minutes=serie["duracao_minutos"] or 0)
+        conflitos = aula_service.conflitos_mentor(
+            mentor_id, datas[0], (datas[-1] + duracao - datas[0]).total_seconds() / 60,
+            excluir_serie_id=serie["id"],
+        )
+        from services import excecoes_service
+        avisos = 0
+        for conflito in conflitos:
+            fim = conflito["data_hora"] + timedelta(minutes=conflito["duracao_minutos"] or 0)
+            # primeira ocorrência que ainda não acabou quando a aula começa
+            i = bisect_right(datas, conflito["data_hora"] - duracao)
+            if i < len(datas) and datas[i] < fim:
+                excecoes_service.notificar_conflito_horario(
+                    f"série {serie['id']}", conflito["aula_id"] or f"série {conflito['serie_id']}",
+                    conflito["mentor_nome"] or f"#{mentor_id}", datas[i],
+                )
+                avisos += 1
+        if avisos:
+            logger.warning("Serie #%s sobrepõe %s sessão(ões) do mentor #%s", serie["id"], avisos, mentor_id)
+    except Exception as e:
+        logger.warning("Erro ao verificar conflitos de horário da serie #%s: %s", serie["id"], e)
+
+
+def obter_serie(serie_id: int) -> Optional[Dict[str, Any]]:
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(_SELECT_SERIES + " WHERE s.id = %s", (serie_id,))
+        linha = cur.fetchone()
+        cur.close()
+    finally:
+        conn.close()
+    return dict(zip((campo for campo, _ in _COLUNAS), linha)) if linha else None
+
+
+def criar_serie(dados: Dict[str, Any], criador_user_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Cria uma série a partir dos campos de AulaSerieCreate (data_hora = primeira
+    ocorrência). ValueError se a regra ou os dados forem inválidos.
+    O mentor e os participantes recebem uma notificação pela série, e a
+    coordenação um aviso por cada sessão do mentor com que ela se sobrepõe.
+    """
+    tipo = dados.get("tipo")
+    is_autonomous = bool(dados.get("is_autonomous"))
+    mentor_id = dados.get("mentor_id")
+    if not is_autonomous and tipo not in ("trabalho_interno", "outro") and not dados.get("turma_id"):
+        raise ValueError("turma_id é obrigatório para aulas regulares")
+
+    inicio = aula_service.hora_local(aula_service._parse_data_hora(dados["data_hora"]))
+    regra, fim = normalizar_regra(dados.get("regra", "FREQ=WEEKLY"), inicio)
+    tipo_final, estado = aula_service._tipo_e_estado_inicial(tipo, is_autonomous, mentor_id)
+    valores = {campo: dados.get(campo) for campo in _CAMPOS_SERIE}
+    valores.update(
+        tipo=tipo_final,
+        estado=estado,
+        is_autonomous=is_autonomous,
+        duracao_minutos=dados.get("duracao_minutos") or 90,
+        participantes_ids=list(dict.fromkeys(dados.get("participantes_ids") or [])),
+        regra=regra,
+        inicio=inicio,
+        fim=fim,
+        excecoes=[aula_service._parse_data_hora(d) for d in dados.get("excecoes") or []],
+        criador_user_id=criador_user_id,
+    )
+
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        colunas = list(valores)
+        cur.execute(f"""
+            INSERT INTO aula_series ({", ".join(colunas)})
+            VALUES ({", ".join(f"%({c})s" for c in colunas)})
+            RETURNING id
+        """, valores)
+        serie_id = cur.fetchone()[0]
+        conn.commit()
+        cur.close()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    logger.info("Serie #%s criada (%s, a partir de %s)", serie_id, regra, inicio)
+
+    inicio_txt = inicio.strftime("%d/%m/%Y %H:%M")
+    if mentor_id and not is_autonomous:
+        aula_service._notificar_mentor(
+            mentor_id,
+            "Novas Sessões Atribuídas",
+            f"Foi-lhe atribuída uma série de sessões a partir de {inicio_txt}.",
+            {"serie_id": serie_id},
+        )
+    if tipo == "outro":
+        from services import notification_service
+
+        tema = dados.get("tema") or "Outro"
+        for uid in valores["participantes_ids"]:
+            if uid != criador_user_id:
+                notification_service.criar_notificacao(
+                    user_id=uid,
+                    tipo="sessao_outro",
+                    titulo=f"Nova sessão: {tema}",
+                    mensagem=f'Foste adicionado às sessões de "{tema}", a partir de {inicio_txt}.',
+                    link="/horarios",
+                    metadados={"serie_id": serie_id},
+                )
+    serie = obter_serie(serie_id)
+    _notificar_conflitos_mentor(serie)
+    return serie
+
+
+def atualizar_serie(serie_id: int, dados: Dict[str, Any]) -> bool:
+    """
+    Altera a série num só UPDATE; vale para todas as ocorrências ainda não
+    materializadas. ValueError se a nova regra for inválida. Se mudar o horário
+    ou o mentor, volta a verificar os conflitos (como criar_serie).
+    """
+    serie = obter_serie(serie_id)
+    if not serie:
+        return False
+    valores = {campo: valor for campo, valor in dados.items() if campo in CAMPOS_EDITAVEIS}
+    if "inicio" in valores:
+        valores["inicio"] = aula_service.hora_local(aula_service._parse_data_hora(valores["inicio"]))
+    if "excecoes" in valores:
+        valores["excecoes"] = [aula_service._parse_data_hora(d) for d in valores["excecoes"] or []]
+    if "regra" in valores or "inicio" in valores:
+        valores["regra"], valores["fim"] = normalizar_regra(
+            valores.get("regra", serie["regra"]), valores.get("inicio", serie["inicio"]),
+        )
+    if "mentor_id" in valores:
+        _, valores["estado"] = aula_service._tipo_e_estado_inicial(
+            serie["tipo"], serie["is_autonomous"], valores["mentor_id"],
+        )
+    if not valores:
+        return True
+
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(f"""
+            UPDATE aula_series
+            SET {", ".join(f"{c} = %({c})s" for c in valores)}, atualizado_em = CURRENT_TIMESTAMP
+            WHERE id = %(serie_id)s
+        """, {**valores, "serie_id": serie_id})
+        conn.commit()
+        cur.close()
+    except Exception as e:
+        conn.rollback()
+        logger.error("Erro ao atualizar serie #%s: %s", serie_id, e)
+        return False
+    finally:
+        conn.close()
+
+    if valores.keys() & _CAMPOS_HORARIO:
+        _notificar_conflitos_mentor(obter_serie(serie_id))
+    return True
+
+
+def apagar_serie(serie_id: int) -> bool:
+    """Apaga a série; as ocorrências materializadas ficam como aulas normais (serie_id a NULL)."""
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM aula_series WHERE id = %s", (serie_id,))
+        apagada = cur.rowcount > 0
+        conn.commit()
+        cur.close()
+        return apagada
+    finally:
+        conn.close()
+
+
+def excluir_ocorrencia(serie_id: int, ocorrencia: datetime) -> bool:
+    """Acrescenta uma EXDATE: a ocorrência deixa de aparecer. False se a série não a gera."""
+    serie = obter_serie(serie_id)
+    ocorrencia = aula_service.hora_local(ocorrencia)
+    if not serie or _indice(serie, ocorrencia) is None:
+        return False
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            UPDATE aula_series
+            SET excecoes = array_append(excecoes, %(ocorrencia)s), atualizado_em = CURRENT_TIMESTAMP
+            WHERE id = %(serie_id)s AND NOT (%(ocorrencia)s = ANY(excecoes))
+        """, {"serie_id": serie_id, "ocorrencia": ocorrencia})
+        conn.commit()
+        cur.close()
+        return True
+    finally:
+        conn.close()
+
+
+def materializar_ocorrencia(serie_id: int, ocorrencia: datetime) -> Optional[int]:
+    """
+    Cria a linha de aulas de uma ocorrência (se ainda não existir) e devolve o
+    id. Idempotente: a mesma ocorrência dá sempre a mesma aula, graças ao
+    índice único (serie_id, serie_ocorrencia). None se a série não a gera;
+    ConflitoHorario se colidir com outra sessão do mentor (migração 065).
+    """
+    serie = obter_serie(serie_id)
+    ocorrencia = aula_service.hora_local(ocorrencia)
+    indice = _indice(serie, ocorrencia) if serie else None
+    if indice is None:
+        return None
+
+    valores = {campo: serie[campo] for campo in _CAMPOS_SERIE if campo != "participantes_ids"}
+    valores.update(
+        serie_id=serie_id,
+        serie_ocorrencia=ocorrencia,
+        data_hora=ocorrencia,
+        tema=_tema(serie["tema"], indice),
+        is_realized=False,
+    )
+    colunas = list(valores)
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(f"""
+            INSERT INTO aulas ({", ".join(colunas)})
+            VALUES ({", ".join(f"%({c})s" for c in colunas)})
+            ON CONFLICT (serie_id, serie_ocorrencia) WHERE serie_id IS NOT NULL DO NOTHING
+            RETURNING id
+        """, valores)
+        linha = cur.fetchone()
+        if linha:
+            aula_id = linha[0]
+            if serie["tipo"] == "outro" and serie["participantes_ids"]:
+                cur.execute("""
+                    INSERT INTO aula_participantes (aula_id, user_id)
+                    SELECT %s, unnest(%s::text[])
+                    ON CONFLICT DO NOTHING
+                """, (aula_id, list(serie["participantes_ids"])))
+            logger.info("Ocorrencia %s da serie #%s materializada como aula #%s", ocorrencia, serie_id, aula_id)
+        else:
+            cur.execute(
+                "SELECT id FROM aulas WHERE serie_id = %s AND serie_ocorrencia = %s", (serie_id, ocorrencia),
+            )
+            aula_id = cur.fetchone()[0]
+        conn.commit()
+        cur.close()
+        return aula_id
+    except Exception as e:
+        conn.rollback()
+        if aula_service._e_conflito_horario(e):
+            raise aula_service.ConflitoHorario("O mentor já tem outra sessão no horário desta ocorrência") from e
+        raise
+    finally:
+        conn.close()
+
+
+def listar_ocorrencias(
+    desde: datetime,
+    ate: datetime,
+    allowed_project_ids=None,
+    hide_direcao_sessions=False,
+) -> List[Dict[str, Any]]:
+    """
+    Ocorrências em [desde, ate) das séries visíveis, da mais recente para a mais
+    antiga e com os filtros de GET /api/aulas. As já materializadas não vêm
+    aqui: aparecem em GET /api/aulas como aulas normais.
+    """
+    desde, ate = aula_service.hora_local(desde), aula_service.hora_local(ate)
+    condicoes = ["s.inicio < %(ate)s", "(s.fim IS NULL OR s.fim >= %(desde)s)"]
+    params: Dict[str, Any] = {"desde": desde, "ate": ate}
+    if allowed_project_ids is not None:
+        condicoes.append("(s.tipo IS NULL OR s.tipo = 'aula' OR s.projeto_id = ANY(%(projetos)s))")
+        params["projetos"] = list(allowed_project_ids)
+    if hide_direcao_sessions:
+        from services import settings_service
+
+        direcao = settings_service.obter_direcao_user_ids()
+        if direcao:
+            condicoes.append("(m.user_id IS NULL OR m.user_id::text NOT IN %(direcao)s)")
+            condicoes.append("(s.responsavel_user_id IS NULL OR s.responsavel_user_id NOT IN %(direcao)s)")
+            params["direcao"] = tuple(sorted(direcao))
+
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        try:
+            cur.execute(_SELECT_SERIES + f" WHERE {' AND '.join(condicoes)}", params)
+        except pg_errors.UndefinedTable:
+            logger.warning("aula_series não existe (migração 063); sem ocorrências de séries")
+            return []
+        series = [dict(zip((campo for campo, _ in _COLUNAS), linha)) for linha in cur.fetchall()]
+        materializadas = set()
+        if series:
+            cur.execute("""
+                SELECT serie_id, serie_ocorrencia FROM aulas
+                WHERE serie_id = ANY(%(series)s) AND serie_ocorrencia >= %(desde)s AND serie_ocorrencia < %(ate)s
+            """, {**params, "series": [s["id"] for s in series]})
+            materializadas = set(cur.fetchall())
+        cur.close()
+    finally:
+        conn.close()
+
+    ocorrencias = [
+        _como_aula(serie, indice, data)
+        for serie in series
+        for indice, data in _ocorrencias(serie, desde, ate)
+        if (serie["id"], data) not in materializadas
+    ]
+    ocorrencias.sort(key=lambda o: (o["data_hora"], o["serie_id"]), reverse=True)
+    return ocorrencias
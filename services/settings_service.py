@@ -6,51 +6,96 @@ from __future__ import annotations
 
 import json
 import logging
-from typing import Any, Optional, Set
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, FrozenSet, Optional
 
+from database import cache_invalidacao
 from database.connection import get_db_connection
 
 logger = logging.getLogger(__name__)
 
-_settings_cache: dict = {}
-_CACHE_DIRTY = True
+# Snapshot partilhado pelos pedidos deste worker: settings + users de direção/root.
+# Cada invalidação (NOTIFY de system_settings ou de profiles, ou definir() local)
+# incrementa _versao; o snapshot só é reutilizado enquanto a versão não mudar.
+# Uma invalidação que chegue durante a leitura deixa o snapshot já desatualizado,
+# em vez de ser perdida.
+@dataclass(frozen=True)
+class _Snapshot:
+    versao: int
+    settings: dict
+    direcao_user_ids: FrozenSet[str]
+    lido_em: float
+
+
+_snapshot: Optional[_Snapshot] = None
+_versao = 0
+_lock = threading.Lock()
+# Sem escuta de NOTIFY, outro worker pode ter alterado uma setting: reler ao fim disto
+_CACHE_TTL_SEM_ESCUTA = 30  # segundos
 
 
 def _invalidate_cache() -> None:
-    global _CACHE_DIRTY
-    _CACHE_DIRTY = True
+    global _versao
+    with _lock:
+        _versao += 1
 
 
-def obter_todas() -> dict:
-    """Devolve todas as linhas de system_settings como {key: {value, label, description, updated_at}}."""
-    global _settings_cache, _CACHE_DIRTY
-    if not _CACHE_DIRTY and _settings_cache:
-        return _settings_cache
+# Alterações feitas noutros workers chegam por NOTIFY (triggers das migrações
+# 053/057/059): 'system_settings:<key>' e 'profiles:<id>' (is_direcao/is_root)
+cache_invalidacao.registar(("system_settings", "profiles"), lambda _chave: _invalidate_cache())
+
+
+def _ler_snapshot(versao: int) -> _Snapshot:
     conn = get_db_connection()
     try:
         cur = conn.cursor()
         cur.execute(
             "SELECT key, value, label, description, updated_at FROM system_settings ORDER BY key"
         )
-        rows = cur.fetchall()
-        result = {}
-        for key, value, label, description, updated_at in rows:
-            result[key] = {
+        settings = {
+            key: {
                 "value": value,
                 "label": label,
                 "description": description,
                 "updated_at": updated_at.isoformat() if updated_at else None,
             }
-        _settings_cache = result
-        _CACHE_DIRTY = False
-        return result
-    except Exception as e:
-        logger.error("Erro ao ler system_settings: %s", e)
-        return {}
+            for key, value, label, description, updated_at in cur.fetchall()
+        }
+        cur.execute("SELECT id::text FROM profiles WHERE is_direcao = TRUE OR is_root = TRUE")
+        direcao = frozenset(row[0] for row in cur.fetchall())
+        cur.close()
+        return _Snapshot(versao, settings, direcao, time.time())
     finally:
         conn.close()
 
 
+def snapshot() -> _Snapshot:
+    """Snapshot atual; só vai à BD depois de uma invalidação (ou do TTL, sem escuta)."""
+    global _snapshot
+    atual = _snapshot
+    if atual is not None and atual.versao == _versao and (
+        cache_invalidacao.ativo() or time.time() - atual.lido_em < _CACHE_TTL_SEM_ESCUTA
+    ):
+        return atual
+    versao = _versao
+    try:
+        novo = _ler_snapshot(versao)
+    except Exception as e:
+        logger.error("Erro ao ler system_settings: %s", e)
+        return atual or _Snapshot(-1, {}, frozenset(), 0.0)
+    with _lock:
+        if _snapshot is None or _snapshot.versao <= novo.versao:
+            _snapshot = novo
+    return novo
+
+
+def obter_todas() -> dict:
+    """Devolve todas as linhas de system_settings como {key: {value, label, description, updated_at}}."""
+    return snapshot().settings
+
+
 def obter(key: str, default: Any = None) -> Any:
     """Devolve o valor JSON desserializado de uma setting específica."""
     settings = obter_todas()
@@ -83,7 +128,8 @@ def definir(key: str, value: Any, updated_by_user_id: Optional[str] = None) -> b
             conn.rollback()
             return False
         conn.commit()
-        _invalidate_cache()
+        # Neste worker, sem esperar pelo NOTIFY: também limpa as permissões se for uma flag de módulo
+        cache_invalidacao.despachar(f"system_settings:{key}")
         return True
     except Exception as e:
         conn.rollback()
@@ -102,17 +148,6 @@ def ocultar_sessoes_direcao() -> bool:
     return bool(obter("ocultar_sessoes_direcao", False))
 
 
-def obter_direcao_user_ids() -> Set[str]:
+def obter_direcao_user_ids() -> FrozenSet[str]:
     """Devolve o conjunto de IDs (str) dos users com is_direcao=TRUE ou is_root=TRUE."""
-    conn = get_db_connection()
-    try:
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT id::text FROM profiles WHERE is_direcao = TRUE OR is_root = TRUE"
-        )
-        return {row[0] for row in cur.fetchall()}
-    except Exception as e:
-        logger.warning("Erro ao buscar direcao_user_ids: %s", e)
-        return set()
-    finally:
-        conn.close()
+    return snapshot().direcao_user_ids
@@ -0,0 +1,155 @@
+"""
+==============================================================================
+RAP NOVA ESCOLA - Snapshot "o meu dia" (GET /api/me/snapshot)
+==============================================================================
+Ficheiro: services/snapshot_service.py
+
+Junta num só payload o que um mentor vê ao abrir a app: próximas sessões,
+sessões por confirmar, sessões por registar, notificações por ler e músicas
+atribuídas. O payload é serializado uma vez e guardado por utilizador, com o
+ETag (hash do conteúdo), até ser invalidado:
+  - pelos triggers da migração 056 (NOTIFY 'me_snapshot[:<user_id>]');
+  - pelo TTL, porque "próximas sessões" depende da hora. Um snapshot recalculado
+    igual ao anterior mantém o ETag, por isso o cliente continua a receber 304.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+
+from database import cache_invalidacao
+from database.connection import get_db_connection
+from services import confirmacao_service, notification_service, registo_service
+from utils.lru import CacheLRU
+from utils.single_flight import single_flight
+
+logger = logging.getLogger(__name__)
+
+# user_id -> (etag, corpo)
+_CACHE = CacheLRU("me_snapshot", max_entradas=int(os.getenv("SNAPSHOT_CACHE_MAX", "2000")))
+_CACHE_TTL = 30  # segundos, sem LISTEN ativo
+_CACHE_TTL_LISTENING = 300  # segundos
+
+LIMITE_PROXIMAS = 20
+ESTADOS_PROXIMAS = ("agendada", "pendente", "confirmada", "em_curso")
+
+# Gerações: um snapshot calculado durante uma invalidação não entra na cache
+_lock = threading.Lock()
+_geracao_global = 0
+_geracoes: Dict[str, int] = {}
+
+
+def _geracao(user_id: str) -> Tuple[int, int]:
+    with _lock:
+        return _geracao_global, _geracoes.get(user_id, 0)
+
+
+def invalidar(user_id: Optional[str] = None) -> None:
+    """Invalida o snapshot de um utilizador, ou de todos sem user_id."""
+    global _geracao_global
+    with _lock:
+        if user_id:
+            _geracoes[user_id] = _geracoes.get(user_id, 0) + 1
+            _CACHE.pop(user_id, None)
+        else:
+            _geracao_global += 1
+            _CACHE.clear()
+
+
+cache_invalidacao.registar(("me_snapshot",), invalidar)
+
+
+def _mentor_id(cur, user_id: str) -> Optional[int]:
+    cur.execute("SELECT id FROM mentores WHERE user_id::text = %s ORDER BY id LIMIT 1", (user_id,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def _proximas_sessoes(cur, user_id: str, mentor_id: Optional[int]) -> list:
+    cur.execute("""
+        SELECT a.id, a.data_hora, a.duracao_minutos, a.estado, a.tipo, a.local, a.tema,
+               a.is_autonomous, t.nome AS turma_nome, e.nome AS estabelecimento_nome
+        FROM aulas a
+        LEFT JOIN turmas t ON a.turma_id = t.id
+        LEFT JOIN estabelecimentos e ON t.estabelecimento_id = e.id
+        WHERE a.data_hora >= NOW()
+          AND a.estado IN %s
+          AND (a.mentor_id = %s OR a.responsavel_user_id = %s)
+        ORDER BY a.data_hora ASC
+        LIMIT %s
+    """, (ESTADOS_PROXIMAS, mentor_id, user_id, LIMITE_PROXIMAS))
+    return [
+        {
+            'id': r[0], 'data_hora': r[1], 'duracao_minutos': r[2], 'estado': r[3],
+            'tipo': r[4], 'local': r[5], 'tema': r[6], 'is_autonomous': r[7],
+            'turma_nome': r[8], 'estabelecimento_nome': r[9],
+        }
+        for r in cur.fetchall()
+    ]
+
+
+def _musicas_atribuidas(cur, user_id: str) -> list:
+    cur.execute("""
+        SELECT m.id, m.titulo, m.estado, m.fase_deadline, t.nome AS turma_nome
+        FROM musicas m
+        LEFT JOIN turmas t ON m.turma_id = t.id
+        WHERE m.responsavel_id::text = %s AND m.arquivado = FALSE
+        ORDER BY m.fase_deadline NULLS LAST, m.id
+    """, (user_id,))
+    return [
+        {'id': r[0], 'titulo': r[1], 'estado': r[2], 'fase_deadline': r[3], 'turma_nome': r[4]}
+        for r in cur.fetchall()
+    ]
+
+
+def calcular_snapshot(user_id: str) -> dict:
+    """Payload completo do snapshot (sem cache)."""
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        mentor_id = _mentor_id(cur, user_id)
+        proximas = _proximas_sessoes(cur, user_id, mentor_id)
+        musicas = _musicas_atribuidas(cur, user_id)
+        cur.close()
+    finally:
+        conn.close()
+
+    return {
+        'user_id': user_id,
+        'mentor_id': mentor_id,
+        'proximas_sessoes': proximas,
+        'pendentes_confirmacao': confirmacao_service.listar_aulas_pendentes_mentor(mentor_id) if mentor_id else [],
+        'por_registar': registo_service.listar_sessoes_registaveis(user_id),
+        'notificacoes_nao_lidas': notification_service.contar_nao_lidas(user_id),
+        'musicas': musicas,
+    }
+
+
+def serializar(snapshot: dict) -> Tuple[str, bytes]:
+    """(ETag, corpo JSON). O ETag só depende do conteúdo."""
+    corpo = json.dumps(jsonable_encoder(snapshot), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return f'"{hashlib.sha256(corpo).hexdigest()[:32]}"', corpo
+
+
+@single_flight
+def _construir(user_id: str) -> Tuple[str, bytes]:
+    geracao = _geracao(user_id)
+    etag, corpo = serializar(calcular_snapshot(user_id))
+    with _lock:
+        if (_geracao_global, _geracoes.get(user_id, 0)) == geracao:
+            _CACHE.set(user_id, (etag, corpo))
+    return etag, corpo
+
+
+def obter_snapshot(user_id: str) -> Tuple[str, bytes]:
+    """(ETag, corpo JSON) do snapshot do utilizador, da cache quando possível."""
+    ttl = _CACHE_TTL_LISTENING if cache_invalidacao.ativo() else _CACHE_TTL
+    entry = _CACHE.get(user_id, ttl)
+    if entry is not None:
+        return entry
+    return _construir(user_id)
@@ -11,6 +11,7 @@ Cada turma tem as suas próprias disciplinas e atividades com UUID.
 import logging
 
 from database.connection import get_db_connection
+from utils.single_flight import single_flight
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +25,7 @@ def _has_is_autonomous(cur) -> bool:
     return cur.fetchone() is not None
 
 
+@single_flight
 def listar_hierarquia_projeto(projeto_id: int):
     """
     Retorna a hierarquia completa para o accordion da Wiki:
@@ -0,0 +1,5 @@
+import os
+
+# permission_service cria o cliente Supabase ao importar; para os testes basta um endereço local
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:54321")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "teste")
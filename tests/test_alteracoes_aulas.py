@@ -0,0 +1,165 @@
+import time
+from datetime import datetime, timedelta
+
+import psycopg2
+import pytest
+
+from perf import PERF_DATABASE_URL
+from perf.listagem_aulas import mentor_com_scoping
+from perf.planos import capturar_sql
+from services import aula_service
+
+
+def test_token_ida_e_volta():
+    momento = datetime(2026, 3, 10, 14, 30, 5, 123456)
+    assert aula_service.ler_token(aula_service.codificar_token(momento)) == momento
+    cursor = aula_service.codificar_cursor(momento, 1)
+    for invalido in ("", "nao-e-token", cursor):
+        with pytest.raises(ValueError):
+            aula_service.ler_token(invalido)
+
+
+def test_token_guarda_a_visao(monkeypatch):
+    momento = datetime(2026, 3, 10, 14, 30)
+    visao = aula_service.visao_aulas([3, 1], frozenset({"u1"}))
+    token = aula_service.codificar_token(momento, visao)
+    assert aula_service.ler_token(token) == momento
+    assert aula_service.visao_do_token(token) == visao
+    assert aula_service.visao_do_token(aula_service.codificar_token(momento)) == ""
+    assert aula_service.visao_aulas() == ""
+    assert visao == aula_service.visao_aulas([1, 3], frozenset({"u1"}))
+    assert visao != aula_service.visao_aulas([1, 3])
+    assert visao != aula_service.visao_aulas([1], frozenset({"u1"}))
+
+    # Acesso a projetos diferente do do token: recarregar sem olhar para as aulas
+    monkeypatch.setattr(aula_service, "get_db_connection", lambda: _ConnAgora(momento))
+    resposta = aula_service.listar_alteracoes_aulas(momento, allowed_project_ids=[1], visao_anterior=visao)
+    assert resposta["recarregar"]
+    assert aula_service.visao_do_token(resposta["token"]) == aula_service.visao_aulas([1])
+
+
+class _ConnAgora:
+    """Ligação que só responde à hora da base."""
+
+    def __init__(self, agora):
+        self.agora = agora
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=None):
+        assert "clock_timestamp" in sql
+
+    def fetchone(self):
+        return (self.agora,)
+
+    def close(self):
+        pass
+
+
+@pytest.mark.skipif(not PERF_DATABASE_URL, reason="PERF_DATABASE_URL não definido (base de perf local)")
+def test_alteracoes_desde_o_token():
+    conn = psycopg2.connect(PERF_DATABASE_URL)
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM pg_class WHERE relname = 'aulas_apagadas'")
+    if not cur.fetchone():
+        conn.close()
+        pytest.skip("migração 061 não aplicada na base de perf")
+    projetos = mentor_com_scoping(cur)["projetos"]
+    # Uma aula presencial (visível) e uma de outro projeto que sai do âmbito do mentor
+    cur.execute("SELECT id, tema FROM aulas WHERE tipo = 'aula' ORDER BY id LIMIT 1")
+    presencial, tema_original = cur.fetchone()
+    cur.execute("""
+        SELECT id, projeto_id FROM aulas
+        WHERE tipo = 'trabalho_autonomo' AND projeto_id = ANY(%s) ORDER BY id LIMIT 1
+    """, (projetos,))
+    autonoma, projeto_original = cur.fetchone()
+    cur.execute("SELECT id FROM projetos WHERE id <> ALL(%s) ORDER BY id LIMIT 1", (projetos,))
+    outro_projeto = cur.fetchone()[0]
+    cur.execute("""
+        INSERT INTO aulas (projeto_id, turma_id, mentor_id, tipo, data_hora, duracao_minutos, estado)
+        SELECT projeto_id, turma_id, mentor_id, tipo, data_hora, duracao_minutos, estado FROM aulas WHERE id = %s
+        RETURNING id
+    """, (presencial,))
+    temporaria = cur.fetchone()[0]
+    conn.commit()
+
+    try:
+        with capturar_sql(PERF_DATABASE_URL, aula_service):
+            inicial = aula_service.listar_alteracoes_aulas(None)
+            assert inicial["recarregar"] and inicial["alteradas"] == []
+            token = inicial["token"]
+            # Fora da margem de segurança, para o delta só ter o que mudou a seguir
+            desde = aula_service.ler_token(token) + aula_service.MARGEM_ALTERACOES
+            time.sleep(0.01)
+
+            cur.execute("UPDATE aulas SET tema = 'delta-sync' WHERE id = %s", (presencial,))
+            cur.execute("UPDATE aulas SET projeto_id = %s WHERE id = %s", (outro_projeto, autonoma))
+            cur.execute("DELETE FROM aulas WHERE id = %s", (temporaria,))
+            conn.commit()
+
+            delta = aula_service.listar_alteracoes_aulas(desde, allowed_project_ids=projetos)
+            assert not delta["recarregar"]
+            assert [a["id"] for a in delta["alteradas"]] == [presencial]
+            assert delta["alteradas"][0]["tema"] == "delta-sync"
+            assert delta["removidas"] == sorted([autonoma, temporaria])
+            assert aula_service.ler_token(delta["token"]) > aula_service.ler_token(token)
+
+            # Sem filtros de projeto a aula que mudou de projeto continua visível
+            delta = aula_service.listar_alteracoes_aulas(desde)
+            assert {a["id"] for a in delta["alteradas"]} == {presencial, autonoma}
+            assert delta["removidas"] == [temporaria]
+
+            antigo = aula_service.ler_token(token) - aula_service.RETENCAO_APAGADAS - timedelta(days=1)
+            assert aula_service.listar_alteracoes_aulas(antigo)["recarregar"]
+    finally:
+        conn.rollback()
+        cur.execute("UPDATE aulas SET tema = %s WHERE id = %s", (tema_original, presencial))
+        cur.execute("UPDATE aulas SET projeto_id = %s WHERE id = %s", (projeto_original, autonoma))
+        cur.execute("DELETE FROM aulas WHERE id = %s", (temporaria,))
+        cur.execute("DELETE FROM aulas_apagadas WHERE aula_id = %s", (temporaria,))
+        conn.commit()
+        conn.close()
+
+
+@pytest.mark.skipif(not PERF_DATABASE_URL, reason="PERF_DATABASE_URL não definido (base de perf local)")
+def test_nomes_e_participantes_contam_como_alteracao():
+    conn = psycopg2.connect(PERF_DATABASE_URL)
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM pg_attribute WHERE attrelid = 'calendar_entries'::regclass AND attname = 'alterado_em'")
+    if not cur.fetchone():
+        conn.close()
+        pytest.skip("migração 062 (com alterado_em) não aplicada na base de perf")
+    cur.execute("""
+        SELECT a.turma_id, t.nome FROM aulas a JOIN turmas t ON t.id = a.turma_id
+        GROUP BY a.turma_id, t.nome ORDER BY count(*) LIMIT 1
+    """)
+    turma_id, nome_original = cur.fetchone()
+    cur.execute("SELECT array_agg(id ORDER BY id) FROM aulas WHERE turma_id = %s", (turma_id,))
+    da_turma = cur.fetchone()[0]
+    cur.execute("SELECT id FROM aulas WHERE tipo = 'outro' AND id <> ALL(%s) ORDER BY id LIMIT 1", (da_turma,))
+    outro = cur.fetchone()[0]
+    cur.execute("SELECT id FROM profiles ORDER BY id LIMIT 1")
+    participante = cur.fetchone()[0]
+    cur.execute("SELECT clock_timestamp() AT TIME ZONE 'UTC'")
+    desde = cur.fetchone()[0] + aula_service.MARGEM_ALTERACOES
+    conn.commit()
+    time.sleep(0.01)
+
+    try:
+        cur.execute("UPDATE turmas SET nome = nome || ' (delta)' WHERE id = %s", (turma_id,))
+        cur.execute("INSERT INTO aula_participantes (aula_id, user_id) VALUES (%s, %s)", (outro, participante))
+        conn.commit()
+        with capturar_sql(PERF_DATABASE_URL, aula_service):
+            delta = aula_service.listar_alteracoes_aulas(desde)
+        assert not delta["recarregar"]
+        alteradas = {a["id"]: a for a in delta["alteradas"]}
+        assert set(alteradas) == set(da_turma) | {outro}
+        assert {alteradas[i]["turma_nome"] for i in da_turma} == {nome_original + " (delta)"}
+        assert participante in alteradas[outro]["participantes_ids"]
+    finally:
+        conn.rollback()
+        cur.execute("UPDATE turmas SET nome = %s WHERE id = %s", (nome_original, turma_id))
+        cur.execute("DELETE FROM aula_participantes WHERE aula_id = %s AND user_id = %s", (outro, participante))
+        conn.commit()
+        conn.close()
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+import psycopg2
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from perf import PERF_DATABASE_URL
+from perf.planos import capturar_sql
+from services import aula_service, notification_service, serie_service
+
+perf_db = pytest.mark.skipif(not PERF_DATABASE_URL, reason="PERF_DATABASE_URL não definido (base de perf local)")
+
+INICIO = datetime(2031, 3, 3, 18, 30)
+
+
+def test_aula_regular_sem_turma_nao_cria_nada():
+    assert aula_service.criar_aulas_recorrentes(
+        INICIO.isoformat(), 90, None, None, None, 4, is_autonomous=False, tipo="aula",
+    ) == []
+
+
+@pytest.fixture
+def cur():
+    conn = psycopg2.connect(PERF_DATABASE_URL)
+    cur = conn.cursor()
+    criadas = []
+    yield cur, criadas
+    conn.rollback()
+    cur.execute("DELETE FROM aulas WHERE id = ANY(%s)", (criadas,))
+    cur.execute("DELETE FROM aulas_apagadas WHERE aula_id = ANY(%s)", (criadas,))
+    conn.commit()
+    conn.close()
+
+
+@perf_db
+def test_serie_numa_transacao_com_uma_notificacao_por_pessoa(monkeypatch, cur):
+    cur, criadas = cur
+    cur.execute("SELECT id::text FROM profiles ORDER BY id LIMIT 3")
+    criador, *participantes = [r[0] for r in cur.fetchall()]
+    cur.execute("SELECT turma_id, mentor_id FROM aulas WHERE tipo = 'aula' AND mentor_id IS NOT NULL LIMIT 1")
+    turma_id, mentor_id = cur.fetchone()
+    notificacoes, mentores = [], []
+    monkeypatch.setattr(notification_service, "criar_notificacao", lambda **kw: notificacoes.append(kw))
+    monkeypatch.setattr(aula_service, "_notificar_mentor", lambda *args: mentores.append(args))
+    conflitos = []
+    monkeypatch.setattr(aula_service, "_notificar_conflitos_mentor", lambda *args: conflitos.append(args))
+
+    with capturar_sql(PERF_DATABASE_URL, aula_service) as capturadas, capturar_sql(PERF_DATABASE_URL, serie_service):
+        sessoes = aula_service.criar_aulas_recorrentes(
+            INICIO.isoformat(), 60, None, None, None, 12, tema="3", tipo="outro", is_autonomous=False,
+            participantes_ids=[criador, *participantes, participantes[0]], criador_user_id=criador,
+        )
+        criadas.extend(s["id"] for s in sessoes)
+        assert [s["data_hora"] for s in sessoes] == [INICIO + timedelta(weeks=i) for i in range(12)]
+        assert [s["tema"] for s in sessoes] == [str(3 + i) for i in range(12)]
+        assert {s["estado"] for s in sessoes} == {"confirmada"}
+        assert sum(sql.lstrip().startswith("INSERT INTO aulas") for sql in capturadas) == 1
+
+        cur.execute("SELECT count(*), count(DISTINCT user_id) FROM aula_participantes WHERE aula_id = ANY(%s)", (criadas,))
+        assert cur.fetchone() == (12 * 3, 3)
+        cur.execute("SELECT participantes_ids FROM calendar_entries WHERE id = %s", (criadas[-1],))
+        assert sorted(cur.fetchone()[0]) == sorted([criador, *participantes])
+        assert sorted(n["user_id"] for n in notificacoes) == sorted(participantes)
+        assert notificacoes[0]["metadados"]["aula_ids"] == criadas
+        assert mentores == []
+
+        # Série de aulas com mentor: uma notificação para a série toda; turma inexistente não deixa nada
+        notificacoes.clear()
+        sessoes = aula_service.criar_aulas_recorrentes(
+            INICIO.isoformat(), 90, None, None, None, 52, turma_id=turma_id, mentor_id=mentor_id,
+            is_autonomous=False, tipo="aula",
+        )
+        criadas.extend(s["id"] for s in sessoes)
+        assert len(sessoes) == 52 and {s["estado"] for s in sessoes} == {aula_service.ESTADO_PENDENTE}
+        assert len(mentores) == 1 and mentores[0][0] == mentor_id and len(mentores[0][3]["aula_ids"]) == 52
+        assert notificacoes == []
+        assert conflitos == [(s["id"], mentor_id, s["data_hora"], 90) for s in sessoes]
+
+        cur.execute("SELECT count(*) FROM aulas")
+        antes = cur.fetchone()[0]
+        with pytest.raises(IntegrityError):
+            aula_service.criar_aulas_recorrentes(
+                INICIO.isoformat(), 90, None, None, None, 8, turma_id=-1, is_autonomous=False, tipo="aula",
+            )
+        cur.execute("SELECT count(*) FROM aulas")
+        assert cur.fetchone()[0] == antes
@@ -0,0 +1,114 @@
+import asyncio
+import time
+
+import httpx
+import jwt
+import pytest
+from fastapi import Depends, FastAPI, HTTPException
+
+import auth
+from api.routers import batch, team
+from api.routers import sessions
+from services import permission_service, profile_service, turma_service
+
+SEGREDO = "segredo-de-teste"
+USER_ID = "00000000-0000-0000-0000-000000000001"
+
+
+def _token():
+    return jwt.encode({"sub": USER_ID, "aud": "authenticated", "email": "a@b.pt"}, SEGREDO, algorithm="HS256")
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(auth, "JWT_SECRET", SEGREDO)
+    permission_service._cache_set(USER_ID, {"role": "coordenador", "is_root": False})
+
+    app = FastAPI()
+    app.include_router(batch.router)
+
+    @app.get("/api/aulas")
+    async def aulas(projeto_id: int = 0, user=Depends(auth.get_current_user_required)):
+        perms = permission_service.get_user_permissions(user["sub"])
+        return [{"id": 1, "projeto_id": projeto_id, "role": perms["role"]}]
+
+    @app.get("/api/proibido")
+    def proibido(user=Depends(auth.get_current_user_required)):
+        raise HTTPException(status_code=403, detail="Acesso negado.")
+
+    yield app
+    permission_service._cache_invalidate(USER_ID)
+
+
+def _post(app, corpo, token=None):
+    async def _executar():
+        transporte = httpx.ASGITransport(app=app)
+        cabecalhos = {"Authorization": f"Bearer {token or _token()}"}
+        async with httpx.AsyncClient(transport=transporte, base_url="http://api") as cliente:
+            return await cliente.post("/api/batch", json=corpo, headers=cabecalhos)
+    return asyncio.run(_executar())
+
+
+def test_batch_junta_respostas_com_status_proprio(app):
+    resp = _post(app, {"pedidos": [
+        {"id": "aulas", "url": "/api/aulas?projeto_id=3"},
+        {"id": "proibido", "url": "/api/proibido"},
+        {"url": "/api/nao-existe"},
+    ]})
+    assert resp.status_code == 200
+    respostas = resp.json()["respostas"]
+    assert respostas[0] == {"id": "aulas", "status": 200, "corpo": [{"id": 1, "projeto_id": 3, "role": "coordenador"}]}
+    assert respostas[1] == {"id": "proibido", "status": 403, "corpo": {"detail": "Acesso negado."}}
+    assert respostas[2]["id"] == "/api/nao-existe" and respostas[2]["status"] == 404
+
+
+def test_token_e_permissoes_resolvidos_uma_vez(app, monkeypatch):
+    descodificacoes = []
+    original = jwt.decode
+    monkeypatch.setattr(auth.jwt, "decode", lambda *a, **k: descodificacoes.append(1) or original(*a, **k))
+
+    resp = _post(app, {"pedidos": [{"url": f"/api/aulas?projeto_id={i}"} for i in range(5)]})
+    assert [r["status"] for r in resp.json()["respostas"]] == [200] * 5
+    assert len(descodificacoes) == 1
+
+
+def test_permissoes_partilhadas_sobrevivem_a_invalidacao_durante_o_pedido():
+    permission_service._cache_set("u-memo", {"role": "mentor"})
+    with permission_service.permissoes_partilhadas():
+        assert permission_service._cache_get("u-memo") == {"role": "mentor"}
+        permission_service._cache_invalidate("u-memo")
+        assert permission_service._cache_get("u-memo") == {"role": "mentor"}
+    assert permission_service._cache_get("u-memo") is None
+
+
+@pytest.mark.parametrize("url", ["/api/batch", "https://outro.pt/api/aulas", "/docs"])
+def test_batch_rejeita_urls_fora_da_api(app, url):
+    assert _post(app, {"pedidos": [{"url": url}]}).status_code == 400
+
+
+def test_batch_exige_autenticacao(app):
+    assert _post(app, {"pedidos": [{"url": "/api/aulas"}]}, token="invalido").status_code == 401
+
+
+def test_sub_pedidos_lentos_correm_em_simultaneo(app, monkeypatch):
+    # Handlers síncronos vão para a threadpool: o gather sobrepõe-nos em vez de
+    # os correr um a um no event loop.
+    intervalos = []
+
+    def _lento(resultado):
+        def _ler():
+            inicio = time.monotonic()
+            time.sleep(0.3)
+            intervalos.append((inicio, time.monotonic()))
+            return resultado
+        return _ler
+
+    monkeypatch.setattr(profile_service, "listar_perfis", _lento([{"id": USER_ID}]))
+    monkeypatch.setattr(turma_service, "listar_mentores", _lento([]))
+    app.include_router(team.router)
+    app.include_router(sessions.router)
+
+    resp = _post(app, {"pedidos": [{"url": "/api/equipa"}, {"url": "/api/mentores"}]})
+    assert [r["status"] for r in resp.json()["respostas"]] == [200, 200]
+    (inicio_a, fim_a), (inicio_b, fim_b) = intervalos
+    assert inicio_a < fim_b and inicio_b < fim_a
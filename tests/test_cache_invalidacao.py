@@ -0,0 +1,124 @@
+import time
+
+import psycopg2
+import pytest
+
+from database import cache_invalidacao, connection
+from perf import PERF_DATABASE_URL
+from services import permission_service, settings_service
+
+
+def test_despachar_entrega_a_chave_ao_callback():
+    recebidos = []
+    cache_invalidacao.registar(("tabela_teste",), recebidos.append)
+    cache_invalidacao.despachar("tabela_teste:abc")
+    cache_invalidacao.despachar("tabela_teste")
+    cache_invalidacao.despachar("outra_tabela:abc")
+    assert recebidos == ["abc", None]
+
+
+def test_notify_de_profiles_invalida_so_esse_utilizador():
+    permission_service._cache_set("u1", {"role": "mentor"})
+    permission_service._cache_set("u2", {"role": "mentor"})
+    cache_invalidacao.despachar("profiles:u1")
+    assert "u1" not in permission_service._CACHE and "u2" in permission_service._CACHE
+    cache_invalidacao.despachar("permission_levels")
+    assert not permission_service._CACHE
+
+
+def test_notify_de_system_settings_marca_cache_suja():
+    versao = settings_service._versao
+    cache_invalidacao.despachar("system_settings")
+    assert settings_service._versao == versao + 1
+
+
+def test_notify_de_profiles_refresca_users_de_direcao():
+    versao = settings_service._versao
+    cache_invalidacao.despachar("profiles:u1")
+    assert settings_service._versao == versao + 1
+
+
+def test_so_flags_de_modulo_invalidam_permissoes():
+    permission_service._cache_set("u1", {"role": "mentor"})
+    versao = settings_service._versao
+    cache_invalidacao.despachar("system_settings:ocultar_sessoes_direcao")
+    assert settings_service._versao > versao and "u1" in permission_service._CACHE
+    cache_invalidacao.despachar("system_settings:module_chat_enabled")
+    assert "u1" not in permission_service._CACHE
+
+
+def test_permissoes_lidas_antes_da_invalidacao_nao_ficam_em_cache(monkeypatch):
+    class _Conexao:
+        def close(self):
+            pass
+
+    def _ler(_conn, user_id):
+        # Chega um NOTIFY enquanto as permissões estão a ser lidas
+        cache_invalidacao.despachar(f"profiles:{user_id}")
+        return None
+
+    monkeypatch.setattr(connection, "get_db_connection", lambda: _Conexao())
+    monkeypatch.setattr(permission_service, "_fetch_permission_row", _ler)
+    assert permission_service.get_user_permissions("u-corrida")["role"] == "mentor"
+    assert "u-corrida" not in permission_service._CACHE
+
+    monkeypatch.setattr(permission_service, "_fetch_permission_row", lambda _conn, _user_id: None)
+    permission_service.get_user_permissions("u-corrida")
+    assert "u-corrida" in permission_service._CACHE
+
+
+@pytest.mark.skipif(not PERF_DATABASE_URL, reason="PERF_DATABASE_URL não definido (base de perf local)")
+def test_alteracao_noutro_processo_chega_em_milissegundos(monkeypatch):
+    conn = psycopg2.connect(PERF_DATABASE_URL)
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM pg_proc WHERE proname = 'notificar_invalidacao_cache'")
+    if not cur.fetchone():
+        conn.close()
+        pytest.skip("migração 053 não aplicada na base de perf")
+    cur.execute("SELECT id::text, role FROM profiles ORDER BY email LIMIT 1")
+    user_id, role = cur.fetchone()
+
+    monkeypatch.setenv("DB_SESSAO_DSN", PERF_DATABASE_URL)
+    monkeypatch.setenv("CACHE_INVALIDACAO", "on")
+    assert cache_invalidacao.iniciar()
+    try:
+        limite = time.monotonic() + 5
+        while not cache_invalidacao.ativo() and time.monotonic() < limite:
+            time.sleep(0.01)
+        assert cache_invalidacao.ativo()
+
+        permission_service._cache_set(user_id, {"role": role})
+        # Reescrever o mesmo valor dispara o trigger sem alterar dados
+        cur.execute("UPDATE profiles SET role = role WHERE id = %s", (user_id,))
+        conn.commit()
+        t0 = time.monotonic()
+        while user_id in permission_service._CACHE and time.monotonic() - t0 < 2:
+            time.sleep(0.001)
+        assert user_id not in permission_service._CACHE
+        assert time.monotonic() - t0 < 0.5
+    finally:
+        cache_invalidacao.parar()
+        conn.close()
+
+
+def test_snapshot_de_settings_reutilizado_ate_a_invalidacao(monkeypatch):
+    leituras = []
+
+    def _ler(versao):
+        leituras.append(versao)
+        if len(leituras) == 1:
+            # NOTIFY a meio da leitura: este snapshot já nasce desatualizado
+            settings_service._invalidate_cache()
+        return settings_service._Snapshot(versao, {"ocultar_sessoes_direcao": {"value": True}}, frozenset({"d1"}), time.time())
+
+    monkeypatch.setattr(settings_service, "_ler_snapshot", _ler)
+    monkeypatch.setattr(settings_service, "_snapshot", None)
+    monkeypatch.setattr(cache_invalidacao, "ativo", lambda: True)
+
+    assert settings_service.obter_direcao_user_ids() == {"d1"}
+    assert settings_service.ocultar_sessoes_direcao()
+    assert settings_service.obter_direcao_user_ids() == {"d1"}
+    assert len(leituras) == 2
+    cache_invalidacao.despachar("profiles:d2")
+    settings_service.obter_todas()
+    assert len(leituras) == 3
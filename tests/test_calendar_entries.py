@@ -0,0 +1,152 @@
+import psycopg2
+import pytest
+
+from perf import PERF_DATABASE_URL
+from perf.planos import capturar_sql
+from services import aula_service
+
+pytestmark = pytest.mark.skipif(not PERF_DATABASE_URL, reason="PERF_DATABASE_URL não definido (base de perf local)")
+
+
+def _pelas_duas_vias(monkeypatch, **kwargs):
+    """(calendar_entries, joins) para os mesmos argumentos; participantes sem ordem."""
+    resultados = []
+    with capturar_sql(PERF_DATABASE_URL, aula_service):
+        for disponivel in (True, False):
+            monkeypatch.setattr(aula_service._CALENDARIO, "disponivel", disponivel)
+            aulas = aula_service._listar_aulas(**kwargs)
+            resultados.append([{**a, "participantes_ids": sorted(a["participantes_ids"])} for a in aulas])
+    return resultados
+
+
+@pytest.fixture
+def conn():
+    conn = psycopg2.connect(PERF_DATABASE_URL)
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM pg_class WHERE relname = 'calendar_entries'")
+    if not cur.fetchone():
+        conn.close()
+        pytest.skip("migração 062 não aplicada na base de perf")
+    yield conn
+    conn.close()
+
+
+def test_projecao_igual_aos_joins(monkeypatch, conn):
+    projecao, joins = _pelas_duas_vias(monkeypatch, limite=5000)
+    assert len(projecao) == 5000
+    assert projecao == joins
+
+
+def test_triggers_mantem_a_projecao(monkeypatch, conn):
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT a.id, a.tema, a.turma_id, t.nome, t.estabelecimento_id, e.sigla, a.mentor_id, m.nome
+        FROM aulas a JOIN turmas t ON t.id = a.turma_id
+        JOIN estabelecimentos e ON e.id = t.estabelecimento_id
+        JOIN mentores m ON m.id = a.mentor_id
+        WHERE a.tipo = 'aula' ORDER BY a.id LIMIT 1
+    """)
+    aula_id, tema, turma_id, turma_nome, estab_id, sigla, mentor_id, mentor_nome = cur.fetchone()
+    cur.execute("""
+        SELECT id, aula_id, user_id FROM aula_participantes
+        WHERE aula_id IN (SELECT id FROM aulas WHERE tipo = 'outro') ORDER BY id LIMIT 1
+    """)
+    participante_id, outra_aula, participante_user = cur.fetchone()
+    nova = None
+    try:
+        cur.execute("UPDATE turmas SET nome = nome || ' (calendário)' WHERE id = %s", (turma_id,))
+        cur.execute("UPDATE estabelecimentos SET sigla = 'CAL' WHERE id = %s", (estab_id,))
+        cur.execute("UPDATE mentores SET nome = 'Mentor calendário' WHERE id = %s", (mentor_id,))
+        cur.execute("UPDATE aulas SET tema = 'calendário', tipo = 'outro' WHERE id = %s", (aula_id,))
+        cur.execute("INSERT INTO aula_participantes (aula_id, user_id) VALUES (%s, %s)", (aula_id, participante_user))
+        cur.execute("DELETE FROM aula_participantes WHERE id = %s", (participante_id,))
+        cur.execute("""
+            INSERT INTO aulas (projeto_id, turma_id, mentor_id, tipo, data_hora, duracao_minutos, estado)
+            SELECT projeto_id, turma_id, mentor_id, 'aula', data_hora, duracao_minutos, estado FROM aulas WHERE id = %s
+            RETURNING id
+        """, (aula_id,))
+        nova = cur.fetchone()[0]
+        conn.commit()
+
+        ids = [aula_id, outra_aula, nova]
+        cur.execute("SELECT id FROM aulas WHERE turma_id = %s OR mentor_id = %s ORDER BY id LIMIT 200", (turma_id, mentor_id))
+        ids += [r[0] for r in cur.fetchall()]
+        projecao, joins = _pelas_duas_vias(monkeypatch, ids=ids, limite=len(ids))
+        assert projecao == joins
+        por_id = {a["id"]: a for a in projecao}
+        assert por_id[aula_id]["tema"] == "calendário"
+        assert por_id[aula_id]["participantes_ids"] == [participante_user]
+        assert por_id[aula_id]["estabelecimento_sigla"] == "CAL"
+        assert por_id[nova]["mentor_nome"] == "Mentor calendário"
+        assert participante_user not in por_id[outra_aula]["participantes_ids"]
+
+        cur.execute("DELETE FROM aulas WHERE id = %s", (nova,))
+        conn.commit()
+        cur.execute("SELECT count(*) FROM calendar_entries WHERE id = %s", (nova,))
+        assert cur.fetchone()[0] == 0
+    finally:
+        conn.rollback()
+        cur.execute("UPDATE turmas SET nome = %s WHERE id = %s", (turma_nome, turma_id))
+        cur.execute("UPDATE estabelecimentos SET sigla = %s WHERE id = %s", (sigla, estab_id))
+        cur.execute("UPDATE mentores SET nome = %s WHERE id = %s", (mentor_nome, mentor_id))
+        cur.execute("UPDATE aulas SET tema = %s, tipo = 'aula' WHERE id = %s", (tema, aula_id))
+        cur.execute("DELETE FROM aula_participantes WHERE aula_id = %s", (aula_id,))
+        cur.execute("""
+            INSERT INTO aula_participantes (id, aula_id, user_id) VALUES (%s, %s, %s) ON CONFLICT DO NOTHING
+        """, (participante_id, outra_aula, participante_user))
+        if nova:
+            cur.execute("DELETE FROM aulas WHERE id = %s", (nova,))
+            cur.execute("DELETE FROM aulas_apagadas WHERE aula_id = %s", (nova,))
+        conn.commit()
+
+
+def test_atividades_e_nome_do_perfil_chegam_a_projecao(conn):
+    """Tudo numa transação desfeita no fim: lê-se calendar_entries na mesma ligação."""
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT a.id, ta.turma_disciplina_id FROM aulas a JOIN turma_atividades ta ON ta.uuid = a.atividade_uuid
+        ORDER BY a.id LIMIT 1
+    """)
+    aula_id, disciplina_id = cur.fetchone()
+    cur.execute("""
+        SELECT m.id, m.user_id FROM mentores m JOIN profiles p ON p.id = m.user_id
+        WHERE EXISTS (SELECT 1 FROM aulas WHERE mentor_id = m.id) ORDER BY m.id LIMIT 1
+    """)
+    mentor_id, user_id = cur.fetchone()
+
+    def _entrada(coluna, condicao, valor):
+        cur.execute(f"SELECT {coluna}, alterado_em FROM calendar_entries WHERE {condicao} = %s ORDER BY id LIMIT 1", (valor,))
+        return cur.fetchone()
+
+    try:
+        # Refrescar sem mudanças não mexe em alterado_em
+        antes = _entrada("atividade_nome", "id", aula_id)
+        cur.execute("SELECT calendar_entries_refrescar(ARRAY[%s])", (aula_id,))
+        assert _entrada("atividade_nome", "id", aula_id) == antes
+
+        cur.execute("""
+            INSERT INTO turma_atividades (turma_disciplina_id, nome) VALUES (%s, 'Atividade calendário') RETURNING uuid
+        """, (disciplina_id,))
+        nova = cur.fetchone()[0]
+        cur.execute("UPDATE aulas SET atividade_uuid = %s WHERE id = %s", (nova, aula_id))
+        assert _entrada("atividade_nome", "id", aula_id)[0] == "Atividade calendário"
+        cur.execute("DELETE FROM turma_atividades WHERE uuid = %s", (nova,))
+        assert _entrada("atividade_nome", "id", aula_id)[0] is None
+
+        # profiles.full_name → mentores.nome é o trigger_sync_roles de produção (fix_complete_trigger.py)
+        cur.execute("""
+            CREATE FUNCTION pg_temp.sync_nome() RETURNS TRIGGER AS $$
+            BEGIN
+              UPDATE mentores SET nome = NEW.full_name WHERE user_id = NEW.id;
+              RETURN NEW;
+            END;
+            $$ LANGUAGE plpgsql
+        """)
+        cur.execute("""
+            CREATE TRIGGER trigger_sync_roles AFTER UPDATE ON profiles
+            FOR EACH ROW EXECUTE FUNCTION pg_temp.sync_nome()
+        """)
+        cur.execute("UPDATE profiles SET full_name = 'Perfil calendário' WHERE id = %s", (user_id,))
+        assert _entrada("mentor_nome", "mentor_id", mentor_id)[0] == "Perfil calendário"
+    finally:
+        conn.rollback()
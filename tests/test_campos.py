@@ -0,0 +1,55 @@
+import pytest
+
+from perf import PERF_DATABASE_URL
+from perf.planos import capturar_sql
+from services import aula_service, equipment_service, musica_service
+from utils.campos import ler_campos, projetar
+
+perf_db = pytest.mark.skipif(not PERF_DATABASE_URL, reason="PERF_DATABASE_URL não definido (base de perf local)")
+
+
+def test_ler_campos():
+    assert ler_campos(None, ("id", "titulo")) is None
+    assert ler_campos(" ", ("id", "titulo")) is None
+    assert ler_campos("titulo, ", ("id", "titulo")) == {"id", "titulo"}
+    assert ler_campos("tipo", aula_service.CAMPOS_LISTA, aula_service.CAMPOS_LISTA_SEMPRE) == {"id", "data_hora", "tipo"}
+    with pytest.raises(ValueError, match="estado, xpto"):
+        ler_campos("titulo,xpto,estado", ("id", "titulo"))
+
+
+def test_projetar_mantem_a_ordem():
+    linhas = [{"id": 1, "titulo": "a", "estado": "x"}]
+    assert projetar(linhas, None) is linhas
+    assert list(projetar(linhas, frozenset({"estado", "id"}))[0]) == ["id", "estado"]
+
+
+@perf_db
+def test_aulas_so_com_os_campos_pedidos():
+    campos = ler_campos("tipo,estado,turma_nome", aula_service.CAMPOS_LISTA, aula_service.CAMPOS_LISTA_SEMPRE)
+    with capturar_sql(PERF_DATABASE_URL, aula_service) as capturadas:
+        completas = aula_service.listar_todas_aulas(limite=500)
+        finas = aula_service.listar_todas_aulas(limite=500, campos=campos)
+    assert finas == projetar(completas, campos)
+    assert "observacoes" not in capturadas[-1] and "participantes_ids" not in capturadas[-1]
+
+
+@perf_db
+def test_musicas_sem_os_joins_dos_campos_nao_pedidos():
+    campos = ler_campos("titulo,estado,responsavel", musica_service.CAMPOS_MUSICA)
+    with capturar_sql(PERF_DATABASE_URL, musica_service) as capturadas:
+        completas = musica_service.listar_musicas()
+        finas = musica_service.listar_musicas(campos=campos)
+    assert completas and finas == projetar(completas, campos)
+    assert "p_resp" in capturadas[-1]
+    for alias in ("p_criador", "p_mist", "p_rev", "p_fin", "disc", "estabelecimentos"):
+        assert alias not in capturadas[-1]
+
+
+@perf_db
+def test_itens_sem_localizacao_nao_leem_sessoes():
+    with capturar_sql(PERF_DATABASE_URL, equipment_service) as capturadas:
+        completos = equipment_service.listar_itens()
+        for pedido, com_sessoes in (("nome,estado", False), ("localizacao_nome", True)):
+            campos = ler_campos(pedido, equipment_service.CAMPOS_ITEM)
+            assert equipment_service.listar_itens(campos=campos) == projetar(completos, campos)
+            assert ("aula_equipamento" in capturadas[-1]) == com_sessoes
@@ -0,0 +1,76 @@
+import asyncio
+import json
+
+import httpx
+from fastapi import FastAPI
+
+from api.captura import REDIGIDO, CapturaTrafegoMiddleware, sanitizar, sanitizar_query
+from perf.replay import Pedido, ler_captura, preparar_pedido
+
+
+def test_sanitizar_mantem_so_valores_anonimos():
+    corpo = {
+        "leva_carro": True, "semanas": 4, "data_hora": "2026-03-09T08:30:00",
+        "estado": "confirmada", "observacoes": "ligar à Maria", "local": "Escola D. Dinis",
+        "responsavel_user_id": "8f14e45f-ceea-4e7a-9f3b-1b1c2d3e4f50", "participantes_ids": ["a b"],
+    }
+    limpo = sanitizar(corpo)
+    assert limpo["leva_carro"] is True and limpo["semanas"] == 4
+    assert limpo["data_hora"] == "2026-03-09T08:30:00" and limpo["estado"] == "confirmada"
+    assert limpo["observacoes"] == REDIGIDO and limpo["local"] == REDIGIDO
+    assert limpo["responsavel_user_id"] == REDIGIDO and limpo["participantes_ids"] == [REDIGIDO]
+    assert sanitizar_query(b"q=joao&data_inicio=2026-01-01&id=1&id=2") == {
+        "q": REDIGIDO, "data_inicio": "2026-01-01", "id": ["1", "2"]}
+
+
+def test_middleware_regista_template_da_rota(tmp_path):
+    app = FastAPI()
+
+    @app.post("/api/aulas/{aula_id}/confirm")
+    async def confirmar(aula_id: int, payload: dict):
+        return {"ok": aula_id}
+
+    captura = tmp_path / "trafego.jsonl"
+    app.add_middleware(CapturaTrafegoMiddleware, caminho=str(captura))
+
+    async def _pedidos():
+        transporte = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://app") as cliente:
+            r = await cliente.post("/api/aulas/812/confirm?origem=email", json={"leva_carro": True})
+            assert r.status_code == 200
+            assert (await cliente.get("/nao/existe")).status_code == 404
+
+    asyncio.run(_pedidos())
+    # middleware_stack é construída no primeiro pedido; fechar garante a escrita
+    middleware = app.middleware_stack
+    while not isinstance(middleware, CapturaTrafegoMiddleware):
+        middleware = middleware.app
+    middleware.gravador.fechar()
+
+    linhas = [json.loads(l) for l in captura.read_text().splitlines()]
+    assert len(linhas) == 1  # rotas inexistentes não são registadas
+    registo = linhas[0]
+    assert registo["rota"] == "/api/aulas/{aula_id}/confirm"
+    assert registo["path_params"] == {"aula_id": "812"}
+    assert registo["query"] == {"origem": "email"}
+    assert registo["corpo"] == {"leva_carro": True}
+    assert registo["estado"] == 200 and registo["role"] is None
+
+
+def test_ler_captura_inclui_rodados_por_ordem(tmp_path):
+    base = tmp_path / "trafego.jsonl"
+    for sufixo, t in (("", 30.0), (".1", 20.0), (".2", 10.0)):
+        (tmp_path / f"trafego.jsonl{sufixo}").write_text(
+            json.dumps({"t": t, "metodo": "GET", "rota": "/api/aulas"}) + "\nlinha cortada\n")
+    assert [p.t for p in ler_captura([str(base)])] == [10.0, 20.0, 30.0]
+    assert [p.t for p in ler_captura([str(base)], desde=15.0, duracao_s=10.0)] == [20.0]
+
+
+def test_preparar_pedido_substitui_redigidos():
+    pedido = Pedido(t=0, metodo="PUT", rota="/api/profiles/{user_id}/aulas/{aula_id}",
+                    path_params={"user_id": REDIGIDO, "aula_id": "7"},
+                    query={"q": REDIGIDO, "semana": "12"}, corpo={"nome": REDIGIDO, "ativo": True})
+    path, params, corpo = preparar_pedido(pedido, "uid-sintetico")
+    assert path == "/api/profiles/uid-sintetico/aulas/7"
+    assert params == {"semana": "12"}
+    assert corpo == {"nome": "perf", "ativo": True}
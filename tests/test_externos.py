@@ -0,0 +1,83 @@
+import asyncio
+import struct
+
+import httpx
+import pytest
+
+from config import externos
+from perf.fakes import Perfil, criar_app, png_com_tamanho
+
+
+@pytest.fixture
+def modo_fake(monkeypatch):
+    monkeypatch.setenv("EXTERNAL_BACKEND", "fake")
+    monkeypatch.setenv("FAKE_EXTERNOS_URL", "http://127.0.0.1:9999/")
+
+
+def test_base_url_real_por_omissao(monkeypatch):
+    monkeypatch.delenv("EXTERNAL_BACKEND", raising=False)
+    monkeypatch.delenv("OSRM_URL", raising=False)
+    monkeypatch.setenv("SUPABASE_URL", "https://projeto.supabase.co")
+    assert externos.base_url("osrm") == "https://router.project-osrm.org"
+    assert externos.base_url("supabase") == "https://projeto.supabase.co"
+    assert externos.endpoint_push("https://fcm.googleapis.com/x") == "https://fcm.googleapis.com/x"
+    assert externos.gemini_http_options() is None
+
+
+def test_modo_fake_redireciona_todos_os_servicos(modo_fake):
+    for servico in externos.SERVICOS:
+        assert externos.base_url(servico) == f"http://127.0.0.1:9999/{servico}"
+    assert externos.endpoint_push("https://fcm.googleapis.com/x").startswith("http://127.0.0.1:9999/push/https%3A")
+    assert externos.gemini_http_options() == {"base_url": "http://127.0.0.1:9999/gemini/"}
+
+
+class _Cliente:
+    """Cliente síncrono mínimo sobre httpx.ASGITransport (sem servidor real)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def _pedido(self, metodo, url, **kwargs):
+        async def _executar():
+            transporte = httpx.ASGITransport(app=self.app)
+            async with httpx.AsyncClient(transport=transporte, base_url="http://fakes") as cliente:
+                return await cliente.request(metodo, url, **kwargs)
+        return asyncio.run(_executar())
+
+    def get(self, url, **kwargs):
+        return self._pedido("GET", url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self._pedido("PUT", url, **kwargs)
+
+
+def _cliente(**perfis):
+    base = {s: Perfil(latencia_ms=0) for s in externos.SERVICOS}
+    base.update(perfis)
+    return _Cliente(criar_app(base))
+
+
+def test_fake_osrm_devolve_rota():
+    resp = _cliente().get("/osrm/route/v1/driving/-9.14,38.72;-9.20,38.75?overview=false")
+    assert resp.status_code == 200
+    assert resp.json()["routes"][0]["distance"] > 5000
+
+
+def test_fake_taxa_de_erro_e_config_em_tempo_real():
+    cliente = _cliente(nominatim=Perfil(latencia_ms=0, taxa_erro=1.0))
+    assert cliente.get("/nominatim/search", params={"q": "x"}).status_code == 503
+    cliente.put("/_config/nominatim", json={"taxa_erro": 0})
+    assert cliente.get("/nominatim/search", params={"q": "x"}).status_code == 200
+
+
+def test_fake_storage_respeita_tamanho_do_payload():
+    cliente = _cliente(supabase=Perfil(latencia_ms=0, payload_kb=32))
+    resp = cliente.get("/supabase/storage/v1/object/public/project-assets/logo.png")
+    assert resp.content.startswith(b"\x89PNG")
+    assert 24 * 1024 < len(resp.content) < 40 * 1024
+
+
+def test_png_com_tamanho_e_valido():
+    png = png_com_tamanho(4)
+    largura, altura = struct.unpack(">II", png[16:24])
+    assert largura == altura > 0
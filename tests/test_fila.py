@@ -0,0 +1,116 @@
+import threading
+import time
+
+import psycopg2
+import pytest
+
+from database import connection, fila
+from perf import PERF_DATABASE_URL
+
+
+def test_atraso_backoff_cresce_exponencialmente_ate_ao_maximo():
+    meio = lambda: 0.5  # sem jitter
+    assert fila.atraso_backoff(1, meio) == fila.BACKOFF_BASE_S
+    assert fila.atraso_backoff(3, meio) == fila.BACKOFF_BASE_S * 4
+    assert fila.atraso_backoff(30, meio) == fila.BACKOFF_MAX_S
+    assert fila.atraso_backoff(1, lambda: 0.0) == pytest.approx(fila.BACKOFF_BASE_S * 0.8)
+
+
+def test_sem_fila_a_tarefa_corre_numa_thread(monkeypatch):
+    monkeypatch.setenv("FILA", "off")
+    feito = threading.Event()
+    fila.tarefa("teste.sem_fila")(lambda valor: feito.set() if valor == 42 else None)
+    assert fila.enfileirar("teste.sem_fila", {"valor": 42}) is None
+    assert feito.wait(2)
+
+
+@pytest.fixture
+def base_perf(monkeypatch):
+    if not PERF_DATABASE_URL:
+        pytest.skip("PERF_DATABASE_URL não definido (base de perf local)")
+    conn = psycopg2.connect(PERF_DATABASE_URL)
+    cur = conn.cursor()
+    cur.execute("SELECT to_regclass('fila_tarefas')")
+    if cur.fetchone()[0] is None:
+        conn.close()
+        pytest.skip("migração 055 não aplicada na base de perf")
+    monkeypatch.setenv("FILA", "on")
+    monkeypatch.setattr(connection, "get_db_connection", lambda: psycopg2.connect(PERF_DATABASE_URL))
+    cur.execute("DELETE FROM fila_tarefas WHERE tipo LIKE 'teste.%%'")
+    conn.commit()
+    yield cur
+    conn.rollback()
+    cur.execute("DELETE FROM fila_tarefas WHERE tipo LIKE 'teste.%%'")
+    conn.commit()
+    conn.close()
+
+
+def _tarefas_teste(cur):
+    cur.execute("""
+        SELECT estado, tentativas, erro FROM fila_tarefas
+         WHERE tipo LIKE 'teste.%%' ORDER BY id
+    """)
+    return cur.fetchall()
+
+
+def test_workers_concorrentes_nunca_executam_a_mesma_tarefa(base_perf):
+    executadas = []
+    lock = threading.Lock()
+
+    @fila.tarefa("teste.contar")
+    def _contar(n):
+        time.sleep(0.005)
+        with lock:
+            executadas.append(n)
+
+    for n in range(40):
+        fila.enfileirar("teste.contar", {"n": n})
+
+    def _consumir():
+        while fila.processar():
+            pass
+
+    threads = [threading.Thread(target=_consumir) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(executadas) == list(range(40))
+    assert {estado for estado, _, _ in _tarefas_teste(base_perf)} == {"concluida"}
+
+
+def test_prioridade_menor_corre_primeiro(base_perf):
+    ordem = []
+    fila.tarefa("teste.ordem")(lambda nome: ordem.append(nome))
+    fila.enfileirar("teste.ordem", {"nome": "normal"})
+    fila.enfileirar("teste.ordem", {"nome": "baixa"}, prioridade=fila.PRIORIDADE_BAIXA)
+    fila.enfileirar("teste.ordem", {"nome": "urgente"}, prioridade=fila.PRIORIDADE_URGENTE)
+    while fila.processar():
+        pass
+    assert ordem == ["urgente", "normal", "baixa"]
+
+
+def test_falha_repete_com_backoff_e_acaba_falhada(base_perf, monkeypatch):
+    monkeypatch.setattr(fila, "atraso_backoff", lambda tentativas: 0)
+
+    @fila.tarefa("teste.falha", max_tentativas=3)
+    def _falhar():
+        raise RuntimeError("serviço externo em baixo")
+
+    fila.enfileirar("teste.falha")
+    assert fila.processar() == 1
+    assert _tarefas_teste(base_perf) == [("pendente", 1, "RuntimeError: serviço externo em baixo")]
+    while fila.processar():
+        pass
+    assert _tarefas_teste(base_perf) == [("falhada", 3, "RuntimeError: serviço externo em baixo")]
+
+
+def test_chave_evita_duplicados_pendentes(base_perf):
+    fila.tarefa("teste.dedup")(lambda: None)
+    primeira = fila.enfileirar("teste.dedup", chave="teste.dedup:1")
+    assert primeira is not None
+    assert fila.enfileirar("teste.dedup", chave="teste.dedup:1") is None
+    assert fila.processar() == 1
+    # Depois de reclamada, uma nova com a mesma chave já entra
+    assert fila.enfileirar("teste.dedup", chave="teste.dedup:1") is not None
@@ -0,0 +1,61 @@
+from services.index_advisor_service import (
+    Condicao, Proposta, _InfoTabela, _propor_para_no, conteudo_migracao,
+    extrair_condicoes, proximo_numero_migracao,
+)
+
+COLUNAS_AULAS = {"id": "integer", "data_hora": "timestamp without time zone", "estado": "character varying",
+                 "mentor_id": "integer", "is_autonomous": "boolean"}
+
+
+def _info(**kwargs):
+    base = dict(
+        linhas=50_000, colunas=COLUNAS_AULAS,
+        distintos={"data_hora": 40_000, "estado": 8, "mentor_id": 200, "is_autonomous": 2},
+        frequentes={"estado": {"terminada": 0.6, "pendente": 0.05}, "is_autonomous": {"false": 0.8, "true": 0.2}},
+        correlacao={"data_hora": 0.98}, indices=[(["id"], None)],
+    )
+    base.update(kwargs)
+    return _InfoTabela(**base)
+
+
+def test_extrair_condicoes_ignora_disjuncoes_e_outras_tabelas():
+    expr = ("((a.data_hora >= '2026-01-01 00:00:00'::timestamp without time zone) "
+            "AND ((a.estado)::text = 'pendente'::text) AND (NOT a.is_autonomous) "
+            "AND ((a.mentor_id = 3) OR (t.id = 4)) AND (t.id = a.id))")
+    assert extrair_condicoes(expr, COLUNAS_AULAS, alias="a") == [
+        Condicao("data_hora", ">=", "2026-01-01 00:00:00"),
+        Condicao("estado", "=", "pendente"),
+        Condicao("is_autonomous", "=", "false"),
+    ]
+
+
+def test_seq_scan_com_intervalo_propoe_indice_na_coluna():
+    no = {"Node Type": "Seq Scan", "Relation Name": "aulas", "Alias": "a", "Total Cost": 1100.0, "Plan Rows": 3000,
+          "Filter": "((a.data_hora >= '2026-01-01'::date) AND (a.data_hora < '2026-04-01'::date))"}
+    proposta = _propor_para_no(no, _info())
+    assert proposta.colunas == ["data_hora"] and proposta.predicado is None
+    assert proposta.custo_estimado < proposta.custo_atual
+
+
+def test_valor_raro_de_coluna_pouco_seletiva_gera_indice_parcial():
+    no = {"Node Type": "Seq Scan", "Relation Name": "aulas", "Alias": "aulas", "Total Cost": 1100.0, "Plan Rows": 40,
+          "Filter": "((estado)::text = 'pendente'::text)"}
+    proposta = _propor_para_no(no, _info())
+    assert proposta.sql == ("CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_aulas_estado_estado_pendente "
+                            "ON aulas(estado) WHERE estado = 'pendente';")
+
+
+def test_indice_existente_nao_e_proposto_outra_vez():
+    no = {"Node Type": "Seq Scan", "Relation Name": "aulas", "Alias": "a", "Total Cost": 1100.0, "Plan Rows": 10,
+          "Filter": "(a.mentor_id = 3)"}
+    assert _propor_para_no(no, _info()).colunas == ["mentor_id"]
+    assert _propor_para_no(no, _info(indices=[(["mentor_id"], None)])) is None
+
+
+def test_migracao_gerada(tmp_path):
+    (tmp_path / "051_x.sql").write_text("")
+    (tmp_path / "049_y.sql").write_text("")
+    assert proximo_numero_migracao(tmp_path) == 52
+    sql = conteudo_migracao([Proposta("aulas", ["data_hora"], custo_atual=1100, custo_estimado=200, chamadas=10)], 52)
+    assert sql.startswith("-- 052:")
+    assert "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_aulas_data_hora ON aulas(data_hora);" in sql
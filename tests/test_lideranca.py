@@ -0,0 +1,109 @@
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import psycopg2
+import psycopg2.extensions
+import pytest
+import pytz
+from apscheduler.triggers.cron import CronTrigger
+
+from database import lideranca
+from database.lideranca import Lider, execucao_em_falta
+from perf import PERF_DATABASE_URL
+
+LISBOA = pytz.timezone("Europe/Lisbon")
+
+
+def test_execucao_em_falta_so_recupera_horarios_passados():
+    trigger = CronTrigger(hour=18, minute=0, timezone=LISBOA)
+    ontem = LISBOA.localize(datetime(2026, 3, 9, 18, 0, 2))
+    hoje_18h = LISBOA.localize(datetime(2026, 3, 10, 18, 0))
+
+    assert execucao_em_falta(trigger, ontem, hoje_18h + timedelta(minutes=3)) == hoje_18h
+    assert execucao_em_falta(trigger, ontem, hoje_18h - timedelta(hours=1)) is None
+    assert execucao_em_falta(trigger, hoje_18h, hoje_18h + timedelta(minutes=3)) is None
+    assert execucao_em_falta(trigger, None, hoje_18h + timedelta(minutes=3)) is None
+    # Atrasos muito longos (ex: sistema parado) não são recuperados
+    assert execucao_em_falta(trigger, ontem, hoje_18h + timedelta(hours=13)) is None
+
+
+def _ligar():
+    conn = psycopg2.connect(PERF_DATABASE_URL)
+    conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+    return conn
+
+
+def _esperar(condicao, timeout_s=3.0):
+    limite = time.monotonic() + timeout_s
+    while not condicao() and time.monotonic() < limite:
+        time.sleep(0.01)
+    return condicao()
+
+
+@pytest.mark.skipif(not PERF_DATABASE_URL, reason="PERF_DATABASE_URL não definido (base de perf local)")
+def test_um_so_lider_e_failover_quando_o_lider_sai():
+    chave = f"rap:teste:{time.time_ns()}"
+    a, b = Lider(chave, intervalo_s=0.05, ligar=_ligar), Lider(chave, intervalo_s=0.05, ligar=_ligar)
+    eventos = []
+    a.registar(lambda: eventos.append("a+"), lambda: eventos.append("a-"))
+    b.registar(lambda: eventos.append("b+"), lambda: eventos.append("b-"))
+    try:
+        a.iniciar()
+        assert _esperar(a.e_lider)
+        b.iniciar()
+        time.sleep(0.3)
+        assert not b.e_lider()
+
+        a.parar()
+        assert _esperar(b.e_lider)
+        assert eventos == ["a+", "a-", "b+"]
+    finally:
+        a.parar()
+        b.parar()
+
+
+@pytest.mark.skipif(not PERF_DATABASE_URL, reason="PERF_DATABASE_URL não definido (base de perf local)")
+def test_exclusivo_numa_ligacao_dedicada():
+    recurso = f"teste:{time.time_ns()}"
+    ligacoes = []
+
+    def _ligar_registando():
+        ligacoes.append(_ligar())
+        return ligacoes[-1]
+
+    with lideranca.exclusivo(recurso, ligar=_ligar_registando) as obtido:
+        assert obtido
+        with lideranca.exclusivo(recurso, ligar=_ligar) as segundo:
+            assert not segundo
+    assert all(conn.closed for conn in ligacoes)
+    with lideranca.exclusivo(recurso, ligar=_ligar) as obtido:
+        assert obtido
+
+
+def test_falha_do_sync_agendado_fica_registada(monkeypatch):
+    from api.routers import ai
+
+    @contextmanager
+    def _lock(_recurso):
+        yield True
+
+    execucoes = []
+    monkeypatch.setattr(lideranca, "ativa", lambda: False)
+    monkeypatch.setattr(lideranca, "exclusivo", _lock)
+    monkeypatch.setattr(lideranca, "_registar_execucao", lambda job_id, _inicio, _ms, erro: execucoes.append((job_id, erro)))
+
+    def _falha():
+        raise RuntimeError("Drive indisponível")
+
+    monkeypatch.setattr(ai, "_sincronizar_kb", _falha)
+    with pytest.raises(RuntimeError):
+        ai._scheduled_sync()
+
+    # Sync manual a correr noutro processo não é uma falha
+    def _ocupado():
+        raise ai._SyncNoutroProcesso()
+
+    monkeypatch.setattr(ai, "_sincronizar_kb", _ocupado)
+    ai._scheduled_sync()
+    assert execucoes == [("drive_sync_daily", "Drive indisponível"), ("drive_sync_daily", None)]
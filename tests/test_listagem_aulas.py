@@ -0,0 +1,40 @@
+import importlib
+
+import psycopg2
+import pytest
+
+from perf import PERF_DATABASE_URL
+from perf.listagem_aulas import medir, mentor_com_scoping
+from perf.planos import capturar_sql
+from services import settings_service
+
+pytestmark = pytest.mark.skipif(not PERF_DATABASE_URL, reason="PERF_DATABASE_URL não definido (base de perf local)")
+
+
+def test_filtros_de_direcao_e_projeto_no_sql(monkeypatch):
+    conn = psycopg2.connect(PERF_DATABASE_URL)
+    try:
+        cur = conn.cursor()
+        projetos = mentor_com_scoping(cur)["projetos"]
+        cur.execute("SELECT id::text FROM profiles WHERE is_direcao OR is_root")
+        direcao = frozenset(r[0] for r in cur.fetchall())
+    finally:
+        conn.close()
+    monkeypatch.setattr(settings_service, "obter_direcao_user_ids", lambda: direcao)
+
+    aula_service = importlib.import_module("services.aula_service")
+    with capturar_sql(PERF_DATABASE_URL, aula_service) as capturadas:
+        aulas = aula_service.listar_todas_aulas(limite=500, allowed_project_ids=projetos, hide_direcao_sessions=True)
+    # O limite é cumprido: nada é descartado depois da query
+    assert len(aulas) == 500
+    assert "NOT IN" in capturadas[0]
+    for a in aulas:
+        assert a["mentor_user_id"] not in direcao
+        assert str(a["responsavel_user_id"] or "") not in direcao
+        assert a["tipo"] in (None, "aula") or a["projeto_id"] in projetos
+
+
+def test_benchmark_reporta_linhas_lidas():
+    resultado = medir(PERF_DATABASE_URL, rondas=1, limite=200)
+    assert resultado["devolvidas"] == 200
+    assert resultado["lidas_aulas"] >= 200
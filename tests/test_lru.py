@@ -0,0 +1,36 @@
+import time
+
+from utils.lru import CacheLRU, metricas
+
+
+def test_despeja_a_entrada_menos_usada():
+    cache = CacheLRU("teste_lru", max_entradas=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a", ttl_s=60) == 1  # "a" passa a ser a mais recente
+    cache.set("c", 3)
+    assert "b" not in cache and "a" in cache and "c" in cache
+    assert cache.metricas()["despejadas"] == 1
+
+
+def test_ttl_expira_e_conta_nas_metricas():
+    cache = CacheLRU("teste_ttl", max_entradas=10)
+    cache.set("a", {"role": "mentor"})
+    assert cache.get("a", ttl_s=60) == {"role": "mentor"}
+    time.sleep(0.02)
+    assert cache.get("a", ttl_s=0.01) is None
+    assert "a" not in cache
+
+    m = cache.metricas()
+    assert (m["acertos"], m["falhas"], m["expiradas"], m["entradas"]) == (1, 1, 1, 0)
+    assert m["taxa_acerto"] == 0.5 and m["ttl_s"] == 0.01
+
+
+def test_invalidacoes_e_registo_global():
+    cache = CacheLRU("teste_invalidacao", max_entradas=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.pop("a") == 1 and cache.pop("a") is None
+    cache.clear()
+    assert len(cache) == 0 and cache.metricas()["invalidadas"] == 2
+    assert any(m["nome"] == "teste_invalidacao" for m in metricas())
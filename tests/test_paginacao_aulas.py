@@ -0,0 +1,98 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+import psycopg2
+import pytest
+from fastapi import FastAPI
+
+from api import deps
+from api.routers import sessions
+from perf import PERF_DATABASE_URL
+from perf.listagem_aulas import mentor_com_scoping, semana_central
+from perf.planos import capturar_sql
+from services import aula_service, settings_service
+from services.permission_service import PermissionContext
+
+
+def test_cursor_ida_e_volta():
+    cursor = aula_service.codificar_cursor(datetime(2026, 3, 10, 14, 30), 812)
+    assert "|" not in cursor and "=" not in cursor
+    assert aula_service.ler_cursor(cursor) == (datetime(2026, 3, 10, 14, 30), 812)
+    for invalido in ("", "nao-e-cursor", "MjAyNi0wMy0xMA"):
+        with pytest.raises(ValueError):
+            aula_service.ler_cursor(invalido)
+
+
+def test_janela_com_fuso_passa_a_hora_de_lisboa():
+    assert aula_service.hora_local(datetime(2026, 3, 9, 0, 0)) == datetime(2026, 3, 9, 0, 0)
+    verao = datetime.fromisoformat("2026-07-05T23:00:00+00:00")
+    assert aula_service.hora_local(verao) == datetime(2026, 7, 6, 0, 0)
+
+
+def _get(app, url):
+    async def _executar():
+        transporte = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://api") as cliente:
+            return await cliente.get(url)
+    return asyncio.run(_executar())
+
+
+def test_endpoint_passa_janela_e_devolve_proximo_cursor(monkeypatch):
+    chamadas = []
+
+    def _listar(**kwargs):
+        chamadas.append(kwargs)
+        base = datetime(2026, 3, 15, 18, 0)
+        return [{"id": 100 - i, "data_hora": base - timedelta(hours=i)} for i in range(kwargs["limite"])]
+
+    monkeypatch.setattr(aula_service, "listar_todas_aulas", _listar)
+    monkeypatch.setattr(settings_service, "ocultar_sessoes_direcao", lambda: False)
+    app = FastAPI()
+    app.include_router(sessions.router)
+    app.dependency_overrides[deps.get_permission_context] = lambda: PermissionContext(
+        user_id="u1", role="mentor", is_root=False, is_direcao=False, is_coordenacao=False,
+        allowed_pages=frozenset(), allowed_actions={}, permission_level=None,
+        project_scoped=False, allowed_project_ids=(),
+    )
+
+    resp = _get(app, "/api/aulas?from=2026-03-09T00:00:00&to=2026-03-16T00:00:00&limit=3")
+    assert resp.status_code == 200 and len(resp.json()) == 3
+    assert chamadas[0]["desde"] == datetime(2026, 3, 9) and chamadas[0]["ate"] == datetime(2026, 3, 16)
+    assert aula_service.ler_cursor(resp.headers["x-next-cursor"]) == (datetime(2026, 3, 15, 16, 0), 98)
+
+    resp = _get(app, f"/api/aulas?limit=3&cursor={resp.headers['x-next-cursor']}")
+    assert chamadas[1]["depois_de"] == (datetime(2026, 3, 15, 16, 0), 98)
+
+    assert _get(app, "/api/aulas?cursor=nao-e-cursor").status_code == 400
+    assert _get(app, "/api/aulas?fields=tipo,xpto").status_code == 400
+    _get(app, "/api/aulas?fields=tipo,estado")
+    assert chamadas[-1]["campos"] == {"id", "data_hora", "tipo", "estado"}
+    assert _get(app, "/api/aulas?limit=5000").status_code == 422
+
+
+@pytest.mark.skipif(not PERF_DATABASE_URL, reason="PERF_DATABASE_URL não definido (base de perf local)")
+def test_paginas_cobrem_a_janela_sem_repetir():
+    conn = psycopg2.connect(PERF_DATABASE_URL)
+    try:
+        cur = conn.cursor()
+        projetos = mentor_com_scoping(cur)["projetos"]
+        desde, ate = semana_central(cur)
+    finally:
+        conn.close()
+
+    janela = dict(allowed_project_ids=projetos, desde=desde, ate=ate)
+    with capturar_sql(PERF_DATABASE_URL, aula_service) as capturadas:
+        completa = [a["id"] for a in aula_service.listar_todas_aulas(**janela)]
+        assert completa
+
+        paginas, depois_de = [], None
+        while True:
+            pagina = aula_service.listar_todas_aulas(limite=37, depois_de=depois_de, **janela)
+            paginas.extend(a["id"] for a in pagina)
+            if len(pagina) < 37:
+                break
+            ultima = pagina[-1]
+            depois_de = aula_service.ler_cursor(aula_service.codificar_cursor(ultima["data_hora"], ultima["id"]))
+    assert paginas == completa
+    assert any("(data_hora, id) < (" in sql for sql in capturadas)
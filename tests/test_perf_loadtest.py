@@ -0,0 +1,56 @@
+import os
+
+import jwt
+import pytest
+
+from perf import PERF_DATABASE_URL
+from perf.loadtest import (
+    MIX_PADRAO, PERF_JWT_SECRET, Resultado, avaliar, carregar_utilizadores,
+    executar_carga, gerar_token, iniciar_servidor, percentil, relatorio,
+)
+from perf.schema import dividir_instrucoes
+
+
+def test_percentil_nearest_rank():
+    valores = list(range(1, 101))
+    assert percentil(valores, 50) == 50
+    assert percentil(valores, 95) == 95
+    assert percentil([], 95) == 0.0
+
+
+def test_gerar_token_tem_forma_supabase():
+    token = gerar_token("00000000-0000-4000-8000-000000000001", "a@perf.local")
+    payload = jwt.decode(token, PERF_JWT_SECRET, algorithms=["HS256"], audience="authenticated")
+    assert payload["sub"] == "00000000-0000-4000-8000-000000000001"
+
+
+def test_avaliar_detecta_p95_acima_do_orcamento():
+    ep = MIX_PADRAO[0]
+    lento = Resultado(latencias=[ep.p95_ms * 2] * 20)
+    assert avaliar({ep.nome: lento}, [ep])
+    rapido = Resultado(latencias=[ep.p95_ms / 2] * 20)
+    assert avaliar({ep.nome: rapido}, [ep]) == []
+
+
+def test_dividir_instrucoes_respeita_blocos_dollar():
+    sql = """
+    -- comentário; com ponto e vírgula
+    CREATE TABLE t (v TEXT DEFAULT 'a;b');
+    CREATE FUNCTION f() RETURNS void AS $$ BEGIN PERFORM 1; END; $$ LANGUAGE plpgsql;
+    """
+    instrucoes = dividir_instrucoes(sql)
+    assert len(instrucoes) == 2
+    assert instrucoes[1].endswith("LANGUAGE plpgsql")
+
+
+@pytest.mark.skipif(not PERF_DATABASE_URL, reason="PERF_DATABASE_URL não definido (base de perf local)")
+def test_orcamentos_p95_sob_carga():
+    utilizadores = carregar_utilizadores(PERF_DATABASE_URL)
+    with iniciar_servidor(PERF_DATABASE_URL) as base_url:
+        resultados = executar_carga(
+            base_url, utilizadores,
+            duracao_s=float(os.getenv("PERF_DURACAO", "15")),
+            concorrencia=int(os.getenv("PERF_CONCORRENCIA", "1")),
+        )
+    violacoes = avaliar(resultados)
+    assert not violacoes, relatorio(resultados) + "\n" + "\n".join(violacoes)
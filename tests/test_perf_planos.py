@@ -0,0 +1,35 @@
+import pytest
+
+from perf import PERF_DATABASE_URL
+from perf.planos import CONSULTAS_CRITICAS, verificar, violacoes_plano
+
+
+def _plano(no_tipo, tabela, custo=100.0):
+    return {
+        "Node Type": "Sort", "Total Cost": custo,
+        "Plans": [{"Node Type": no_tipo, "Relation Name": tabela, "Total Cost": custo}],
+    }
+
+
+def test_seq_scan_em_tabela_grande_e_violacao():
+    problemas = violacoes_plano(_plano("Seq Scan", "aulas"), {"aulas": 50_000}, custo_max=1_000)
+    assert problemas == ["Seq Scan em aulas (50000 linhas)"]
+
+
+def test_seq_scan_em_tabela_pequena_ou_permitida_passa():
+    assert violacoes_plano(_plano("Seq Scan", "aulas"), {"aulas": 100}, custo_max=1_000) == []
+    assert violacoes_plano(_plano("Seq Scan", "aulas"), {"aulas": 50_000}, custo_max=1_000,
+                           seq_scan_permitido=("aulas",)) == []
+    assert violacoes_plano(_plano("Index Scan", "aulas"), {"aulas": 50_000}, custo_max=1_000) == []
+
+
+def test_custo_acima_do_orcamento_e_violacao():
+    problemas = violacoes_plano(_plano("Index Scan", "aulas", custo=5_000), {"aulas": 50_000}, custo_max=1_000)
+    assert problemas == ["custo estimado 5000 > orçamento 1000"]
+
+
+@pytest.mark.skipif(not PERF_DATABASE_URL, reason="PERF_DATABASE_URL não definido (base de perf local)")
+@pytest.mark.parametrize("consulta", CONSULTAS_CRITICAS, ids=lambda c: c.nome)
+def test_planos_das_consultas_criticas(consulta):
+    problemas = verificar(PERF_DATABASE_URL, consulta)
+    assert not problemas, "\n".join(problemas)
@@ -0,0 +1,31 @@
+from datetime import datetime
+
+from perf.seed import Dimensoes, _campo_copy, _CopyStream
+
+
+def test_dimensoes_escalar():
+    base = Dimensoes()
+    dez = base.escalar(10)
+    assert dez.aulas == base.aulas * 10
+    assert dez.semanas_historico == base.semanas_historico
+    assert base.projetos < dez.projetos < base.projetos * 10
+
+
+def test_campo_copy_escapa_valores():
+    assert _campo_copy(None) == "\\N"
+    assert _campo_copy(True) == "t"
+    assert _campo_copy("a\tb\nc\\d") == "a\\tb\\nc\\\\d"
+    assert _campo_copy(datetime(2026, 1, 2, 9, 30)) == "2026-01-02 09:30:00"
+
+
+def test_copy_stream_le_por_blocos():
+    stream = _CopyStream((i, f"nome {i}") for i in range(1000))
+    blocos = []
+    while True:
+        bloco = stream.read(100)
+        if not bloco:
+            break
+        blocos.append(bloco)
+    linhas = "".join(blocos).splitlines()
+    assert len(linhas) == 1000 == stream.contagem
+    assert linhas[-1] == "999\tnome 999"
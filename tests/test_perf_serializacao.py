@@ -0,0 +1,44 @@
+import importlib.util
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from perf.serializacao import (
+    BENCHMARKS, _codificar, _descodificar, carregar_fixtures, medir, preparar, relatorio,
+)
+
+
+@pytest.fixture(scope="module")
+def fixtures():
+    return carregar_fixtures()
+
+
+def test_codificacao_preserva_tipos_da_base():
+    valores = {"dt": datetime(2026, 3, 9, 8, 30), "u": uuid.uuid4(), "d": Decimal("1.50"),
+               "td": timedelta(minutes=90), "lista": [1, None, "x"]}
+    assert _descodificar(_codificar(valores)) == valores
+
+
+@pytest.mark.parametrize("nome", list(BENCHMARKS))
+def test_benchmark_formata_todas_as_linhas(fixtures, nome):
+    resultado = preparar(nome, fixtures)()
+    assert resultado and all(isinstance(d, dict) for d in resultado)
+    m = medir(nome, preparar(nome, fixtures), rondas=1, tempo_min_ronda_s=0.0)
+    assert m.linhas == len(resultado) and m.ops_s > 0 and m.pico_kib > 0
+    assert nome in relatorio([m], {nome: {"ops_s": m.ops_s, "pico_kib": m.pico_kib}})
+
+
+def test_export_calcula_horas_a_partir_das_linhas_gravadas(fixtures):
+    linha = preparar("listar_aulas_export", fixtures)()[0]
+    inicio = datetime.strptime(linha["hora_inicio"], "%H:%M")
+    fim = datetime.strptime(linha["hora_fim"], "%H:%M")
+    assert (fim - inicio) % timedelta(days=1) == timedelta(minutes=linha["duracao_minutos"] or 0)
+
+
+@pytest.mark.skipif(importlib.util.find_spec("pytest_benchmark") is None, reason="pytest-benchmark não instalado")
+@pytest.mark.parametrize("nome", list(BENCHMARKS))
+def test_pytest_benchmark(benchmark, fixtures, nome):
+    benchmark.group = "serializacao"
+    assert benchmark(preparar(nome, fixtures))
@@ -0,0 +1,196 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+import psycopg2
+import pytest
+from fastapi import FastAPI
+from psycopg2 import errors as pg_errors
+from sqlalchemy.exc import IntegrityError
+
+from api import deps
+from api.routers import sessions
+from auth import get_current_user_required
+from database import migracoes
+from perf import PERF_DATABASE_URL
+from perf.planos import capturar_sql, percorrer
+from services import aula_service, equipment_service, excecoes_service, serie_service, settings_service
+from services.permission_service import PermissionContext
+
+perf_db = pytest.mark.skipif(not PERF_DATABASE_URL, reason="PERF_DATABASE_URL não definido (base de perf local)")
+
+INICIO = datetime(2033, 2, 7, 14, 0)
+
+
+def test_restricao_de_exclusao_responde_409(monkeypatch):
+    class _Integridade(Exception):
+        orig = pg_errors.ExclusionViolation()
+
+    assert aula_service._e_conflito_horario(_Integridade())
+    assert aula_service._e_conflito_horario(pg_errors.ExclusionViolation())
+    assert not aula_service._e_conflito_horario(ValueError("outro erro"))
+
+    def _conflito(*_args, **_kwargs):
+        raise aula_service.ConflitoHorario("O mentor já tem outra sessão nesse horário")
+
+    monkeypatch.setattr(aula_service, "criar_aula", _conflito)
+    monkeypatch.setattr(aula_service, "atualizar_aula", _conflito)
+    monkeypatch.setattr(aula_service, "criar_aulas_recorrentes", _conflito)
+    monkeypatch.setattr(serie_service, "materializar_ocorrencia", _conflito)
+    monkeypatch.setattr(serie_service, "obter_serie", lambda serie_id: {
+        "id": serie_id, "tipo": "aula", "projeto_id": None, "mentor_user_id": None, "responsavel_user_id": None,
+    })
+    monkeypatch.setattr(settings_service, "ocultar_sessoes_direcao", lambda: False)
+    app = FastAPI()
+    app.include_router(sessions.router)
+    app.dependency_overrides[get_current_user_required] = lambda: {"sub": "u1"}
+    app.dependency_overrides[deps.get_permission_context] = lambda: PermissionContext(
+        user_id="u1", role="coordenador", is_root=False, is_direcao=False, is_coordenacao=True,
+        allowed_pages=frozenset(), allowed_actions={}, permission_level=None,
+        project_scoped=False, allowed_project_ids=(),
+    )
+
+    async def _pedidos():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://api") as cliente:
+            return [
+                await cliente.post("/api/aulas", json={"data_hora": INICIO.isoformat(), "mentor_id": 1}),
+                await cliente.put("/api/aulas/1", json={"data_hora": INICIO.isoformat()}),
+                await cliente.post("/api/aulas/recorrentes", json={"data_hora": INICIO.isoformat(), "mentor_id": 1}),
+                await cliente.post(f"/api/aulas/series/1/ocorrencias/{INICIO.isoformat()}/materializar"),
+            ]
+
+    for resposta in asyncio.run(_pedidos()):
+        assert resposta.status_code == 409
+        assert resposta.json()["detail"] == "O mentor já tem outra sessão nesse horário"
+
+
+def test_recorrentes_e_materializar_traduzem_a_restricao(monkeypatch):
+    class _Sessao:
+        def __init__(self, *_args):
+            pass
+
+        def __enter__(self):
+            raise IntegrityError("INSERT INTO aulas", {}, pg_errors.ExclusionViolation())
+
+        def __exit__(self, *_args):
+            return False
+
+    monkeypatch.setattr(aula_service, "Session", _Sessao)
+    monkeypatch.setattr(serie_service, "ocorrencias_do_mentor", lambda *args: [])
+    with pytest.raises(aula_service.ConflitoHorario):
+        aula_service.criar_aulas_recorrentes(INICIO.isoformat(), 60, None, None, None, 4, mentor_id=1)
+
+    class _Cursor:
+        def execute(self, *_args):
+            raise pg_errors.ExclusionViolation()
+
+    class _Conn:
+        def cursor(self):
+            return _Cursor()
+
+        def rollback(self):
+            pass
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(serie_service, "obter_serie", lambda serie_id: {
+        "id": serie_id, "regra": "FREQ=WEEKLY", "inicio": INICIO, "excecoes": [], "tema": None,
+        **{campo: None for campo in serie_service._CAMPOS_SERIE if campo != "tema"},
+    })
+    monkeypatch.setattr(serie_service, "get_db_connection", _Conn)
+    with pytest.raises(aula_service.ConflitoHorario):
+        serie_service.materializar_ocorrencia(1, INICIO + timedelta(weeks=1))
+
+
+@pytest.fixture
+def cur():
+    conn = psycopg2.connect(PERF_DATABASE_URL)
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM pg_attribute WHERE attrelid = 'aulas'::regclass AND attname = 'periodo'")
+    if not cur.fetchone():
+        conn.close()
+        pytest.skip("migração 064 não aplicada na base de perf")
+    yield cur
+    conn.rollback()
+    conn.close()
+
+
+@perf_db
+def test_periodo_equivale_a_expressao_antiga(monkeypatch, cur):
+    cur.execute("""
+        SELECT count(*) FROM aulas
+        WHERE periodo IS DISTINCT FROM tsrange(data_hora, data_hora + duracao_minutos * INTERVAL '1 minute')
+    """)
+    assert cur.fetchone()[0] == 0
+
+    cur.execute("""
+        SELECT ae.item_id, a.data_hora + INTERVAL '100 minutes', a.duracao_minutos
+        FROM aula_equipamento ae JOIN aulas a ON a.id = ae.aula_id
+        ORDER BY a.id LIMIT 8
+    """)
+    with capturar_sql(PERF_DATABASE_URL, equipment_service):
+        for item_id, data_hora, duracao in cur.fetchall():
+            margem = timedelta(minutes=equipment_service.BUFFER_MINUTOS)
+            cur.execute("""
+                SELECT a.id FROM aula_equipamento ae JOIN aulas a ON a.id = ae.aula_id
+                WHERE ae.item_id = %s
+                  AND a.data_hora < %s
+                  AND (a.data_hora + (a.duracao_minutos * INTERVAL '1 minute')) > %s
+            """, (item_id, data_hora + timedelta(minutes=duracao) + margem, data_hora - margem))
+            esperadas = {r[0] for r in cur.fetchall()}
+            assert esperadas
+
+            monkeypatch.setattr(migracoes._PERIODO, "disponivel", True)
+            com_coluna = equipment_service.verificar_conflitos([item_id], data_hora, duracao)
+            monkeypatch.setattr(migracoes._PERIODO, "disponivel", False)
+            calculado = equipment_service.verificar_conflitos([item_id], data_hora, duracao)
+            assert {c["aula_id"] for c in com_coluna if "aula_id" in c} == esperadas
+            assert calculado == com_coluna
+
+    cur.execute("EXPLAIN (FORMAT JSON) SELECT count(*) FROM aulas a WHERE a.periodo @> %s::timestamp", (INICIO,))
+    plano = cur.fetchone()[0][0]["Plan"]
+    assert "idx_aulas_periodo" in {no.get("Index Name") for no in percorrer(plano)}
+
+
+@perf_db
+def test_sobreposicao_do_mentor_avisada_na_escrita(monkeypatch, cur):
+    cur.execute("SELECT mentor_id FROM aulas WHERE mentor_id IS NOT NULL ORDER BY id LIMIT 1")
+    mentor_id = cur.fetchone()[0]
+    avisos = []
+    monkeypatch.setattr(excecoes_service, "notificar_conflito_horario", lambda *args: avisos.append(args[:2]))
+    monkeypatch.setattr(aula_service, "_notificar_mentor", lambda *args: None)
+
+    criadas = []
+    try:
+        with capturar_sql(PERF_DATABASE_URL, aula_service), capturar_sql(PERF_DATABASE_URL, serie_service):
+            def _criar(inicio, duracao):
+                aula = aula_service.criar_aula(
+                    None, inicio, tipo="outro", duracao_minutos=duracao, mentor_id=mentor_id,
+                )
+                criadas.append(aula["id"])
+                return aula["id"]
+
+            primeira = _criar(INICIO, 90)
+            assert avisos == []
+            segunda = _criar(INICIO + timedelta(minutes=60), 60)
+            assert avisos == [(segunda, primeira)]
+
+            # Encostada à primeira (começa quando ela acaba) não é sobreposição
+            avisos.clear()
+            assert aula_service.atualizar_aula(segunda, {"data_hora": INICIO + timedelta(minutes=90)})
+            assert avisos == []
+            assert aula_service.atualizar_aula(segunda, {"duracao_minutos": 30, "data_hora": INICIO})
+            assert avisos == [(segunda, primeira)]
+
+            # Cancelada deixa de ocupar o horário do mentor
+            avisos.clear()
+            assert aula_service.atualizar_aula(primeira, {"estado": aula_service.ESTADO_CANCELADA})
+            assert avisos == []
+            assert [c["aula_id"] for c in aula_service.conflitos_mentor(mentor_id, INICIO, 180)] == [segunda]
+            assert aula_service.conflitos_mentor(mentor_id, INICIO, 180, excluir_aula_id=segunda) == []
+    finally:
+        cur.connection.rollback()
+        cur.execute("DELETE FROM aulas WHERE id = ANY(%s)", (criadas,))
+        cur.execute("DELETE FROM aulas_apagadas WHERE aula_id = ANY(%s)", (criadas,))
+        cur.connection.commit()
@@ -0,0 +1,92 @@
+import asyncio
+
+import httpx
+import jwt
+import pytest
+from fastapi import Depends, FastAPI
+
+import auth
+from api import deps
+from services import permission_service
+
+SEGREDO = "segredo-de-teste"
+USER_ID = "00000000-0000-0000-0000-000000000002"
+PERMS = {
+    "is_root": False, "is_direcao": False, "is_coordenacao": True, "role": "coordenador",
+    "allowed_pages": {"horarios"}, "allowed_actions": {"sessions.create": True},
+    "permission_level": None, "project_scoped": True, "allowed_project_ids": [3, 7],
+}
+
+
+@pytest.fixture
+def resolucoes(monkeypatch):
+    monkeypatch.setattr(auth, "JWT_SECRET", SEGREDO)
+    chamadas = []
+    monkeypatch.setattr(permission_service, "get_user_permissions", lambda uid: chamadas.append(uid) or dict(PERMS))
+    return chamadas
+
+
+def _get(app, url):
+    async def _executar():
+        token = jwt.encode({"sub": USER_ID, "aud": "authenticated"}, SEGREDO, algorithm="HS256")
+        transporte = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://api") as cliente:
+            return await cliente.get(url, headers={"Authorization": f"Bearer {token}"})
+    return asyncio.run(_executar())
+
+
+def _app():
+    app = FastAPI()
+    app.add_middleware(deps.PermissoesPorPedido)
+
+    @app.get("/api/teste")
+    def teste(ctx=Depends(deps.get_permission_context), user=Depends(auth.get_current_user_required)):
+        deps._require_coordenacao(user)
+        deps._require_action(user, "sessions.create")
+        deps._require_root_or_role(user, {"coordenador"})
+        outro = permission_service.get_permission_context(USER_ID)
+        return {"mesmo": outro is ctx, "projetos": ctx.project_filter}
+
+    return app
+
+
+def test_contexto_resolvido_uma_vez_por_pedido(resolucoes):
+    app = _app()
+    resp = _get(app, "/api/teste")
+    assert resp.status_code == 200
+    assert resp.json() == {"mesmo": True, "projetos": [3, 7]}
+    assert resolucoes == [USER_ID]
+
+    # Pedido seguinte: novo contexto
+    _get(app, "/api/teste")
+    assert resolucoes == [USER_ID, USER_ID]
+
+
+def test_require_sem_permissao_da_403(resolucoes):
+    app = _app()
+
+    @app.get("/api/so-direcao")
+    def so_direcao(user=Depends(auth.get_current_user_required)):
+        deps._require_direcao(user)
+
+    assert _get(app, "/api/so-direcao").status_code == 403
+
+
+def test_escrita_local_refresca_o_contexto_no_mesmo_pedido(resolucoes):
+    with permission_service.permissoes_partilhadas():
+        antes = permission_service.get_permission_context(USER_ID)
+        assert permission_service.get_permission_context(USER_ID) is antes
+        permission_service._forget(USER_ID)
+        assert permission_service.get_permission_context(USER_ID) is not antes
+    assert len(resolucoes) == 2
+
+
+def test_contexto():
+    ctx = permission_service.PermissionContext(
+        user_id="u", role="mentor", is_root=False, is_direcao=False, is_coordenacao=False,
+        allowed_pages=frozenset({"wiki"}), allowed_actions={"wiki.edit": True},
+        permission_level=None, project_scoped=False, allowed_project_ids=(1,),
+    )
+    assert ctx.project_filter is None and not ctx.is_coordenacao_or_above
+    assert ctx.has_action("wiki.edit") and not ctx.has_action("admin.users")
+    assert ctx.can_access_page("wiki") and not ctx.can_access_page("admin")
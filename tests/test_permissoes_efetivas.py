@@ -0,0 +1,94 @@
+import re
+from pathlib import Path
+
+import psycopg2
+import pytest
+
+from perf import PERF_DATABASE_URL
+from services import permission_service
+
+MIGRACAO_058 = Path(__file__).resolve().parent.parent / "migrations" / "058_permissoes_efetivas.sql"
+
+
+@pytest.fixture
+def conn():
+    if not PERF_DATABASE_URL:
+        pytest.skip("PERF_DATABASE_URL não definido (base de perf local)")
+    conn = psycopg2.connect(PERF_DATABASE_URL)
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM pg_proc WHERE proname = 'permissoes_efetivas'")
+    if not cur.fetchone():
+        conn.close()
+        pytest.skip("migração 058 não aplicada na base de perf")
+    yield conn
+    conn.rollback()
+    conn.close()
+
+
+def _normalizar(sql):
+    return " ".join(sql.split())
+
+
+def test_query_inline_e_o_corpo_da_funcao_058():
+    sql = MIGRACAO_058.read_text(encoding="utf-8")
+    corpo = re.search(r"RETURN QUERY\s+(.*?);\s*END;", sql, re.DOTALL).group(1)
+    corpo = re.sub(r"\bp_(user_id|flags)\b", r"%(\1)s", corpo)
+    assert _normalizar(permission_service._PERMISSOES_SQL_INLINE) == _normalizar(corpo)
+
+
+def test_funcao_e_query_inline_devolvem_a_mesma_linha(conn):
+    cur = conn.cursor()
+    cur.execute("SELECT id::text FROM profiles WHERE project_scoped ORDER BY email LIMIT 1")
+    user_id = cur.fetchone()[0]
+    # Overrides e flags dentro da transação do teste (desfeitos no rollback)
+    cur.execute("""
+        INSERT INTO user_page_permissions (user_id, page_slug, granted)
+        VALUES (%s, 'wiki', FALSE), (%s, 'financeiro', TRUE)
+        ON CONFLICT (user_id, page_slug) DO UPDATE SET granted = EXCLUDED.granted
+    """, (user_id, user_id))
+    cur.execute("UPDATE system_settings SET value = 'false' WHERE key = 'module_chat_enabled'")
+
+    params = {"user_id": user_id, "flags": list(permission_service._MODULE_FLAGS.values())}
+    cur.execute(permission_service._PERMISSOES_SQL, params)
+    pela_funcao = cur.fetchone()
+    cur.execute(permission_service._PERMISSOES_SQL_INLINE, params)
+    assert cur.fetchone() == pela_funcao
+    assert pela_funcao[13] == ["financeiro"] and pela_funcao[14] == ["wiki"]
+    assert pela_funcao[16] == ["module_chat_enabled"]
+
+
+def test_cache_miss_faz_uma_so_query(conn, monkeypatch):
+    cur = conn.cursor()
+    cur.execute("SELECT id::text FROM profiles WHERE NOT is_root ORDER BY email LIMIT 1")
+    user_id = cur.fetchone()[0]
+
+    class _Cursor:
+        def __init__(self, real):
+            self._real = real
+
+        def execute(self, sql, params=None):
+            queries.append(sql)
+            return self._real.execute(sql, params)
+
+        def __getattr__(self, nome):
+            return getattr(self._real, nome)
+
+    class _Conn:
+        def cursor(self):
+            return _Cursor(conn.cursor())
+
+        def __getattr__(self, nome):
+            return getattr(conn, nome)
+
+        def close(self):
+            pass
+
+    queries = []
+    monkeypatch.setattr("database.connection.get_db_connection", lambda: _Conn())
+    permission_service._cache_invalidate(user_id)
+    try:
+        perms = permission_service.get_user_permissions(user_id)
+    finally:
+        permission_service._cache_invalidate(user_id)
+    assert queries == [permission_service._PERMISSOES_SQL]
+    assert perms["allowed_pages"] and not perms["is_root"]
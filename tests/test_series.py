@@ -0,0 +1,313 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+import psycopg2
+import pytest
+from fastapi import FastAPI
+
+from api import deps
+from api.routers import sessions
+from perf import PERF_DATABASE_URL
+from perf.planos import capturar_sql
+from services import aula_service, excecoes_service, notification_service, serie_service, settings_service
+from services.permission_service import PermissionContext
+
+INICIO = datetime(2032, 1, 5, 17, 0)  # segunda-feira
+
+
+def test_normalizar_regra():
+    assert serie_service.normalizar_regra("rrule:FREQ=WEEKLY;COUNT=3", INICIO) == (
+        "FREQ=WEEKLY;COUNT=3", INICIO + timedelta(weeks=2),
+    )
+    assert serie_service.normalizar_regra("FREQ=WEEKLY;INTERVAL=2", INICIO) == ("FREQ=WEEKLY;INTERVAL=2", None)
+    assert serie_service.normalizar_regra("FREQ=WEEKLY;UNTIL=20320131T235959", INICIO)[1] == datetime(2032, 1, 26, 17, 0)
+    for invalida in ("", "FREQ=YEARLY", "xpto", "DTSTART=20320105T170000;FREQ=WEEKLY", "FREQ=DAILY;COUNT=600"):
+        with pytest.raises(ValueError):
+            serie_service.normalizar_regra(invalida, INICIO)
+
+
+def test_ocorrencias_na_janela_contam_as_excluidas():
+    serie = {"regra": "FREQ=WEEKLY;BYDAY=MO,TH", "inicio": INICIO, "excecoes": [INICIO + timedelta(days=3)]}
+    janela = list(serie_service._ocorrencias(serie, INICIO, INICIO + timedelta(weeks=2)))
+    assert janela == [(0, INICIO), (2, INICIO + timedelta(weeks=1)), (3, INICIO + timedelta(weeks=1, days=3))]
+    assert serie_service._indice(serie, INICIO + timedelta(days=3)) is None
+    assert serie_service._indice(serie, INICIO + timedelta(hours=1)) is None
+    assert serie_service._tema("4", 2) == "6" and serie_service._tema("Rimas", 2) == "Rimas"
+
+
+def test_endpoint_ocorrencias_exige_janela_curta(monkeypatch):
+    chamadas = []
+    monkeypatch.setattr(serie_service, "listar_ocorrencias", lambda *a, **kw: chamadas.append((a, kw)) or [])
+    monkeypatch.setattr(settings_service, "ocultar_sessoes_direcao", lambda: False)
+    app = FastAPI()
+    app.include_router(sessions.router)
+    app.dependency_overrides[deps.get_permission_context] = lambda: PermissionContext(
+        user_id="u1", role="mentor", is_root=False, is_direcao=False, is_coordenacao=False,
+        allowed_pages=frozenset(), allowed_actions={}, permission_level=None,
+        project_scoped=True, allowed_project_ids=(3,),
+    )
+
+    async def _get(url):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://api") as cliente:
+            return (await cliente.get(url)).status_code
+
+    url = "/api/aulas/series/ocorrencias?from=2032-01-05T00:00:00&to="
+    assert asyncio.run(_get(url + "2032-01-12T00:00:00")) == 200
+    assert chamadas[0][1]["allowed_project_ids"] == [3]
+    assert asyncio.run(_get(url + "2032-06-01T00:00:00")) == 400
+    assert asyncio.run(_get(url + "2032-01-01T00:00:00")) == 400
+    assert asyncio.run(_get("/api/aulas/series/ocorrencias")) == 422
+
+
+def _contexto(user_id, coordenacao=False):
+    return PermissionContext(
+        user_id=user_id, role="mentor", is_root=False, is_direcao=False, is_coordenacao=coordenacao,
+        allowed_pages=frozenset(), allowed_actions={}, permission_level=None,
+        project_scoped=True, allowed_project_ids=(3,),
+    )
+
+
+def test_endpoints_da_serie_com_ambito_de_projeto(monkeypatch):
+    series = {
+        1: {"id": 1, "tipo": "outro", "projeto_id": 3, "criador_user_id": "criador", "responsavel_user_id": None,
+            "mentor_user_id": "mentor", "participantes_ids": ["participante"]},
+        2: {"id": 2, "tipo": "outro", "projeto_id": 9, "criador_user_id": "criador", "responsavel_user_id": None,
+            "mentor_user_id": None, "participantes_ids": []},
+    }
+    monkeypatch.setattr(serie_service, "obter_serie", series.get)
+    monkeypatch.setattr(serie_service, "atualizar_serie", lambda *a: True)
+    monkeypatch.setattr(serie_service, "apagar_serie", lambda *a: True)
+    monkeypatch.setattr(serie_service, "excluir_ocorrencia", lambda *a: True)
+    monkeypatch.setattr(serie_service, "materializar_ocorrencia", lambda *a: 10)
+    monkeypatch.setattr(aula_service, "obter_aula_por_id", lambda aula_id: {"id": aula_id})
+    monkeypatch.setattr(settings_service, "ocultar_sessoes_direcao", lambda: False)
+    app = FastAPI()
+    app.include_router(sessions.router)
+
+    async def _pedidos(ctx, serie_id):
+        app.dependency_overrides[deps.get_permission_context] = lambda: ctx
+        base = f"/api/aulas/series/{serie_id}"
+        ocorrencia = f"{base}/ocorrencias/2032-01-12T17:00:00"
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://api") as cliente:
+            respostas = [
+                await cliente.get(base),
+                await cliente.put(base, json={"tema": "x"}),
+                await cliente.delete(base),
+                await cliente.delete(ocorrencia),
+                await cliente.post(ocorrencia + "/materializar"),
+            ]
+        return [r.status_code for r in respostas]
+
+    # Série de um projeto fora do âmbito: não existe para o utilizador
+    assert asyncio.run(_pedidos(_contexto("criador"), 2)) == [404] * 5
+    assert asyncio.run(_pedidos(_contexto("criador"), 1)) == [200] * 5
+    assert asyncio.run(_pedidos(_contexto("outro", coordenacao=True), 1)) == [200] * 5
+    # Mentor e participantes veem e materializam, mas não alteram a série
+    for user_id in ("mentor", "participante"):
+        assert asyncio.run(_pedidos(_contexto(user_id), 1)) == [200, 403, 403, 403, 200]
+    assert asyncio.run(_pedidos(_contexto("outro"), 1)) == [200, 403, 403, 403, 403]
+
+
+@pytest.mark.skipif(not PERF_DATABASE_URL, reason="PERF_DATABASE_URL não definido (base de perf local)")
+def test_serie_expandida_e_materializada(monkeypatch):
+    conn = psycopg2.connect(PERF_DATABASE_URL)
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM pg_class WHERE relname = 'aula_series'")
+    if not cur.fetchone():
+        conn.close()
+        pytest.skip("migração 063 não aplicada na base de perf")
+    cur.execute("SELECT id::text FROM profiles ORDER BY id LIMIT 3")
+    criador, *participantes = [r[0] for r in cur.fetchall()]
+    notificacoes = []
+    monkeypatch.setattr(notification_service, "criar_notificacao", lambda **kw: notificacoes.append(kw))
+
+    serie, aula_id = None, None
+    try:
+        with capturar_sql(PERF_DATABASE_URL, serie_service), capturar_sql(PERF_DATABASE_URL, aula_service):
+            serie = serie_service.criar_serie({
+                "data_hora": INICIO.isoformat(), "regra": "FREQ=WEEKLY;COUNT=30", "tipo": "outro",
+                "is_autonomous": False, "tema": "1", "duracao_minutos": 60,
+                "participantes_ids": [criador, *participantes],
+            }, criador_user_id=criador)
+            assert serie["fim"] == INICIO + timedelta(weeks=29) and serie["estado"] == "confirmada"
+            assert sorted(n["user_id"] for n in notificacoes) == sorted(participantes)
+            cur.execute("SELECT count(*) FROM aulas WHERE serie_id = %s", (serie["id"],))
+            assert cur.fetchone()[0] == 0
+
+            janela = (INICIO + timedelta(weeks=4), INICIO + timedelta(weeks=8))
+            ocorrencias = serie_service.listar_ocorrencias(*janela)
+            assert [o["data_hora"] for o in ocorrencias] == [INICIO + timedelta(weeks=w) for w in (7, 6, 5, 4)]
+            assert ocorrencias[-1]["tema"] == "5" and ocorrencias[-1]["id"] is None
+            assert set(ocorrencias[0]) >= set(aula_service.CAMPOS_LISTA)
+
+            quinta, sexta = INICIO + timedelta(weeks=5), INICIO + timedelta(weeks=6)
+            assert serie_service.excluir_ocorrencia(serie["id"], quinta)
+            assert serie_service.materializar_ocorrencia(serie["id"], quinta) is None
+            aula_id = serie_service.materializar_ocorrencia(serie["id"], sexta)
+            assert serie_service.materializar_ocorrencia(serie["id"], sexta) == aula_id
+            assert [o["data_hora"] for o in serie_service.listar_ocorrencias(*janela)] == [
+                INICIO + timedelta(weeks=w) for w in (7, 4)
+            ]
+
+            [aula] = aula_service._listar_aulas(ids=[aula_id])
+            assert aula["data_hora"] == sexta and aula["tema"] == "7"
+            assert sorted(aula["participantes_ids"]) == sorted([criador, *participantes])
+
+            # Editar a série é um UPDATE; a ocorrência materializada fica como estava
+            assert serie_service.atualizar_serie(serie["id"], {"tema": "Ensaios", "regra": "FREQ=WEEKLY;COUNT=6"})
+            assert [o["tema"] for o in serie_service.listar_ocorrencias(*janela)] == ["Ensaios"]
+            assert aula_service.obter_aula_por_id(aula_id)["tema"] == "7"
+            with pytest.raises(ValueError):
+                serie_service.atualizar_serie(serie["id"], {"regra": "FREQ=HOURLY"})
+
+            # Apagar a aula da ocorrência exclui-a da série, em vez de a fazer reaparecer
+            outra = serie_service.materializar_ocorrencia(serie["id"], INICIO + timedelta(weeks=4))
+            assert aula_service.apagar_aula(outra)
+            assert INICIO + timedelta(weeks=4) in serie_service.obter_serie(serie["id"])["excecoes"]
+            assert serie_service.listar_ocorrencias(*janela) == []
+            cur.execute("DELETE FROM aulas_apagadas WHERE aula_id = %s", (outra,))
+            conn.commit()
+
+            assert serie_service.apagar_serie(serie["id"])
+            cur.execute("SELECT serie_id FROM aulas WHERE id = %s", (aula_id,))
+            assert cur.fetchone() == (None,)
+    finally:
+        conn.rollback()
+        if aula_id:
+            cur.execute("DELETE FROM aulas WHERE id = %s", (aula_id,))
+            cur.execute("DELETE FROM aulas_apagadas WHERE aula_id = %s", (aula_id,))
+        if serie:
+            cur.execute("DELETE FROM aula_series WHERE id = %s", (serie["id"],))
+        conn.commit()
+        conn.close()
+
+
+@pytest.mark.skipif(not PERF_DATABASE_URL, reason="PERF_DATABASE_URL não definido (base de perf local)")
+def test_conflitos_do_mentor_nas_ocorrencias(monkeypatch):
+    conn = psycopg2.connect(PERF_DATABASE_URL)
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM pg_class WHERE relname = 'aula_series'")
+    if not cur.fetchone():
+        conn.close()
+        pytest.skip("migração 063 não aplicada na base de perf")
+    cur.execute("SELECT mentor_id FROM aulas WHERE mentor_id IS NOT NULL ORDER BY id LIMIT 1")
+    mentor_id = cur.fetchone()[0]
+    # Uma aula do mentor a meio da 3.ª ocorrência e outra já cancelada na 4.ª
+    cur.execute("""
+        INSERT INTO aulas (mentor_id, tipo, data_hora, duracao_minutos, estado)
+        VALUES (%s, 'outro', %s, 60, 'pendente'), (%s, 'outro', %s, 60, 'cancelada')
+        RETURNING id
+    """, (mentor_id, INICIO + timedelta(weeks=2, minutes=30), mentor_id, INICIO + timedelta(weeks=3)))
+    ocupada, cancelada = [r[0] for r in cur.fetchall()]
+    conn.commit()
+    avisos = []
+    monkeypatch.setattr(excecoes_service, "notificar_conflito_horario", lambda *args: avisos.append(args))
+    monkeypatch.setattr(aula_service, "_notificar_mentor", lambda *args: None)
+
+    serie, materializada = None, None
+    try:
+        with capturar_sql(PERF_DATABASE_URL, serie_service), capturar_sql(PERF_DATABASE_URL, aula_service):
+            serie = serie_service.criar_serie({
+                "data_hora": INICIO.isoformat(), "regra": "FREQ=WEEKLY;COUNT=6", "tipo": "outro",
+                "is_autonomous": False, "mentor_id": mentor_id, "duracao_minutos": 60,
+            })
+            assert [(a[0], a[1], a[3]) for a in avisos] == [
+                (f"série {serie['id']}", ocupada, INICIO + timedelta(weeks=2)),
+            ]
+
+            # A ocorrência materializada não conta como conflito da própria série
+            materializada = serie_service.materializar_ocorrencia(serie["id"], INICIO + timedelta(weeks=1))
+            avisos.clear()
+            assert serie_service.atualizar_serie(serie["id"], {"duracao_minutos": 30})
+            assert avisos == []
+            assert serie_service.atualizar_serie(serie["id"], {"inicio": (INICIO + timedelta(minutes=45)).isoformat()})
+            assert [a[1] for a in avisos] == [ocupada]
+            avisos.clear()
+            assert serie_service.atualizar_serie(serie["id"], {"tema": "Ensaios"})
+            assert avisos == []
+    finally:
+        conn.rollback()
+        criadas = [ocupada, cancelada] + ([materializada] if materializada else [])
+        cur.execute("DELETE FROM aulas WHERE id = ANY(%s)", (criadas,))
+        cur.execute("DELETE FROM aulas_apagadas WHERE aula_id = ANY(%s)", (criadas,))
+        if serie:
+            cur.execute("DELETE FROM aula_series WHERE id = %s", (serie["id"],))
+        conn.commit()
+        conn.close()
+
+
+@pytest.mark.skipif(not PERF_DATABASE_URL, reason="PERF_DATABASE_URL não definido (base de perf local)")
+def test_sessao_sobre_ocorrencia_por_materializar_e_conflito(monkeypatch):
+    conn = psycopg2.connect(PERF_DATABASE_URL)
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM pg_class WHERE relname = 'aula_series'")
+    if not cur.fetchone():
+        conn.close()
+        pytest.skip("migração 063 não aplicada na base de perf")
+    cur.execute("SELECT mentor_id FROM aulas WHERE mentor_id IS NOT NULL ORDER BY id LIMIT 1")
+    mentor_id = cur.fetchone()[0]
+    avisos = []
+    monkeypatch.setattr(excecoes_service, "notificar_conflito_horario", lambda *args: avisos.append(args))
+    monkeypatch.setattr(aula_service, "_notificar_mentor", lambda *args: None)
+
+    series, aulas = [], []
+    try:
+        with capturar_sql(PERF_DATABASE_URL, serie_service), capturar_sql(PERF_DATABASE_URL, aula_service):
+            series.append(serie_service.criar_serie({
+                "data_hora": INICIO.isoformat(), "regra": "FREQ=WEEKLY;COUNT=4", "tipo": "outro",
+                "is_autonomous": False, "mentor_id": mentor_id, "duracao_minutos": 60,
+            }))
+            serie_id = series[0]["id"]
+            [conflito] = aula_service.conflitos_mentor(mentor_id, INICIO + timedelta(weeks=1, minutes=30), 60)
+            assert conflito["aula_id"] is None and conflito["serie_id"] == serie_id
+            assert conflito["data_hora"] == INICIO + timedelta(weeks=1)
+            assert aula_service.conflitos_mentor(
+                mentor_id, INICIO + timedelta(weeks=1, minutes=30), 60, excluir_serie_id=serie_id,
+            ) == []
+
+            with pytest.raises(aula_service.ConflitoHorario):
+                aula_service.criar_aula(
+                    None, INICIO + timedelta(weeks=2, minutes=15), tipo="outro", mentor_id=mentor_id,
+                )
+            with pytest.raises(aula_service.ConflitoHorario):
+                aula_service.criar_aulas_recorrentes(
+                    INICIO - timedelta(weeks=1), 60, None, None, None, 3, tipo="outro", mentor_id=mentor_id,
+                    is_autonomous=False,
+                )
+            cur.execute(
+                "SELECT count(*) FROM aulas WHERE mentor_id = %s AND data_hora >= %s AND data_hora < %s",
+                (mentor_id, INICIO - timedelta(weeks=1), INICIO + timedelta(weeks=4)),
+            )
+            assert cur.fetchone()[0] == 0
+
+            # Logo a seguir à ocorrência não é conflito; mudar a aula para cima dela é
+            aula = aula_service.criar_aula(
+                None, INICIO + timedelta(weeks=1, hours=1), tipo="outro", mentor_id=mentor_id, duracao_minutos=60,
+            )
+            aulas.append(aula["id"])
+            with pytest.raises(aula_service.ConflitoHorario):
+                aula_service.atualizar_aula(aula["id"], {"data_hora": INICIO + timedelta(weeks=3)})
+            assert aula_service.obter_aula_por_id(aula["id"])["data_hora"] == INICIO + timedelta(weeks=1, hours=1)
+
+            # Materializada, a ocorrência conta como aula (e a restrição 065 trata dela)
+            aulas.append(serie_service.materializar_ocorrencia(serie_id, INICIO + timedelta(weeks=2)))
+            [conflito] = aula_service.conflitos_mentor(mentor_id, INICIO + timedelta(weeks=2), 30)
+            assert conflito["aula_id"] == aulas[-1]
+
+            # Outra série do mesmo mentor por cima desta: a coordenação é avisada
+            avisos.clear()
+            series.append(serie_service.criar_serie({
+                "data_hora": (INICIO + timedelta(weeks=3, minutes=30)).isoformat(), "regra": "FREQ=WEEKLY;COUNT=2",
+                "tipo": "outro", "is_autonomous": False, "mentor_id": mentor_id, "duracao_minutos": 60,
+            }))
+            assert [(a[0], a[1], a[3]) for a in avisos] == [
+                (f"série {series[1]['id']}", f"série {serie_id}", INICIO + timedelta(weeks=3, minutes=30)),
+            ]
+    finally:
+        conn.rollback()
+        cur.execute("DELETE FROM aulas WHERE id = ANY(%s)", (aulas,))
+        cur.execute("DELETE FROM aulas_apagadas WHERE aula_id = ANY(%s)", (aulas,))
+        cur.execute("DELETE FROM aula_series WHERE id = ANY(%s)", ([s["id"] for s in series],))
+        conn.commit()
+        conn.close()
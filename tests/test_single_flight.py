@@ -0,0 +1,88 @@
+import threading
+import time
+
+import pytest
+
+from utils.single_flight import SingleFlight, single_flight
+
+
+def _em_paralelo(n, alvo):
+    resultados = [None] * n
+    erros = [None] * n
+
+    def _correr(i):
+        try:
+            resultados[i] = alvo(i)
+        except Exception as e:
+            erros[i] = e
+
+    threads = [threading.Thread(target=_correr, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    return threads, resultados, erros
+
+
+def _esperar_partilhadas(grupo, n, timeout_s=2.0):
+    limite = time.monotonic() + timeout_s
+    while grupo.partilhadas < n and time.monotonic() < limite:
+        time.sleep(0.001)
+
+
+def test_chamadas_iguais_em_simultaneo_correm_uma_vez():
+    grupo = SingleFlight()
+    libertar = threading.Event()
+    execucoes = []
+
+    def _lento(projeto_id):
+        execucoes.append(projeto_id)
+        libertar.wait(2)
+        return {"projeto": projeto_id}
+
+    threads, resultados, _ = _em_paralelo(5, lambda i: grupo.executar(("stats", 7), _lento, 7))
+    _esperar_partilhadas(grupo, 4)
+    libertar.set()
+    for t in threads:
+        t.join()
+
+    assert execucoes == [7]
+    assert all(r is resultados[0] for r in resultados)
+    assert (grupo.execucoes, grupo.partilhadas) == (1, 4)
+    assert not grupo.em_curso(("stats", 7))
+
+
+def test_erro_chega_a_todos_e_nao_fica_guardado():
+    grupo = SingleFlight()
+    libertar = threading.Event()
+
+    def _falha():
+        libertar.wait(2)
+        raise ValueError("base em baixo")
+
+    threads, _, erros = _em_paralelo(3, lambda i: grupo.executar("k", _falha))
+    _esperar_partilhadas(grupo, 2)
+    libertar.set()
+    for t in threads:
+        t.join()
+    assert all(isinstance(e, ValueError) for e in erros)
+
+    # Não é cache: a chamada seguinte volta a correr a função
+    assert grupo.executar("k", lambda: "ok") == "ok"
+
+
+def test_decorador_separa_por_argumentos():
+    chamadas = []
+
+    @single_flight
+    def _ler(projeto_id=None):
+        chamadas.append(projeto_id)
+        return projeto_id
+
+    assert _ler(1) == 1
+    assert _ler(projeto_id=2) == 2
+    assert _ler(1) == 1
+    assert chamadas == [1, 2, 1]
+
+
+def test_argumentos_nao_hashable_falham_cedo():
+    with pytest.raises(TypeError):
+        single_flight(lambda filtros: filtros)({"a": 1})
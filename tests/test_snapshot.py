@@ -0,0 +1,129 @@
+import select
+import time
+from datetime import datetime
+
+import httpx
+import psycopg2
+import psycopg2.extensions
+import pytest
+
+from api.routers.auth import _etag_corresponde
+from perf import PERF_DATABASE_URL
+from perf.loadtest import gerar_token, iniciar_servidor
+from services import snapshot_service
+
+
+def test_etag_so_depende_do_conteudo():
+    base = {"user_id": "u1", "proximas_sessoes": [{"id": 1, "data_hora": datetime(2026, 3, 10, 14, 0)}]}
+    etag, corpo = snapshot_service.serializar(base)
+    assert snapshot_service.serializar(dict(base))[0] == etag
+    assert b'"2026-03-10T14:00:00"' in corpo
+    assert snapshot_service.serializar({**base, "notificacoes_nao_lidas": 1})[0] != etag
+
+
+def test_if_none_match():
+    assert _etag_corresponde('"abc"', '"abc"')
+    assert _etag_corresponde('W/"abc", "def"', '"abc"')
+    assert _etag_corresponde("*", '"abc"')
+    assert not _etag_corresponde('"def"', '"abc"')
+    assert not _etag_corresponde(None, '"abc"')
+
+
+def test_invalidacao_durante_o_calculo_nao_fica_em_cache(monkeypatch):
+    def _calcular(user_id):
+        # Chega um NOTIFY enquanto o snapshot está a ser calculado
+        snapshot_service.invalidar(user_id)
+        return {"user_id": user_id}
+
+    monkeypatch.setattr(snapshot_service, "calcular_snapshot", _calcular)
+    snapshot_service.obter_snapshot("u-corrida")
+    assert "u-corrida" not in snapshot_service._CACHE
+
+
+@pytest.mark.skipif(not PERF_DATABASE_URL, reason="PERF_DATABASE_URL não definido (base de perf local)")
+def test_snapshot_com_etag_e_invalidacao_por_trigger():
+    conn = psycopg2.connect(PERF_DATABASE_URL)
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM pg_proc WHERE proname = 'notificar_snapshot_utilizador'")
+    if not cur.fetchone():
+        conn.close()
+        pytest.skip("migração 056 não aplicada na base de perf")
+    cur.execute("""
+        SELECT p.id::text, p.email FROM profiles p
+        JOIN mentores m ON m.user_id = p.id
+        ORDER BY p.email LIMIT 1
+    """)
+    user_id, email = cur.fetchone()
+    cabecalhos = {"Authorization": f"Bearer {gerar_token(user_id, email)}"}
+
+    try:
+        with iniciar_servidor(PERF_DATABASE_URL, porta=8792) as base_url:
+            resp = httpx.get(f"{base_url}/api/me/snapshot", headers=cabecalhos, timeout=30)
+            assert resp.status_code == 200
+            etag = resp.headers["etag"]
+            corpo = resp.json()
+            assert corpo["user_id"] == user_id and corpo["mentor_id"] is not None
+            assert {"proximas_sessoes", "pendentes_confirmacao", "por_registar", "musicas"} <= corpo.keys()
+
+            resp = httpx.get(f"{base_url}/api/me/snapshot", headers={**cabecalhos, "If-None-Match": etag}, timeout=30)
+            assert resp.status_code == 304 and resp.content == b""
+
+            cur.execute("""
+                INSERT INTO notificacoes (user_id, tipo, titulo, mensagem)
+                VALUES (%s, 'teste', 'Snapshot', 'teste de invalidação') RETURNING id
+            """, (user_id,))
+            notif_id = cur.fetchone()[0]
+            conn.commit()
+
+            limite = time.monotonic() + 5
+            while True:
+                resp = httpx.get(f"{base_url}/api/me/snapshot", headers={**cabecalhos, "If-None-Match": etag}, timeout=30)
+                if resp.status_code == 200 or time.monotonic() > limite:
+                    break
+                time.sleep(0.05)
+            assert resp.status_code == 200
+            assert resp.json()["notificacoes_nao_lidas"] == corpo["notificacoes_nao_lidas"] + 1
+    finally:
+        conn.rollback()
+        cur.execute("DELETE FROM notificacoes WHERE tipo = 'teste' AND titulo = 'Snapshot'")
+        conn.commit()
+        conn.close()
+
+
+@pytest.mark.skipif(not PERF_DATABASE_URL, reason="PERF_DATABASE_URL não definido (base de perf local)")
+def test_campos_das_sessoes_por_registar_invalidam_o_snapshot():
+    escuta = psycopg2.connect(PERF_DATABASE_URL)
+    escuta.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+    escuta.cursor().execute("LISTEN rap_cache")
+    conn = psycopg2.connect(PERF_DATABASE_URL)
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM pg_trigger WHERE tgname = 'trg_snapshot_turma_disciplinas'")
+    if not cur.fetchone():
+        conn.close()
+        escuta.close()
+        pytest.skip("migração 056 não aplicada na base de perf")
+
+    def _avisos(sql, params=()):
+        cur.execute(sql, params)
+        conn.commit()
+        payloads = set()
+        limite = time.monotonic() + 2
+        while not any(p.startswith("me_snapshot") for p in payloads) and time.monotonic() < limite:
+            select.select([escuta], [], [], 0.1)
+            escuta.poll()
+            payloads |= {n.payload for n in escuta.notifies}
+            escuta.notifies.clear()
+        return payloads
+
+    try:
+        cur.execute("""
+            SELECT a.id, m.user_id::text FROM aulas a JOIN mentores m ON m.id = a.mentor_id
+            WHERE m.user_id IS NOT NULL ORDER BY a.id LIMIT 1
+        """)
+        aula_id, user_id = cur.fetchone()
+        # UPDATE sem mudar o valor: o trigger UPDATE OF dispara na mesma
+        assert f"me_snapshot:{user_id}" in _avisos("UPDATE aulas SET sumario = sumario WHERE id = %s", (aula_id,))
+        assert "me_snapshot" in _avisos("UPDATE turma_disciplinas SET nome = nome WHERE id = (SELECT min(id) FROM turma_disciplinas)")
+    finally:
+        conn.close()
+        escuta.close()
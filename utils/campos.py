@@ -0,0 +1,37 @@
+"""
+Sparse fieldsets: parâmetro `fields=` das listagens (GET /api/aulas,
+/api/musicas, /api/equipamento/itens).
+
+O cliente pede só os campos de que precisa (ex: a grelha do calendário
+dispensa observacoes/objetivos) e o serviço corta tanto o SELECT como o
+payload. Sem `fields` devolve-se tudo, como antes.
+
+Como usar noutros ficheiros:
+    from utils.campos import ler_campos, projetar
+
+    campos = ler_campos("id,titulo,estado", CAMPOS_MUSICA)  # ValueError se houver desconhecidos
+    linhas = projetar(linhas, campos)
+"""
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Sequence
+
+
+def ler_campos(
+    fields: Optional[str],
+    disponiveis: Iterable[str],
+    sempre: Sequence[str] = ("id",),
+) -> Optional[FrozenSet[str]]:
+    """"a,b,c" → frozenset com `sempre` incluído; None ou vazio → None (todos os campos)."""
+    if fields is None or not fields.strip():
+        return None
+    pedidos = {c.strip() for c in fields.split(",") if c.strip()}
+    desconhecidos = pedidos - set(disponiveis)
+    if desconhecidos:
+        raise ValueError(f"Campos desconhecidos: {', '.join(sorted(desconhecidos))}")
+    return frozenset(pedidos) | frozenset(sempre)
+
+
+def projetar(linhas: List[Dict[str, Any]], campos: Optional[FrozenSet[str]]) -> List[Dict[str, Any]]:
+    """Só os `campos` de cada linha, pela ordem original; com campos=None devolve as linhas como estão."""
+    if campos is None:
+        return linhas
+    return [{k: v for k, v in linha.items() if k in campos} for linha in linhas]
@@ -0,0 +1,105 @@
+"""
+Cache LRU limitada com TTL e métricas, para as caches em memória dos serviços.
+
+A entrada menos usada sai quando se atinge `max_entradas`, por isso a cache
+não cresce sem limite com utilizadores que já não voltam. O TTL é passado em
+cada leitura: os serviços usam um TTL longo enquanto o LISTEN/NOTIFY está
+ativo (database/cache_invalidacao.py) e um curto quando não está.
+
+Como usar noutros ficheiros:
+    from utils.lru import CacheLRU
+
+    _CACHE = CacheLRU("permissoes", max_entradas=2000)
+    valor = _CACHE.get(user_id, ttl_s=300)
+    _CACHE.set(user_id, valor)
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+_caches: Dict[str, "CacheLRU"] = {}
+
+
+class CacheLRU:
+    def __init__(self, nome: str, max_entradas: int = 1000):
+        self.nome = nome
+        self.max_entradas = max_entradas
+        self._dados: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.expiradas = 0
+        self.despejadas = 0
+        self.invalidadas = 0
+        self.ttl_s: Optional[float] = None  # último TTL pedido
+        _caches[nome] = self
+
+    def get(self, chave: Hashable, ttl_s: float) -> Optional[Any]:
+        with self._lock:
+            self.ttl_s = ttl_s
+            entrada = self._dados.get(chave)
+            if entrada is None:
+                self.falhas += 1
+                return None
+            if time.time() - entrada[0] >= ttl_s:
+                del self._dados[chave]
+                self.expiradas += 1
+                self.falhas += 1
+                return None
+            self._dados.move_to_end(chave)
+            self.acertos += 1
+            return entrada[1]
+
+    def set(self, chave: Hashable, valor: Any) -> None:
+        with self._lock:
+            self._dados[chave] = (time.time(), valor)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.max_entradas:
+                self._dados.popitem(last=False)
+                self.despejadas += 1
+
+    def pop(self, chave: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entrada = self._dados.pop(chave, None)
+            if entrada is None:
+                return default
+            self.invalidadas += 1
+            return entrada[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self.invalidadas += len(self._dados)
+            self._dados.clear()
+
+    def __contains__(self, chave: Hashable) -> bool:
+        with self._lock:
+            return chave in self._dados
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._dados)
+
+    def metricas(self) -> dict:
+        with self._lock:
+            agora = time.time()
+            idades = [agora - t for t, _ in self._dados.values()]
+            pedidos = self.acertos + self.falhas
+            return {
+                "nome": self.nome,
+                "entradas": len(self._dados),
+                "max_entradas": self.max_entradas,
+                "ttl_s": self.ttl_s,
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                "taxa_acerto": round(self.acertos / pedidos, 4) if pedidos else None,
+                "expiradas": self.expiradas,
+                "despejadas": self.despejadas,
+                "invalidadas": self.invalidadas,
+                "idade_max_s": round(max(idades), 1) if idades else None,
+            }
+
+
+def metricas() -> list:
+    """Métricas de todas as caches LRU deste processo."""
+    return [cache.metricas() for cache in list(_caches.values())]
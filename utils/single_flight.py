@@ -0,0 +1,98 @@
+"""
+Single-flight: chamadas simultâneas e iguais partilham uma só execução.
+
+Quando vários pedidos pedem a mesma leitura pesada ao mesmo tempo (ex: as
+estatísticas de um projeto quando a coordenação abre a página), só o primeiro
+corre a função; os outros esperam e recebem o mesmo resultado (ou a mesma
+exceção). Não é uma cache: assim que a execução termina, a chamada seguinte
+volta a correr a função.
+
+Funciona entre threads do mesmo processo — os handlers que o usam devem ser
+`def` (o FastAPI corre-os no threadpool), senão os pedidos nunca se sobrepõem.
+O resultado é o MESMO objeto para todos: quem o recebe não o deve alterar.
+
+Como usar noutros ficheiros:
+    from utils.single_flight import single_flight
+
+    @single_flight
+    def listar_stats(projeto_id=None): ...
+"""
+import functools
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class _Voo:
+    __slots__ = ("feito", "resultado", "erro", "partilhas")
+
+    def __init__(self):
+        self.feito = threading.Event()
+        self.resultado = None
+        self.erro = None
+        self.partilhas = 0
+
+
+class SingleFlight:
+    """Grupo de chamadas em curso, indexadas por chave."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._em_curso: Dict[Hashable, _Voo] = {}
+        self.execucoes = 0
+        self.partilhadas = 0
+
+    def executar(self, chave: Hashable, funcao: Callable[..., Any], *args, **kwargs) -> Any:
+        with self._lock:
+            voo = self._em_curso.get(chave)
+            primeiro = voo is None
+            if primeiro:
+                voo = self._em_curso[chave] = _Voo()
+                self.execucoes += 1
+            else:
+                voo.partilhas += 1
+                self.partilhadas += 1
+
+        if not primeiro:
+            voo.feito.wait()
+            if voo.erro is not None:
+                raise voo.erro
+            return voo.resultado
+
+        try:
+            voo.resultado = funcao(*args, **kwargs)
+            return voo.resultado
+        except BaseException as e:
+            voo.erro = e
+            raise
+        finally:
+            with self._lock:
+                self._em_curso.pop(chave, None)
+            voo.feito.set()
+            if voo.partilhas:
+                logger.debug(f"[SINGLE-FLIGHT] {chave!r} partilhado por {voo.partilhas + 1} chamadas")
+
+    def em_curso(self, chave: Hashable) -> bool:
+        with self._lock:
+            return chave in self._em_curso
+
+
+_grupo = SingleFlight()
+
+
+def estatisticas() -> dict:
+    return {"execucoes": _grupo.execucoes, "partilhadas": _grupo.partilhadas}
+
+
+def single_flight(funcao):
+    """Decorador: chave = (função, args, kwargs). Os argumentos têm de ser hashable."""
+    nome = f"{funcao.__module__}.{funcao.__qualname__}"
+
+    @functools.wraps(funcao)
+    def envolvida(*args, **kwargs):
+        chave = (nome, args, tuple(sorted(kwargs.items())))
+        return _grupo.executar(chave, funcao, *args, **kwargs)
+
+    return envolvida
@@ -0,0 +1,57 @@
+"""
+Worker da fila de tarefas (database/fila.py), num processo separado da API.
+
+    python -m worker              # 2 threads
+    python -m worker --threads 4
+
+Com o worker a correr à parte, arrancar a API com FILA_WORKER_EMBUTIDO=off.
+Podem correr vários workers em paralelo (SKIP LOCKED): cada tarefa só é
+executada por um deles.
+"""
+import argparse
+import logging
+import signal
+import threading
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from database import fila
+from database.connection import close_pool
+
+logger = logging.getLogger("worker")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Worker da fila de tarefas")
+    parser.add_argument("--threads", type=int, default=2, help="tarefas em paralelo neste processo")
+    parser.add_argument("--intervalo", type=float, default=fila.INTERVALO_POLL_S,
+                        help="segundos entre consultas quando a fila está vazia")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    fila.carregar_tarefas()
+    # Primeiro acesso à base antes das threads (o pool é criado de forma preguiçosa)
+    fila.manutencao()
+
+    parar = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: parar.set())
+    signal.signal(signal.SIGINT, lambda *_: parar.set())
+
+    threads = [
+        threading.Thread(target=fila.correr, args=(parar, args.intervalo), name=f"fila-worker-{i}")
+        for i in range(args.threads)
+    ]
+    for t in threads:
+        t.start()
+    logger.info(f"Worker da fila a correr com {args.threads} thread(s)")
+    # As threads terminam a tarefa em curso antes de sair
+    while any(t.is_alive() for t in threads):
+        for t in threads:
+            t.join(timeout=1.0)
+    close_pool()
+    logger.info("Worker terminado")
+
+
+if __name__ == "__main__":
+    main()